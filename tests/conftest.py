@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tools/ scripts import their siblings directly (e.g. `from shudnc import ...`).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
@@ -0,0 +1,72 @@
+from forcing_catalog import ForcingCatalog
+
+STEP = 180.0  # minutes (3-hourly)
+
+
+def _entry(start, n=1, *, grid="g1", product="GLDAS"):
+    t = {"n": n, "start": start, "end": start + (n - 1) * STEP}
+    if n > 1:
+        t["step"] = STEP
+    return {"size": 1, "mtime_ns": 1, "product": product, "vars": ["Tair_f_inst"], "grid": grid, "time": t}
+
+
+def _catalog(files):
+    return ForcingCatalog("/data", {"files": files})
+
+
+def test_contiguous_archive_has_no_gaps_or_duplicates():
+    cat = _catalog({f"GLDAS/2017/f{k:02d}.nc4": _entry(k * STEP) for k in range(8)})
+    cov = cat.coverage("gldas")
+    assert cov["files"] == 8
+    (arc,) = cov["archives"]
+    # Year subdirectories belong to their archive.
+    assert (arc["dir"], arc["grid"], arc["step_min"]) == ("GLDAS", "g1", STEP)
+    assert arc["spans"] == [[0.0, 7 * STEP]]
+    assert arc["gaps"] == [] and arc["duplicates"] == []
+
+
+def test_gap_is_reported_as_first_and_last_missing_record():
+    files = {f"GLDAS/f{k:02d}.nc4": _entry(k * STEP) for k in (0, 1, 2, 6, 7)}
+    (arc,) = _catalog(files).coverage("GLDAS")["archives"]
+    assert arc["spans"] == [[0.0, 2 * STEP], [6 * STEP, 7 * STEP]]
+    assert arc["gaps"] == [[3 * STEP, 5 * STEP]]
+
+
+def test_multi_record_files_use_the_within_file_step():
+    files = {"ERA5/a.nc": _entry(0.0, n=24, product="ERA5"), "ERA5/b.nc": _entry(30 * STEP, n=24, product="ERA5")}
+    (arc,) = _catalog(files).coverage("ERA5")["archives"]
+    assert arc["step_min"] == STEP
+    assert arc["gaps"] == [[24 * STEP, 29 * STEP]]
+
+
+def test_overlapping_files_are_duplicates():
+    files = {
+        "GLDAS/a.nc4": _entry(0.0, n=4),
+        "GLDAS/b.nc4": _entry(3 * STEP, n=4),
+        "GLDAS/c.nc4": _entry(7 * STEP, n=1),
+    }
+    (arc,) = _catalog(files).coverage("GLDAS")["archives"]
+    assert arc["duplicates"] == [{"time": 3 * STEP, "files": ["/data/GLDAS/a.nc4", "/data/GLDAS/b.nc4"]}]
+    assert arc["gaps"] == []
+
+
+def test_subset_next_to_source_is_a_separate_archive():
+    files = {}
+    for k in range(4):
+        files[f"GLDAS/2017/f{k}.nc4"] = _entry(k * STEP, grid="global")
+        files[f"GLDAS_qhh/2017/f{k}.nc4"] = _entry(k * STEP, grid="basin")
+    cov = _catalog(files).coverage("GLDAS")
+    assert cov["files"] == 8
+    assert [(a["dir"], a["grid"]) for a in cov["archives"]] == [("GLDAS", "global"), ("GLDAS_qhh", "basin")]
+    assert all(a["duplicates"] == [] and a["gaps"] == [] for a in cov["archives"])
+
+
+def test_unreadable_and_other_products_are_ignored():
+    files = {
+        "GLDAS/a.nc4": _entry(0.0),
+        "GLDAS/b.nc4": {"size": 1, "mtime_ns": 1, "product": "GLDAS", "error": "OSError: bad"},
+        "ERA5/c.nc": _entry(0.0, product="ERA5"),
+    }
+    cov = _catalog(files).coverage("GLDAS")
+    assert cov["files"] == 1
+    assert _catalog({}).coverage("GLDAS") == {"files": 0, "archives": []}
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from forcing_convert import Expr
+
+
+def test_parse_collects_variable_names():
+    e = Expr.parse("  (Tair - 273.15) * k + sqrt(Tair) ", where="t")
+    assert e.text == "(Tair - 273.15) * k + sqrt(Tair)"
+    assert sorted(e.names) == ["Tair", "k"]  # each once, functions excluded
+
+
+def test_evaluates_on_arrays_with_python_precedence():
+    x = np.array([1.0, 4.0, 9.0])
+    e = Expr.parse("-x + 2 * x / 4 - abs(-x) + +1", where="t")
+    np.testing.assert_allclose(e({"x": x}), -x + 2 * x / 4 - np.abs(-x) + 1)
+    np.testing.assert_allclose(Expr.parse("exp(x * 0) + sqrt(x)", where="t")({"x": x}), [2.0, 3.0, 4.0])
+
+
+def test_constants_are_floats():
+    assert Expr.parse("1 / 2", where="t")({}) == 0.5
+
+
+def test_functions_do_not_warn_on_invalid_input():
+    with np.errstate(all="raise"):
+        out = Expr.parse("sqrt(x) + exp(x)", where="t")({"x": np.array([-1.0, 1000.0])})
+    assert np.isnan(out[0]) and np.isinf(out[1])
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "x ** 2",
+        "x % 2",
+        "x // 2",
+        "not x",
+        "log(x)",
+        "sqrt(x, 2)",
+        "sqrt(x=1)",
+        "np.sqrt(x)",
+        "x.real",
+        "x[0]",
+        "'a'",
+        "True",
+        "x if x else 1",
+        "x < 1",
+        "lambda: 1",
+        "__import__('os')",
+    ],
+)
+def test_rejects_unsupported_syntax(text):
+    with pytest.raises(ValueError, match="adapter conversion.temp"):
+        Expr.parse(text, where="conversion.temp")
+
+
+@pytest.mark.parametrize("text", [None, "", "   ", 3.0, "x +"])
+def test_rejects_missing_or_invalid_text(text):
+    with pytest.raises(ValueError):
+        Expr.parse(text, where="t")
+
+
+def test_unknown_name_fails_at_evaluation():
+    with pytest.raises(KeyError):
+        Expr.parse("x + y", where="t")({"x": 1.0})
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import grid_index as grid_index_module
+from grid_index import grid_index, to_xyz
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+
+def _brute_regular(lat, lon, px, py):
+    return np.abs(lat[None, :] - py[:, None]).argmin(axis=1), np.abs(lon[None, :] - px[:, None]).argmin(axis=1)
+
+
+def _brute_curvilinear(lat2, lon2, px, py):
+    centres = to_xyz(lon2.ravel(), lat2.ravel())
+    d = ((to_xyz(px, py)[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2)
+    d[:, ~np.isfinite(centres).all(axis=1)] = np.inf
+    flat = d.argmin(axis=1)
+    return flat // lat2.shape[1], flat % lat2.shape[1]
+
+
+def test_regular_grid_matches_brute_force():
+    rng = np.random.default_rng(0)
+    lat = np.arange(20.0, 40.0, 0.25)
+    lon = np.arange(-10.0, 30.0, 0.25)
+    px, py = rng.uniform(-10, 30, 500), rng.uniform(20, 40, 500)
+    row, col = grid_index(lat, lon).nearest(px, py)
+    exp_row, exp_col = _brute_regular(lat, lon, px, py)
+    np.testing.assert_array_equal(row, exp_row)
+    np.testing.assert_array_equal(col, exp_col)
+
+
+def test_regular_0360_grid_shifts_negative_longitudes():
+    lat = np.arange(-5.0, 5.0, 1.0)
+    lon = np.arange(0.0, 360.0, 1.0)
+    row, col = grid_index(lat, lon).nearest([-1.2, 359.0, 1.0], [0.0, 0.0, 0.0])
+    assert list(col) == [359, 359, 1]
+
+
+@pytest.mark.parametrize("seam", [False, True])
+def test_curvilinear_grid_matches_brute_force(seam):
+    rng = np.random.default_rng(1)
+    ny, nx = 30, 40
+    j, i = np.meshgrid(np.arange(ny), np.arange(nx), indexing="ij")
+    # Rotated, sheared grid; optionally straddling the antimeridian.
+    lon0 = 170.0 if seam else 100.0
+    lon2 = lon0 + 0.3 * i + 0.05 * j
+    lat2 = 30.0 + 0.25 * j - 0.04 * i
+    if seam:
+        lon2 = np.where(lon2 > 180.0, lon2 - 360.0, lon2)
+    lat2[3:6, 5:9] = np.nan  # masked cells are never chosen
+    px = rng.uniform(lon0, lon0 + 12.0, 400)
+    py = rng.uniform(29.0, 37.0, 400)
+    if seam:
+        px = np.where(px > 180.0, px - 360.0, px)
+    gi = grid_index(lat2, lon2, cache=False)
+    row, col = gi.nearest(px, py)
+    exp_row, exp_col = _brute_curvilinear(lat2, lon2, px, py)
+    np.testing.assert_array_equal(row, exp_row)
+    np.testing.assert_array_equal(col, exp_col)
+    assert not np.isnan(lat2[row, col]).any()
+
+
+def test_curvilinear_tree_cache_round_trip(tmp_path, monkeypatch):
+    rng = np.random.default_rng(2)
+    lat2 = 10.0 + rng.uniform(0, 5, (15, 12)).cumsum(axis=0) * 0.01
+    lon2 = 50.0 + rng.uniform(0, 5, (15, 12)).cumsum(axis=1) * 0.01
+    px, py = rng.uniform(50.0, 50.5, 100), rng.uniform(10.0, 10.5, 100)
+    grid_index(lat2, lon2)
+    assert list((tmp_path / "shudnc" / "grid_index").glob("*.npz"))
+    # A new process (empty memo) loads the tree from the cache.
+    monkeypatch.setattr(grid_index_module, "_MEMO", {})
+    row, col = grid_index(lat2, lon2).nearest(px, py)
+    exp_row, exp_col = _brute_curvilinear(lat2, lon2, px, py)
+    np.testing.assert_array_equal(row, exp_row)
+    np.testing.assert_array_equal(col, exp_col)
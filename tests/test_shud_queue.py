@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+import shud_queue
+
+
+@pytest.fixture
+def conn(tmp_path):
+    c = shud_queue._connect(tmp_path / "queue.sqlite")
+    yield c
+    c.close()
+
+
+def _add(conn, *, cpus=1, mem_mb=0, priority=0, not_before=0.0):
+    cur = conn.execute(
+        "INSERT INTO jobs (config, command, profile, cpus, mem_mb, priority, not_before, submitted) "
+        "VALUES ('c.yaml', 'run', 'p', ?, ?, ?, ?, ?)",
+        (cpus, mem_mb, priority, not_before, time.time()),
+    )
+    return cur.lastrowid
+
+
+def _state(conn, job_id):
+    return conn.execute("SELECT state, attempts, worker FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def test_claim_fills_free_slots_by_priority_then_fifo(conn):
+    a = _add(conn, cpus=2)
+    b = _add(conn, cpus=2)
+    c = _add(conn, cpus=1, priority=5)
+    d = _add(conn, cpus=1)
+    claimed = shud_queue._claim(conn, worker="h:1", free_cpus=3, free_mem_mb=-1)
+    # c first (priority), then a (FIFO); b and d no longer fit in the 3 CPUs.
+    assert [r["id"] for r in claimed] == [c, a]
+    assert tuple(_state(conn, a)) == ("running", 1, "h:1")
+    assert _state(conn, b)["state"] == "queued"
+    assert _state(conn, d)["state"] == "queued"
+
+
+def test_claim_respects_memory_and_back_off(conn):
+    big = _add(conn, mem_mb=800)
+    later = _add(conn, not_before=time.time() + 3600)
+    small = _add(conn, mem_mb=100)
+    claimed = shud_queue._claim(conn, worker="h:1", free_cpus=8, free_mem_mb=500)
+    assert [r["id"] for r in claimed] == [small]
+    assert _state(conn, big)["state"] == "queued"
+    assert _state(conn, later)["state"] == "queued"
+
+
+def test_claimed_job_is_not_claimed_twice(conn):
+    job = _add(conn)
+    assert [r["id"] for r in shud_queue._claim(conn, worker="h:1", free_cpus=4, free_mem_mb=-1)] == [job]
+    assert shud_queue._claim(conn, worker="h:2", free_cpus=4, free_mem_mb=-1) == []
+
+
+def test_fail_oversized(conn):
+    fits = _add(conn, cpus=4, mem_mb=1000)
+    too_many_cpus = _add(conn, cpus=5)
+    too_much_mem = _add(conn, mem_mb=2000)
+    shud_queue._fail_oversized(conn, cpus=4, mem_mb=1000)
+    assert _state(conn, fits)["state"] == "queued"
+    assert _state(conn, too_many_cpus)["state"] == "failed"
+    assert _state(conn, too_much_mem)["state"] == "failed"
+    # No memory budget (0): memory never fails a job.
+    unlimited = _add(conn, mem_mb=10**6)
+    shud_queue._fail_oversized(conn, cpus=4, mem_mb=0)
+    assert _state(conn, unlimited)["state"] == "queued"
+
+
+@pytest.mark.parametrize(
+    "rc, attempts, cancelled, expected",
+    [
+        (0, 1, False, ("done", 0.0)),
+        (1, 1, False, ("queued", 110.0)),
+        (137, 2, False, ("queued", 120.0)),
+        (1, 3, False, ("failed", 0.0)),
+        (2, 1, False, ("failed", 0.0)),  # shudnc ConfigError: retrying cannot help
+        (0, 1, True, ("cancelled", 0.0)),
+        (-9, 1, True, ("cancelled", 0.0)),
+    ],
+)
+def test_after_exit(rc, attempts, cancelled, expected):
+    got = shud_queue._after_exit(
+        rc, attempts=attempts, max_retries=2, cancelled=cancelled, retry_delay_sec=10.0, now=100.0
+    )
+    assert got == expected
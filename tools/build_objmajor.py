@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Build an object-major ([obj, time]) sidecar for SHUD output.
+
+Legacy *.dat files and time-major NetCDF output store one record per time
+step, so extracting one element's or river segment's full series (e.g. an
+outlet hydrograph) touches every record. The sidecar stores the same values
+transposed and chunked along objects, so one series is a contiguous read.
+
+The transposition is out-of-core: the source is streamed in time blocks of
+--block-mb / (8 * n_obj) records (rounded to whole --chunk-time chunks) and
+each block is written transposed into whole [chunk_obj, chunk_time] chunks,
+so memory is bounded by --block-mb regardless of the mesh size.
+
+Sidecar naming (next to the source, see compare_output._objmajor_sidecar_path):
+- <x>.dat            -> <x>.dat.objmajor.nc        (rows = legacy icol[] columns)
+- <x>.nc + --var v   -> <x>.nc.v.objmajor.nc       (rows = full object dimension)
+
+compare_output.py uses a sidecar automatically when its recorded source size
+and mtime still match the source file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+import sys
+import time
+from typing import Any, List, Sequence, Tuple
+
+from compare_output import (
+    LegacyBinReader,
+    ObjMajorSidecar,
+    _objmajor_sidecar_path,
+    _require_netCDF4,
+    _source_fingerprint,
+)
+
+
+def _eprint(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
+def _create_sidecar(
+    ds: Any,
+    *,
+    n_obj: int,
+    n_time: int,
+    dtype: str,
+    chunk_obj: int,
+    chunk_time: int,
+    complevel: int,
+) -> Any:
+    ds.createDimension("obj", n_obj)
+    ds.createDimension("time", n_time)
+    ds.createVariable("time", "f8", ("time",))
+    ds.createVariable("index_1based", "i4", ("obj",))
+    return ds.createVariable(
+        "values",
+        dtype,
+        ("obj", "time"),
+        zlib=complevel > 0,
+        complevel=max(1, min(9, int(complevel))),
+        shuffle=complevel > 0,
+        chunksizes=(max(1, min(chunk_obj, n_obj)), max(1, min(chunk_time, max(1, n_time)))),
+    )
+
+
+def _block_len(n_obj: int, chunk_time: int, block_mb: float) -> Tuple[int, int]:
+    """
+    (records per transposition block, time chunk length) for a `block_mb` memory budget.
+
+    A block holds records x n_obj doubles, so its length comes from the budget divided by n_obj.
+    Blocks are whole time chunks so every chunk is written exactly once; when a single chunk of
+    n_obj would exceed the budget (very large meshes) the time chunk is shortened to fit.
+    """
+    fit = max(1, int(float(block_mb) * 1e6) // (8 * max(1, int(n_obj))))
+    chunk_time = max(1, min(int(chunk_time), fit))
+    return max(chunk_time, (fit // chunk_time) * chunk_time), chunk_time
+
+
+def _build_from_legacy(src: str, tmp: str, *, chunk_obj: int, chunk_time: int, block_mb: float, complevel: int) -> int:
+    netCDF4 = _require_netCDF4()
+    import numpy as np  # type: ignore
+
+    with LegacyBinReader(src) as rd, netCDF4.Dataset(tmp, "w", format="NETCDF4") as ds:
+        n_time = rd.num_records
+        block, chunk_time = _block_len(rd.num_var, chunk_time, block_mb)
+        values = _create_sidecar(
+            ds,
+            n_obj=rd.num_var,
+            n_time=n_time,
+            dtype="f8",
+            chunk_obj=chunk_obj,
+            chunk_time=chunk_time,
+            complevel=complevel,
+        )
+        ds.variables["time"][:] = rd.times_array()
+        ds.variables["index_1based"][:] = np.asarray(rd.icol_1based, dtype=np.int32)
+        for start in range(0, n_time, block):
+            stop = min(n_time, start + block)
+            _, vals = rd.read_block(start, stop)
+            values[:, start:stop] = vals.T
+        return n_time
+
+
+def _build_from_netcdf(
+    src: str,
+    tmp: str,
+    *,
+    var_name: str,
+    time_dim: str,
+    obj_dim: str,
+    chunk_obj: int,
+    chunk_time: int,
+    block_mb: float,
+    complevel: int,
+) -> int:
+    netCDF4 = _require_netCDF4()
+    import numpy as np  # type: ignore
+
+    with netCDF4.Dataset(src, "r") as sds, netCDF4.Dataset(tmp, "w", format="NETCDF4") as ds:
+        if var_name not in sds.variables:
+            raise ValueError(f"var not found in NetCDF: {src}: {var_name}")
+        var = sds.variables[var_name]
+        dims = list(var.dimensions)
+        if not obj_dim:
+            cand = [d for d in dims if d != time_dim]
+            if len(cand) != 1:
+                raise ValueError(f"Cannot infer obj_dim from dims={dims}; pass --obj-dim")
+            obj_dim = cand[0]
+        if time_dim not in dims or obj_dim not in dims:
+            raise ValueError(f"var dims do not include {time_dim}/{obj_dim}: {var_name} dims={dims}")
+        n_time = len(sds.dimensions[time_dim])
+        n_obj = len(sds.dimensions[obj_dim])
+        block, chunk_time = _block_len(n_obj, chunk_time, block_mb)
+        values = _create_sidecar(
+            ds,
+            n_obj=n_obj,
+            n_time=n_time,
+            dtype=var.dtype.str.lstrip("<>=|"),
+            chunk_obj=chunk_obj,
+            chunk_time=chunk_time,
+            complevel=complevel,
+        )
+        if time_dim in sds.variables:
+            ds.variables["time"][:] = np.asarray(sds.variables[time_dim][:], dtype=np.float64)
+            units = getattr(sds.variables[time_dim], "units", None)
+            if isinstance(units, str):
+                ds.variables["time"].units = units
+        else:
+            ds.variables["time"][:] = np.arange(n_time, dtype=np.float64)
+        ds.variables["index_1based"][:] = np.arange(1, n_obj + 1, dtype=np.int32)
+
+        t_axis = dims.index(time_dim)
+        o_axis = dims.index(obj_dim)
+        for start in range(0, n_time, block):
+            stop = min(n_time, start + block)
+            index: List[Any] = []
+            for d in dims:
+                if d == time_dim:
+                    index.append(slice(start, stop))
+                elif d == obj_dim:
+                    index.append(slice(None))
+                else:
+                    index.append(0)
+            blk = np.ma.filled(np.ma.asarray(var[tuple(index)]), np.nan)
+            # Scalar-indexed extra dims are dropped; the remaining axes keep source order.
+            values[:, start:stop] = blk if o_axis < t_axis else blk.T
+        return n_time
+
+
+def build_sidecar(
+    src: str,
+    *,
+    var_name: str = "",
+    time_dim: str = "time",
+    obj_dim: str = "",
+    chunk_obj: int = 16,
+    chunk_time: int = 4096,
+    block_mb: float = 256.0,
+    complevel: int = 0,
+    force: bool = False,
+) -> Tuple[str, bool]:
+    """Build (or reuse) the sidecar for src; return (path, rebuilt)."""
+    out = _objmajor_sidecar_path(src, var_name)
+    if not force:
+        existing = ObjMajorSidecar.open_if_fresh(src, var_name)
+        if existing is not None:
+            existing.close()
+            return out, False
+
+    # Fingerprint before reading: if the source changes mid-build the sidecar is simply stale.
+    size, mtime_ns = _source_fingerprint(src)
+    tmp = out + ".tmp"
+    try:
+        if var_name:
+            _build_from_netcdf(
+                src,
+                tmp,
+                var_name=var_name,
+                time_dim=time_dim,
+                obj_dim=obj_dim,
+                chunk_obj=chunk_obj,
+                chunk_time=chunk_time,
+                block_mb=block_mb,
+                complevel=complevel,
+            )
+        else:
+            _build_from_legacy(src, tmp, chunk_obj=chunk_obj, chunk_time=chunk_time, block_mb=block_mb, complevel=complevel)
+        netCDF4 = _require_netCDF4()
+        with netCDF4.Dataset(tmp, "a") as ds:
+            ds.title = "SHUD output object-major sidecar"
+            ds.source_path = os.path.basename(src)
+            ds.source_var = var_name
+            ds.source_size = size
+            ds.source_mtime_ns = str(mtime_ns)
+            ds.history = (
+                f"{dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds')}: "
+                "built by tools/build_objmajor.py"
+            )
+        os.replace(tmp, out)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return out, True
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description="Build object-major [obj, time] sidecars for SHUD output")
+    ap.add_argument("sources", nargs="+", help="Legacy *.dat files, or NetCDF output files (with --var)")
+    ap.add_argument("--var", default="", help="NetCDF variable name (NetCDF sources only)")
+    ap.add_argument("--time-dim", default="time", help="NetCDF time dimension name (default: time)")
+    ap.add_argument("--obj-dim", default="", help="NetCDF object dimension name (inferred if unambiguous)")
+    ap.add_argument("--chunk-obj", type=int, default=16, help="Chunk length along objects (default: 16)")
+    ap.add_argument("--chunk-time", type=int, default=4096, help="Chunk length along time (default: 4096)")
+    ap.add_argument(
+        "--block-mb",
+        type=float,
+        default=256.0,
+        help="Memory budget (MB) of one transposition block; records per block = budget / n_obj (default: 256)",
+    )
+    ap.add_argument("--complevel", type=int, default=0, help="Deflate level 0-9 (default: 0, off)")
+    ap.add_argument("--force", action="store_true", help="Rebuild even if an up-to-date sidecar exists")
+
+    args = ap.parse_args(list(argv))
+    if args.chunk_obj <= 0 or args.chunk_time <= 0 or args.block_mb <= 0:
+        raise ValueError("--chunk-obj/--chunk-time/--block-mb must be positive")
+
+    for src in args.sources:
+        src_abs = os.path.abspath(src)
+        is_nc = src_abs.endswith(".nc") or src_abs.endswith(".nc4")
+        if is_nc and not args.var:
+            raise ValueError(f"--var is required for NetCDF source: {src_abs}")
+        t0 = time.perf_counter()
+        out, rebuilt = build_sidecar(
+            src_abs,
+            var_name=args.var if is_nc else "",
+            time_dim=args.time_dim,
+            obj_dim=args.obj_dim.strip(),
+            chunk_obj=int(args.chunk_obj),
+            chunk_time=int(args.chunk_time),
+            block_mb=float(args.block_mb),
+            complevel=int(args.complevel),
+            force=bool(args.force),
+        )
+        wall = time.perf_counter() - t0
+        if rebuilt:
+            mb = os.path.getsize(src_abs) / 1e6
+            print(f"Wrote: {out} ({mb:.1f} MB source in {wall:.2f}s)")
+        else:
+            print(f"Up to date: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -3,7 +3,9 @@
 Sampled forcing regression compare: baseline CSV vs NetCDF forcing.
 
 This tool is intentionally sampled (not full-grid/full-time) to keep comparisons
-fast and reviewable.
+fast and reviewable. `--dense` compares every baseline csv record of the selected
+stations instead; it (and `--cube`) reads NetCDF values from a station cube
+(tools/station_cube.py) rather than opening source files per sample.
 """
 
 from __future__ import annotations
@@ -19,6 +21,12 @@ import os
 import sys
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
+from forcing_convert import VARS, conversion_for
+from grid_index import GridIndex, grid_index
+
+
+DENSE_MAX_SAMPLES = 1000  # differing samples kept in the --dense JSON report
+
 
 def _eprint(msg: str) -> None:
     print(msg, file=sys.stderr)
@@ -204,6 +212,26 @@ def _read_station_csv_at(path: str, t_min: float) -> Tuple[float, float, float,
         return prev_vals
 
 
+def _read_station_csv(path: str) -> List[Tuple[float, Tuple[float, float, float, float, float]]]:
+    """All data rows of a forcing csv as (t_min, 5 vars)."""
+    rows: List[Tuple[float, Tuple[float, float, float, float, float]]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        _ = f.readline()
+        _ = f.readline()
+        for raw in f:
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split()
+            if len(parts) < 6:
+                raise ValueError(f"Invalid forcing csv row: {path}: {raw!r}")
+            vals = tuple(float(x) for x in parts[1:6])
+            rows.append((float(parts[0]) * 1440.0, vals))  # type: ignore[arg-type]
+    if not rows:
+        raise ValueError(f"No data rows in forcing csv: {path}")
+    return rows
+
+
 def _require_netCDF4() -> Any:
     try:
         import netCDF4  # type: ignore
@@ -218,7 +246,14 @@ def _require_netCDF4() -> Any:
 
 
 def _resolve_single_glob(pattern: str) -> str:
-    matches = sorted(glob.glob(pattern))
+    from forcing_catalog import catalog_for  # local import: forcing_catalog imports this module
+
+    # Prefer the archive catalog (no directory listing); fall back to the filesystem when it has no match
+    # or any match is stale (deleted or rewritten since the catalog was built).
+    cat = catalog_for(os.path.dirname(pattern))
+    matches = cat.glob(pattern) if cat is not None else []
+    if cat is None or not matches or not all(cat.is_current(m) for m in matches):
+        matches = sorted(glob.glob(pattern))
     if len(matches) != 1:
         raise ValueError(f"Glob must match exactly 1 file, got {len(matches)}: {pattern}")
     return matches[0]
@@ -264,29 +299,29 @@ def _parse_units_since(units: str) -> Tuple[float, dt.datetime]:
     return factor_min, base
 
 
-def _cmfd2_precip_units_kind(units: str) -> str:
-    u = units.strip().lower()
-    if "kg" in u and ("m-2" in u or "m**-2" in u) and ("s-1" in u or "s**-1" in u):
-        return "KG_M2_S"
-    if "mm" in u and ("hr" in u or "h-1" in u or "h**-1" in u):
-        return "MM_HR"
-    if "mm" in u and ("day" in u or "d-1" in u or "d**-1" in u):
-        return "MM_DAY"
-    return "UNKNOWN"
-
-
-def _cmfd2_precip_units_kind_from_cfg(forcing_cfg: Dict[str, str], *, units_attr: str) -> str:
-    # Mirror NetcdfForcingProvider's CMFD_PRECIP_UNITS override behavior.
-    raw = forcing_cfg.get("CMFD_PRECIP_UNITS", "").strip().upper()
-    if not raw or raw == "AUTO":
-        return _cmfd2_precip_units_kind(units_attr)
-    if raw == "KG_M2_S":
-        return "KG_M2_S"
-    if raw in ("MM_HR", "MM/HR", "MM_H-1"):
-        return "MM_HR"
-    if raw in ("MM_DAY", "MM/DAY", "MM_D-1"):
-        return "MM_DAY"
-    raise ValueError(f"Invalid CMFD_PRECIP_UNITS override: {raw!r}")
+# tools/forcing_convert.py output key -> report key (baseline csv column).
+_NC_KEYS = {"prec": "Precip_mm_day", "temp": "Temp_C", "rh": "RH_1", "wind": "Wind_m_s", "rn": "RN_W_m2"}
+
+
+def _convert(
+    product: str,
+    raw: Dict[str, Any],
+    *,
+    forcing_cfg: Dict[str, str],
+    units: Optional[Dict[str, str]] = None,
+    dt_sec: Any = None,
+) -> List[Dict[str, float]]:
+    """Raw values (var key -> records) -> SHUD's 5 forcing variables per record (NetcdfForcingProvider semantics)."""
+    forc = conversion_for(product).convert(raw, units=units, forcing_cfg=forcing_cfg, dt_sec=dt_sec)
+    cols = {v: forc[v].reshape(-1).tolist() for v in VARS}
+    return [{_NC_KEYS[v]: float(cols[v][j]) for v in VARS} for j in range(len(cols["prec"]))]
+
+
+def _nearest_cell(ds: Any, lat_var: str, lon_var: str, lon_deg: float, lat_deg: float) -> Tuple[GridIndex, int, int]:
+    """(grid index, lat/row index, lon/col index) of a station's nearest cell; see tools/grid_index.py."""
+    grid = grid_index(ds.variables[lat_var][:], ds.variables[lon_var][:])
+    row, col = grid.nearest([float(lon_deg)], [float(lat_deg)])
+    return grid, int(row[0]), int(col[0])
 
 
 def _read_netcdf_point(
@@ -374,22 +409,7 @@ def _cmfd2_netcdf_at(
     f_pres, v_pres = resolve("PRES")
 
     with netCDF4.Dataset(f_prec, "r") as ds_grid:
-        lat_arr = ds_grid.variables[lat_var][:]
-        lon_arr = ds_grid.variables[lon_var][:]
-        lon_min = float(lon_arr.min())
-        lon_max = float(lon_arr.max())
-        lon_0360 = lon_min >= 0.0 and lon_max > 180.0
-
-        slon = float(station_lon_deg)
-        if lon_0360:
-            if slon < 0.0:
-                slon += 360.0
-            while slon >= 360.0:
-                slon -= 360.0
-
-        # nearest search
-        lat_idx = int(abs(lat_arr - station_lat_deg).argmin())
-        lon_idx = int(abs(lon_arr - slon).argmin())
+        _, lat_idx, lon_idx = _nearest_cell(ds_grid, lat_var, lon_var, station_lon_deg, station_lat_deg)
 
         # time index (step function)
         time_vals = ds_grid.variables[time_var][:]
@@ -455,77 +475,14 @@ def _cmfd2_netcdf_at(
             ds_pres, var_name=v_pres, dim_time=dim_time, dim_lat=dim_lat, dim_lon=dim_lon, time_idx=i, lat_idx=lat_idx, lon_idx=lon_idx
         )
 
-        # precip units auto-detect
         units = getattr(ds_prec.variables[v_prec], "units", "")
-        kind = _cmfd2_precip_units_kind_from_cfg(forcing_cfg, units_attr=(units if isinstance(units, str) else ""))
-        if kind == "KG_M2_S":
-            prcp_mm_day = prec_raw * 86400.0
-        elif kind == "MM_HR":
-            prcp_mm_day = prec_raw * 24.0
-        elif kind == "MM_DAY":
-            prcp_mm_day = prec_raw
-        else:
-            raise ValueError(f"unknown CMFD2 precip units: {units!r}")
-
-        # Match NetcdfForcingProvider / AutoSHUD baseline forcing semantics:
-        # quantize first, then threshold.
-        if not math.isfinite(float(prcp_mm_day)) or prcp_mm_day < 0.0:
-            prcp_mm_day = 0.0
-        prcp_mm_day = round(float(prcp_mm_day), 4)
-        if prcp_mm_day < 0.0001:
-            prcp_mm_day = 0.0
-
-        temp_c = temp_k - 273.15
-        if not math.isfinite(float(temp_c)):
-            temp_c = 0.0
-        temp_c = round(float(temp_c), 2)
-        rh_percent = 0.263 * pres * shum / math.exp(17.67 * (temp_k - 273.15) / (temp_k - 29.65))
-        rh_percent = max(0.0, min(100.0, float(rh_percent)))
-        rh_1 = rh_percent / 100.0
-        rh_1 = round(float(rh_1), 4)
-        rh_1 = max(0.0, min(1.0, float(rh_1)))
-
-        wind_ms = abs(wind)
-        wind_ms = 0.0 if not math.isfinite(float(wind_ms)) else float(wind_ms)
-        wind_ms = round(float(wind_ms), 2)
-        if wind_ms < 0.05:
-            wind_ms = 0.05
-
-        rn_wm2 = srad
-        rn_wm2 = 0.0 if not math.isfinite(float(rn_wm2)) else float(rn_wm2)
-        if rn_wm2 < 0.0:
-            rn_wm2 = 0.0
-        rn_wm2 = float(round(float(rn_wm2), 0))
-
-        return {
-            "Precip_mm_day": float(prcp_mm_day),
-            "Temp_C": float(temp_c),
-            "RH_1": float(rh_1),
-            "Wind_m_s": float(wind_ms),
-            "RN_W_m2": float(rn_wm2),
-        }
 
-
-def _era5_rh_from_dewpoint(*, temp_c: float, dew_c: float) -> float:
-    # Ratio 0-1, computed from dewpoint (Td) and temperature (T).
-    #
-    # es = 6.112 * exp(17.67*T /(T + 243.5))
-    # ea = 6.112 * exp(17.67*Td/(Td + 243.5))
-    # rh = clamp(ea/es, 0, 1)
-    def esat(tc: float) -> float:
-        return 6.112 * math.exp(17.67 * float(tc) / (float(tc) + 243.5))
-
-    es = esat(temp_c)
-    if not math.isfinite(float(es)) or es <= 0.0:
-        return 0.0
-    ea = esat(dew_c)
-    if not math.isfinite(float(ea)) or ea < 0.0:
-        ea = 0.0
-    rh = float(ea) / float(es)
-    if not math.isfinite(float(rh)):
-        rh = 0.0
-    rh = max(0.0, min(1.0, float(rh)))
-    return rh
+    return _convert(
+        "CMFD2",
+        {"PREC": [prec_raw], "TEMP": [temp_k], "SHUM": [shum], "SRAD": [srad], "WIND": [wind], "PRES": [pres]},
+        forcing_cfg=forcing_cfg,
+        units={"PREC": units if isinstance(units, str) else ""},
+    )[0]
 
 
 def _era5_netcdf_at(
@@ -582,21 +539,7 @@ def _era5_netcdf_at(
 
     # Open file(s)
     with netCDF4.Dataset(f0, "r") as ds0:
-        lat_arr = ds0.variables[lat_var][:]
-        lon_arr = ds0.variables[lon_var][:]
-        lon_min = float(lon_arr.min())
-        lon_max = float(lon_arr.max())
-        lon_0360 = lon_min >= 0.0 and lon_max > 180.0
-
-        slon = float(station_lon_deg)
-        if lon_0360:
-            if slon < 0.0:
-                slon += 360.0
-            while slon >= 360.0:
-                slon -= 360.0
-
-        lat_idx = int(abs(lat_arr - float(station_lat_deg)).argmin())
-        lon_idx = int(abs(lon_arr - slon).argmin())
+        _, lat_idx, lon_idx = _nearest_cell(ds0, lat_var, lon_var, station_lon_deg, station_lat_deg)
 
         time_vals0 = ds0.variables[time_var][:]
         units0 = getattr(ds0.variables[time_var], "units", None)
@@ -765,74 +708,13 @@ def _era5_netcdf_at(
                 )
                 dt_sec = float((times1[i1] - times0[i0]).total_seconds())
 
-    if dt_sec <= 0.0 or not math.isfinite(float(dt_sec)):
-        raise ValueError(f"invalid dt_sec for ERA5 increment: {dt_sec}")
-
-    # Reset-tolerant forward differences for accumulated variables.
-    # Mirror SHUD/src/classes/NetcdfForcingProvider.cpp (ERA5):
-    # - accumulated fields can reset across stitching boundaries
-    # - float quantization can create small negative deltas even when the true series is constant
-    tp_diff = float(tp1) - float(tp0)
-    tp_tol = max(1e-5, 1e-4 * max(abs(float(tp0)), abs(float(tp1))))  # meters
-    if tp_diff >= -tp_tol:
-        tp_inc_m = max(0.0, float(tp_diff))
-    else:
-        tp_inc_m = max(0.0, float(tp1))
-
-    ssr_diff = float(ssr1) - float(ssr0)
-    ssr_tol = max(1000.0, 1e-4 * max(abs(float(ssr0)), abs(float(ssr1))))  # J/m^2
-    if ssr_diff >= -ssr_tol:
-        ssr_inc_jm2 = max(0.0, float(ssr_diff))
-    else:
-        ssr_inc_jm2 = max(0.0, float(ssr1))
-
-    prcp_mm_day = tp_inc_m * 1000.0 * (86400.0 / float(dt_sec))
-    if not math.isfinite(float(prcp_mm_day)) or prcp_mm_day < 0.0:
-        prcp_mm_day = 0.0
-    prcp_mm_day = round(float(prcp_mm_day), 4)
-    if prcp_mm_day < 0.0001:
-        prcp_mm_day = 0.0
-
-    temp_c = float(t2m_k) - 273.15
-    if not math.isfinite(float(temp_c)):
-        temp_c = 0.0
-    temp_c = round(float(temp_c), 2)
-
-    dew_c = float(d2m_k) - 273.15
-    rh_1 = _era5_rh_from_dewpoint(temp_c=float(temp_c), dew_c=float(dew_c))
-    rh_1 = round(float(rh_1), 4)
-    rh_1 = max(0.0, min(1.0, float(rh_1)))
-
-    wind_ms = math.sqrt(float(u10) * float(u10) + float(v10) * float(v10))
-    wind_ms = 0.0 if not math.isfinite(float(wind_ms)) else float(wind_ms)
-    wind_ms = round(float(wind_ms), 2)
-    if wind_ms < 0.05:
-        wind_ms = 0.05
-
-    rn_wm2 = ssr_inc_jm2 / float(dt_sec)
-    rn_wm2 = 0.0 if not math.isfinite(float(rn_wm2)) else float(rn_wm2)
-    if rn_wm2 < 0.0:
-        rn_wm2 = 0.0
-    rn_wm2 = float(round(float(rn_wm2), 0))
-
-    return {
-        "Precip_mm_day": float(prcp_mm_day),
-        "Temp_C": float(temp_c),
-        "RH_1": float(rh_1),
-        "Wind_m_s": float(wind_ms),
-        "RN_W_m2": float(rn_wm2),
-    }
-
-
-def _gldas_precip_units_kind(units: str) -> str:
-    u = units.strip().lower()
-    if "kg" in u and ("m-2" in u or "m**-2" in u) and ("s-1" in u or "s**-1" in u):
-        return "KG_M2_S"
-    if "mm" in u and ("s-1" in u or "s**-1" in u):
-        return "MM_S"
-    if "mm" in u and ("day" in u or "d-1" in u or "d**-1" in u):
-        return "MM_DAY"
-    return "UNKNOWN"
+    # Accumulated fields carry the [i0, i1] boundary records; the rest are read at i0.
+    return _convert(
+        "ERA5",
+        {"TP": [tp0, tp1], "SSR": [ssr0, ssr1], "T2M": [t2m_k], "D2M": [d2m_k], "U10": [u10], "V10": [v10]},
+        forcing_cfg=forcing_cfg,
+        dt_sec=dt_sec,
+    )[0]
 
 
 def _gldas_netcdf_at(
@@ -857,6 +739,8 @@ def _gldas_netcdf_at(
     dim_time = forcing_cfg.get("NC_DIM_TIME", "time")
     dim_lat = forcing_cfg.get("NC_DIM_LAT", "lat")
     dim_lon = forcing_cfg.get("NC_DIM_LON", "lon")
+    lat_var = forcing_cfg.get("LAT_VAR", dim_lat)
+    lon_var = forcing_cfg.get("LON_VAR", dim_lon)
 
     v_prec = forcing_cfg["NC_VAR_PREC"]
     v_temp = forcing_cfg["NC_VAR_TEMP"]
@@ -873,22 +757,8 @@ def _gldas_netcdf_at(
     fn = os.path.join(data_root, rel)
 
     with netCDF4.Dataset(fn, "r") as ds:
-        lat_arr = ds.variables[dim_lat][:]
-        lon_arr = ds.variables[dim_lon][:]
-
-        lon_min = float(lon_arr.min())
-        lon_max = float(lon_arr.max())
-        lon_0360 = lon_min >= 0.0 and lon_max > 180.0
-        slon = float(station_lon_deg)
-        if lon_0360:
-            if slon < 0.0:
-                slon += 360.0
-            while slon >= 360.0:
-                slon -= 360.0
-
         # Nearest grid cell, with optional remap off _FillValue cells (mirrors SHUD's GLDAS behavior).
-        lat_idx0 = int(abs(lat_arr - float(station_lat_deg)).argmin())
-        lon_idx0 = int(abs(lon_arr - slon).argmin())
+        grid, lat_idx0, lon_idx0 = _nearest_cell(ds, lat_var, lon_var, station_lon_deg, station_lat_deg)
 
         def is_valid(ilat: int, ilon: int) -> bool:
             try:
@@ -912,8 +782,7 @@ def _gldas_netcdf_at(
             max_r = 10  # up to ~2.5 degrees in each direction for 0.25deg grids
             best_dist2 = float("inf")
             best: Optional[Tuple[int, int]] = None
-            nlat = int(len(lat_arr))
-            nlon = int(len(lon_arr))
+            nlat, nlon = grid.shape
             for r in range(1, max_r + 1):
                 found = False
                 k_lo = max(0, int(lat_idx0) - r)
@@ -924,11 +793,7 @@ def _gldas_netcdf_at(
                     for jj in range(j_lo, j_hi + 1):
                         if not is_valid(kk, jj):
                             continue
-                        dlon = abs(float(lon_arr[jj]) - float(slon))
-                        if lon_0360:
-                            dlon = min(float(dlon), 360.0 - float(dlon))
-                        dlat = abs(float(lat_arr[kk]) - float(station_lat_deg))
-                        dist2 = float(dlon) * float(dlon) + float(dlat) * float(dlat)
+                        dist2 = float(grid.dist2(kk, jj, float(station_lon_deg), float(station_lat_deg))[0])
                         if dist2 < best_dist2:
                             best_dist2 = dist2
                             best = (kk, jj)
@@ -1005,50 +870,86 @@ def _gldas_netcdf_at(
         )
 
         units = getattr(ds.variables[v_prec], "units", "")
-        kind = _gldas_precip_units_kind(units if isinstance(units, str) else "")
-        if kind in ("KG_M2_S", "MM_S"):
-            prcp_mm_day = float(prec_raw) * 86400.0
-        elif kind == "MM_DAY":
-            prcp_mm_day = float(prec_raw)
+
+    return _convert(
+        "GLDAS",
+        {"PREC": [prec_raw], "TEMP": [temp_k], "SHUM": [shum], "PRES": [pres], "WIND": [wind], "SRAD": [srad]},
+        forcing_cfg=forcing_cfg,
+        units={"PREC": units if isinstance(units, str) else ""},
+    )[0]
+
+
+def _cube_netcdf_series(
+    cube: Any,
+    *,
+    cube_tmins: Sequence[float],
+    forcing_cfg: Dict[str, str],
+    forc_start_yyyymmdd: int,
+    station_idx: int,
+    t_mins: Sequence[float],
+    clamp: bool,
+    time_tol_min: float,
+) -> List[Dict[str, float]]:
+    """
+    Like the _*_netcdf_at readers, for all `t_mins` of one station at once, from a station cube
+    (tools/station_cube.py); the selected records are converted in one batch.
+
+    `cube_tmins` is the cube's time axis in minutes since ForcStartTime. Station cells (incl. the
+    GLDAS _FillValue remap) are the cube's; bounds are checked against the cube's period.
+    """
+    import numpy as np  # type: ignore
+
+    product = cube.product
+    if product not in ("CMFD2", "ERA5", "GLDAS"):
+        raise ValueError(f"Unsupported PRODUCT in station cube: {product!r}")
+
+    tol = float(time_tol_min)
+    first = float(cube_tmins[0])
+    last = float(cube_tmins[-1])
+    forc_base = _parse_yyyymmdd(forc_start_yyyymmdd)
+    recs: List[int] = []
+    for t_min in t_mins:
+        # ERA5/GLDAS records are selected at the floored product step (same as the file readers).
+        target = float(t_min)
+        if product in ("ERA5", "GLDAS"):
+            step = 60 if product == "ERA5" else 180
+            t0 = _floor_dt_to_minute_step(_dt_from_forc_start(forc_start_yyyymmdd, target), step)
+            target = (t0 - forc_base).total_seconds() / 60.0
+        if target < first - tol:
+            if not clamp:
+                raise ValueError(f"t_min out of range (< first): t_min={target} first={first} tol={tol} (station cube)")
+            i = 0
+        elif target > last + tol:
+            if not clamp:
+                raise ValueError(f"t_min out of range (> last): t_min={target} last={last} tol={tol} (station cube)")
+            i = len(cube_tmins) - 1
         else:
-            raise ValueError(f"unknown GLDAS precip units: {units!r}")
-
-        if not math.isfinite(float(prcp_mm_day)) or prcp_mm_day < 0.0:
-            prcp_mm_day = 0.0
-        prcp_mm_day = round(float(prcp_mm_day), 4)
-        if prcp_mm_day < 0.0001:
-            prcp_mm_day = 0.0
-
-        temp_c = float(temp_k) - 273.15
-        if not math.isfinite(float(temp_c)):
-            temp_c = 0.0
-        temp_c = round(float(temp_c), 2)
-
-        rh_percent = 0.263 * float(pres) * float(shum) / math.exp(17.67 * (float(temp_k) - 273.15) / (float(temp_k) - 29.65))
-        rh_percent = max(0.0, min(100.0, float(rh_percent)))
-        rh_1 = rh_percent / 100.0
-        rh_1 = round(float(rh_1), 4)
-        rh_1 = max(0.0, min(1.0, float(rh_1)))
-
-        wind_ms = abs(float(wind))
-        wind_ms = 0.0 if not math.isfinite(float(wind_ms)) else float(wind_ms)
-        wind_ms = round(float(wind_ms), 2)
-        if wind_ms < 0.05:
-            wind_ms = 0.05
-
-        rn_wm2 = float(srad)
-        rn_wm2 = 0.0 if not math.isfinite(float(rn_wm2)) else float(rn_wm2)
-        if rn_wm2 < 0.0:
-            rn_wm2 = 0.0
-        rn_wm2 = float(round(float(rn_wm2), 0))
-
-        return {
-            "Precip_mm_day": float(prcp_mm_day),
-            "Temp_C": float(temp_c),
-            "RH_1": float(rh_1),
-            "Wind_m_s": float(wind_ms),
-            "RN_W_m2": float(rn_wm2),
-        }
+            # Step-function semantics: select the last record at/before t_min (within tolerance).
+            i = min(max(bisect.bisect_right(cube_tmins, target + tol) - 1, 0), len(cube_tmins) - 1)
+        recs.append(i)
+
+    conv = conversion_for(product)
+    i0 = np.asarray(recs, dtype=np.int64)
+    dt_sec = None
+    if conv.accumulated:
+        i1 = i0 + 1
+        if len(recs) and int(i1.max()) >= len(cube_tmins):
+            raise ValueError(f"need lookahead beyond station cube time axis: i0={int(i0.max())} nt={len(cube_tmins)}")
+        sel = np.stack([i0, i1], axis=-1)  # (record, boundary): accumulated fields read [i, i+1]
+        tm = np.asarray(cube_tmins, dtype=float)
+        dt_sec = ((tm[i1] - tm[i0]) * 60.0)[:, None]
+    else:
+        sel = i0
+
+    raw: Dict[str, Any] = {}
+    for key in conv.inputs:
+        v = cube.raw[station_idx, sel, cube.var_keys.index(key)]
+        bad = ~np.isfinite(v)
+        if bad.any():
+            k = int(np.asarray(sel)[bad.nonzero()][0])
+            raise ValueError(f"non-finite value for var={forcing_cfg.get(f'NC_VAR_{key}', key)} at cube record {k}")
+        raw[key] = v
+    return _convert(product, raw, forcing_cfg=forcing_cfg, units={k: cube.units(k) for k in conv.inputs}, dt_sec=dt_sec)
 
 
 def _summarize_diffs(samples: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
@@ -1083,6 +984,17 @@ def main(argv: Sequence[str]) -> int:
         default=1e-3,
         help="Time tolerance (minutes) used for bounds checks and index selection (default: 1e-3).",
     )
+    p.add_argument(
+        "--dense",
+        action="store_true",
+        help="Compare every baseline csv record of --stations (ignores --t-min); reads NetCDF via a station cube",
+    )
+    p.add_argument(
+        "--cube",
+        default="",
+        help="Read NetCDF values from this station cube (tools/station_cube.py) instead of the source files",
+    )
+    p.add_argument("--jobs", type=int, default=0, help="Worker processes extracting the --dense cube (default: CPU count)")
     p.add_argument("--out-json", default="", help="Write JSON report to this path (optional)")
     p.add_argument("--fail-max-abs", type=float, default=math.inf, help="Fail if any variable max_abs exceeds this")
 
@@ -1106,13 +1018,75 @@ def main(argv: Sequence[str]) -> int:
     if not os.path.isabs(forcing_cfg.get("DATA_ROOT", "")):
         forcing_cfg["DATA_ROOT"] = os.path.normpath(os.path.join(nc_run, forcing_cfg["DATA_ROOT"]))
 
+    product = forcing_cfg.get("PRODUCT", "").upper()
+    csv_rows: Dict[int, List[Tuple[float, Tuple[float, float, float, float, float]]]] = {}
+    for sidx in stations_idx:
+        st = tsd.stations[sidx]
+        csv_path = _resolve_station_csv_path(baseline_run, tsd.rel_path, st.filename)
+        if args.dense:
+            csv_rows[sidx] = _read_station_csv(csv_path)
+        else:
+            csv_rows[sidx] = [(float(t), _read_station_csv_at(csv_path, t)) for t in times_min]
+
+    cube: Any = None
+    if args.cube or args.dense:
+        from forcing_catalog import PRODUCT_STEPS
+        from station_cube import _mask_key, cube_for, read_cube  # local import: station_cube imports this module
+
+        tsd_stations = [(s.lon_deg, s.lat_deg) for s in tsd.stations]
+        forc_base = _parse_yyyymmdd(forc_start)
+        # SHUD remaps GLDAS stations off _FillValue cells at the run's START file, as gen_forcing_baseline.
+        para = _read_kv_cfg(os.path.join(nc_run, "input", prj, f"{prj}.cfg.para"))
+        mask_at = forc_base + dt.timedelta(days=float(para.get("START", 0.0)))
+        if args.cube:
+            cube = read_cube(os.path.abspath(args.cube))
+            if cube.product != product or not cube.matches(tsd_stations):
+                raise ValueError(f"Station cube {args.cube} does not match PRODUCT={product} and the tsd.forc stations")
+            # SHUD samples the nearest cell; other interpolations or another remap file are not its values.
+            interp = cube.attrs.get("interp", "nearest")
+            if interp != "nearest":
+                raise ValueError(f"Station cube {args.cube} uses interp={interp}; SHUD compares need interp=nearest")
+            want = _mask_key(product, mask_at)
+            if cube.attrs.get("mask_at", "") != want:
+                raise ValueError(
+                    f"Station cube {args.cube} remaps GLDAS stations at mask_at={cube.attrs.get('mask_at', '')!r}, "
+                    f"not at the run's START file ({want})"
+                )
+        else:
+            # Period of the csv records (+ one product step: ERA5 reads the record after each step).
+            t_lo = min(rows[0][0] for rows in csv_rows.values())
+            t_hi = max(rows[-1][0] for rows in csv_rows.values()) + PRODUCT_STEPS[product][0]
+            cube = cube_for(
+                forcing_cfg,
+                stations=tsd_stations,
+                t_start=forc_base + dt.timedelta(minutes=t_lo),
+                t_end=forc_base + dt.timedelta(minutes=t_hi),
+                mask_at=mask_at,
+                jobs=int(args.jobs),
+            )
+        base_min = (forc_base - dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)).total_seconds() / 60.0
+        cube_tmins = [float(v) - base_min for v in cube.times]
+
+    # Station cube values are converted per station in one batch.
+    cube_rows: Dict[int, List[Dict[str, float]]] = {}
+    if cube is not None:
+        for sidx in stations_idx:
+            cube_rows[sidx] = _cube_netcdf_series(
+                cube,
+                cube_tmins=cube_tmins,
+                forcing_cfg=forcing_cfg,
+                forc_start_yyyymmdd=forc_start,
+                station_idx=sidx,
+                t_mins=[t for t, _ in csv_rows[sidx]],
+                clamp=bool(args.clamp),
+                time_tol_min=float(args.time_tol_min),
+            )
+
     samples: List[Dict[str, Any]] = []
 
     for sidx in stations_idx:
         st = tsd.stations[sidx]
-        csv_path = _resolve_station_csv_path(baseline_run, tsd.rel_path, st.filename)
-        for tmin in times_min:
-            base_vals = _read_station_csv_at(csv_path, tmin)
+        for j, (tmin, base_vals) in enumerate(csv_rows[sidx]):
             base_map = {
                 "Precip_mm_day": base_vals[0],
                 "Temp_C": base_vals[1],
@@ -1120,8 +1094,9 @@ def main(argv: Sequence[str]) -> int:
                 "Wind_m_s": base_vals[3],
                 "RN_W_m2": base_vals[4],
             }
-            product = forcing_cfg.get("PRODUCT", "").upper()
-            if product == "CMFD2":
+            if cube is not None:
+                nc_map = cube_rows[sidx][j]
+            elif product == "CMFD2":
                 nc_map = _cmfd2_netcdf_at(
                     forcing_cfg=forcing_cfg,
                     forc_start_yyyymmdd=forc_start,
@@ -1173,13 +1148,20 @@ def main(argv: Sequence[str]) -> int:
         "prj": prj,
         "forc_start_yyyymmdd": forc_start,
         "stations_idx0": stations_idx,
-        "times_min": times_min,
+        "times_min": [] if args.dense else times_min,
         "summary": summary,
         "samples": samples,
     }
+    if args.dense:
+        # Every record was compared: keep the report reviewable by listing only differing samples.
+        differing = [x for x in samples if any(float(d) != 0.0 for d in x["diff"].values())]
+        report["dense"] = True
+        report["samples_total"] = len(samples)
+        report["samples_differing"] = len(differing)
+        report["samples"] = differing[:DENSE_MAX_SAMPLES]
 
     # Print a compact summary
-    print("== Forcing compare summary (baseline - nc) ==")
+    print(f"== Forcing compare summary (baseline - nc, {len(samples)} samples) ==")
     for v, s in summary.items():
         print(f"- {v}: max_abs={s['max_abs']:.6g} mean={s['mean']:.6g} mean_abs={s['mean_abs']:.6g}")
 
@@ -5,6 +5,8 @@ Sampled output regression compare: legacy (binary/ASCII) vs NetCDF.
 The NetCDF output contract is still evolving (Phase B). This tool focuses on:
 - parsing SHUD legacy binary output (*.dat) deterministically
 - comparing sampled (time, index) points against NetCDF variables
+- --follow: comparing every record of a *.dat that SHUD is still writing against
+  NetCDF output or a reference run, exiting non-zero at the first divergence
 """
 
 from __future__ import annotations
@@ -13,9 +15,12 @@ import argparse
 import dataclasses
 import json
 import math
+import mmap
 import os
+import signal
 import struct
 import sys
+import time
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 
@@ -63,8 +68,23 @@ class LegacyBin:
     values: List[List[float]]  # rows: [num_var]
 
 
-def _read_legacy_bin(path: str) -> LegacyBin:
-    def read_exact(f: Any, n: int, *, what: str) -> bytes:
+LEGACY_HEADER_BYTES = 1024
+
+
+@dataclasses.dataclass(frozen=True)
+class LegacyBinHeader:
+    start_time: float
+    num_var: int
+    icol_1based: List[int]
+    data_offset: int  # byte offset of the first record
+
+    @property
+    def record_size(self) -> int:
+        return 8 * (1 + self.num_var)
+
+
+def _read_legacy_header(f: Any, path: str) -> LegacyBinHeader:
+    def read_exact(n: int, *, what: str) -> bytes:
         blob = f.read(int(n))
         if len(blob) != int(n):
             raise ValueError(
@@ -72,37 +92,49 @@ def _read_legacy_bin(path: str) -> LegacyBin:
             )
         return blob
 
-    with open(path, "rb") as f:
-        header = read_exact(f, 1024, what="1024-byte header")
+    header = read_exact(LEGACY_HEADER_BYTES, what="1024-byte header")
+    header_text = ""
+    try:
+        header_text = header.split(b"\x00", 1)[0].decode("utf-8", errors="replace").strip()
+    except Exception:
         header_text = ""
-        try:
-            header_text = header.split(b"\x00", 1)[0].decode("utf-8", errors="replace").strip()
-        except Exception:
-            header_text = ""
-        if header_text and "SHUD" not in header_text:
-            # Not fatal, but helpful when users accidentally point at the wrong file.
-            raise ValueError(f"Legacy bin header does not look like SHUD output: {path}")
-
-        start_time = struct.unpack("d", read_exact(f, 8, what="start_time (double)"))[0]
-        if not math.isfinite(float(start_time)):
-            raise ValueError(f"Invalid legacy bin start_time (non-finite): {path}: {start_time!r}")
-
-        num_var_raw = struct.unpack("d", read_exact(f, 8, what="num_var (double)"))[0]
-        if not math.isfinite(float(num_var_raw)):
-            raise ValueError(f"Invalid legacy bin num_var (non-finite): {path}: {num_var_raw!r}")
-        num_var = int(round(float(num_var_raw)))
-        if abs(float(num_var_raw) - float(num_var)) > 1e-6:
-            raise ValueError(f"Invalid legacy bin num_var (not an integer): {path}: {num_var_raw!r}")
-        if num_var <= 0 or num_var > 100000:
-            raise ValueError(f"Invalid legacy bin num_var (out of range): {path}: {num_var}")
-
-        icol_bytes = read_exact(f, 8 * num_var, what="icol array (num_var doubles)")
-        icol = list(struct.unpack(f"{num_var}d", icol_bytes))
-        icol_1based = [int(round(x)) for x in icol]
+    if header_text and "SHUD" not in header_text:
+        # Not fatal, but helpful when users accidentally point at the wrong file.
+        raise ValueError(f"Legacy bin header does not look like SHUD output: {path}")
+
+    start_time = struct.unpack("d", read_exact(8, what="start_time (double)"))[0]
+    if not math.isfinite(float(start_time)):
+        raise ValueError(f"Invalid legacy bin start_time (non-finite): {path}: {start_time!r}")
+
+    num_var_raw = struct.unpack("d", read_exact(8, what="num_var (double)"))[0]
+    if not math.isfinite(float(num_var_raw)):
+        raise ValueError(f"Invalid legacy bin num_var (non-finite): {path}: {num_var_raw!r}")
+    num_var = int(round(float(num_var_raw)))
+    if abs(float(num_var_raw) - float(num_var)) > 1e-6:
+        raise ValueError(f"Invalid legacy bin num_var (not an integer): {path}: {num_var_raw!r}")
+    if num_var <= 0 or num_var > 100000:
+        raise ValueError(f"Invalid legacy bin num_var (out of range): {path}: {num_var}")
+
+    icol_bytes = read_exact(8 * num_var, what="icol array (num_var doubles)")
+    icol = list(struct.unpack(f"{num_var}d", icol_bytes))
+    icol_1based = [int(round(x)) for x in icol]
+
+    return LegacyBinHeader(
+        start_time=float(start_time),
+        num_var=num_var,
+        icol_1based=icol_1based,
+        data_offset=LEGACY_HEADER_BYTES + 16 + 8 * num_var,
+    )
+
+
+def _read_legacy_bin(path: str) -> LegacyBin:
+    with open(path, "rb") as f:
+        hdr = _read_legacy_header(f, path)
+        num_var = hdr.num_var
 
         times: List[float] = []
         rows: List[List[float]] = []
-        rec_size = 8 * (1 + num_var)
+        rec_size = hdr.record_size
         while True:
             blob = f.read(rec_size)
             if not blob:
@@ -115,14 +147,213 @@ def _read_legacy_bin(path: str) -> LegacyBin:
             rows.append([float(x) for x in vals])
 
     return LegacyBin(
-        start_time=float(start_time),
+        start_time=hdr.start_time,
         num_var=num_var,
-        icol_1based=icol_1based,
+        icol_1based=hdr.icol_1based,
         times_min=times,
         values=rows,
     )
 
 
+class LegacyBinReader:
+    """
+    Random-access, memory-mapped reader for legacy *.dat output.
+
+    Records are fixed-size (time + num_var doubles), so record i lives at
+    data_offset + i * record_size and can be read without touching the rest of
+    the file. A partially written trailing record is an error unless
+    allow_partial=True (useful while SHUD is still appending).
+    """
+
+    def __init__(self, path: str, *, allow_partial: bool = False) -> None:
+        self.path = path
+        self.allow_partial = bool(allow_partial)
+        self._f = open(path, "rb")
+        try:
+            self.header = _read_legacy_header(self._f, path)
+        except Exception:
+            self._f.close()
+            raise
+        self._mm: Optional[mmap.mmap] = None
+        self.num_records = 0
+        self.partial_bytes = 0
+        self.refresh()
+
+    @property
+    def num_var(self) -> int:
+        return self.header.num_var
+
+    @property
+    def icol_1based(self) -> List[int]:
+        return self.header.icol_1based
+
+    def refresh(self) -> int:
+        """Re-map the file (it may have grown) and return the number of complete records."""
+        size = os.fstat(self._f.fileno()).st_size
+        payload = max(0, size - self.header.data_offset)
+        rec_size = self.header.record_size
+        num_records, partial = divmod(payload, rec_size)
+        if partial and not self.allow_partial:
+            raise ValueError(f"Truncated legacy bin record: {self.path}")
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if size > 0:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.num_records = int(num_records)
+        self.partial_bytes = int(partial)
+        return self.num_records
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._f.close()
+
+    def __enter__(self) -> "LegacyBinReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.num_records
+
+    def _offset(self, i: int) -> int:
+        if i < 0 or i >= self.num_records:
+            raise IndexError(f"record index out of range: {i} (num_records={self.num_records}): {self.path}")
+        return self.header.data_offset + int(i) * self.header.record_size
+
+    def record_bytes(self, i: int) -> bytes:
+        assert self._mm is not None
+        off = self._offset(i)
+        return self._mm[off : off + self.header.record_size]
+
+    def time_at(self, i: int) -> float:
+        assert self._mm is not None
+        return float(struct.unpack_from("d", self._mm, self._offset(i))[0])
+
+    def record(self, i: int) -> Tuple[float, List[float]]:
+        assert self._mm is not None
+        off = self._offset(i)
+        t = struct.unpack_from("d", self._mm, off)[0]
+        vals = struct.unpack_from(f"{self.num_var}d", self._mm, off + 8)
+        return float(t), [float(x) for x in vals]
+
+    def times(self) -> List[float]:
+        return [self.time_at(i) for i in range(self.num_records)]
+
+    def times_array(self) -> Any:
+        """Return all record times as a numpy array (strided read, values are not touched)."""
+        import numpy as np  # type: ignore
+
+        if self.num_records == 0:
+            return np.empty((0,), dtype="<f8")
+        assert self._mm is not None
+        view = np.ndarray(
+            shape=(self.num_records,),
+            dtype="<f8",
+            buffer=self._mm,
+            offset=self.header.data_offset,
+            strides=(self.header.record_size,),
+        )
+        out = np.array(view)
+        del view
+        return out
+
+    def read_block(self, start: int, stop: int) -> Tuple[Any, Any]:
+        """Return (times[n], values[n, num_var]) numpy arrays for records [start, stop)."""
+        import numpy as np  # type: ignore
+
+        assert self._mm is not None
+        start = max(0, int(start))
+        stop = min(self.num_records, int(stop))
+        if stop <= start:
+            return np.empty((0,), dtype="<f8"), np.empty((0, self.num_var), dtype="<f8")
+        off = self.header.data_offset + start * self.header.record_size
+        n = stop - start
+        block = np.frombuffer(self._mm, dtype="<f8", count=n * (1 + self.num_var), offset=off)
+        # Copy out of the mapping so the mmap can be closed/re-mapped while callers hold the arrays.
+        block = np.array(block.reshape(n, 1 + self.num_var))
+        return block[:, 0], block[:, 1:]
+
+
+OBJMAJOR_SUFFIX = ".objmajor.nc"
+
+
+def _objmajor_sidecar_path(source_path: str, var_name: str = "") -> str:
+    # <x>.dat -> <x>.dat.objmajor.nc ; <x>.nc + var -> <x>.nc.<var>.objmajor.nc
+    if var_name:
+        return f"{source_path}.{var_name}{OBJMAJOR_SUFFIX}"
+    return f"{source_path}{OBJMAJOR_SUFFIX}"
+
+
+def _source_fingerprint(source_path: str) -> Tuple[int, int]:
+    st = os.stat(source_path)
+    return int(st.st_size), int(st.st_mtime_ns)
+
+
+class ObjMajorSidecar:
+    """
+    Reader for the object-major ([obj, time]) sidecar written by tools/build_objmajor.py.
+
+    The sidecar records the source file's size and mtime; it is only used when
+    both still match, so a re-run SHUD output silently falls back to the source.
+    Rows are legacy columns (icol order) for *.dat sources and the full object
+    dimension for NetCDF sources.
+    """
+
+    def __init__(self, path: str, ds: Any) -> None:
+        self.path = path
+        self._ds = ds
+        self._values = ds.variables["values"]
+        self.times_min: List[float] = [float(x) for x in ds.variables["time"][:]]
+        self.icol_1based: List[int] = [int(x) for x in ds.variables["index_1based"][:]]
+
+    @classmethod
+    def open_if_fresh(cls, source_path: str, var_name: str = "") -> Optional["ObjMajorSidecar"]:
+        path = _objmajor_sidecar_path(source_path, var_name)
+        if not os.path.exists(path) or not os.path.exists(source_path):
+            return None
+        try:
+            netCDF4 = _require_netCDF4()
+        except RuntimeError:
+            return None
+        ds = netCDF4.Dataset(path, "r")
+        try:
+            size, mtime_ns = _source_fingerprint(source_path)
+            fresh = (
+                int(getattr(ds, "source_size", -1)) == size
+                and str(getattr(ds, "source_mtime_ns", "")) == str(mtime_ns)
+                and str(getattr(ds, "source_var", "")) == str(var_name)
+                and "values" in ds.variables
+            )
+        except Exception:
+            fresh = False
+        if not fresh:
+            ds.close()
+            return None
+        return cls(path, ds)
+
+    def close(self) -> None:
+        self._ds.close()
+
+    def __enter__(self) -> "ObjMajorSidecar":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def series(self, row: int) -> Any:
+        """Full time series of one object row (contiguous read)."""
+        import numpy as np  # type: ignore
+
+        return np.ma.filled(np.ma.asarray(self._values[int(row), :], dtype=float), np.nan)
+
+    def value(self, time_idx: int, row: int) -> float:
+        return float(self._values[int(row), int(time_idx)])
+
+
 def _find_time_index(times: Sequence[float], t_min: float, tol: float) -> int:
     best = -1
     best_err = float("inf")
@@ -136,65 +367,327 @@ def _find_time_index(times: Sequence[float], t_min: float, tol: float) -> int:
     return best
 
 
-def _read_netcdf_value(nc_path: str, var_name: str, time_idx: int, obj_idx0: int, time_dim: str, obj_dim: str) -> float:
-    netCDF4 = _require_netCDF4()
-    with netCDF4.Dataset(nc_path, "r") as ds:
-        if var_name not in ds.variables:
-            raise ValueError(f"var not found in NetCDF: {nc_path}: {var_name}")
-        var = ds.variables[var_name]
-        dims = list(var.dimensions)
-        if time_dim not in dims or obj_dim not in dims:
-            raise ValueError(f"var dims do not include {time_dim}/{obj_dim}: {var_name} dims={dims}")
-        index: List[int] = []
-        for d in dims:
-            if d == time_dim:
-                index.append(int(time_idx))
-            elif d == obj_dim:
-                index.append(int(obj_idx0))
-            else:
-                index.append(0)
-        v = var[tuple(index)]
+def _read_netcdf_value(
+    nc_path: str,
+    var_name: str,
+    time_idx: int,
+    obj_idx0: int,
+    time_dim: str,
+    obj_dim: str,
+    *,
+    sidecar: Optional[ObjMajorSidecar] = None,
+    ds: Any = None,
+) -> float:
+    """One sampled value; pass an open `sidecar` (or `ds`) to reuse it across samples."""
+    if sidecar is not None:
+        v = sidecar.value(int(time_idx), int(obj_idx0))
+        if not math.isfinite(float(v)):
+            raise ValueError(f"non-finite value for var={var_name} at time={time_idx} obj={obj_idx0} (sidecar)")
+        return float(v)
+    if ds is None:
+        netCDF4 = _require_netCDF4()
+        with netCDF4.Dataset(nc_path, "r") as ds_:
+            return _read_netcdf_value(nc_path, var_name, time_idx, obj_idx0, time_dim, obj_dim, ds=ds_)
+
+    if var_name not in ds.variables:
+        raise ValueError(f"var not found in NetCDF: {nc_path}: {var_name}")
+    var = ds.variables[var_name]
+    dims = list(var.dimensions)
+    if time_dim not in dims or obj_dim not in dims:
+        raise ValueError(f"var dims do not include {time_dim}/{obj_dim}: {var_name} dims={dims}")
+    index: List[int] = []
+    for d in dims:
+        if d == time_dim:
+            index.append(int(time_idx))
+        elif d == obj_dim:
+            index.append(int(obj_idx0))
+        else:
+            index.append(0)
+    v = var[tuple(index)]
+    try:
+        import numpy as np  # type: ignore
+
+        if isinstance(v, np.ma.MaskedArray):
+            if bool(np.ma.is_masked(v)):
+                raise ValueError(f"masked value for var={var_name} at idx={index}")
+            v = v.item()
+        elif hasattr(v, "item"):
+            v = v.item()
+    except Exception:
+        pass
+    if v is None or not math.isfinite(float(v)):
+        raise ValueError(f"non-finite value for var={var_name} at idx={index}")
+    return float(v)
+
+
+class _NetcdfFollowSource:
+    """
+    Growing NetCDF output variable, re-opened on every poll (SHUD may still be writing it).
+
+    The unlimited time dimension is extended before the record's values are written, so the
+    last record is only reported once the dimension grows again or the writer is gone (final).
+    """
+
+    def __init__(self, path: str, *, var_name: str, time_dim: str, obj_dim: str, icol_1based: Sequence[int]) -> None:
+        self.path = path
+        self.var_name = var_name
+        self.time_dim = time_dim
+        self.obj_dim = obj_dim
+        self.obj_idx0 = [int(i) - 1 for i in icol_1based]
+        self.num_records = 0
+        self.is_float32 = False
+
+    def refresh(self, *, final: bool = False) -> int:
+        netCDF4 = _require_netCDF4()
         try:
-            import numpy as np  # type: ignore
-
-            if isinstance(v, np.ma.MaskedArray):
-                if bool(np.ma.is_masked(v)):
-                    raise ValueError(f"masked value for var={var_name} at idx={index}")
-                v = v.item()
-            elif hasattr(v, "item"):
-                v = v.item()
-        except Exception:
+            with netCDF4.Dataset(self.path, "r") as ds:
+                if self.var_name not in ds.variables:
+                    return self._complete(final)
+                var = ds.variables[self.var_name]
+                dims = list(var.dimensions)
+                if not self.obj_dim:
+                    cand = [d for d in dims if d != self.time_dim]
+                    if len(cand) != 1:
+                        raise ValueError(f"Cannot infer obj_dim from dims={dims}; pass --obj-dim")
+                    self.obj_dim = cand[0]
+                self.is_float32 = str(var.dtype) == "float32"
+                self.num_records = len(ds.dimensions[self.time_dim])
+        except (OSError, RuntimeError):
+            # Not created yet, or caught mid-write: try again on the next poll.
             pass
-        if v is None or not math.isfinite(float(v)):
-            raise ValueError(f"non-finite value for var={var_name} at idx={index}")
-        return float(v)
+        return self._complete(final)
+
+    def _complete(self, final: bool) -> int:
+        return self.num_records if final else max(0, self.num_records - 1)
+
+    def read_block(self, start: int, stop: int) -> Optional[Tuple[Any, Any]]:
+        """(times, values) of records [start, stop), or None when caught mid-write (retry on the next poll)."""
+        try:
+            return self._read_block(start, stop)
+        except (OSError, RuntimeError):
+            return None
+
+    def _read_block(self, start: int, stop: int) -> Tuple[Any, Any]:
+        import numpy as np  # type: ignore
+
+        netCDF4 = _require_netCDF4()
+        with netCDF4.Dataset(self.path, "r") as ds:
+            var = ds.variables[self.var_name]
+            index: List[Any] = []
+            for d in var.dimensions:
+                if d == self.time_dim:
+                    index.append(slice(int(start), int(stop)))
+                elif d == self.obj_dim:
+                    index.append(slice(None))
+                else:
+                    index.append(0)
+            blk = np.ma.filled(np.ma.asarray(var[tuple(index)], dtype=float), np.nan)
+            dims = [d for d in var.dimensions if d in (self.time_dim, self.obj_dim)]
+            if dims[0] != self.time_dim:
+                blk = blk.T
+            times = None
+            if self.time_dim in ds.variables:
+                times = np.asarray(ds.variables[self.time_dim][int(start) : int(stop)], dtype=float)
+        return times, blk[:, self.obj_idx0]
+
+    def close(self) -> None:
+        pass
+
+
+def _open_legacy_when_ready(path: str, *, deadline: float, poll_sec: float) -> LegacyBinReader:
+    # SHUD creates the file before the header is complete; wait for a readable header.
+    while True:
+        try:
+            return LegacyBinReader(path, allow_partial=True)
+        except (OSError, ValueError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(poll_sec)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _follow(args: argparse.Namespace, legacy_path: str) -> int:
+    import numpy as np  # type: ignore
+
+    poll = max(0.05, float(args.poll_sec))
+    idle_timeout = float(args.idle_timeout)
+    cand = _open_legacy_when_ready(legacy_path, deadline=time.monotonic() + idle_timeout, poll_sec=poll)
+    ref: Any
+    if args.reference_bin:
+        ref_path = os.path.abspath(args.reference_bin)
+        ref = _open_legacy_when_ready(ref_path, deadline=time.monotonic() + idle_timeout, poll_sec=poll)
+        if ref.icol_1based != cand.icol_1based:
+            raise ValueError(f"Legacy column layout differs (icol[]): {legacy_path} vs {ref_path}")
+    else:
+        ref_path = os.path.abspath(args.netcdf)
+        ref = _NetcdfFollowSource(
+            ref_path,
+            var_name=args.var,
+            time_dim=args.time_dim,
+            obj_dim=args.obj_dim.strip(),
+            icol_1based=cand.icol_1based,
+        )
+
+    tol = float(args.tol)
+    icol = np.asarray(cand.icol_1based, dtype=np.int64)
+    compared = 0
+    last_growth = time.monotonic()
+    final = False
+    divergence: Optional[Dict[str, Any]] = None
+    print(f"[follow] {legacy_path} vs {ref_path} (poll={poll}s, idle_timeout={idle_timeout}s)")
+    try:
+        while True:
+            # Check the writer before refreshing: everything it wrote before exiting is then visible
+            # to this refresh, which may also include the NetCDF record held back while it was running.
+            if args.pid and not final and not _pid_alive(int(args.pid)):
+                final = True
+            n_ref = ref.refresh(final=final) if isinstance(ref, _NetcdfFollowSource) else ref.refresh()
+            n = min(cand.refresh(), n_ref)
+            if n > compared:
+                last_growth = time.monotonic()
+                blk = ref.read_block(compared, n)
+                if blk is None:
+                    if final:
+                        raise RuntimeError(f"Cannot read records {compared}..{n} of {ref_path}")
+                    time.sleep(poll)
+                    continue
+                t_r, v_r = blk
+                t_c, v_c = cand.read_block(compared, n)
+                if getattr(ref, "is_float32", False):
+                    # NetCDF output is float32: compare at the precision it was written with.
+                    v_c = v_c.astype(np.float32).astype(float)
+                bad_val = ~((v_c == v_r) | (np.isnan(v_c) & np.isnan(v_r)) | (np.abs(v_c - v_r) <= tol))
+                bad_rec = bad_val.any(axis=1)
+                if t_r is not None and len(t_r) == len(t_c):
+                    bad_rec |= np.abs(t_c - t_r) > float(args.time_tol)
+                if bad_rec.any():
+                    k = int(np.argmax(bad_rec))
+                    cols = np.nonzero(bad_val[k])[0]
+                    divergence = {
+                        "record": compared + k,
+                        "t_min": float(t_c[k]),
+                        "ref_t_min": float(t_r[k]) if t_r is not None and len(t_r) == len(t_c) else None,
+                        "columns": [
+                            {
+                                "index_1based": int(icol[j]),
+                                "legacy": float(v_c[k, j]),
+                                "reference": float(v_r[k, j]),
+                                "diff": float(v_c[k, j] - v_r[k, j]),
+                            }
+                            for j in cols[:100]
+                        ],
+                        "num_columns": int(len(cols)),
+                    }
+                    break
+                compared = n
+                print(f"[follow] records ok: {compared} (t_min={float(t_c[-1])})")
+                sys.stdout.flush()
+                continue
+
+            if final:
+                # Writer is gone and the last refresh after that found nothing new: done.
+                break
+            if time.monotonic() - last_growth >= idle_timeout:
+                # Treat a stalled writer as finished: one more pass including any held-back record.
+                final = True
+                continue
+            time.sleep(poll)
+    finally:
+        cand.close()
+        ref.close()
+
+    report = {
+        "legacy_bin": legacy_path,
+        "reference": ref_path,
+        "var": args.var or None,
+        "mode": "follow",
+        "records_compared": compared,
+        "partial_trailing_bytes": cand.partial_bytes,
+        "divergence": divergence,
+    }
+    if divergence is not None:
+        _eprint(
+            f"DIVERGED at record {divergence['record']} (t_min={divergence['t_min']}): "
+            f"{divergence['num_columns']} column(s) differ"
+        )
+        if args.kill_pid_on_diverge and args.pid:
+            try:
+                os.kill(int(args.pid), signal.SIGTERM)
+                _eprint(f"Sent SIGTERM to pid {args.pid}")
+            except ProcessLookupError:
+                pass
+    else:
+        print(f"[follow] done: {compared} records identical")
+
+    if args.out_json:
+        out_path = os.path.abspath(args.out_json)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Wrote: {out_path}")
+    return 2 if divergence is not None else 0
 
 
 def main(argv: Sequence[str]) -> int:
     ap = argparse.ArgumentParser(description="Sampled output compare: legacy *.dat vs NetCDF variable")
     ap.add_argument("--legacy-bin", required=True, help="Legacy binary output file (*.dat)")
-    ap.add_argument("--netcdf", required=True, help="NetCDF output file (*.nc)")
-    ap.add_argument("--var", required=True, help="NetCDF variable name to compare")
+    ap.add_argument("--netcdf", default="", help="NetCDF output file (*.nc)")
+    ap.add_argument("--var", default="", help="NetCDF variable name to compare")
     ap.add_argument("--time-dim", default="time", help="NetCDF time dimension name (default: time)")
     ap.add_argument("--obj-dim", default="", help="NetCDF object dimension name (required if not inferable)")
     ap.add_argument("--times-min", default="", help="Sample times (minutes), comma-separated; default: first 2 records")
     ap.add_argument("--indices", default="", help="Sample full indices (1-based), comma-separated; default: first 3 icol[]")
     ap.add_argument("--time-tol", type=float, default=1e-6, help="Time match tolerance (minutes)")
     ap.add_argument("--out-json", default="", help="Write JSON report (optional)")
+    fg = ap.add_argument_group("follow mode (compare every record of a run that is still writing)")
+    fg.add_argument("--follow", action="store_true", help="Watch the growing --legacy-bin and compare each new record")
+    fg.add_argument("--reference-bin", default="", help="Reference legacy *.dat to follow against (instead of --netcdf)")
+    fg.add_argument("--tol", type=float, default=0.0, help="Absolute value tolerance (default: 0, exact)")
+    fg.add_argument("--poll-sec", type=float, default=2.0, help="Polling interval in seconds (default: 2)")
+    fg.add_argument("--idle-timeout", type=float, default=600.0, help="Stop after this many seconds without new records")
+    fg.add_argument("--pid", type=int, default=0, help="SHUD process id; stop once it exits and nothing new arrives")
+    fg.add_argument("--kill-pid-on-diverge", action="store_true", help="Send SIGTERM to --pid on first divergence")
 
     args = ap.parse_args(list(argv))
     legacy_path = os.path.abspath(args.legacy_bin)
+    if args.reference_bin and not args.follow:
+        ap.error("--reference-bin requires --follow")
+    if not args.reference_bin and not (args.netcdf and args.var):
+        ap.error("--netcdf and --var are required (or --follow --reference-bin)")
+    if args.follow:
+        return _follow(args, legacy_path)
     nc_path = os.path.abspath(args.netcdf)
 
-    legacy = _read_legacy_bin(legacy_path)
+    # Prefer an up-to-date object-major sidecar (tools/build_objmajor.py) over parsing the whole *.dat.
+    legacy_sidecar = ObjMajorSidecar.open_if_fresh(legacy_path)
+    if legacy_sidecar is not None:
+        legacy_times_min = legacy_sidecar.times_min
+        legacy_icol_1based = legacy_sidecar.icol_1based
+        legacy_value = legacy_sidecar.value
+    else:
+        legacy = _read_legacy_bin(legacy_path)
+        legacy_times_min = legacy.times_min
+        legacy_icol_1based = legacy.icol_1based
+
+        def legacy_value(ti: int, col: int) -> float:
+            return float(legacy.values[ti][col])
 
     if not args.times_min:
-        times_min = legacy.times_min[:2]
+        times_min = legacy_times_min[:2]
     else:
         times_min = _parse_float_list(args.times_min)
 
     if not args.indices:
-        indices_1based = legacy.icol_1based[:3]
+        indices_1based = legacy_icol_1based[:3]
     else:
         indices_1based = _parse_int_list(args.indices)
 
@@ -213,32 +706,46 @@ def main(argv: Sequence[str]) -> int:
     samples: List[Dict[str, Any]] = []
 
     # Map legacy icol -> column index
-    col_of_index: Dict[int, int] = {idx: j for j, idx in enumerate(legacy.icol_1based)}
+    col_of_index: Dict[int, int] = {idx: j for j, idx in enumerate(legacy_icol_1based)}
 
-    for t in times_min:
-        ti = _find_time_index(legacy.times_min, float(t), tol=float(args.time_tol))
-        for idx1 in indices_1based:
-            if idx1 not in col_of_index:
-                continue
-            col = col_of_index[idx1]
-            legacy_v = float(legacy.values[ti][col])
-            nc_v = _read_netcdf_value(
-                nc_path,
-                var_name=args.var,
-                time_idx=ti,
-                obj_idx0=int(idx1) - 1,
-                time_dim=args.time_dim,
-                obj_dim=obj_dim,
-            )
-            samples.append(
-                {
-                    "t_min": float(legacy.times_min[ti]),
-                    "index_1based": int(idx1),
-                    "legacy": legacy_v,
-                    "netcdf": nc_v,
-                    "diff": legacy_v - nc_v,
-                }
-            )
+    # Open the NetCDF side (object-major sidecar when fresh, else the dataset) once for all samples.
+    nc_sidecar = ObjMajorSidecar.open_if_fresh(nc_path, args.var)
+    nc_ds = _require_netCDF4().Dataset(nc_path, "r") if nc_sidecar is None else None
+    try:
+        for t in times_min:
+            ti = _find_time_index(legacy_times_min, float(t), tol=float(args.time_tol))
+            for idx1 in indices_1based:
+                if idx1 not in col_of_index:
+                    continue
+                col = col_of_index[idx1]
+                legacy_v = float(legacy_value(ti, col))
+                nc_v = _read_netcdf_value(
+                    nc_path,
+                    var_name=args.var,
+                    time_idx=ti,
+                    obj_idx0=int(idx1) - 1,
+                    time_dim=args.time_dim,
+                    obj_dim=obj_dim,
+                    sidecar=nc_sidecar,
+                    ds=nc_ds,
+                )
+                samples.append(
+                    {
+                        "t_min": float(legacy_times_min[ti]),
+                        "index_1based": int(idx1),
+                        "legacy": legacy_v,
+                        "netcdf": nc_v,
+                        "diff": legacy_v - nc_v,
+                    }
+                )
+    finally:
+        if nc_sidecar is not None:
+            nc_sidecar.close()
+        if nc_ds is not None:
+            nc_ds.close()
+
+    if legacy_sidecar is not None:
+        legacy_sidecar.close()
 
     diffs = [abs(float(s["diff"])) for s in samples]
     report = {
@@ -247,6 +754,7 @@ def main(argv: Sequence[str]) -> int:
         "var": args.var,
         "time_dim": args.time_dim,
         "obj_dim": obj_dim,
+        "legacy_sidecar": legacy_sidecar.path if legacy_sidecar is not None else None,
         "samples": samples,
         "summary": {"count": len(samples), "max_abs": max(diffs) if diffs else 0.0, "mean_abs": sum(diffs) / len(diffs) if diffs else 0.0},
     }
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Convert SHUD legacy binary output (<prj>.out/*.dat) to UGRID/CF NetCDF.
+
+Until SHUD's native NetCDF writer (Phase B) covers every run, this tool gives
+existing legacy output the same downstream layout:
+
+- streams: <prj>.ele*.dat -> {prefix}.ele.nc, <prj>.riv*.dat -> {prefix}.riv.nc,
+  <prj>.lak*.dat -> {prefix}.lake.nc (file names from configs/output/ugrid.yaml)
+- one variable per legacy file, named by the basename suffix (e.g. eleysurf),
+  on the full object dimension (mesh_face/river/lake); columns not selected by
+  the legacy icol[] are _FillValue and flagged in <kind>_output_mask
+- time = legacy record time, "minutes since <ForcStartTime> 00:00:00 UTC"
+- UGRID mesh topology in the element file when <prj>.sp.mesh is available
+- object dimension sizes from <prj>.sp.mesh / .sp.riv / .sp.lake (else the
+  largest written column, with a warning)
+
+Records are streamed through the memory-mapped legacy reader in time blocks
+(never the whole file in RAM), written with configurable chunking/deflate, and
+streams are converted in parallel processes. Throughput is reported in MB/s of
+legacy input.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import dataclasses
+import datetime as dt
+import glob
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from compare_output import LegacyBinReader, _require_netCDF4
+
+
+FILL_VALUE_F32 = 9.96921e36
+
+# Stream kind -> (legacy name prefix, schema files key, object dimension, id variable)
+STREAMS: Dict[str, Tuple[str, str, str, str]] = {
+    "ele": ("ele", "element", "mesh_face", "element_id"),
+    "riv": ("riv", "river", "river", "river_id"),
+    "lake": ("lak", "lake", "lake", "lake_id"),
+}
+
+DEFAULT_FILES = {"element": "{prefix}.ele.nc", "river": "{prefix}.riv.nc", "lake": "{prefix}.lake.nc"}
+
+# units/long_name registry by legacy variable suffix (SPEC_阶段B §7.2).
+VAR_ATTRS: Dict[str, Tuple[str, str]] = {
+    "eleyic": ("m", "interception storage"),
+    "eleysnow": ("m", "snow depth"),
+    "eleysurf": ("m", "surface water depth"),
+    "eleyunsat": ("m", "unsat storage depth"),
+    "eleygw": ("m", "groundwater head"),
+    "elevprcp": ("m day-1", "precip (to land)"),
+    "elevnetprcp": ("m day-1", "net precip"),
+    "elevetp": ("m day-1", "potential ET"),
+    "eleveta": ("m day-1", "actual ET"),
+    "elevrech": ("m day-1", "recharge"),
+    "elevinfil": ("m day-1", "infiltration"),
+    "elevexfil": ("m day-1", "exfiltration"),
+    "elevetic": ("m day-1", "ET from interception"),
+    "elevettr": ("m day-1", "transpiration"),
+    "elevetev": ("m day-1", "soil evaporation"),
+    "eleqrsurf": ("m3 day-1", "element to river surface flux"),
+    "eleqrsub": ("m3 day-1", "element to river subsurface flux"),
+    "eleqsurf": ("m3 day-1", "element lateral surface flux (sum over edges)"),
+    "eleqsurf1": ("m3 day-1", "element lateral surface flux across edge 1"),
+    "eleqsurf2": ("m3 day-1", "element lateral surface flux across edge 2"),
+    "eleqsurf3": ("m3 day-1", "element lateral surface flux across edge 3"),
+    "eleqsub": ("m3 day-1", "element lateral subsurface flux (sum over edges)"),
+    "eleqsub1": ("m3 day-1", "element lateral subsurface flux across edge 1"),
+    "eleqsub2": ("m3 day-1", "element lateral subsurface flux across edge 2"),
+    "eleqsub3": ("m3 day-1", "element lateral subsurface flux across edge 3"),
+    "rivqdown": ("m3 day-1", "river downstream discharge"),
+    "rivqup": ("m3 day-1", "river upstream discharge"),
+    "rivqsurf": ("m3 day-1", "river surface exchange"),
+    "rivqsub": ("m3 day-1", "river subsurface exchange"),
+    "rivystage": ("m", "river stage"),
+    "lakystage": ("m", "lake stage"),
+    "lakatop": ("m2", "lake top area"),
+    "lakvevap": ("m day-1", "lake evaporation"),
+    "lakvprcp": ("m day-1", "lake precipitation"),
+    "lakqrivin": ("m3 day-1", "lake inflow from rivers"),
+    "lakqrivout": ("m3 day-1", "lake outflow to rivers"),
+    "lakqsurf": ("m3 day-1", "lake surface exchange"),
+    "lakqsub": ("m3 day-1", "lake subsurface exchange"),
+}
+
+
+def _eprint(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
+def _read_forc_start(tsd_forc_path: str) -> int:
+    with open(tsd_forc_path, "r", encoding="utf-8") as f:
+        head = f.readline().split()
+    if len(head) < 2:
+        raise ValueError(f"Invalid tsd.forc header: {tsd_forc_path}")
+    return int(head[1])
+
+
+def _time_units(forc_start_yyyymmdd: int) -> str:
+    y = forc_start_yyyymmdd // 10000
+    m = (forc_start_yyyymmdd // 100) % 100
+    d = forc_start_yyyymmdd % 100
+    return f"minutes since {dt.date(y, m, d).isoformat()} 00:00:00 UTC"
+
+
+@dataclasses.dataclass(frozen=True)
+class Mesh:
+    node_x: List[float]
+    node_y: List[float]
+    face_nodes: List[Tuple[int, int, int]]  # 1-based node ids
+
+
+def _read_table_block(lines: List[str], pos: int, path: str) -> Tuple[int, List[List[str]]]:
+    # rSHUD write.df layout: "<nrow> <ncol>", a column-name line, then nrow rows.
+    head = lines[pos].split()
+    if len(head) < 2:
+        raise ValueError(f"Invalid table header at {path}:{pos + 1}: {lines[pos]!r}")
+    nrow = int(head[0])
+    rows = [lines[pos + 2 + i].split() for i in range(nrow)]
+    return pos + 2 + nrow, rows
+
+
+def _read_sp_mesh(path: str) -> Mesh:
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [ln for ln in f.read().splitlines() if ln.strip()]
+    pos, ele_rows = _read_table_block(lines, 0, path)
+    _, node_rows = _read_table_block(lines, pos, path)
+    face_nodes = [(int(r[1]), int(r[2]), int(r[3])) for r in ele_rows]
+    node_x = [float(r[1]) for r in node_rows]
+    node_y = [float(r[2]) for r in node_rows]
+    return Mesh(node_x=node_x, node_y=node_y, face_nodes=face_nodes)
+
+
+def _read_table_nrow(path: str) -> int:
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.readline().split()
+    if not head:
+        raise ValueError(f"Empty table file: {path}")
+    return int(head[0])
+
+
+def _discover_streams(out_dir: str, prj: str, kinds: Sequence[str]) -> Dict[str, List[str]]:
+    found: Dict[str, List[str]] = {}
+    for kind in kinds:
+        name_prefix = STREAMS[kind][0]
+        pat = os.path.join(out_dir, f"{prj}.{name_prefix}*.dat")
+        files = sorted(glob.glob(pat))
+        if files:
+            found[kind] = files
+    return found
+
+
+def _var_name(path: str) -> str:
+    # <prj>.eleysurf.dat -> eleysurf
+    base = os.path.basename(path)
+    if base.endswith(".dat"):
+        base = base[: -len(".dat")]
+    name = base.rsplit(".", 1)[-1]
+    return re.sub(r"[^A-Za-z0-9_]", "_", name)
+
+
+@dataclasses.dataclass(frozen=True)
+class StreamJob:
+    kind: str
+    files: List[str]
+    out_path: str
+    n_obj: Optional[int]
+    mesh: Optional[Mesh]
+    time_units: str
+    calendar: str
+    prj: str
+    chunk_time: int
+    chunk_obj: int
+    complevel: int
+    shuffle: bool
+    block_records: int
+
+
+def _convert_stream(job: StreamJob) -> Dict[str, Any]:
+    obj_dim = STREAMS[job.kind][2]
+    t_start = time.perf_counter()
+    bytes_in = 0
+
+    readers = [LegacyBinReader(p) for p in job.files]
+    try:
+        n_obj = job.n_obj
+        max_icol = max(max(r.icol_1based) for r in readers)
+        if n_obj is None:
+            n_obj = max_icol
+        elif max_icol > n_obj:
+            raise ValueError(f"legacy icol exceeds {obj_dim}={n_obj} (max icol={max_icol}) in stream {job.kind}")
+
+        tmp_path = job.out_path + ".tmp"
+        os.makedirs(os.path.dirname(job.out_path) or ".", exist_ok=True)
+        try:
+            _write_stream(job, readers, tmp_path, n_obj=n_obj)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, job.out_path)
+        bytes_in = sum(os.path.getsize(p) for p in job.files)
+    finally:
+        for r in readers:
+            r.close()
+
+    wall = time.perf_counter() - t_start
+    bytes_out = os.path.getsize(job.out_path)
+    return {
+        "stream": job.kind,
+        "out": job.out_path,
+        "variables": [_var_name(p) for p in job.files],
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "wall_sec": wall,
+        "mb_per_sec": (bytes_in / 1e6) / wall if wall > 0 else 0.0,
+    }
+
+
+def _write_stream(job: StreamJob, readers: Sequence[LegacyBinReader], tmp_path: str, *, n_obj: int) -> None:
+    netCDF4 = _require_netCDF4()
+    import numpy as np  # type: ignore
+
+    _, _, obj_dim, id_var = STREAMS[job.kind]
+    with netCDF4.Dataset(tmp_path, "w", format="NETCDF4") as ds:
+        ds.Conventions = "CF-1.10, UGRID-1.0"
+        ds.title = f"SHUD output: {job.prj}"
+        ds.source = "SHUD"
+        ds.history = (
+            f"{dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds')}: "
+            "converted from legacy *.dat by tools/convert_output.py"
+        )
+
+        ds.createDimension(obj_dim, n_obj)
+        ids = ds.createVariable(id_var, "i4", (obj_dim,))
+        ids[:] = np.arange(1, n_obj + 1, dtype=np.int32)
+
+        if job.kind == "ele" and job.mesh is not None:
+            _write_mesh(ds, job.mesh)
+
+        mask = np.zeros((n_obj,), dtype=np.int8)
+        time_dims: Dict[Tuple[int, bytes], str] = {}
+        chunk_obj = max(1, min(int(job.chunk_obj), n_obj))
+
+        for path, rd in zip(job.files, readers):
+            vname = _var_name(path)
+            times_all = np.asarray(rd.times_array(), dtype=np.float64)
+            key = (len(times_all), times_all.tobytes())
+            tdim = time_dims.get(key)
+            if tdim is None:
+                # Variables with a different dt_* interval get their own time axis.
+                tdim = "time" if not time_dims else f"time_{vname}"
+                time_dims[key] = tdim
+                ds.createDimension(tdim, None)
+                tv = ds.createVariable(tdim, "f8", (tdim,))
+                tv.units = job.time_units
+                tv.calendar = job.calendar
+                tv.standard_name = "time"
+                tv[:] = times_all
+
+            chunk_time = max(1, min(int(job.chunk_time), max(1, rd.num_records)))
+            var = ds.createVariable(
+                vname,
+                "f4",
+                (tdim, obj_dim),
+                zlib=job.complevel > 0,
+                complevel=max(1, min(9, int(job.complevel))),
+                shuffle=bool(job.shuffle),
+                chunksizes=(chunk_time, chunk_obj),
+                fill_value=np.float32(FILL_VALUE_F32),
+            )
+            units, long_name = VAR_ATTRS.get(vname, ("", ""))
+            if units:
+                var.units = units
+            if long_name:
+                var.long_name = long_name
+            if job.kind == "ele" and job.mesh is not None:
+                var.mesh = "mesh"
+                var.location = "face"
+            var.legacy_file = os.path.basename(path)
+
+            cols = np.asarray(rd.icol_1based, dtype=np.int64) - 1
+            mask[cols] = 1
+            # Block size is a multiple of the time chunk so each write fills whole chunks.
+            block = max(chunk_time, (int(job.block_records) // chunk_time) * chunk_time)
+            for start in range(0, rd.num_records, block):
+                stop = min(rd.num_records, start + block)
+                _, vals = rd.read_block(start, stop)
+                out = np.full((stop - start, n_obj), np.float32(FILL_VALUE_F32), dtype=np.float32)
+                out[:, cols] = vals
+                var[start:stop, :] = out
+
+        mv = ds.createVariable(f"{STREAMS[job.kind][1]}_output_mask", "i1", (obj_dim,))
+        mv.long_name = "1 if the object is selected in legacy output (icol), else 0"
+        mv[:] = mask
+
+
+def _write_mesh(ds: Any, mesh: Mesh) -> None:
+    import numpy as np  # type: ignore
+
+    ds.createDimension("mesh_node", len(mesh.node_x))
+    ds.createDimension("max_face_nodes", 3)
+    topo = ds.createVariable("mesh", "i4")
+    topo.cf_role = "mesh_topology"
+    topo.topology_dimension = 2
+    topo.node_coordinates = "mesh_node_x mesh_node_y"
+    topo.face_node_connectivity = "mesh_face_nodes"
+    topo.face_coordinates = "mesh_face_x mesh_face_y"
+
+    nx = ds.createVariable("mesh_node_x", "f8", ("mesh_node",))
+    nx.units = "m"
+    ny = ds.createVariable("mesh_node_y", "f8", ("mesh_node",))
+    ny.units = "m"
+    node_x = np.asarray(mesh.node_x, dtype=np.float64)
+    node_y = np.asarray(mesh.node_y, dtype=np.float64)
+    nx[:] = node_x
+    ny[:] = node_y
+
+    faces = np.asarray(mesh.face_nodes, dtype=np.int32)
+    fv = ds.createVariable("mesh_face_nodes", "i4", ("mesh_face", "max_face_nodes"))
+    fv.cf_role = "face_node_connectivity"
+    fv.start_index = 1
+    fv[:] = faces
+
+    fx = ds.createVariable("mesh_face_x", "f8", ("mesh_face",))
+    fx.units = "m"
+    fy = ds.createVariable("mesh_face_y", "f8", ("mesh_face",))
+    fy.units = "m"
+    fx[:] = node_x[faces - 1].mean(axis=1)
+    fy[:] = node_y[faces - 1].mean(axis=1)
+
+
+def _load_schema(path: str) -> Dict[str, Any]:
+    if not path:
+        return {}
+    import yaml  # type: ignore
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"Schema YAML root must be a mapping: {path}")
+    return data
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description="Convert legacy SHUD *.dat output to UGRID/CF NetCDF")
+    ap.add_argument("--run", required=True, help="run_dir (contains input/<prj>/ and output/<prj>.out/)")
+    ap.add_argument("--prj", required=True, help="Project name (e.g. qhh)")
+    ap.add_argument("--out-dir", default="", help="Legacy output dir (default: <run>/output/<prj>.out)")
+    ap.add_argument("--nc-dir", default="", help="Destination dir (default: <run>/output_netcdf)")
+    ap.add_argument("--prefix", default="", help="File prefix for {prefix} (default: <prj>)")
+    ap.add_argument("--schema", default="", help="Output schema YAML (default: configs/output/ugrid.yaml)")
+    ap.add_argument("--streams", default="ele,riv,lake", help="Streams to convert (default: ele,riv,lake)")
+    ap.add_argument("--chunk-time", type=int, default=256, help="Chunk length along time (default: 256)")
+    ap.add_argument("--chunk-obj", type=int, default=4096, help="Chunk length along objects (default: 4096)")
+    ap.add_argument("--complevel", type=int, default=4, help="Deflate level 0-9, 0 disables (default: 4)")
+    ap.add_argument("--no-shuffle", action="store_true", help="Disable the HDF5 shuffle filter")
+    ap.add_argument("--block-records", type=int, default=2048, help="Records per streamed read block (default: 2048)")
+    ap.add_argument("--jobs", type=int, default=0, help="Parallel stream workers (default: one per stream)")
+    ap.add_argument("--out-json", default="", help="Write JSON report (optional)")
+
+    args = ap.parse_args(list(argv))
+    run_dir = os.path.abspath(args.run)
+    prj = str(args.prj)
+    out_dir = os.path.abspath(args.out_dir) if args.out_dir else os.path.join(run_dir, "output", f"{prj}.out")
+    nc_dir = os.path.abspath(args.nc_dir) if args.nc_dir else os.path.join(run_dir, "output_netcdf")
+    prefix = args.prefix or prj
+    schema_path = args.schema or os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "configs", "output", "ugrid.yaml")
+    schema = _load_schema(os.path.abspath(schema_path)) if os.path.exists(schema_path) else {}
+
+    kinds = [k.strip() for k in args.streams.split(",") if k.strip()]
+    bad = [k for k in kinds if k not in STREAMS]
+    if bad:
+        raise ValueError(f"Unknown stream(s): {bad} (choose from {sorted(STREAMS)})")
+
+    input_dir = os.path.join(run_dir, "input", prj)
+    forc_start = _read_forc_start(os.path.join(input_dir, f"{prj}.tsd.forc"))
+    units = _time_units(forc_start)
+    time_cfg = schema.get("time") if isinstance(schema.get("time"), dict) else {}
+    calendar = str(time_cfg.get("calendar", "standard"))
+    files_cfg = dict(DEFAULT_FILES)
+    if isinstance(schema.get("files"), dict):
+        files_cfg.update({k: str(v) for k, v in schema["files"].items()})
+
+    mesh: Optional[Mesh] = None
+    mesh_path = os.path.join(input_dir, f"{prj}.sp.mesh")
+    if os.path.exists(mesh_path):
+        mesh = _read_sp_mesh(mesh_path)
+    n_obj: Dict[str, Optional[int]] = {"ele": len(mesh.face_nodes) if mesh is not None else None, "riv": None, "lake": None}
+    riv_path = os.path.join(input_dir, f"{prj}.sp.riv")
+    if os.path.exists(riv_path):
+        n_obj["riv"] = _read_table_nrow(riv_path)
+    lake_path = os.path.join(input_dir, f"{prj}.sp.lake")
+    if os.path.exists(lake_path):
+        n_obj["lake"] = _read_table_nrow(lake_path)
+
+    streams = _discover_streams(out_dir, prj, kinds)
+    if not streams:
+        raise FileNotFoundError(f"No legacy *.dat files for streams {kinds} under: {out_dir}")
+    for kind in streams:
+        if n_obj.get(kind) is None:
+            _eprint(
+                f"WARNING: no object count for stream {kind} in {input_dir}; using the largest written column "
+                "(objects after it are missing from the output)"
+            )
+
+    jobs = [
+        StreamJob(
+            kind=kind,
+            files=files,
+            out_path=os.path.join(nc_dir, files_cfg[STREAMS[kind][1]].replace("{prefix}", prefix)),
+            n_obj=n_obj.get(kind),
+            mesh=mesh if kind == "ele" else None,
+            time_units=units,
+            calendar=calendar,
+            prj=prj,
+            chunk_time=int(args.chunk_time),
+            chunk_obj=int(args.chunk_obj),
+            complevel=int(args.complevel),
+            shuffle=not bool(args.no_shuffle),
+            block_records=int(args.block_records),
+        )
+        for kind, files in streams.items()
+    ]
+
+    t0 = time.perf_counter()
+    max_workers = int(args.jobs) if int(args.jobs) > 0 else len(jobs)
+    results: List[Dict[str, Any]] = []
+    # HDF5 is not thread-safe: one process per stream.
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for res in pool.map(_convert_stream, jobs):
+            results.append(res)
+    wall = time.perf_counter() - t0
+
+    total_in = sum(int(r["bytes_in"]) for r in results)
+    total_out = sum(int(r["bytes_out"]) for r in results)
+    report = {
+        "run": run_dir,
+        "prj": prj,
+        "time_units": units,
+        "streams": results,
+        "summary": {
+            "bytes_in": total_in,
+            "bytes_out": total_out,
+            "wall_sec": wall,
+            "mb_per_sec": (total_in / 1e6) / wall if wall > 0 else 0.0,
+        },
+    }
+
+    print("== Legacy -> NetCDF conversion ==")
+    for r in results:
+        print(
+            f"- {r['stream']}: {len(r['variables'])} vars -> {r['out']} "
+            f"({r['bytes_in'] / 1e6:.1f} MB -> {r['bytes_out'] / 1e6:.1f} MB, {r['mb_per_sec']:.1f} MB/s)"
+        )
+    s = report["summary"]
+    print(f"- total: {s['bytes_in'] / 1e6:.1f} MB in {s['wall_sec']:.2f}s ({s['mb_per_sec']:.1f} MB/s)")
+
+    if args.out_json:
+        out_path = os.path.abspath(args.out_json)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Wrote: {out_path}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
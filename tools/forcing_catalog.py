@@ -0,0 +1,745 @@
+#!/usr/bin/env python3
+"""
+Forcing archive catalog: a one-time header scan of a NetCDF forcing archive.
+
+For every *.nc / *.nc4 file under a data root the catalog records the product
+(CMFD2/ERA5/GLDAS, from the file name), variables, time range and step, a grid
+signature and the file size/mtime. Only headers and coordinate variables are
+read, in parallel worker processes.
+
+The index is a compact JSON file at <data_root>/.forcing_catalog.json (or in
+~/.cache/shudnc/ when the archive is read-only). It is refreshed incrementally: files whose size and mtime are unchanged are reused,
+new or changed files are rescanned and deleted files are dropped.
+
+Tools resolve files and time coverage through `catalog_for(path)`, which finds
+the nearest catalog above a path. Without a catalog they fall back to globbing
+the filesystem as before.
+
+Usage:
+  python3 tools/forcing_catalog.py build Data/Forcing
+  python3 tools/forcing_catalog.py show Data/Forcing --product GLDAS
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import datetime as dt
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from compare_forcing import _parse_units_since, _require_netCDF4
+from grid_index import read_grid
+
+
+CATALOG_NAME = ".forcing_catalog.json"
+CATALOG_VERSION = 1
+NETCDF_SUFFIXES = (".nc", ".nc4")
+
+# File-name patterns per product (matched against the basename).
+PRODUCT_PATTERNS = (
+    ("GLDAS", re.compile(r"^GLDAS_")),
+    ("ERA5", re.compile(r"^ERA5_")),
+    ("CMFD2", re.compile(r"_CMFD_")),
+)
+
+TIME_NAMES = ("time",)
+LAT_NAMES = ("lat", "latitude")
+LON_NAMES = ("lon", "longitude")
+
+_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def _eprint(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
+def _infer_product(path: str) -> str:
+    base = os.path.basename(path)
+    for product, pat in PRODUCT_PATTERNS:
+        if pat.search(base):
+            return product
+    return "UNKNOWN"
+
+
+def epoch_min(t: dt.datetime) -> float:
+    """Minutes since 1970-01-01 UTC (the catalog's time coordinate)."""
+    return (t - _EPOCH).total_seconds() / 60.0
+
+
+def from_epoch_min(v: float) -> dt.datetime:
+    return _EPOCH + dt.timedelta(minutes=float(v))
+
+
+def _fmt_time(v: Optional[float]) -> str:
+    return "-" if v is None else from_epoch_min(v).strftime("%Y-%m-%d %H:%M")
+
+
+def _coord(ds: Any, names: Sequence[str]) -> Optional[Tuple[str, Any]]:
+    for n in names:
+        if n in ds.variables:
+            return n, ds.variables[n]
+    return None
+
+
+def _scan_file(task: Tuple[str, str, str]) -> Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Read one file's header and coordinates; return (rel, entry, grid)."""
+    root, rel, product = task
+    netCDF4 = _require_netCDF4()
+    import numpy as np  # type: ignore
+
+    path = os.path.join(root, rel)
+    st = os.stat(path)
+    entry: Dict[str, Any] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "product": product or _infer_product(rel)}
+    try:
+        with netCDF4.Dataset(path, "r") as ds:
+            entry["dims"] = {d: len(v) for d, v in ds.dimensions.items()}
+            entry["vars"] = sorted(
+                n for n, v in ds.variables.items() if n not in ds.dimensions and len(v.dimensions) >= 2
+            )
+            tv = _coord(ds, TIME_NAMES)
+            if tv is not None:
+                units = getattr(tv[1], "units", "")
+                vals = np.asarray(tv[1][:], dtype=float).ravel()
+                if isinstance(units, str) and units.strip() and vals.size:
+                    factor_min, base_dt = _parse_units_since(units)
+                    times = epoch_min(base_dt) + vals * factor_min
+                    entry["time"] = {"n": int(times.size), "start": float(times[0]), "end": float(times[-1])}
+                    if times.size > 1:
+                        steps = np.diff(times)
+                        entry["time"]["step"] = float(np.median(steps))
+                        # Irregular or unsorted axes keep their full time list.
+                        if not np.allclose(steps, steps[0]) or steps[0] <= 0:
+                            entry["time"]["values"] = [float(x) for x in times]
+            grid: Optional[Dict[str, Any]] = None
+            lat = _coord(ds, LAT_NAMES)
+            lon = _coord(ds, LON_NAMES)
+            if lat is not None and lon is not None:
+                h = hashlib.sha1()
+                grid = {}
+                for key, (name, var) in (("lat", lat), ("lon", lon)):
+                    arr = np.ascontiguousarray(np.asarray(var[:], dtype=np.float64))
+                    h.update(f"{key}:{name}:{arr.shape}".encode("ascii"))
+                    h.update(arr.tobytes())
+                    grid[key] = {
+                        "name": name,
+                        "shape": list(arr.shape),
+                        "dims": list(var.dimensions),
+                        "min": float(arr.min()),
+                        "max": float(arr.max()),
+                        "first": float(arr.ravel()[0]),
+                        "last": float(arr.ravel()[-1]),
+                    }
+                entry["grid"] = h.hexdigest()[:16]
+            return rel, entry, grid
+    except Exception as e:  # unreadable files are recorded, not fatal
+        entry["error"] = f"{type(e).__name__}: {e}"
+        return rel, entry, None
+
+
+def _walk(root: str) -> List[str]:
+    out: List[str] = []
+    for d, dirs, files in os.walk(root):
+        dirs[:] = sorted(x for x in dirs if not x.startswith("."))
+        for fn in files:
+            if fn.endswith(NETCDF_SUFFIXES):
+                out.append(os.path.relpath(os.path.join(d, fn), root).replace(os.sep, "/"))
+    return sorted(out)
+
+
+def _glob_regex(pattern: str) -> "re.Pattern[str]":
+    # glob(3) semantics on '/'-separated relative paths: wildcards never cross a separator.
+    out = []
+    for ch in pattern:
+        if ch == "*":
+            out.append("[^/]*")
+        elif ch == "?":
+            out.append("[^/]")
+        else:
+            out.append(re.escape(ch))
+    return re.compile("".join(out) + r"\Z")
+
+
+class ForcingCatalog:
+    def __init__(self, root: str, data: Dict[str, Any]) -> None:
+        self.root = os.path.abspath(root)
+        self.files: Dict[str, Dict[str, Any]] = data.get("files") or {}
+        self.grids: Dict[str, Dict[str, Any]] = data.get("grids") or {}
+        self.built_utc: str = str(data.get("built_utc", ""))
+
+    @classmethod
+    def load(cls, root: str, *, cache: bool = False) -> Optional["ForcingCatalog"]:
+        path = catalog_path(root, cache=cache)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if data.get("version") != CATALOG_VERSION:
+            return None
+        return cls(root, data)
+
+    def rel(self, path: str) -> Optional[str]:
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        if rel == ".." or rel.startswith(".." + os.sep):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def entry(self, path: str) -> Optional[Dict[str, Any]]:
+        rel = self.rel(path)
+        return self.files.get(rel) if rel is not None else None
+
+    def exists(self, path: str) -> bool:
+        e = self.entry(path)
+        return e is not None and "error" not in e
+
+    def is_current(self, path: str) -> bool:
+        """Whether `path` still exists with the size and mtime it was catalogued with."""
+        e = self.entry(path)
+        if e is None:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return e.get("size") == st.st_size and e.get("mtime_ns") == st.st_mtime_ns
+
+    def glob(self, pattern: str) -> List[str]:
+        """Absolute paths of catalogued files matching a glob pattern (absolute or relative to root)."""
+        rel = self.rel(pattern) if os.path.isabs(pattern) else pattern.replace(os.sep, "/")
+        if rel is None:
+            return []
+        rx = _glob_regex(rel)
+        return [os.path.join(self.root, r) for r in sorted(self.files) if rx.match(r)]
+
+    def product_files(self, product: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """(abs path, entry) for a product's readable files with a time axis, ordered by start time."""
+        out = [
+            (os.path.join(self.root, r), e)
+            for r, e in self.files.items()
+            if e.get("product") == product.upper() and "error" not in e and "time" in e
+        ]
+        return sorted(out, key=lambda x: (x[1]["time"]["start"], x[0]))
+
+    def products(self) -> List[str]:
+        return sorted({str(e.get("product")) for e in self.files.values()})
+
+    def archives(self, product: str) -> Dict[Tuple[str, str], List[Tuple[str, Dict[str, Any]]]]:
+        """
+        A product's files grouped by (archive directory, grid signature).
+
+        The archive directory is the file's root-relative directory without trailing all-digit
+        components (year / day-of-year subdirectories), so e.g. GLDAS/2017/*.nc4 and GLDAS_qhh/*.nc4
+        or the per-variable CMFD2 directories are separate archives.
+        """
+        out: Dict[Tuple[str, str], List[Tuple[str, Dict[str, Any]]]] = {}
+        for path, e in self.product_files(product):
+            parts = os.path.dirname(os.path.relpath(path, self.root)).replace(os.sep, "/").split("/")
+            while parts and parts[-1].isdigit():
+                parts.pop()
+            key = ("/".join(p for p in parts if p) or ".", str(e.get("grid") or ""))
+            out.setdefault(key, []).append((path, e))
+        return dict(sorted(out.items()))
+
+    def coverage(self, product: str, *, tol_min: float = 1e-3) -> Dict[str, Any]:
+        """Covered time spans, missing-record gaps and overlapping files per archive of one product (epoch minutes)."""
+        archives = [
+            dict(_archive_coverage(files, tol_min=tol_min), dir=d, grid=g)
+            for (d, g), files in self.archives(product).items()
+        ]
+        return {"files": sum(a["files"] for a in archives), "archives": archives}
+
+
+def _archive_coverage(files: List[Tuple[str, Dict[str, Any]]], *, tol_min: float) -> Dict[str, Any]:
+    """Spans/gaps/duplicates of one archive's files, ordered by start time."""
+    starts = [e["time"]["start"] for _, e in files]
+    per_file_steps = [e["time"]["step"] for _, e in files if e["time"].get("step")]
+    between = [b - a for a, b in zip(starts, starts[1:]) if b - a > tol_min]
+    # Record step: within-file step when files hold several records, else the file cadence.
+    step = min(per_file_steps) if per_file_steps else (min(between) if between else None)
+    spans: List[List[float]] = []
+    gaps: List[List[float]] = []
+    duplicates: List[Dict[str, Any]] = []
+    prev_end: Optional[float] = None
+    prev_path = ""
+    for path, e in files:
+        t = e["time"]
+        if prev_end is not None and t["start"] <= prev_end + tol_min:
+            duplicates.append({"time": t["start"], "files": [prev_path, path]})
+        if spans and step is not None and t["start"] <= spans[-1][1] + step + tol_min:
+            spans[-1][1] = max(spans[-1][1], t["end"])
+        else:
+            if spans:
+                # Gap as [first missing record, last missing record].
+                pad = step if step is not None else 0.0
+                gaps.append([spans[-1][1] + pad, t["start"] - pad])
+            spans.append([t["start"], t["end"]])
+        prev_end = t["end"] if prev_end is None else max(prev_end, t["end"])
+        prev_path = path
+    return {
+        "files": len(files),
+        "step_min": step,
+        "spans": spans,
+        "gaps": gaps,
+        "duplicates": duplicates,
+        "vars": sorted({v for _, e in files for v in e.get("vars", [])}),
+    }
+
+
+def build_catalog(
+    root: str,
+    *,
+    product: str = "",
+    jobs: int = 0,
+    full: bool = False,
+    only: Optional[Sequence[str]] = None,
+    cache: bool = False,
+) -> Tuple[ForcingCatalog, Dict[str, int]]:
+    """
+    Create or incrementally refresh the catalog of `root`; return it and scan counts.
+
+    `only` limits the refresh to these root-relative paths (other entries are kept as they are),
+    so a pre-flight check touches just the files of its time window. `cache` keeps the catalog in
+    the per-user cache (seeded from a catalog in the data root, which is left untouched).
+    """
+    root = os.path.abspath(root)
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"Forcing data root not found: {root}")
+    old = None
+    if not full:
+        old = ForcingCatalog.load(root, cache=cache)
+        if old is None and cache:
+            old = ForcingCatalog.load(root)
+    old_files = old.files if old is not None else {}
+    grids: Dict[str, Dict[str, Any]] = dict(old.grids) if old is not None else {}
+
+    files: Dict[str, Dict[str, Any]] = {}
+    todo: List[Tuple[str, str, str]] = []
+    if only is None:
+        rels = _walk(root)
+    else:
+        rels = sorted(set(only))
+        wanted = set(rels)
+        # Keep the other entries, minus files deleted since they were catalogued.
+        files.update(
+            (r, e) for r, e in old_files.items() if r not in wanted and os.path.exists(os.path.join(root, r))
+        )
+    for rel in rels:
+        try:
+            st = os.stat(os.path.join(root, rel))
+        except FileNotFoundError:
+            continue
+        prev = old_files.get(rel)
+        if prev is not None and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+            if not product or prev.get("product") == product.upper():
+                files[rel] = prev
+                continue
+        todo.append((root, rel, product.upper()))
+
+    workers = jobs if jobs > 0 else (os.cpu_count() or 1)
+    if todo:
+        chunk = max(1, len(todo) // (workers * 8))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for rel, entry, grid in pool.map(_scan_file, todo, chunksize=chunk):
+                files[rel] = entry
+                if grid is not None and entry.get("grid"):
+                    grids.setdefault(entry["grid"], grid)
+
+    used = {e.get("grid") for e in files.values()}
+    grids = {k: v for k, v in grids.items() if k in used}
+    data = {
+        "version": CATALOG_VERSION,
+        "root": root,
+        "built_utc": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "grids": grids,
+        "files": dict(sorted(files.items())),
+    }
+    out = catalog_path(root, cache=cache)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    # Unique temp file: concurrent builders (e.g. parallel pre-flights) must not share one.
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(out) + ".", suffix=".tmp", dir=os.path.dirname(out))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, out)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    _CATALOGS.clear()
+    counts = {
+        "files": len(files),
+        "scanned": len(todo),
+        "reused": len(files) - len(todo),
+        "removed": len(set(old_files) - set(files)),
+        "errors": sum(1 for e in files.values() if "error" in e),
+    }
+    return ForcingCatalog(root, data), counts
+
+
+def catalog_path(root: str, *, cache: bool = False) -> str:
+    """
+    <root>/.forcing_catalog.json, or a per-user cache file when the archive is read-only
+    (shared data disks) or `cache` is set: $XDG_CACHE_HOME/shudnc/forcing_catalog-<hash of root>.json.
+    """
+    root = os.path.abspath(root)
+    local = os.path.join(root, CATALOG_NAME)
+    if not cache and (os.path.exists(local) or os.access(root, os.W_OK)):
+        return local
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    digest = hashlib.sha1(root.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache, "shudnc", f"forcing_catalog-{digest}.json")
+
+
+_CATALOGS: Dict[str, Optional[ForcingCatalog]] = {}
+
+
+def catalog_for(path: str) -> Optional[ForcingCatalog]:
+    """
+    The catalog of the nearest directory at or above `path` that has one, in the data root or
+    the per-user cache (cached per process).
+    """
+    d = os.path.abspath(path)
+    if not os.path.isdir(d):
+        d = os.path.dirname(d)
+    seen: List[str] = []
+    while True:
+        if d in _CATALOGS:
+            cat = _CATALOGS[d]
+            break
+        seen.append(d)
+        found = [c for c in (False, True) if os.path.exists(catalog_path(d, cache=c))]
+        if found:
+            cat = ForcingCatalog.load(d, cache=found[0])
+            break
+        parent = os.path.dirname(d)
+        if parent == d:
+            cat = None
+            break
+        d = parent
+    for s in seen:
+        _CATALOGS[s] = cat
+    return cat
+
+
+# Record step (minutes) of each product as read by SHUD's NetCDF forcing provider, and whether the record
+# at the window end is read as well (ERA5 accumulated fields use the forward difference A[k+1] - A[k]).
+PRODUCT_STEPS: Dict[str, Tuple[float, bool]] = {
+    "CMFD2": (180.0, False),
+    "ERA5": (60.0, True),
+    "GLDAS": (180.0, False),
+}
+
+
+def format_layout(pattern: str, t: dt.datetime, *, var_lower: str = "") -> str:
+    """Expand adapter layout tokens ({year} {yyyy} {doy} {yyyymm} {yyyymmdd} {hhmm} {var_lower}) at time t."""
+    return (
+        pattern.replace("{var_lower}", var_lower)
+        .replace("{yyyymmdd}", t.strftime("%Y%m%d"))
+        .replace("{yyyymm}", t.strftime("%Y%m"))
+        .replace("{year}", f"{t.year:04d}")
+        .replace("{yyyy}", f"{t.year:04d}")
+        .replace("{doy}", f"{t.timetuple().tm_yday:03d}")
+        .replace("{hhmm}", t.strftime("%H%M"))
+    )
+
+
+def _entry_times(entry: Dict[str, Any]) -> List[int]:
+    t = entry.get("time") or {}
+    if "values" in t:
+        vals = t["values"]
+    elif int(t.get("n", 0)) > 1:
+        vals = [t["start"] + i * t["step"] for i in range(int(t["n"]))]
+    elif "start" in t:
+        vals = [t["start"]]
+    else:
+        vals = []
+    return [int(round(v)) for v in vals]
+
+
+def station_cells(
+    path: str,
+    stations: Sequence[Tuple[float, float]],
+    var_names: Sequence[str],
+) -> List[Dict[str, Any]]:
+    """
+    Nearest grid cell of each (lon, lat) station in `path`, whether the station lies inside the grid
+    (half a cell of padding; one cell spacing on curvilinear grids) and which variables are
+    fill/NaN there at the first record.
+    """
+    netCDF4 = _require_netCDF4()
+    import numpy as np  # type: ignore
+
+    with netCDF4.Dataset(path, "r") as ds:
+        lat = _coord(ds, LAT_NAMES)
+        lon = _coord(ds, LON_NAMES)
+        if lat is None or lon is None:
+            raise ValueError(f"No lat/lon coordinate variables in {path}")
+        grid, lat_dim, lon_dim = read_grid(ds, lat[0], lon[0])
+        xs = np.array([float(x) for x, _ in stations], dtype=float)
+        ys = np.array([float(y) for _, y in stations], dtype=float)
+        ilat, ilon = grid.nearest(xs, ys)
+        inside = grid.inside(xs, ys)
+
+        out: List[Dict[str, Any]] = [
+            {
+                "station": i,
+                "lon": float(xs[i]),
+                "lat": float(ys[i]),
+                "ilat": int(ilat[i]),
+                "ilon": int(ilon[i]),
+                "inside": bool(inside[i]),
+                "invalid_vars": [],
+            }
+            for i in range(xs.size)
+        ]
+        if not out:
+            return out
+
+        # One bounding-box read per variable at the first record.
+        lat_lo = min(r["ilat"] for r in out)
+        lat_hi = max(r["ilat"] for r in out)
+        lon_lo = min(r["ilon"] for r in out)
+        lon_hi = max(r["ilon"] for r in out)
+        for v in var_names:
+            if v not in ds.variables:
+                continue
+            var = ds.variables[v]
+            index = tuple(
+                slice(lat_lo, lat_hi + 1) if d == lat_dim else slice(lon_lo, lon_hi + 1) if d == lon_dim else 0
+                for d in var.dimensions
+            )
+            block = np.ma.filled(np.ma.asarray(var[index], dtype=float), np.nan)
+            for r in out:
+                if not np.isfinite(block[r["ilat"] - lat_lo, r["ilon"] - lon_lo]):
+                    r["invalid_vars"].append(v)
+    return out
+
+
+def required_records(product: str, t_start: dt.datetime, t_end: dt.datetime) -> Tuple[float, List[int]]:
+    """(record step, record times in epoch minutes) SHUD reads from `product` for [t_start, t_end]."""
+    product = product.upper()
+    if product not in PRODUCT_STEPS:
+        raise ValueError(f"Unknown forcing product {product!r} (known: {', '.join(sorted(PRODUCT_STEPS))})")
+    step, read_end = PRODUCT_STEPS[product]
+    k0 = int(epoch_min(t_start) // step)
+    k1 = int(-(-epoch_min(t_end) // step)) - (0 if read_end else 1)
+    return step, [int(round(k * step)) for k in range(k0, max(k0, k1) + 1)]
+
+
+def layout_streams(
+    var_names: Dict[str, str], var_dirs: Optional[Dict[str, str]] = None
+) -> Dict[str, Tuple[str, List[str]]]:
+    """stream -> (directory, variables): one per variable directory (CMFD2), else a single stream '*'."""
+    streams: Dict[str, Tuple[str, List[str]]] = {}
+    if var_dirs:
+        for key, vdir in sorted(var_dirs.items()):
+            vname = var_names.get(key)
+            if vname:
+                streams[key] = (vdir, [vname])
+    else:
+        streams["*"] = ("", sorted(set(var_names.values())))
+    return streams
+
+
+def resolve_layout(
+    root: str,
+    file_pattern: str,
+    records: Sequence[int],
+    streams: Dict[str, Tuple[str, List[str]]],
+    *,
+    per_var: bool,
+    year_subdir: bool,
+) -> Dict[str, Dict[str, List[str]]]:
+    """stream -> {layout path (possibly a glob): matching root-relative files} over the given records."""
+    resolved: Dict[str, Dict[str, List[str]]] = {}
+    for name, (vdir, vnames) in streams.items():
+        seen: Dict[str, None] = {}
+        for tm in records:
+            t = from_epoch_min(tm)
+            rel = format_layout(file_pattern, t, var_lower=vnames[0].lower() if per_var else "")
+            if year_subdir:
+                rel = f"{t.year:04d}/{rel}"
+            seen[f"{vdir}/{rel}" if vdir else rel] = None
+        res: Dict[str, List[str]] = {}
+        for rel in seen:
+            full = os.path.join(root, rel)
+            if any(ch in rel for ch in "*?["):
+                res[rel] = sorted(os.path.relpath(p, root).replace(os.sep, "/") for p in glob.glob(full))
+            else:
+                res[rel] = [rel] if os.path.isfile(full) else []
+        resolved[name] = res
+    return resolved
+
+
+def preflight(
+    data_root: str,
+    *,
+    product: str,
+    file_pattern: str,
+    t_start: dt.datetime,
+    t_end: dt.datetime,
+    var_names: Dict[str, str],
+    var_dirs: Optional[Dict[str, str]] = None,
+    year_subdir: bool = False,
+    stations: Sequence[Tuple[float, float]] = (),
+    jobs: int = 0,
+    cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Check that a product's files cover every record SHUD reads in [t_start, t_end].
+
+    Files are derived from the adapter layout; their time axes come from the catalog, which is
+    refreshed (in parallel) only for the files of this window; by default it lives in the
+    per-user cache so a check never writes into the data root. Products with per-variable
+    directories (CMFD2) are checked per variable. Returns missing/ambiguous/unreadable files,
+    missing variables, missing and duplicated record times (epoch minutes) per stream, and the
+    station grid cells of the first file.
+    """
+    product = product.upper()
+    step, required = required_records(product, t_start, t_end)
+    root = os.path.abspath(data_root)
+    streams = layout_streams(var_names, var_dirs)
+    resolved = resolve_layout(
+        root, file_pattern, required, streams, per_var=bool(var_dirs), year_subdir=year_subdir
+    )
+    present = [r for res in resolved.values() for m in res.values() for r in m]
+
+    cat, counts = build_catalog(root, jobs=jobs, only=present, cache=cache)
+
+    report: Dict[str, Any] = {
+        "product": product,
+        "step_min": step,
+        "window": [epoch_min(t_start), epoch_min(t_end)],
+        "records": len(required),
+        "scanned": counts["scanned"],
+        "streams": {},
+        "stations": [],
+    }
+    required_set = set(required)
+    first_file: Dict[str, str] = {}
+    for name, res in resolved.items():
+        vnames = streams[name][1]
+        hits: Dict[int, int] = {}
+        st = {
+            "files": 0,
+            "missing_files": [r for r, m in res.items() if not m],
+            "ambiguous": [r for r, m in res.items() if len(m) > 1],
+            "unreadable": [],
+            "missing_vars": [],
+        }
+        for rel in dict.fromkeys(r for m in res.values() for r in m):
+            e = cat.files.get(rel)
+            if e is None:
+                continue
+            st["files"] += 1
+            if "error" in e:
+                st["unreadable"].append(f"{rel}: {e['error']}")
+                continue
+            first_file.setdefault(name, os.path.join(root, rel))
+            lacking = [v for v in vnames if v not in e.get("vars", [])]
+            if lacking:
+                st["missing_vars"].append(f"{rel}: {', '.join(lacking)}")
+            for tm in _entry_times(e):
+                if tm in required_set:
+                    hits[tm] = hits.get(tm, 0) + 1
+        st["missing_times"] = [tm for tm in required if tm not in hits]
+        st["duplicate_times"] = sorted(tm for tm, c in hits.items() if c > 1)
+        report["streams"][name] = st
+
+    if stations:
+        for name, path in sorted(first_file.items()):
+            for r in station_cells(path, stations, streams[name][1]):
+                r["stream"] = name
+                r["file"] = os.path.relpath(path, root)
+                report["stations"].append(r)
+    return report
+
+
+def time_ranges(times: Sequence[int], step: float) -> List[Tuple[int, int]]:
+    """Collapse sorted record times into [first, last] runs of consecutive records."""
+    out: List[Tuple[int, int]] = []
+    for tm in times:
+        if out and tm - out[-1][1] <= step + 1e-6:
+            out[-1] = (out[-1][0], tm)
+        else:
+            out.append((tm, tm))
+    return out
+
+
+def _print_coverage(cat: ForcingCatalog, product: str) -> None:
+    cov = cat.coverage(product)
+    print(f"- {product}: files={cov['files']} archives={len(cov['archives'])}")
+    for a in cov["archives"]:
+        step = a["step_min"]
+        grid = a["grid"] or "-"
+        print(f"  {a['dir']} (grid {grid}): files={a['files']} step={'-' if step is None else f'{step:g} min'}")
+        if a["vars"]:
+            print(f"    vars: {', '.join(a['vars'])}")
+        for x, y in a["spans"]:
+            print(f"    covered: {_fmt_time(x)} .. {_fmt_time(y)}")
+        for x, y in a["gaps"][:20]:
+            print(f"    GAP:     {_fmt_time(x)} .. {_fmt_time(y)}")
+        if len(a["gaps"]) > 20:
+            print(f"    ... {len(a['gaps']) - 20} more gaps")
+        for d in a["duplicates"][:5]:
+            files = " / ".join(os.path.relpath(p, cat.root) for p in d["files"])
+            print(f"    DUPLICATE at {_fmt_time(d['time'])}: {files}")
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description="Forcing archive catalog (header-only NetCDF index)")
+    sub = ap.add_subparsers(dest="action", required=True)
+    b = sub.add_parser("build", help="Create or incrementally refresh <data_root>/.forcing_catalog.json")
+    b.add_argument("data_root", help="Forcing archive root (e.g. Data/Forcing or Data/Forcing/GLDAS)")
+    b.add_argument("--product", default="", help="Force the product label for every file (default: from file name)")
+    b.add_argument("--jobs", type=int, default=0, help="Worker processes (default: CPU count)")
+    b.add_argument("--full", action="store_true", help="Rescan every file instead of refreshing incrementally")
+    s = sub.add_parser("show", help="Print per-product coverage from an existing catalog")
+    s.add_argument("data_root", help="Forcing archive root (or any path below it)")
+    s.add_argument("--product", default="", help="Only this product")
+    s.add_argument("--json", action="store_true", help="Print coverage as JSON")
+
+    args = ap.parse_args(list(argv))
+    if args.action == "build":
+        t0 = time.perf_counter()
+        cat, counts = build_catalog(args.data_root, product=args.product, jobs=args.jobs, full=args.full)
+        wall = time.perf_counter() - t0
+        print("== Forcing catalog ==")
+        print(
+            f"- files={counts['files']} scanned={counts['scanned']} reused={counts['reused']} "
+            f"removed={counts['removed']} errors={counts['errors']} ({wall:.2f}s)"
+        )
+        for p in cat.products():
+            _print_coverage(cat, p)
+        for rel, e in cat.files.items():
+            if "error" in e:
+                _eprint(f"WARNING: unreadable: {rel}: {e['error']}")
+        print(f"Wrote: {catalog_path(cat.root)}")
+        return 0
+
+    cat = catalog_for(args.data_root)
+    if cat is None:
+        _eprint(f"ERROR: no forcing catalog at or above {os.path.abspath(args.data_root)}; run `build` first")
+        return 2
+    products = [args.product.upper()] if args.product else cat.products()
+    if args.json:
+        print(json.dumps({p: cat.coverage(p) for p in products}, indent=2))
+        return 0
+    print(f"== Forcing catalog: {cat.root} (built {cat.built_utc}) ==")
+    for p in products:
+        _print_coverage(cat, p)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Raw forcing product values -> SHUD's 5 forcing variables, driven by the adapter YAMLs.
+
+The `conversion:` block of configs/forcing/<product>.yaml defines, per SHUD variable, the
+expression applied to the raw product variables (the keys of `netcdf.var_names`):
+
+  precip:      to_mm_per_day (or to_mm_per_day_if_units_<kind>, picked from the precip units
+               attribute; CMFD2 honours cfg.forcing CMFD_PRECIP_UNITS), min_mm_per_day
+  temperature: to_celsius
+  rh:          formula (RH %) + clamp_percent_max + to_ratio, or method: dewpoint + dewpoint_celsius
+  wind:        to_m_per_s
+  rn:          to_w_per_m2
+
+Expressions are arithmetic (+ - * /, abs/exp/sqrt) over the raw variables, `dt_sec` and, for
+accumulated fields, `<var>_inc_<unit>`: the reset-tolerant forward difference of <var> over
+[t_k, t_k+1), with the absolute tolerance from `conversion.accumulated.<var>`.
+
+Conversion.convert() takes raw arrays of any shape (keyed by upper-case var key, as in
+cfg.forcing NC_VAR_* and station cubes) and applies SHUD's NetcdfForcingProvider clamps and
+quantization elementwise, so generators and comparators share one vectorized path. With
+accumulated fields the last axis is time: inputs carry n+1 boundary records, outputs n steps.
+"""
+
+from __future__ import annotations
+
+import ast
+import dataclasses
+import functools
+import operator
+import os
+import re
+import sys
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+VARS = ("prec", "temp", "rh", "wind", "rn")  # mm/day, C, 0-1, m/s, W/m2
+ADAPTER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "configs", "forcing")
+ACC_REL_TOL = 1e-4  # relative part of the accumulated-field reset tolerance (SHUD)
+
+_BINOPS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+_FUNCS = ("abs", "exp", "sqrt")
+_INC_RE = re.compile(r"^([A-Za-z0-9]+)_inc(?:_\w+)?$")
+
+# Precip units assumed when the variable has no `units` attribute (GLDAS Rainf_f_tavg is a flux).
+DEFAULT_PRECIP_UNITS = {"GLDAS": "kg m-2 s-1"}
+_WARNED: set = set()
+
+
+def _warn_once(msg: str) -> None:
+    if msg not in _WARNED:
+        _WARNED.add(msg)
+        print(f"WARNING: {msg}", file=sys.stderr)
+
+
+def _require_yaml() -> Any:
+    try:
+        import yaml  # type: ignore
+
+        return yaml
+    except Exception as e:
+        raise RuntimeError(
+            "Python package 'PyYAML' is required to read forcing adapters.\n"
+            "Install:\n"
+            "  python3 -m pip install pyyaml\n"
+        ) from e
+
+
+@dataclasses.dataclass(frozen=True)
+class Expr:
+    """A parsed adapter expression; evaluated on numpy arrays, in Python's operator order."""
+
+    text: str
+    tree: Any
+    names: Tuple[str, ...]
+
+    @classmethod
+    def parse(cls, text: Any, *, where: str) -> "Expr":
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError(f"Missing expression for adapter {where}")
+        try:
+            tree = ast.parse(text.strip(), mode="eval").body
+        except SyntaxError as e:
+            raise ValueError(f"Invalid expression for adapter {where}: {text!r}") from e
+        names: list = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCS or len(node.args) != 1 or node.keywords:
+                    raise ValueError(f"Unsupported call in adapter {where}: {text!r} (allowed: {', '.join(_FUNCS)})")
+            elif isinstance(node, ast.Name):
+                if node.id not in _FUNCS and node.id not in names:
+                    names.append(node.id)
+            elif isinstance(node, ast.BinOp):
+                if type(node.op) not in _BINOPS:
+                    raise ValueError(f"Unsupported operator in adapter {where}: {text!r}")
+            elif isinstance(node, ast.UnaryOp):
+                if not isinstance(node.op, (ast.USub, ast.UAdd)):
+                    raise ValueError(f"Unsupported operator in adapter {where}: {text!r}")
+            elif isinstance(node, ast.Constant):
+                if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                    raise ValueError(f"Unsupported constant in adapter {where}: {text!r}")
+            elif not isinstance(node, (ast.operator, ast.unaryop, ast.Load)):
+                raise ValueError(f"Unsupported syntax in adapter {where}: {text!r}")
+        return cls(text=text.strip(), tree=tree, names=tuple(names))
+
+    def __call__(self, env: Mapping[str, Any]) -> Any:
+        return _eval(self.tree, env)
+
+
+def _eval(node: Any, env: Mapping[str, Any]) -> Any:
+    import numpy as np  # type: ignore
+
+    if isinstance(node, ast.BinOp):
+        return _BINOPS[type(node.op)](_eval(node.left, env), _eval(node.right, env))
+    if isinstance(node, ast.UnaryOp):
+        v = _eval(node.operand, env)
+        return -v if isinstance(node.op, ast.USub) else v
+    if isinstance(node, ast.Constant):
+        return float(node.value)
+    if isinstance(node, ast.Name):
+        return env[node.id]
+    fn = {"abs": np.abs, "exp": np.exp, "sqrt": np.sqrt}[node.func.id]
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        return fn(_eval(node.args[0], env))
+
+
+def _round(x: Any, ndigits: int) -> Any:
+    import numpy as np  # type: ignore
+
+    # np.round is rint(x*10^n)/10^n, as SHUD's nearbyint; where x*10^n lands within
+    # float error of a half, defer to Python round (correctly rounded, ties-to-even)
+    # so results stay bit-identical to the scalar quantization.
+    out = np.asarray(np.round(x, ndigits))
+    y = x * (10.0**ndigits)
+    with np.errstate(invalid="ignore"):
+        near = np.abs(np.abs(y - np.trunc(y)) - 0.5) < 1e-6
+    if near.any():
+        out[near] = [round(float(v), ndigits) for v in x[near]]
+    return out
+
+
+def _finite(x: Any) -> Any:
+    import numpy as np  # type: ignore
+
+    x = np.asarray(x, dtype=float)
+    return np.where(np.isfinite(x), x, 0.0)
+
+
+# Quantization of the 5 SHUD forcing variables (elementwise over arrays of any shape).
+def _quantize_prec_mm_day(x: Any, min_mm_day: float = 0.0001) -> Any:
+    import numpy as np  # type: ignore
+
+    x = _finite(x)
+    x = _round(np.where(x < 0.0, 0.0, x), 4)
+    return np.where(x < min_mm_day, 0.0, x)
+
+
+def _quantize_temp_c(x: Any) -> Any:
+    return _round(_finite(x), 2)
+
+
+def _quantize_rh_1(x: Any) -> Any:
+    import numpy as np  # type: ignore
+
+    # + 0.0 folds -0.0 to 0.0, as max(0.0, -0.0) does for scalars.
+    x = _round(np.clip(_finite(x), 0.0, 1.0) + 0.0, 4)
+    return np.clip(x, 0.0, 1.0)
+
+
+def _quantize_wind_ms(x: Any) -> Any:
+    import numpy as np  # type: ignore
+
+    x = _round(np.abs(_finite(x)), 2)
+    return np.where(x < 0.05, 0.05, x)
+
+
+def _quantize_rn_wm2(x: Any) -> Any:
+    import numpy as np  # type: ignore
+
+    x = _finite(x)
+    return _round(np.where(x < 0.0, 0.0, x), 0)
+
+
+def _rh_from_dewpoint(*, temp_c: Any, dew_c: Any) -> Any:
+    import numpy as np  # type: ignore
+
+    # Same as SHUD NetcdfForcingProvider (ERA5):
+    #   es = 6.112 * exp(17.67*T /(T + 243.5)), ea likewise from Td, rh = clamp(ea/es, 0, 1)
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        es = 6.112 * np.exp(17.67 * temp_c / (temp_c + 243.5))
+        ea = 6.112 * np.exp(17.67 * dew_c / (dew_c + 243.5))
+        ok = np.isfinite(es) & (es > 0.0) & np.isfinite(ea)
+        rh = np.where(ok, ea / np.where(ok, es, 1.0), 0.0)
+    return np.clip(_finite(rh), 0.0, 1.0)
+
+
+def _increment(acc: Any, *, abs_tol: float) -> Any:
+    import numpy as np  # type: ignore
+
+    # Forward difference of an accumulated field along the last axis (n+1 -> n).
+    # A drop beyond the tolerance is an accumulation reset (stitched forecast cycles): the
+    # increment is then the post-reset value itself; smaller drops are float noise.
+    a0 = acc[..., :-1]
+    a1 = acc[..., 1:]
+    d = a1 - a0
+    tol = np.maximum(abs_tol, ACC_REL_TOL * np.maximum(np.abs(a0), np.abs(a1)))
+    return np.where(d >= -tol, np.maximum(0.0, d), np.maximum(0.0, a1))
+
+
+def precip_units_kind(units: str) -> str:
+    """KG_M2_S, MM_S, MM_HR, MM_DAY or UNKNOWN from a precip `units` attribute."""
+    u = units.strip().lower()
+    if "kg" in u and ("m-2" in u or "m**-2" in u) and ("s-1" in u or "s**-1" in u):
+        return "KG_M2_S"
+    if "mm" in u and ("hr" in u or "h-1" in u or "h**-1" in u):
+        return "MM_HR"
+    if "mm" in u and ("s-1" in u or "s**-1" in u):
+        return "MM_S"
+    if "mm" in u and ("day" in u or "d-1" in u or "d**-1" in u):
+        return "MM_DAY"
+    return "UNKNOWN"
+
+
+def _cmfd_precip_units_override(raw: str) -> str:
+    # Mirror NetcdfForcingProvider's CMFD_PRECIP_UNITS override behavior ("" = auto).
+    raw = raw.strip().upper()
+    if not raw or raw == "AUTO":
+        return ""
+    if raw == "KG_M2_S":
+        return "KG_M2_S"
+    if raw in ("MM_HR", "MM/HR", "MM_H-1"):
+        return "MM_HR"
+    if raw in ("MM_DAY", "MM/DAY", "MM_D-1"):
+        return "MM_DAY"
+    raise ValueError(f"Invalid CMFD_PRECIP_UNITS override: {raw!r}")
+
+
+@dataclasses.dataclass(frozen=True)
+class Conversion:
+    product: str
+    precip: Dict[str, Expr]  # units kind -> mm/day expression ("" = regardless of units)
+    precip_var: str  # raw key whose units attribute selects the precip expression
+    min_mm_per_day: float
+    temp: Expr
+    rh_method: str  # "formula" | "dewpoint"
+    rh: Expr  # RH % (formula) or dewpoint in C (dewpoint)
+    rh_clamp_percent: float
+    rh_ratio: Optional[Expr]
+    wind: Expr
+    rn: Expr
+    accumulated: Dict[str, float]  # raw key -> absolute reset tolerance
+    increments: Dict[str, str]  # expression name (e.g. tp_inc_m) -> raw key
+
+    @property
+    def inputs(self) -> Tuple[str, ...]:
+        """Raw variable keys the conversion reads (upper-case)."""
+        keys: list = []
+        for e in self._exprs():
+            for n in e.names:
+                k = self.increments.get(n, "" if n in ("dt_sec", "rh_percent") else n.upper())
+                if k and k not in keys:
+                    keys.append(k)
+        return tuple(keys)
+
+    def _exprs(self) -> Tuple[Expr, ...]:
+        extra = (self.rh_ratio,) if self.rh_ratio is not None else ()
+        return tuple(self.precip.values()) + (self.temp, self.rh, self.wind, self.rn) + extra
+
+    def precip_kind(self, units: str, forcing_cfg: Optional[Mapping[str, str]] = None) -> str:
+        if "" in self.precip:
+            return ""
+        kind = ""
+        if self.product == "CMFD2" and forcing_cfg is not None:
+            kind = _cmfd_precip_units_override(forcing_cfg.get("CMFD_PRECIP_UNITS", ""))
+        kind = kind or precip_units_kind(units)
+        if not units.strip() and kind not in self.precip and self.product in DEFAULT_PRECIP_UNITS:
+            units = DEFAULT_PRECIP_UNITS[self.product]
+            kind = precip_units_kind(units)
+            _warn_once(f"{self.product} precip has no units attribute; assuming {units}")
+        if kind not in self.precip:
+            raise ValueError(f"unknown {self.product} precip units: {units!r}")
+        return kind
+
+    def convert(
+        self,
+        raw: Mapping[str, Any],
+        *,
+        units: Optional[Mapping[str, str]] = None,
+        forcing_cfg: Optional[Mapping[str, str]] = None,
+        dt_sec: Any = None,
+    ) -> Dict[str, Any]:
+        """
+        Raw values (upper-case var key -> array) -> {prec, temp, rh, wind, rn} arrays.
+
+        `units` gives the units attribute of raw variables (the precip one selects the unit
+        conversion). With accumulated fields, raw arrays have n+1 records on the last axis
+        (instantaneous ones may have n) and `dt_sec` (broadcastable to the n steps) is required.
+        """
+        import numpy as np  # type: ignore
+
+        def get(key: str) -> Any:
+            if key not in raw:
+                raise ValueError(f"missing raw variable {key} for {self.product} conversion")
+            return np.asarray(raw[key], dtype=float)
+
+        env: Dict[str, Any] = {}
+        n = -1
+        if self.accumulated:
+            n = min(get(k).shape[-1] for k in self.accumulated) - 1
+            dt = np.asarray(dt_sec, dtype=float)
+            if dt_sec is None or not bool(np.all(np.isfinite(dt) & (dt > 0.0))):
+                raise ValueError(f"invalid dt_sec for {self.product} increment: {dt_sec}")
+            env["dt_sec"] = dt
+        for e in self._exprs():
+            for name in e.names:
+                if name in env or name == "rh_percent":
+                    continue
+                if name in self.increments:
+                    key = self.increments[name]
+                    env[name] = _increment(get(key), abs_tol=self.accumulated[key])
+                else:
+                    x = get(name.upper())
+                    env[name] = x[..., :n] if n >= 0 else x
+
+        kind = self.precip_kind((units or {}).get(self.precip_var, ""), forcing_cfg)
+        prec = _quantize_prec_mm_day(self.precip[kind](env), self.min_mm_per_day)
+        # Temp is quantized to 2 decimals before the dewpoint RH calc (match SHUD).
+        temp = _quantize_temp_c(self.temp(env))
+        if self.rh_method == "dewpoint":
+            rh = _rh_from_dewpoint(temp_c=temp, dew_c=self.rh(env))
+        else:
+            with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+                rh_percent = np.clip(self.rh(env), 0.0, self.rh_clamp_percent)
+            rh = self.rh_ratio({**env, "rh_percent": rh_percent}) if self.rh_ratio is not None else rh_percent
+        return {
+            "prec": prec,
+            "temp": temp,
+            "rh": _quantize_rh_1(rh),
+            "wind": _quantize_wind_ms(self.wind(env)),
+            "rn": _quantize_rn_wm2(self.rn(env)),
+        }
+
+
+def conversion_from_adapter(adapter: Mapping[str, Any], *, product: str = "") -> Conversion:
+    """Build the Conversion described by an adapter YAML mapping (see module docstring)."""
+    product = (product or str(adapter.get("name", ""))).strip().upper()
+    conv = adapter.get("conversion") or {}
+    var_names = (adapter.get("netcdf") or {}).get("var_names") or {}
+    if not isinstance(conv, dict) or not isinstance(var_names, dict) or not var_names:
+        raise ValueError(f"Adapter for {product} needs netcdf.var_names and a conversion mapping")
+    raw_keys = {str(k).upper() for k in var_names}
+
+    def section(name: str) -> Dict[str, Any]:
+        sec = conv.get(name)
+        if not isinstance(sec, dict):
+            raise ValueError(f"Adapter for {product} is missing conversion.{name}")
+        return sec
+
+    def expr(sec: str, key: str) -> Expr:
+        return Expr.parse(section(sec).get(key), where=f"{product} conversion.{sec}.{key}")
+
+    precip_sec = section("precip")
+    precip: Dict[str, Expr] = {}
+    if "to_mm_per_day" in precip_sec:
+        precip[""] = expr("precip", "to_mm_per_day")
+    prefix = "to_mm_per_day_if_units_"
+    for key in precip_sec:
+        if str(key).startswith(prefix):
+            precip[str(key)[len(prefix) :].upper()] = expr("precip", str(key))
+    if not precip:
+        raise ValueError(f"Adapter for {product} has no conversion.precip.to_mm_per_day[_if_units_<kind>]")
+    precip_var = ""
+    if "" not in precip:
+        names = [n.upper() for e in precip.values() for n in e.names if n.upper() in raw_keys]
+        if not names:
+            raise ValueError(f"Adapter for {product}: conversion.precip reads no raw variable")
+        precip_var = names[0]
+
+    rh_sec = section("rh")
+    rh_ratio: Optional[Expr] = None
+    if str(rh_sec.get("method", "")).strip().lower() == "dewpoint":
+        rh_method = "dewpoint"
+        rh = expr("rh", "dewpoint_celsius")
+    else:
+        rh_method = "formula"
+        rh = expr("rh", "formula")
+        if "to_ratio" in rh_sec:
+            rh_ratio = expr("rh", "to_ratio")
+
+    temp = expr("temperature", "to_celsius")
+    wind = expr("wind", "to_m_per_s")
+    rn = expr("rn", "to_w_per_m2")
+
+    # Resolve expression names: raw vars, <var>_inc_<unit> increments, dt_sec, rh_percent.
+    acc_tol = {str(k).upper(): v for k, v in (conv.get("accumulated") or {}).items()}
+    accumulated: Dict[str, float] = {}
+    increments: Dict[str, str] = {}
+    for e in list(precip.values()) + [temp, rh, wind, rn] + ([rh_ratio] if rh_ratio is not None else []):
+        for name in e.names:
+            if name == "dt_sec" or (name == "rh_percent" and e is rh_ratio) or name.upper() in raw_keys:
+                continue
+            m = _INC_RE.match(name)
+            if m is None or m.group(1).upper() not in raw_keys:
+                raise ValueError(f"Unknown name {name!r} in adapter {product} conversion: {e.text!r}")
+            key = m.group(1).upper()
+            tol = acc_tol.get(key)
+            if not isinstance(tol, (int, float)) or isinstance(tol, bool):
+                raise ValueError(f"Adapter for {product} needs conversion.accumulated.{m.group(1)} (reset tolerance)")
+            increments[name] = key
+            accumulated[key] = float(tol)
+
+    return Conversion(
+        product=product,
+        precip=precip,
+        precip_var=precip_var,
+        min_mm_per_day=float(precip_sec.get("min_mm_per_day", 0.0001)),
+        temp=temp,
+        rh_method=rh_method,
+        rh=rh,
+        rh_clamp_percent=float(rh_sec.get("clamp_percent_max", 100.0)),
+        rh_ratio=rh_ratio,
+        wind=wind,
+        rn=rn,
+        accumulated=accumulated,
+        increments=increments,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def conversion_for(product: str, adapter_path: str = "") -> Conversion:
+    """Conversion for PRODUCT from `adapter_path` (default: configs/forcing/<product>.yaml)."""
+    product = product.strip().upper()
+    path = adapter_path or os.path.join(ADAPTER_DIR, f"{product.lower()}.yaml")
+    if not os.path.isfile(path):
+        raise ValueError(f"No forcing adapter for PRODUCT={product!r}: {path}")
+    yaml = _require_yaml()
+    with open(path, "r", encoding="utf-8") as f:
+        adapter = yaml.safe_load(f)
+    if not isinstance(adapter, dict):
+        raise ValueError(f"Adapter YAML root must be a mapping: {path}")
+    return conversion_from_adapter(adapter, product=product)
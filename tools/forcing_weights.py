@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Interpolation weights from a forcing grid to target points (stations, element centroids).
+
+Every method yields a sparse (targets x grid cells) matrix, stored row-wise with a fixed
+number of entries per target (ELL layout: `cols`/`w` arrays of shape (n_targets, K),
+unused entries have w=0). Applying it to a grid record is a gather + weighted sum, vectorized
+over time and targets, on the cropped slab that covers the weighted cells:
+
+  - nearest:  one-hot weights on the nearest cell (tools/grid_index.py: SHUD's per-axis
+              argmin on regular grids, a KD-tree on curvilinear 2-D lat/lon grids), with
+              SHUD's GLDAS remap off invalid cells when a validity mask is given;
+              values are bit-identical to direct nearest-cell reads
+  - bilinear: the 4 cells around the point (edges clamp; global longitude grids wrap)
+  - area:     overlap of a target box (default: one grid cell, centred on the point) with the
+              grid cells, weighted by cos(latitude)
+
+bilinear and area need a regular grid (1-D lat/lon coordinates).
+
+With a validity mask, bilinear/area weights on invalid cells are dropped and the rest
+renormalized; targets left without a valid cell fall back to the remapped nearest cell.
+
+Weights depend only on the grid, the mask, the targets and the method, and are cached as
+.npz under $XDG_CACHE_HOME/shudnc/weights/ (default ~/.cache), keyed by a hash of those.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import os
+from typing import Any, Optional, Sequence, Tuple
+
+from grid_index import GridIndex, cache_root, grid_index, lon_frame
+
+METHODS = ("nearest", "bilinear", "area")
+REMAP_MAX_R = 10  # cells; matches SHUD's GLDAS water-mask remap
+
+
+@dataclasses.dataclass
+class GridWeights:
+    method: str
+    nlat: int
+    nlon: int
+    cols: Any  # int64 (n, K): flat cell index ilat * nlon + ilon
+    w: Any  # float64 (n, K)
+
+    @property
+    def n(self) -> int:
+        return int(self.cols.shape[0])
+
+    def dominant(self) -> Tuple[Any, Any]:
+        """(ilat, ilon) of each target's largest weight (the cell itself for nearest)."""
+        import numpy as np  # type: ignore
+
+        c = self.cols[np.arange(self.n), np.argmax(self.w, axis=1)]
+        return c // self.nlon, c % self.nlon
+
+    def box(self, rows: Optional[Sequence[int]] = None) -> Tuple[int, int, int, int]:
+        """(lat_lo, lat_hi, lon_lo, lon_hi), inclusive, covering the weighted cells of `rows`."""
+        import numpy as np  # type: ignore
+
+        cols = self.cols if rows is None else self.cols[list(rows)]
+        w = self.w if rows is None else self.w[list(rows)]
+        c = cols[w > 0]
+        k, j = c // self.nlon, c % self.nlon
+        return int(k.min()), int(k.max()), int(j.min()), int(j.max())
+
+    def local(self, box: Tuple[int, int, int, int], rows: Sequence[int]) -> Tuple[Any, Any]:
+        """(cols, w) of `rows` as flat indices into the box's (lat, lon) slab."""
+        import numpy as np  # type: ignore
+
+        lat_lo, _, lon_lo, lon_hi = box
+        cols = self.cols[list(rows)]
+        w = self.w[list(rows)]
+        k = cols // self.nlon - lat_lo
+        j = cols % self.nlon - lon_lo
+        local = np.where(w > 0, k * (lon_hi - lon_lo + 1) + j, 0)
+        return local.astype(np.int64), w
+
+    def select(self, rows: Sequence[int]) -> "GridWeights":
+        return dataclasses.replace(self, cols=self.cols[list(rows)], w=self.w[list(rows)])
+
+    def unique(self) -> Tuple[Any, Any]:
+        """(first row of each distinct weight row, index of every target's distinct row).
+
+        Targets with identical weights (for nearest: in the same cell) get identical series,
+        so only the first row of each needs extracting.
+        """
+        import numpy as np  # type: ignore
+
+        key = np.concatenate([self.cols.astype(np.float64), self.w], axis=1)
+        _, first, inverse = np.unique(key, axis=0, return_index=True, return_inverse=True)
+        order = np.argsort(first)  # keep distinct rows in target order
+        rank = np.empty_like(order)
+        rank[order] = np.arange(order.size)
+        return first[order], rank[np.asarray(inverse).ravel()]
+
+
+def apply_local(slab: Any, cols: Any, w: Any) -> Any:
+    """(time, lat, lon) slab -> (time, n) weighted sums; NaN on a weighted cell propagates."""
+    import numpy as np  # type: ignore
+
+    flat = slab.reshape(slab.shape[0], -1)
+    vals = flat[:, cols]  # (time, n, K)
+    return (np.where(w > 0, vals, 0.0) * w).sum(axis=-1)
+
+
+def concat(parts: Sequence[GridWeights]) -> GridWeights:
+    """Stack weights of target subsets on the same grid (padding to the widest K)."""
+    import numpy as np  # type: ignore
+
+    k = max(p.cols.shape[1] for p in parts)
+    cols = np.concatenate([np.pad(p.cols, ((0, 0), (0, k - p.cols.shape[1]))) for p in parts])
+    w = np.concatenate([np.pad(p.w, ((0, 0), (0, k - p.w.shape[1]))) for p in parts])
+    return GridWeights(method=parts[0].method, nlat=parts[0].nlat, nlon=parts[0].nlon, cols=cols, w=w)
+
+
+def _remap(valid: Any, ilat: Any, ilon: Any, index: GridIndex, lon: Any, lat: Any) -> int:
+    """Move targets on invalid cells to the nearest valid cell within REMAP_MAX_R rings (in place)."""
+    import numpy as np  # type: ignore
+
+    remapped = 0
+    nlat, nlon = valid.shape
+    for i in np.flatnonzero(~valid[ilat, ilon]):
+        k0, j0 = int(ilat[i]), int(ilon[i])
+        best: Optional[Tuple[int, int]] = None
+        for r in range(1, REMAP_MAX_R + 1):
+            kk, jj = np.meshgrid(
+                np.arange(max(0, k0 - r), min(nlat - 1, k0 + r) + 1),
+                np.arange(max(0, j0 - r), min(nlon - 1, j0 + r) + 1),
+                indexing="ij",
+            )
+            kk, jj = kk.ravel(), jj.ravel()
+            ok = valid[kk, jj]
+            if bool(ok.any()):
+                # First minimum in row-major order, as SHUD's scan with a strict '<'.
+                d2 = np.where(ok, index.dist2(kk, jj, float(lon[i]), float(lat[i])), np.inf)
+                m = int(np.argmin(d2))
+                best = (int(kk[m]), int(jj[m]))
+                break
+        if best is None:
+            raise RuntimeError(
+                f"GLDAS remap failed for station[{i}] lon={lon[i]} lat={lat[i]} (nearest idx_lat={k0} idx_lon={j0})"
+            )
+        ilat[i], ilon[i] = best
+        remapped += 1
+    return remapped
+
+
+def _nearest(index: GridIndex, lon: Any, lat: Any, valid: Optional[Any]) -> Tuple[Any, Any, int]:
+    ilat, ilon = index.nearest(lon, lat)
+    remapped = _remap(valid, ilat, ilon, index, lon, lat) if valid is not None else 0
+    return ilat, ilon, remapped
+
+
+def _bracket(coord: Any, x: Any, *, wrap: bool) -> Tuple[Any, Any, Any]:
+    """(i0, i1, frac) with x = (1-frac)*coord[i0] + frac*coord[i1]; clamps outside unless `wrap`."""
+    import numpy as np  # type: ignore
+
+    n = coord.size
+    desc = n > 1 and float(coord[-1]) < float(coord[0])
+    c = coord[::-1] if desc else coord
+    if n == 1:
+        z = np.zeros(x.size, dtype=np.int64)
+        return z, z, np.zeros(x.size)
+    step = float(c[1] - c[0])
+    if wrap:
+        # Global longitudes: extend with the first cell one period later so the seam brackets too.
+        c = np.append(c, c[0] + 360.0)
+        x = np.where(x < c[0], x + 360.0, x)
+    i = np.clip(np.searchsorted(c, x, side="right") - 1, 0, c.size - 2)
+    frac = np.clip((x - c[i]) / (c[i + 1] - c[i]), 0.0, 1.0) if step != 0.0 else np.zeros(x.size)
+    i0, i1 = i, i + 1
+    if wrap:
+        i1 = np.where(i1 == n, 0, i1)
+    if desc:
+        i0, i1 = n - 1 - i0, n - 1 - i1
+    return i0.astype(np.int64), i1.astype(np.int64), frac
+
+
+def _is_global_lon(lon_arr: Any) -> bool:
+    if lon_arr.size < 2:
+        return False
+    step = abs(float(lon_arr[1]) - float(lon_arr[0]))
+    return abs(abs(float(lon_arr[-1]) - float(lon_arr[0])) + step - 360.0) < 1e-6 * 360.0
+
+
+def _bilinear(lat_arr: Any, lon_arr: Any, lon: Any, lat: Any) -> Tuple[Any, Any]:
+    import numpy as np  # type: ignore
+
+    lon, _ = lon_frame(lon_arr, lon)
+    k0, k1, fy = _bracket(lat_arr, lat, wrap=False)
+    j0, j1, fx = _bracket(lon_arr, lon, wrap=_is_global_lon(lon_arr))
+    nlon = lon_arr.size
+    cols = np.stack([k0 * nlon + j0, k0 * nlon + j1, k1 * nlon + j0, k1 * nlon + j1], axis=1)
+    w = np.stack([(1 - fy) * (1 - fx), (1 - fy) * fx, fy * (1 - fx), fy * fx], axis=1)
+    return cols, w
+
+
+def _edges(coord: Any) -> Tuple[Any, Any]:
+    """(lower, upper) cell bounds from centres (midpoints; outer cells mirror their width)."""
+    import numpy as np  # type: ignore
+
+    if coord.size == 1:
+        return coord - 0.5, coord + 0.5
+    mid = 0.5 * (coord[1:] + coord[:-1])
+    b = np.concatenate([[coord[0] - (mid[0] - coord[0])], mid, [coord[-1] + (coord[-1] - mid[-1])]])
+    return np.minimum(b[:-1], b[1:]), np.maximum(b[:-1], b[1:])
+
+
+def _overlap_1d(lo: Any, hi: Any, x0: Any, x1: Any) -> Any:
+    import numpy as np  # type: ignore
+
+    return np.clip(np.minimum(hi, x1) - np.maximum(lo, x0), 0.0, None)
+
+
+def _area(lat_arr: Any, lon_arr: Any, lon: Any, lat: Any, half_deg: Optional[Tuple[float, float]]) -> Tuple[Any, Any]:
+    import numpy as np  # type: ignore
+
+    lon, _ = lon_frame(lon_arr, lon)
+    lat_lo, lat_hi = _edges(lat_arr)
+    lon_lo, lon_hi = _edges(lon_arr)
+    if half_deg is None:
+        hy = 0.5 * float(np.median(lat_hi - lat_lo))
+        hx = 0.5 * float(np.median(lon_hi - lon_lo))
+    else:
+        hy, hx = float(half_deg[0]), float(half_deg[1])
+
+    def span(lo: Any, hi: Any, x0: Any, x1: Any) -> Tuple[Any, int]:
+        # First candidate cell and the widest candidate count over all targets.
+        order = np.argsort(lo)
+        first = np.searchsorted(hi[order], x0, side="left")
+        last = np.searchsorted(lo[order], x1, side="right") - 1
+        first = np.clip(first, 0, lo.size - 1)
+        last = np.clip(last, 0, lo.size - 1)
+        return order, first, int(max(1, (last - first).max() + 1))
+
+    oy, fy0, ky = span(lat_lo, lat_hi, lat - hy, lat + hy)
+    ox, fx0, kx = span(lon_lo, lon_hi, lon - hx, lon + hx)
+    iy = oy[np.clip(fy0[:, None] + np.arange(ky)[None, :], 0, lat_arr.size - 1)]  # (n, ky)
+    ix = ox[np.clip(fx0[:, None] + np.arange(kx)[None, :], 0, lon_arr.size - 1)]  # (n, kx)
+    wy = _overlap_1d(lat_lo[iy], lat_hi[iy], (lat - hy)[:, None], (lat + hy)[:, None]) * np.cos(np.deg2rad(lat_arr[iy]))
+    wx = _overlap_1d(lon_lo[ix], lon_hi[ix], (lon - hx)[:, None], (lon + hx)[:, None])
+    # Clipped candidate indices repeat the edge cell: count each cell once.
+    wy = np.where(np.concatenate([np.ones((iy.shape[0], 1), bool), iy[:, 1:] != iy[:, :-1]], axis=1), wy, 0.0)
+    wx = np.where(np.concatenate([np.ones((ix.shape[0], 1), bool), ix[:, 1:] != ix[:, :-1]], axis=1), wx, 0.0)
+    cols = (iy[:, :, None] * lon_arr.size + ix[:, None, :]).reshape(lat.size, -1)
+    w = (wy[:, :, None] * wx[:, None, :]).reshape(lat.size, -1)
+    return cols, w
+
+
+def _normalize(cols: Any, w: Any, valid: Optional[Any], fallback: Any) -> Tuple[Any, Any]:
+    """Drop invalid cells, renormalize rows; rows with no weight left use the one-hot `fallback` cell."""
+    import numpy as np  # type: ignore
+
+    if valid is not None:
+        w = np.where(valid.ravel()[cols], w, 0.0)
+    total = w.sum(axis=1)
+    empty = total <= 0.0
+    w = np.where(empty[:, None], 0.0, w / np.where(empty, 1.0, total)[:, None])
+    cols = np.where(w > 0, cols, 0)
+    if bool(empty.any()):
+        cols[empty, 0] = fallback[empty]
+        w[empty, 0] = 1.0
+    return cols, w
+
+
+def compute_weights(
+    method: str,
+    lat_arr: Any,
+    lon_arr: Any,
+    points: Sequence[Tuple[float, float]],
+    *,
+    valid: Optional[Any] = None,
+    half_deg: Optional[Tuple[float, float]] = None,
+) -> Tuple[GridWeights, int]:
+    """(weights, number of targets remapped off invalid nearest cells) for (lon, lat) points."""
+    import numpy as np  # type: ignore
+
+    if method not in METHODS:
+        raise ValueError(f"Unknown interpolation method {method!r} (known: {', '.join(METHODS)})")
+    index = grid_index(lat_arr, lon_arr)
+    if index.curvilinear and method != "nearest":
+        raise ValueError(f"--interp {method} needs a regular grid (1-D lat/lon); curvilinear grids support nearest")
+    lat_arr, lon_arr = index.lat, index.lon
+    nlat, nlon = index.shape
+    pts = np.asarray(points, dtype=float).reshape(-1, 2)
+    lon, lat = pts[:, 0].copy(), pts[:, 1].copy()
+    ilat, ilon, remapped = _nearest(index, lon, lat, valid)
+    nearest = ilat * nlon + ilon
+    if method == "nearest":
+        cols, w = nearest[:, None], np.ones((nearest.size, 1))
+    elif method == "bilinear":
+        cols, w = _normalize(*_bilinear(lat_arr, lon_arr, lon, lat), valid, nearest)
+    else:
+        cols, w = _normalize(*_area(lat_arr, lon_arr, lon, lat, half_deg), valid, nearest)
+    # Drop all-zero columns so K stays as small as the method allows.
+    keep = (w > 0).any(axis=0)
+    keep[0] = True
+    gw = GridWeights(method=method, nlat=nlat, nlon=nlon, cols=cols[:, keep], w=w[:, keep])
+    return gw, remapped
+
+
+def weights_cache_dir() -> str:
+    return os.path.join(cache_root(), "weights")
+
+
+def grid_weights(
+    method: str,
+    lat_arr: Any,
+    lon_arr: Any,
+    points: Sequence[Tuple[float, float]],
+    *,
+    valid: Optional[Any] = None,
+    half_deg: Optional[Tuple[float, float]] = None,
+    cache: bool = True,
+) -> Tuple[GridWeights, int]:
+    """compute_weights(), reusing the on-disk cache for the same grid, mask, targets and method."""
+    import numpy as np  # type: ignore
+
+    lat_arr = np.ascontiguousarray(lat_arr, dtype=float)
+    lon_arr = np.ascontiguousarray(lon_arr, dtype=float)
+    pts = np.ascontiguousarray(np.asarray(points, dtype=float).reshape(-1, 2))
+    h = hashlib.sha1()
+    h.update(f"{method}\0{half_deg}\0{lat_arr.shape}\0{lon_arr.shape}\0".encode("utf-8"))
+    for arr in (lat_arr, lon_arr, pts):
+        h.update(arr.tobytes())
+    if valid is not None:
+        h.update(np.packbits(np.asarray(valid, dtype=bool)).tobytes())
+    path = os.path.join(weights_cache_dir(), f"{h.hexdigest()}.npz")
+
+    if cache and os.path.exists(path):
+        try:
+            with np.load(path) as z:
+                nlat, nlon = lat_arr.shape if lat_arr.ndim == 2 else (lat_arr.size, lon_arr.size)
+                gw = GridWeights(method=method, nlat=nlat, nlon=nlon, cols=z["cols"], w=z["w"])
+                return gw, int(z["remapped"])
+        except Exception:
+            pass  # unreadable cache entry: recompute and overwrite
+    gw, remapped = compute_weights(method, lat_arr, lon_arr, pts, valid=valid, half_deg=half_deg)
+    if cache:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp, cols=gw.cols, w=gw.w, remapped=np.int64(remapped))
+            os.replace(tmp, path)
+        except OSError:
+            pass  # read-only cache: weights are cheap to recompute
+    return gw, remapped
@@ -19,9 +19,30 @@ This tool reads:
 and writes:
   - <run_dir>/<path-from-tsd.forc>/<station>.csv
 
+Raw product values at the station cells come from a station cube
+(tools/station_cube.py): extracted from the source files on each run, or
+read from --cube (built there first if missing or stale). --interp picks how
+station values come from the grid (nearest, as SHUD, by default; see
+tools/forcing_weights.py).
+
+Several projects (repeated --run/--prj, e.g. many basins on one GLDAS/ERA5
+archive) are generated in one pass: projects with the same cfg.forcing have
+their stations merged into a single extraction that opens each source file
+once, and the series are fanned out to each project's CSVs.
+
+--points FILE (ID/Lon/Lat table) or --mesh (element centroids of
+<prj>.sp.mesh, projected with --crs) generate forcing at an arbitrary point
+set instead: points with identical grid weights share one series, the period
+is extracted in --chunk-days passes, and the result is one point-dimension
+NetCDF (<VAR>(series, time) + point_series(point)) rather than a CSV per point.
+
 Supported products:
   - PRODUCT=ERA5   (daily files, hourly; tp/ssr accumulated -> forward-diff increments)
   - PRODUCT=GLDAS  (per-timestep files, 3-hourly; includes _FillValue remap like SHUD)
+  - PRODUCT=CMFD2  (monthly per-variable files, 3-hourly)
+
+Unit conversion, clamps and quantization come from tools/forcing_convert.py (driven by
+configs/forcing/<product>.yaml), shared with tools/compare_forcing.py.
 
 Notes
 -----
@@ -38,6 +59,14 @@ import math
 import os
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from forcing_catalog import epoch_min
+from forcing_convert import conversion_for
+from forcing_weights import METHODS
+from station_cube import StationCube, cube_for, extract_cube, station_weights
+
+# Output step (minutes) of the generated forcing per product (ERA5 hourly, CMFD2/GLDAS 3-hourly).
+PRODUCT_DT_MIN: Dict[str, float] = {"CMFD2": 180.0, "ERA5": 60.0, "GLDAS": 180.0}
+
 
 def _eprint(msg: str) -> None:
     import sys
@@ -125,50 +154,6 @@ def _dt_from_forc_start(forc_start_yyyymmdd: int, t_min: float) -> dt.datetime:
     return _parse_yyyymmdd(forc_start_yyyymmdd) + dt.timedelta(minutes=float(t_min))
 
 
-def _zfill(v: int, w: int) -> str:
-    return str(v).zfill(w)
-
-
-def _doy_3(t: dt.datetime) -> str:
-    return _zfill(int(t.timetuple().tm_yday), 3)
-
-
-def _floor_dt_to_minute_step(t: dt.datetime, step_min: int) -> dt.datetime:
-    if step_min <= 0:
-        raise ValueError(f"invalid step_min: {step_min}")
-    base = dt.datetime(t.year, t.month, t.day, 0, 0, 0, tzinfo=dt.timezone.utc)
-    mins = int((t - base).total_seconds() // 60)
-    mins = (mins // int(step_min)) * int(step_min)
-    return base + dt.timedelta(minutes=int(mins))
-
-
-def _format_gldas_path(file_pattern: str, *, t: dt.datetime) -> str:
-    yyyymmdd = t.strftime("%Y%m%d")
-    year = t.strftime("%Y")
-    doy = _doy_3(t)
-    hhmm = t.strftime("%H%M")
-    return (
-        file_pattern.replace("{year}", year)
-        .replace("{yyyy}", year)
-        .replace("{doy}", doy)
-        .replace("{yyyymmdd}", yyyymmdd)
-        .replace("{hhmm}", hhmm)
-    )
-
-
-def _require_netCDF4() -> Any:
-    try:
-        import netCDF4  # type: ignore
-
-        return netCDF4
-    except Exception as e:
-        raise RuntimeError(
-            "Python package 'netCDF4' is required.\n"
-            "Install:\n"
-            "  python3 -m pip install netCDF4 numpy\n"
-        ) from e
-
-
 def _read_para_start_end_min(path: str) -> Tuple[float, float]:
     start_day: Optional[float] = None
     end_day: Optional[float] = None
@@ -234,471 +219,53 @@ def _write_station_csv(
             )
 
 
-def _quantize_prec_mm_day(x: float) -> float:
-    if not math.isfinite(float(x)) or float(x) < 0.0:
-        x = 0.0
-    # SHUD uses nearbyint(x*1e4)/1e4 (ties-to-even); Python round matches ties-to-even.
-    x = round(float(x), 4)
-    if float(x) < 0.0001:
-        x = 0.0
-    return float(x)
-
-
-def _quantize_temp_c(x: float) -> float:
-    if not math.isfinite(float(x)):
-        x = 0.0
-    return float(round(float(x), 2))
-
-
-def _quantize_rh_1(x: float) -> float:
-    if not math.isfinite(float(x)):
-        x = 0.0
-    x = max(0.0, min(1.0, float(x)))
-    x = round(float(x), 4)
-    x = max(0.0, min(1.0, float(x)))
-    return float(x)
-
-
-def _quantize_wind_ms(x: float) -> float:
-    if not math.isfinite(float(x)):
-        x = 0.0
-    x = abs(float(x))
-    x = round(float(x), 2)
-    if x < 0.05:
-        x = 0.05
-    return float(x)
-
-
-def _quantize_rn_wm2(x: float) -> float:
-    if not math.isfinite(float(x)):
-        x = 0.0
-    if float(x) < 0.0:
-        x = 0.0
-    return float(round(float(x), 0))
-
-
-def _era5_rh_from_dewpoint(*, temp_c: float, dew_c: float) -> float:
-    # Same as SHUD NetcdfForcingProvider (ERA5).
-    es = 6.112 * math.exp(17.67 * float(temp_c) / (float(temp_c) + 243.5))
-    ea = 6.112 * math.exp(17.67 * float(dew_c) / (float(dew_c) + 243.5))
-    rh = 0.0
-    if math.isfinite(float(es)) and float(es) > 0.0 and math.isfinite(float(ea)):
-        rh = float(ea) / float(es)
-    if not math.isfinite(float(rh)):
-        rh = 0.0
-    rh = max(0.0, min(1.0, float(rh)))
-    return float(rh)
-
-
-def _era5_resolve_day_file(
-    forcing_cfg: Dict[str, str],
-    *,
-    day_dt: dt.datetime,
-) -> str:
-    data_root = forcing_cfg["DATA_ROOT"]
-    file_pattern = forcing_cfg["LAYOUT_FILE_PATTERN"]
-    year_subdir = forcing_cfg.get("LAYOUT_YEAR_SUBDIR", "0").strip() not in ("", "0", "FALSE", "false")
-
-    yyyymmdd = day_dt.strftime("%Y%m%d")
-    fn = file_pattern.replace("{yyyymmdd}", yyyymmdd)
-    if year_subdir:
-        return os.path.join(data_root, f"{day_dt.year:04d}", fn)
-    return os.path.join(data_root, fn)
-
-
-def _generate_era5(
-    *,
-    forcing_cfg: Dict[str, str],
-    tsd: TsdForc,
-    sim_start_min: float,
-    sim_end_min: float,
-    out_dir: str,
-) -> None:
-    netCDF4 = _require_netCDF4()
-    import numpy as np  # type: ignore
-
-    v_tp = forcing_cfg["NC_VAR_TP"]
-    v_t2m = forcing_cfg["NC_VAR_T2M"]
-    v_d2m = forcing_cfg["NC_VAR_D2M"]
-    v_u10 = forcing_cfg["NC_VAR_U10"]
-    v_v10 = forcing_cfg["NC_VAR_V10"]
-    v_ssr = forcing_cfg["NC_VAR_SSR"]
+def _convert(
+    cube: StationCube, *, product: str, forcing_cfg: Dict[str, str], forc_start_yyyymmdd: int, times_out: Sequence[float]
+) -> Dict[str, Any]:
+    """Raw cube -> SHUD forcing {prec, temp, rh, wind, rn} of shape (point, step); see tools/forcing_convert.py."""
+    conv = conversion_for(product)
+    dt_min = PRODUCT_DT_MIN[product]
+    times = list(times_out)
+    if conv.accumulated:
+        # Boundary record after the last step for accumulated forward-diff increments.
+        times.append(float(times_out[-1]) + dt_min)
+
+    base_min = epoch_min(_parse_yyyymmdd(forc_start_yyyymmdd))
+    idx = cube.time_index([base_min + t for t in times])
+    return conv.convert(
+        {k: cube.var(k)[:, idx] for k in conv.inputs},
+        units={k: cube.units(k) for k in conv.inputs},
+        forcing_cfg=forcing_cfg,
+        dt_sec=dt_min * 60.0,
+    )
 
-    lat_var = forcing_cfg.get("LAT_VAR", forcing_cfg.get("NC_DIM_LAT", "latitude"))
-    lon_var = forcing_cfg.get("LON_VAR", forcing_cfg.get("NC_DIM_LON", "longitude"))
 
-    # Output time axis: dt = 60 min (ERA5 hourly).
-    dt_min = 60.0
+def _times_out(product: str, sim_end_min: float) -> List[float]:
+    dt_min = PRODUCT_DT_MIN[product]
     n_steps = max(1, int(math.ceil(float(sim_end_min) / dt_min)))
-    times_out = [float(k) * dt_min for k in range(n_steps)]  # last record covers +dt_min
-
-    # Boundary times needed for accumulated forward-diff increments.
-    times_bound = [float(k) * dt_min for k in range(n_steps + 1)]
-
-    base = _parse_yyyymmdd(tsd.forc_start_yyyymmdd)
-    last_bound_dt = _dt_from_forc_start(tsd.forc_start_yyyymmdd, times_bound[-1])
-    max_day = int((last_bound_dt - base).total_seconds() // 86400)
-
-    # Open the first day file to read grid coords and build station->grid mapping.
-    first_day = base
-    f0 = _era5_resolve_day_file(forcing_cfg, day_dt=first_day)
-    with netCDF4.Dataset(f0, "r") as ds0:
-        lat_arr = np.array(ds0.variables[lat_var][:], dtype=float)
-        lon_arr = np.array(ds0.variables[lon_var][:], dtype=float)
-    lon_min = float(lon_arr.min())
-    lon_max = float(lon_arr.max())
-    lon_0360 = lon_min >= 0.0 and lon_max > 180.0
-
-    st_lon = np.array([s.lon_deg for s in tsd.stations], dtype=float)
-    st_lat = np.array([s.lat_deg for s in tsd.stations], dtype=float)
-    if lon_0360:
-        st_lon = np.where(st_lon < 0.0, st_lon + 360.0, st_lon)
-        st_lon = np.mod(st_lon, 360.0)
-
-    # Nearest-neighbor mapping (ties pick the first index, matching argmin).
-    lon_idx = np.array([int(np.abs(lon_arr - float(x)).argmin()) for x in st_lon], dtype=int)
-    lat_idx = np.array([int(np.abs(lat_arr - float(y)).argmin()) for y in st_lat], dtype=int)
-
-    lon_lo = int(lon_idx.min())
-    lon_hi = int(lon_idx.max())
-    lat_lo = int(lat_idx.min())
-    lat_hi = int(lat_idx.max())
-    lon_off = lon_idx - lon_lo
-    lat_off = lat_idx - lat_lo
-
-    nst = len(tsd.stations)
-    n_bound = len(times_bound)
-
-    raw_tp = np.zeros((nst, n_bound), dtype=float)
-    raw_ssr = np.zeros((nst, n_bound), dtype=float)
-    raw_t2m = np.zeros((nst, n_bound), dtype=float)
-    raw_d2m = np.zeros((nst, n_bound), dtype=float)
-    raw_u10 = np.zeros((nst, n_bound), dtype=float)
-    raw_v10 = np.zeros((nst, n_bound), dtype=float)
-
-    # Load per-day subsets.
-    for day in range(0, max_day + 1):
-        day_dt = base + dt.timedelta(days=int(day))
-        fn = _era5_resolve_day_file(forcing_cfg, day_dt=day_dt)
-        if not os.path.exists(fn):
-            raise FileNotFoundError(fn)
-        with netCDF4.Dataset(fn, "r") as ds:
-            tp = ds.variables[v_tp][:, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-            ssr = ds.variables[v_ssr][:, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-            t2m = ds.variables[v_t2m][:, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-            d2m = ds.variables[v_d2m][:, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-            u10 = ds.variables[v_u10][:, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-            v10 = ds.variables[v_v10][:, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-
-            for h in range(24):
-                k = day * 24 + h
-                if k >= n_bound:
-                    break
-                raw_tp[:, k] = np.array(tp[h, :, :], dtype=float)[lat_off, lon_off]
-                raw_ssr[:, k] = np.array(ssr[h, :, :], dtype=float)[lat_off, lon_off]
-                raw_t2m[:, k] = np.array(t2m[h, :, :], dtype=float)[lat_off, lon_off]
-                raw_d2m[:, k] = np.array(d2m[h, :, :], dtype=float)[lat_off, lon_off]
-                raw_u10[:, k] = np.array(u10[h, :, :], dtype=float)[lat_off, lon_off]
-                raw_v10[:, k] = np.array(v10[h, :, :], dtype=float)[lat_off, lon_off]
-
-    # Convert to SHUD 5-var forcing (match SHUD NetcdfForcingProvider).
-    dt_sec = 3600.0
-
-    prec = np.zeros((nst, n_steps), dtype=float)
-    temp = np.zeros((nst, n_steps), dtype=float)
-    rh = np.zeros((nst, n_steps), dtype=float)
-    wind = np.zeros((nst, n_steps), dtype=float)
-    rn = np.zeros((nst, n_steps), dtype=float)
-
-    for k in range(n_steps):
-        tp0 = raw_tp[:, k]
-        tp1 = raw_tp[:, k + 1]
-        d_tp = tp1 - tp0
-        tp_tol = np.maximum(1e-5, 1e-4 * np.maximum(np.abs(tp0), np.abs(tp1)))
-        tp_inc_m = np.where(d_tp >= -tp_tol, np.maximum(0.0, d_tp), np.maximum(0.0, tp1))
-
-        ssr0 = raw_ssr[:, k]
-        ssr1 = raw_ssr[:, k + 1]
-        d_ssr = ssr1 - ssr0
-        ssr_tol = np.maximum(1000.0, 1e-4 * np.maximum(np.abs(ssr0), np.abs(ssr1)))
-        ssr_inc = np.where(d_ssr >= -ssr_tol, np.maximum(0.0, d_ssr), np.maximum(0.0, ssr1))
-
-        # Precip (mm/day)
-        prec_k = tp_inc_m * 1000.0 * (86400.0 / dt_sec)
-        # Quantize + threshold (scalar helper, but vectorized loop is cheap here)
-        prec[:, k] = np.array([_quantize_prec_mm_day(float(x)) for x in prec_k], dtype=float)
-
-        # RN (W/m2)
-        rn_k = ssr_inc / dt_sec
-        rn[:, k] = np.array([_quantize_rn_wm2(float(x)) for x in rn_k], dtype=float)
-
-        # Temp (C), quantize 2 decimals before RH calc (match SHUD).
-        temp_c = raw_t2m[:, k] - 273.15
-        temp[:, k] = np.array([_quantize_temp_c(float(x)) for x in temp_c], dtype=float)
-
-        # RH (0-1) from dewpoint + quantized temperature.
-        dew_c = raw_d2m[:, k] - 273.15
-        rh_k = [_era5_rh_from_dewpoint(temp_c=float(temp[i, k]), dew_c=float(dew_c[i])) for i in range(nst)]
-        rh[:, k] = np.array([_quantize_rh_1(float(x)) for x in rh_k], dtype=float)
-
-        # Wind (m/s)
-        wind_k = np.sqrt(raw_u10[:, k] * raw_u10[:, k] + raw_v10[:, k] * raw_v10[:, k])
-        wind[:, k] = np.array([_quantize_wind_ms(float(x)) for x in wind_k], dtype=float)
-
-    # Write per-station CSV.
-    _eprint(f"Writing ERA5 forcing CSV: stations={nst}, steps={n_steps}, out_dir={out_dir}")
-    for i, st in enumerate(tsd.stations):
-        out_path = os.path.join(out_dir, st.filename)
-        _write_station_csv(
-            out_path,
-            forc_start_yyyymmdd=tsd.forc_start_yyyymmdd,
-            times_min=times_out,
-            prec_mm_day=prec[i, :].tolist(),
-            temp_c=temp[i, :].tolist(),
-            rh_1=rh[i, :].tolist(),
-            wind_ms=wind[i, :].tolist(),
-            rn_wm2=rn[i, :].tolist(),
-        )
-
-
-def _gldas_is_valid(
-    *,
-    temp_var: Any,
-    time_idx: int,
-    lat_idx: int,
-    lon_idx: int,
-    fill: Optional[float],
-    missing: Optional[float],
-) -> bool:
-    try:
-        v = temp_var[time_idx, lat_idx, lon_idx]
-        import numpy as np  # type: ignore
-
-        if isinstance(v, np.ma.MaskedArray):
-            if bool(np.ma.is_masked(v)):
-                return False
-            v = v.item()
-        elif hasattr(v, "item"):
-            v = v.item()
-        x = float(v)
-    except Exception:
-        return False
-    if not math.isfinite(float(x)):
-        return False
-    if fill is not None and float(x) == float(fill):
-        return False
-    if missing is not None and float(x) == float(missing):
-        return False
-    return True
-
-
-def _generate_gldas(
-    *,
-    forcing_cfg: Dict[str, str],
-    tsd: TsdForc,
-    sim_start_min: float,
-    sim_end_min: float,
-    out_dir: str,
-) -> None:
-    netCDF4 = _require_netCDF4()
-    import numpy as np  # type: ignore
+    return [float(k) * dt_min for k in range(n_steps)]  # last record covers +dt_min
 
-    file_pattern = forcing_cfg["LAYOUT_FILE_PATTERN"]
-    data_root = forcing_cfg["DATA_ROOT"]
 
-    dim_lat = forcing_cfg.get("NC_DIM_LAT", "lat")
-    dim_lon = forcing_cfg.get("NC_DIM_LON", "lon")
+@dataclasses.dataclass
+class _Project:
+    run_dir: str
+    prj: str
+    tsd: TsdForc
+    sim_start_min: float
+    sim_end_min: float
+    forcing_cfg: Dict[str, str]
+    out_dir: str
 
-    v_prec = forcing_cfg["NC_VAR_PREC"]
-    v_temp = forcing_cfg["NC_VAR_TEMP"]
-    v_shum = forcing_cfg["NC_VAR_SHUM"]
-    v_pres = forcing_cfg["NC_VAR_PRES"]
-    v_wind = forcing_cfg["NC_VAR_WIND"]
-    v_srad = forcing_cfg["NC_VAR_SRAD"]
-
-    dt_min = 180.0
-    n_steps = max(1, int(math.ceil(float(sim_end_min) / dt_min)))
-    times_out = [float(k) * dt_min for k in range(n_steps)]  # last record covers +dt_min
-
-    # Use SHUD's t0 file for water-mask remap: first timestep used by the simulation.
-    start_step = int(math.floor(float(sim_start_min) / dt_min))
-    t0_min = float(start_step) * dt_min
-    t0_dt = _dt_from_forc_start(tsd.forc_start_yyyymmdd, t0_min)
-    t0_file = os.path.join(data_root, _format_gldas_path(file_pattern, t=t0_dt))
-    if not os.path.exists(t0_file):
-        raise FileNotFoundError(t0_file)
-
-    st_lon = [s.lon_deg for s in tsd.stations]
-    st_lat = [s.lat_deg for s in tsd.stations]
-    nst = len(tsd.stations)
-
-    with netCDF4.Dataset(t0_file, "r") as ds0:
-        lat_arr = np.array(ds0.variables[dim_lat][:], dtype=float)
-        lon_arr = np.array(ds0.variables[dim_lon][:], dtype=float)
-        temp_var = ds0.variables[v_temp]
-        fill = getattr(temp_var, "_FillValue", None)
-        missing = getattr(temp_var, "missing_value", None)
-        fill_f = float(fill) if fill is not None else None
-        missing_f = float(missing) if missing is not None else None
-
-        lon_min = float(lon_arr.min())
-        lon_max = float(lon_arr.max())
-        lon_0360 = lon_min >= 0.0 and lon_max > 180.0
-
-        st_lon_adj = list(st_lon)
-        if lon_0360:
-            st_lon_adj = [x + 360.0 if x < 0.0 else x for x in st_lon_adj]
-            st_lon_adj = [x % 360.0 for x in st_lon_adj]
-
-        # Initial nearest mapping.
-        lon_idx0 = [int(np.abs(lon_arr - float(x)).argmin()) for x in st_lon_adj]
-        lat_idx0 = [int(np.abs(lat_arr - float(y)).argmin()) for y in st_lat]
-
-        # Remap off invalid cells (match SHUD: max_r=10, dist2 in lon/lat degrees).
-        lon_idx: List[int] = []
-        lat_idx: List[int] = []
-        remapped = 0
-        for i in range(nst):
-            j0 = int(lon_idx0[i])
-            k0 = int(lat_idx0[i])
-            if _gldas_is_valid(
-                temp_var=temp_var,
-                time_idx=0,
-                lat_idx=k0,
-                lon_idx=j0,
-                fill=fill_f,
-                missing=missing_f,
-            ):
-                lon_idx.append(j0)
-                lat_idx.append(k0)
-                continue
+    @property
+    def base(self) -> dt.datetime:
+        return _parse_yyyymmdd(self.tsd.forc_start_yyyymmdd)
 
-            best: Optional[Tuple[int, int]] = None
-            best_dist2 = float("inf")
-            max_r = 10
-            for r in range(1, max_r + 1):
-                found = False
-                k_lo = max(0, k0 - r)
-                k_hi = min(int(len(lat_arr)) - 1, k0 + r)
-                j_lo = max(0, j0 - r)
-                j_hi = min(int(len(lon_arr)) - 1, j0 + r)
-                for kk in range(k_lo, k_hi + 1):
-                    for jj in range(j_lo, j_hi + 1):
-                        if not _gldas_is_valid(
-                            temp_var=temp_var,
-                            time_idx=0,
-                            lat_idx=kk,
-                            lon_idx=jj,
-                            fill=fill_f,
-                            missing=missing_f,
-                        ):
-                            continue
-                        dlon = abs(float(lon_arr[jj]) - float(st_lon_adj[i]))
-                        if lon_0360:
-                            dlon = min(dlon, 360.0 - dlon)
-                        dlat = abs(float(lat_arr[kk]) - float(st_lat[i]))
-                        dist2 = dlon * dlon + dlat * dlat
-                        if dist2 < best_dist2:
-                            best_dist2 = dist2
-                            best = (kk, jj)
-                            found = True
-                if found:
-                    break
-            if best is None:
-                raise RuntimeError(
-                    f"GLDAS remap failed for station[{i}] lon={st_lon[i]} lat={st_lat[i]} (nearest idx_lat={k0} idx_lon={j0})"
-                )
-            kk, jj = best
-            lat_idx.append(int(kk))
-            lon_idx.append(int(jj))
-            remapped += 1
-
-    if remapped > 0:
-        _eprint(f"GLDAS remap: {remapped}/{nst} stations moved off _FillValue grid cells (using t0 file).")
-
-    lon_idx_np = np.array(lon_idx, dtype=int)
-    lat_idx_np = np.array(lat_idx, dtype=int)
-    lon_lo = int(lon_idx_np.min())
-    lon_hi = int(lon_idx_np.max())
-    lat_lo = int(lat_idx_np.min())
-    lat_hi = int(lat_idx_np.max())
-    lon_off = lon_idx_np - lon_lo
-    lat_off = lat_idx_np - lat_lo
-
-    prec = np.zeros((nst, n_steps), dtype=float)
-    temp = np.zeros((nst, n_steps), dtype=float)
-    rh = np.zeros((nst, n_steps), dtype=float)
-    wind = np.zeros((nst, n_steps), dtype=float)
-    rn = np.zeros((nst, n_steps), dtype=float)
-
-    for ti, tmin in enumerate(times_out):
-        step_dt = _floor_dt_to_minute_step(_dt_from_forc_start(tsd.forc_start_yyyymmdd, tmin), 180)
-        rel = _format_gldas_path(file_pattern, t=step_dt)
-        fn = os.path.join(data_root, rel)
-        if not os.path.exists(fn):
-            raise FileNotFoundError(fn)
-        with netCDF4.Dataset(fn, "r") as ds:
-            # One file contains all variables; time dim length=1.
-            pr = ds.variables[v_prec][0, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-            tk = ds.variables[v_temp][0, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-            shum = ds.variables[v_shum][0, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-            pres = ds.variables[v_pres][0, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-            wi = ds.variables[v_wind][0, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-            sr = ds.variables[v_srad][0, lat_lo : lat_hi + 1, lon_lo : lon_hi + 1]
-
-            pr_v = np.array(pr, dtype=float)[lat_off, lon_off]
-            tk_v = np.array(tk, dtype=float)[lat_off, lon_off]
-            shum_v = np.array(shum, dtype=float)[lat_off, lon_off]
-            pres_v = np.array(pres, dtype=float)[lat_off, lon_off]
-            wi_v = np.array(wi, dtype=float)[lat_off, lon_off]
-            sr_v = np.array(sr, dtype=float)[lat_off, lon_off]
-
-        # Precip: kg/m^2/s -> mm/day
-        prec_mm_day = pr_v * 86400.0
-        prec[:, ti] = np.array([_quantize_prec_mm_day(float(x)) for x in prec_mm_day], dtype=float)
-
-        # Temp
-        temp_c = tk_v - 273.15
-        temp[:, ti] = np.array([_quantize_temp_c(float(x)) for x in temp_c], dtype=float)
-
-        # RH (same as CMFD2/GLDAS in SHUD)
-        rh_percent = 0.263 * pres_v * shum_v / np.exp(17.67 * (tk_v - 273.15) / (tk_v - 29.65))
-        rh_percent = np.clip(rh_percent, 0.0, 100.0)
-        rh_1 = rh_percent / 100.0
-        rh[:, ti] = np.array([_quantize_rh_1(float(x)) for x in rh_1], dtype=float)
-
-        # Wind
-        wind[:, ti] = np.array([_quantize_wind_ms(float(x)) for x in wi_v], dtype=float)
-
-        # RN
-        rn[:, ti] = np.array([_quantize_rn_wm2(float(x)) for x in sr_v], dtype=float)
-
-    _eprint(f"Writing GLDAS forcing CSV: stations={nst}, steps={n_steps}, out_dir={out_dir}")
-    for i, st in enumerate(tsd.stations):
-        out_path = os.path.join(out_dir, st.filename)
-        _write_station_csv(
-            out_path,
-            forc_start_yyyymmdd=tsd.forc_start_yyyymmdd,
-            times_min=times_out,
-            prec_mm_day=prec[i, :].tolist(),
-            temp_c=temp[i, :].tolist(),
-            rh_1=rh[i, :].tolist(),
-            wind_ms=wind[i, :].tolist(),
-            rn_wm2=rn[i, :].tolist(),
-        )
+    @property
+    def product(self) -> str:
+        return self.forcing_cfg["PRODUCT"].strip().upper()
 
 
-def main(argv: Optional[Sequence[str]] = None) -> int:
-    p = argparse.ArgumentParser(description="Generate CSV forcing baseline for regression vs NetCDF forcing")
-    p.add_argument("--run", required=True, help="Target run_dir (contains input/<prj>/<prj>.tsd.forc)")
-    p.add_argument("--nc-run", required=True, help="NetCDF run_dir (contains input/<prj>/<prj>.cfg.forcing)")
-    p.add_argument("--prj", required=True, help="Project name (e.g. qhh)")
-    args = p.parse_args(list(argv) if argv is not None else None)
-
-    run_dir = os.path.abspath(args.run)
-    nc_run = os.path.abspath(args.nc_run)
-    prj = str(args.prj)
-
+def _load_project(run_dir: str, nc_run: str, prj: str) -> _Project:
     tsd_path = os.path.join(run_dir, "input", prj, f"{prj}.tsd.forc")
     para_path = os.path.join(run_dir, "input", prj, f"{prj}.cfg.para")
     cfg_forcing_path = os.path.join(nc_run, "input", prj, f"{prj}.cfg.forcing")
@@ -714,30 +281,399 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
     if "DATA_ROOT" in forcing_cfg and not os.path.isabs(forcing_cfg["DATA_ROOT"]):
         forcing_cfg["DATA_ROOT"] = os.path.normpath(os.path.join(nc_run, forcing_cfg["DATA_ROOT"]))
 
+    product = forcing_cfg["PRODUCT"].strip().upper()
+    if product not in PRODUCT_DT_MIN:
+        raise ValueError(f"Unsupported PRODUCT for baseline generation: {product!r} ({cfg_forcing_path})")
+
     rel = tsd.rel_path.strip()
     out_dir = rel if os.path.isabs(rel) else os.path.normpath(os.path.join(run_dir, rel))
-    os.makedirs(out_dir, exist_ok=True)
+    return _Project(
+        run_dir=run_dir,
+        prj=prj,
+        tsd=tsd,
+        sim_start_min=float(sim_start_min),
+        sim_end_min=float(sim_end_min),
+        forcing_cfg=forcing_cfg,
+        out_dir=out_dir,
+    )
 
-    product = forcing_cfg["PRODUCT"].strip().upper()
-    if product == "ERA5":
-        _generate_era5(
-            forcing_cfg=forcing_cfg,
-            tsd=tsd,
-            sim_start_min=float(sim_start_min),
-            sim_end_min=float(sim_end_min),
-            out_dir=out_dir,
-        )
-    elif product == "GLDAS":
-        _generate_gldas(
-            forcing_cfg=forcing_cfg,
-            tsd=tsd,
-            sim_start_min=float(sim_start_min),
-            sim_end_min=float(sim_end_min),
-            out_dir=out_dir,
+
+def _generate(proj: _Project, cube: StationCube) -> None:
+    os.makedirs(proj.out_dir, exist_ok=True)
+    product = proj.product
+    times_out = _times_out(product, proj.sim_end_min)
+    forc = _convert(
+        cube,
+        product=product,
+        forcing_cfg=proj.forcing_cfg,
+        forc_start_yyyymmdd=proj.tsd.forc_start_yyyymmdd,
+        times_out=times_out,
+    )
+
+    _eprint(
+        f"Writing {product} forcing CSV: stations={len(proj.tsd.stations)}, steps={len(times_out)}, "
+        f"out_dir={proj.out_dir}"
+    )
+    for i, st in enumerate(proj.tsd.stations):
+        _write_station_csv(
+            os.path.join(proj.out_dir, st.filename),
+            forc_start_yyyymmdd=proj.tsd.forc_start_yyyymmdd,
+            times_min=times_out,
+            prec_mm_day=forc["prec"][i, :].tolist(),
+            temp_c=forc["temp"][i, :].tolist(),
+            rh_1=forc["rh"][i, :].tolist(),
+            wind_ms=forc["wind"][i, :].tolist(),
+            rn_wm2=forc["rn"][i, :].tolist(),
         )
-    else:
-        raise ValueError(f"Unsupported PRODUCT for baseline generation: {product!r}")
 
+
+def _generate_merged(projects: Sequence[_Project], *, method: str, jobs: int) -> None:
+    """
+    One pass over the archive for projects sharing a cfg.forcing: their stations are merged into
+    one extraction (each source file opened once, one cropped read per project), then every
+    project's CSVs are written from its rows of the merged cube.
+    """
+    forcing_cfg = projects[0].forcing_cfg
+    gldas = projects[0].product == "GLDAS"
+
+    stations: List[Tuple[float, float]] = []
+    masks: List[dt.datetime] = []
+    index: Dict[Tuple[float, float, Optional[dt.datetime]], int] = {}
+    rows: List[List[int]] = []
+    for proj in projects:
+        # SHUD remaps GLDAS stations at each run's own t0 file.
+        mask_at = proj.base + dt.timedelta(minutes=proj.sim_start_min)
+        prow: List[int] = []
+        for st in proj.tsd.stations:
+            key = (st.lon_deg, st.lat_deg, mask_at if gldas else None)
+            if key not in index:
+                index[key] = len(stations)
+                stations.append((st.lon_deg, st.lat_deg))
+                masks.append(mask_at)
+            prow.append(index[key])
+        rows.append(prow)
+
+    t_start = min(proj.base for proj in projects)
+    t_end = max(proj.base + dt.timedelta(minutes=proj.sim_end_min) for proj in projects)
+    cube = extract_cube(
+        forcing_cfg,
+        stations=stations,
+        t_start=t_start,
+        t_end=t_end,
+        mask_at=masks,
+        groups=rows,
+        method=method,
+        jobs=jobs,
+    )
+    _eprint(
+        f"Merged extraction: projects={len(projects)} stations={len(stations)} "
+        f"records={cube.times.size} files={cube.attrs.get('files')}"
+    )
+    for proj, prow in zip(projects, rows):
+        _generate(proj, cube.select(prow))
+
+
+@dataclasses.dataclass(frozen=True)
+class _Points:
+    ids: List[int]
+    lon: Any  # float64 (point,)
+    lat: Any
+    source: str
+
+
+def _read_points(path: str) -> _Points:
+    """Whitespace/comma table with a header naming Lon and Lat columns (ID optional, default 1..n)."""
+    import numpy as np  # type: ignore
+
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [ln.replace(",", " ").split() for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
+    if not lines:
+        raise ValueError(f"Empty points file: {path}")
+    head = [h.upper() for h in lines[0]]
+    if "LON" not in head or "LAT" not in head:
+        raise ValueError(f"Points file header must name Lon and Lat columns: {path}: {' '.join(lines[0])!r}")
+    c_lon, c_lat = head.index("LON"), head.index("LAT")
+    c_id = head.index("ID") if "ID" in head else None
+    rows = lines[1:]
+    if not rows:
+        raise ValueError(f"No points in {path}")
+    try:
+        ids = [int(r[c_id]) if c_id is not None else i + 1 for i, r in enumerate(rows)]
+        lon = np.array([float(r[c_lon]) for r in rows], dtype=float)
+        lat = np.array([float(r[c_lat]) for r in rows], dtype=float)
+    except (IndexError, ValueError) as e:
+        raise ValueError(f"Invalid point record in {path}: {e}") from e
+    return _Points(ids=ids, lon=lon, lat=lat, source=os.path.abspath(path))
+
+
+def _mesh_points(run_dir: str, prj: str, crs: str) -> _Points:
+    """Element centroids of <run>/input/<prj>/<prj>.sp.mesh, projected from `crs` to lon/lat."""
+    import numpy as np  # type: ignore
+
+    from convert_output import _read_sp_mesh
+
+    path = os.path.join(run_dir, "input", prj, f"{prj}.sp.mesh")
+    mesh = _read_sp_mesh(path)
+    nodes = np.asarray(mesh.face_nodes, dtype=np.int64) - 1
+    x = np.asarray(mesh.node_x, dtype=float)[nodes].mean(axis=1)
+    y = np.asarray(mesh.node_y, dtype=float)[nodes].mean(axis=1)
+    lon, lat = _to_lonlat(x, y, crs)
+    return _Points(ids=list(range(1, nodes.shape[0] + 1)), lon=lon, lat=lat, source=path)
+
+
+def _to_lonlat(x: Any, y: Any, crs: str) -> Tuple[Any, Any]:
+    if not crs:
+        raise ValueError("--mesh needs --crs (the mesh's projection: EPSG code, WKT, or a .prj/.shp path)")
+    if crs.strip().upper() in ("EPSG:4326", "WGS84", "LONLAT"):
+        return x, y
+    try:
+        import pyproj  # type: ignore
+    except Exception as e:
+        raise RuntimeError(
+            "Python package 'pyproj' is required to project mesh centroids to lon/lat.\n"
+            "Install:\n"
+            "  python3 -m pip install pyproj\n"
+        ) from e
+    src = crs
+    if os.path.isfile(os.path.splitext(crs)[0] + ".prj"):
+        with open(os.path.splitext(crs)[0] + ".prj", "r", encoding="utf-8") as f:
+            src = f.read()
+    tr = pyproj.Transformer.from_crs(pyproj.CRS.from_user_input(src), pyproj.CRS.from_epsg(4326), always_xy=True)
+    return tr.transform(x, y)
+
+
+# SHUD forcing variable -> (NetCDF name, CSV column, units) in the point forcing file.
+_POINT_VARS: Dict[str, Tuple[str, str, str]] = {
+    "prec": ("PREC", "Precip_mm.d", "mm day-1"),
+    "temp": ("TEMP", "Temp_C", "degC"),
+    "rh": ("RH", "RH_1", "1"),
+    "wind": ("WIND", "Wind_m.s", "m s-1"),
+    "rn": ("RN", "RN_w.m2", "W m-2"),
+}
+
+
+def _write_points_nc(
+    path: str,
+    *,
+    proj: _Project,
+    points: _Points,
+    rep: Any,
+    series_of: Any,
+    cell: Tuple[Any, Any],
+    times_out: Sequence[float],
+    method: str,
+) -> Any:
+    """Create the point forcing NetCDF (values filled per time chunk); returns the open dataset."""
+    from compare_forcing import _require_netCDF4
+
+    netCDF4 = _require_netCDF4()
+    import numpy as np  # type: ignore
+
+    ds = netCDF4.Dataset(path, "w", format="NETCDF4")
+    ds.createDimension("point", len(points.ids))
+    ds.createDimension("series", int(rep.size))
+    ds.createDimension("time", len(times_out))
+    base = proj.base
+    ds.title = f"SHUD forcing at {len(points.ids)} points ({proj.product})"
+    ds.source = points.source
+    ds.product = proj.product
+    ds.interp = method
+    ds.forc_start = str(proj.tsd.forc_start_yyyymmdd)
+    ds.comment = (
+        "Points with identical grid weights share one series: values of point p are "
+        "<VAR>[point_series[p], :]. Values are quantized as SHUD's NetCDF forcing provider."
+    )
+    t = ds.createVariable("time", "f8", ("time",))
+    t.units = f"minutes since {base:%Y-%m-%d} 00:00:00 UTC"
+    t[:] = np.asarray(times_out, dtype=float)
+    for name, vals, dtype, units in (
+        ("point_id", points.ids, "i4", ""),
+        ("point_lon", points.lon, "f8", "degrees_east"),
+        ("point_lat", points.lat, "f8", "degrees_north"),
+        ("point_series", series_of, "i4", ""),
+    ):
+        v = ds.createVariable(name, dtype, ("point",))
+        if units:
+            v.units = units
+        v[:] = np.asarray(vals)
+    ds.variables["point_series"].long_name = "0-based index into the series dimension"
+    for name, vals in (("series_cell_ilat", cell[0]), ("series_cell_ilon", cell[1])):
+        ds.createVariable(name, "i4", ("series",))[:] = np.asarray(vals)
+    chunks = (min(int(rep.size), 256), min(len(times_out), 8760))
+    for key, (name, long_name, units) in _POINT_VARS.items():
+        v = ds.createVariable(name, "f8", ("series", "time"), zlib=True, complevel=4, chunksizes=chunks)
+        v.long_name = long_name
+        v.units = units
+    return ds
+
+
+def _generate_points(
+    proj: _Project, points: _Points, *, out: str, method: str, jobs: int, chunk_days: float
+) -> None:
+    """
+    Forcing at an arbitrary point set (e.g. mesh element centroids) into one point-dimension
+    NetCDF. Points with identical grid weights are extracted and converted once; the period is
+    extracted in chunks of `chunk_days` so memory stays bounded by (distinct points x chunk).
+    """
+    import numpy as np  # type: ignore
+
+    product = proj.product
+    mask_at = proj.base + dt.timedelta(minutes=proj.sim_start_min)
+    pts = list(zip(points.lon.tolist(), points.lat.tolist()))
+    weights, _ = station_weights(proj.forcing_cfg, stations=pts, t_start=proj.base, mask_at=mask_at, method=method)
+    rep, series_of = weights.unique()
+    reps = [pts[int(i)] for i in rep]
+    cell = weights.select(rep).dominant()
+
+    times_out = _times_out(product, proj.sim_end_min)
+    dt_min = PRODUCT_DT_MIN[product]
+    step = max(1, int(round(float(chunk_days) * 1440.0 / dt_min)))
+    _eprint(
+        f"Point forcing: points={len(pts)} distinct series={len(reps)} steps={len(times_out)} "
+        f"chunks={-(-len(times_out) // step)}"
+    )
+
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    tmp = f"{out}.tmp"
+    ds = _write_points_nc(
+        tmp,
+        proj=proj,
+        points=points,
+        rep=rep,
+        series_of=series_of,
+        cell=cell,
+        times_out=times_out,
+        method=method,
+    )
+    try:
+        for k0 in range(0, len(times_out), step):
+            k1 = min(len(times_out), k0 + step)
+            cube = extract_cube(
+                proj.forcing_cfg,
+                stations=reps,
+                t_start=proj.base + dt.timedelta(minutes=times_out[k0]),
+                t_end=proj.base + dt.timedelta(minutes=k1 * dt_min),
+                mask_at=mask_at,
+                method=method,
+                jobs=jobs,
+            )
+            forc = _convert(
+                cube,
+                product=product,
+                forcing_cfg=proj.forcing_cfg,
+                forc_start_yyyymmdd=proj.tsd.forc_start_yyyymmdd,
+                times_out=times_out[k0:k1],
+            )
+            for key, (name, _, _) in _POINT_VARS.items():
+                ds.variables[name][:, k0:k1] = forc[key]
+        ds.close()
+    except BaseException:
+        ds.close()
+        os.remove(tmp)
+        raise
+    os.replace(tmp, out)
+    _eprint(f"Wrote: {out}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Generate CSV forcing baseline for regression vs NetCDF forcing")
+    p.add_argument(
+        "--run",
+        required=True,
+        action="append",
+        help="Target run_dir (contains input/<prj>/<prj>.tsd.forc); repeat for several projects",
+    )
+    p.add_argument(
+        "--nc-run",
+        required=True,
+        action="append",
+        help="NetCDF run_dir (contains input/<prj>/<prj>.cfg.forcing); once for all --run, or once per --run",
+    )
+    p.add_argument("--prj", required=True, action="append", help="Project name (e.g. qhh); once, or once per --run")
+    p.add_argument(
+        "--cube",
+        default="",
+        help="Station cube (tools/station_cube.py) to read instead of the source files; built there if missing or stale",
+    )
+    p.add_argument(
+        "--interp",
+        choices=METHODS,
+        default="nearest",
+        help="Station values from the grid: nearest (SHUD, default), bilinear or area (tools/forcing_weights.py)",
+    )
+    p.add_argument("--jobs", type=int, default=0, help="Worker processes reading source files (default: CPU count)")
+    pts = p.add_mutually_exclusive_group()
+    pts.add_argument(
+        "--points",
+        default="",
+        help="Generate at these points instead of the tsd.forc stations (table with ID/Lon/Lat header)",
+    )
+    pts.add_argument(
+        "--mesh",
+        action="store_true",
+        help="Generate at the element centroids of <run>/input/<prj>/<prj>.sp.mesh (needs --crs)",
+    )
+    p.add_argument("--crs", default="", help="Mesh projection for --mesh: EPSG code, WKT or a .prj/.shp path")
+    p.add_argument(
+        "--out",
+        default="",
+        help="Point forcing NetCDF for --points/--mesh (default: <forcing dir>/<prj>.<PRODUCT>.points.nc)",
+    )
+    p.add_argument(
+        "--chunk-days", type=float, default=10.0, help="Days extracted per pass for --points/--mesh (default: 10)"
+    )
+    args = p.parse_args(list(argv) if argv is not None else None)
+
+    runs = [os.path.abspath(r) for r in args.run]
+    nc_runs = [os.path.abspath(r) for r in args.nc_run]
+    prjs = [str(x) for x in args.prj]
+    for name, vals in (("--nc-run", nc_runs), ("--prj", prjs)):
+        if len(vals) not in (1, len(runs)):
+            raise ValueError(f"{name} must be given once or once per --run ({len(runs)}), got {len(vals)}")
+    projects = [
+        _load_project(run_dir, nc_runs[i if len(nc_runs) > 1 else 0], prjs[i if len(prjs) > 1 else 0])
+        for i, run_dir in enumerate(runs)
+    ]
+
+    if args.points or args.mesh:
+        if len(projects) != 1 or args.cube:
+            raise ValueError("--points/--mesh take a single --run and no --cube")
+        proj = projects[0]
+        points = _read_points(args.points) if args.points else _mesh_points(proj.run_dir, proj.prj, str(args.crs))
+        out = args.out or os.path.join(proj.out_dir, f"{proj.prj}.{proj.product}.points.nc")
+        _generate_points(
+            proj,
+            points,
+            out=os.path.abspath(out),
+            method=str(args.interp),
+            jobs=int(args.jobs),
+            chunk_days=float(args.chunk_days),
+        )
+        return 0
+
+    if len(projects) == 1:
+        proj = projects[0]
+        cube = cube_for(
+            proj.forcing_cfg,
+            stations=[(s.lon_deg, s.lat_deg) for s in proj.tsd.stations],
+            t_start=proj.base,
+            t_end=proj.base + dt.timedelta(minutes=proj.sim_end_min),
+            mask_at=proj.base + dt.timedelta(minutes=proj.sim_start_min),
+            path=os.path.abspath(args.cube) if args.cube else "",
+            method=str(args.interp),
+            jobs=int(args.jobs),
+        )
+        _generate(proj, cube)
+        return 0
+
+    if args.cube:
+        raise ValueError("--cube applies to a single --run; several projects are extracted in one merged pass")
+    # Projects reading the same archive the same way share one pass over it.
+    by_forcing: Dict[Tuple[Tuple[str, str], ...], List[_Project]] = {}
+    for proj in projects:
+        by_forcing.setdefault(tuple(sorted(proj.forcing_cfg.items())), []).append(proj)
+    for group in by_forcing.values():
+        _generate_merged(group, method=str(args.interp), jobs=int(args.jobs))
     return 0
 
 
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Spatial index of a forcing grid: (lon, lat) points -> grid cell (row, column), shared by the
+station cube and generators (via forcing_weights.py), compare_forcing.py, the validate station
+check (forcing_catalog.py) and subset_forcing.py.
+
+  - regular grids (1-D lat/lon coordinate variables): nearest lat and lon index chosen
+    separately, which is SHUD's NetcdfForcingProvider rule (first index on ties)
+  - curvilinear grids (2-D lat(y, x)/lon(y, x), e.g. regional downscaled products): nearest
+    cell centre by great-circle distance, from a KD-tree over the centres as 3-D unit vectors
+    (chord length orders like arc length, so the antimeridian and poles need no special case);
+    cells with NaN/masked coordinates are never chosen
+
+Rows/columns are the grid's (lat, lon) dimensions, or (y, x) for curvilinear grids, so flat
+cell indices are row * ncols + col either way. KD-trees are built once per grid: memoized per
+process and cached as .npz under $XDG_CACHE_HOME/shudnc/grid_index/ (default ~/.cache), keyed
+by a hash of the coordinates.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import math
+import os
+from typing import Any, Dict, Optional, Tuple
+
+_LEAF = 32  # max points per KD-tree leaf
+_QUERY_CHUNK = 4096  # query points per vectorized search (and per argmin block)
+
+_MEMO: Dict[str, "GridIndex"] = {}
+
+
+def cache_root() -> str:
+    """$XDG_CACHE_HOME/shudnc (default ~/.cache/shudnc)."""
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "shudnc")
+
+
+def lon_frame(lon_arr: Any, lon: Any) -> Tuple[Any, bool]:
+    """Target longitudes in the grid's convention (0..360 grids shift negative longitudes)."""
+    import numpy as np  # type: ignore
+
+    lon_0360 = float(np.nanmin(lon_arr)) >= 0.0 and float(np.nanmax(lon_arr)) > 180.0
+    if lon_0360:
+        lon = np.mod(np.where(lon < 0.0, lon + 360.0, lon), 360.0)
+    return lon, lon_0360
+
+
+def nearest_1d(coord: Any, x: Any) -> Any:
+    """argmin(|coord - x|) per x (first index on ties), in blocks to bound memory."""
+    import numpy as np  # type: ignore
+
+    out = np.empty(x.size, dtype=np.int64)
+    for a in range(0, x.size, _QUERY_CHUNK):
+        out[a : a + _QUERY_CHUNK] = np.abs(coord[None, :] - x[a : a + _QUERY_CHUNK, None]).argmin(axis=1)
+    return out
+
+
+def to_xyz(lon: Any, lat: Any) -> Any:
+    """(n, 3) unit vectors of (lon, lat) in degrees."""
+    import numpy as np  # type: ignore
+
+    lam = np.deg2rad(np.asarray(lon, dtype=float).ravel())
+    phi = np.deg2rad(np.asarray(lat, dtype=float).ravel())
+    c = np.cos(phi)
+    return np.stack([c * np.cos(lam), c * np.sin(lam), np.sin(phi)], axis=1)
+
+
+def _box_d2(p: Any, lo: Any, hi: Any) -> Any:
+    """Squared distance from points to axis-aligned boxes (0 inside), row-wise."""
+    import numpy as np  # type: ignore
+
+    d = np.maximum(np.maximum(lo - p, p - hi), 0.0)
+    return (d * d).sum(axis=1)
+
+
+@dataclasses.dataclass
+class KDTree:
+    """
+    Implicit balanced KD-tree in heap order: node i covers perm[start[i]:end[i]], its children
+    are 2i+1 / 2i+2 (median split on the widest axis), the nodes of the last level are leaves.
+    """
+
+    xyz: Any  # (n, 3)
+    perm: Any  # (n,) int64: positions in xyz, each node's points contiguous
+    start: Any  # (nodes,) int64
+    end: Any  # (nodes,) int64
+    lo: Any  # (nodes, 3) bounding box
+    hi: Any  # (nodes, 3)
+    depth: int
+
+    @classmethod
+    def build(cls, xyz: Any) -> "KDTree":
+        import numpy as np  # type: ignore
+
+        n = int(xyz.shape[0])
+        depth = max(0, int(math.ceil(math.log2(max(1, n) / _LEAF)))) if n > _LEAF else 0
+        nodes = 2 ** (depth + 1) - 1
+        first_leaf = 2**depth - 1
+        perm = np.arange(n, dtype=np.int64)
+        start = np.zeros(nodes, dtype=np.int64)
+        end = np.zeros(nodes, dtype=np.int64)
+        lo = np.full((nodes, 3), np.inf)
+        hi = np.full((nodes, 3), -np.inf)
+        end[0] = n
+        for i in range(nodes):
+            a, b = int(start[i]), int(end[i])
+            if b <= a:
+                continue
+            idx = perm[a:b]
+            p = xyz[idx]
+            lo[i], hi[i] = p.min(axis=0), p.max(axis=0)
+            if i >= first_leaf:
+                continue
+            mid = (a + b) // 2
+            axis = int(np.argmax(hi[i] - lo[i]))
+            perm[a:b] = idx[np.argpartition(p[:, axis], mid - a)]
+            start[2 * i + 1], end[2 * i + 1] = a, mid
+            start[2 * i + 2], end[2 * i + 2] = mid, b
+        return cls(xyz=xyz, perm=perm, start=start, end=end, lo=lo, hi=hi, depth=depth)
+
+    def query(self, pts: Any) -> Tuple[Any, Any]:
+        """(position in xyz, squared chord distance) of each point's nearest neighbour (lowest position on ties)."""
+        import numpy as np  # type: ignore
+
+        pos = np.empty(pts.shape[0], dtype=np.int64)
+        d2 = np.empty(pts.shape[0], dtype=float)
+        for a in range(0, pts.shape[0], _QUERY_CHUNK):
+            pos[a : a + _QUERY_CHUNK], d2[a : a + _QUERY_CHUNK] = self._query(pts[a : a + _QUERY_CHUNK])
+        return pos, d2
+
+    def _leaves(self, qi: Any, leaf: Any, p: Any, nq: int) -> Tuple[Any, Any]:
+        """Best (position, d2) per query over the (query, leaf) pairs; queries without pairs get inf."""
+        import numpy as np  # type: ignore
+
+        width = int((self.end[leaf] - self.start[leaf]).max()) if leaf.size else 1
+        off = np.arange(width)[None, :]
+        slot = self.start[leaf][:, None] + off
+        ok = slot < self.end[leaf][:, None]
+        cand = self.perm[np.where(ok, slot, 0)]
+        diff = self.xyz[cand] - p[qi][:, None, :]
+        dist = np.where(ok, (diff * diff).sum(axis=2), np.inf)
+        q = np.repeat(qi, width)
+        order = np.lexsort((cand.ravel(), dist.ravel(), q))
+        q_sorted = q[order]
+        first = np.ones(q_sorted.size, dtype=bool)
+        first[1:] = q_sorted[1:] != q_sorted[:-1]
+        best_pos = np.zeros(nq, dtype=np.int64)
+        best_d2 = np.full(nq, np.inf)
+        best_pos[q_sorted[first]] = cand.ravel()[order][first]
+        best_d2[q_sorted[first]] = dist.ravel()[order][first]
+        return best_pos, best_d2
+
+    def _query(self, p: Any) -> Tuple[Any, Any]:
+        import numpy as np  # type: ignore
+
+        nq = p.shape[0]
+        allq = np.arange(nq)
+        # Upper bound: greedy descent to the closest-box leaf.
+        node = np.zeros(nq, dtype=np.int64)
+        for _ in range(self.depth):
+            c1, c2 = 2 * node + 1, 2 * node + 2
+            node = np.where(_box_d2(p, self.lo[c1], self.hi[c1]) <= _box_d2(p, self.lo[c2], self.hi[c2]), c1, c2)
+        _, bound = self._leaves(allq, node, p, nq)
+        # Exact: every leaf whose box is within the bound (<=, so ties resolve to the lowest position).
+        qi, node = allq, np.zeros(nq, dtype=np.int64)
+        for _ in range(self.depth):
+            qi = np.repeat(qi, 2)
+            node = np.stack([2 * node + 1, 2 * node + 2], axis=1).ravel()
+            keep = _box_d2(p[qi], self.lo[node], self.hi[node]) <= bound[qi]
+            qi, node = qi[keep], node[keep]
+        return self._leaves(qi, node, p, nq)
+
+
+@dataclasses.dataclass
+class GridIndex:
+    lat: Any  # (rows,) or (rows, cols), NaN where masked
+    lon: Any  # (cols,) or (rows, cols)
+    tree: Optional[KDTree] = None  # curvilinear grids
+    ids: Any = None  # flat cell index of each tree point (cells with finite coordinates)
+
+    @property
+    def curvilinear(self) -> bool:
+        return self.lat.ndim == 2
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        if self.curvilinear:
+            return int(self.lat.shape[0]), int(self.lat.shape[1])
+        return int(self.lat.size), int(self.lon.size)
+
+    def nearest(self, lon: Any, lat: Any) -> Tuple[Any, Any]:
+        """(row, col) int64 arrays of the nearest cell of each (lon, lat) point."""
+        import numpy as np  # type: ignore
+
+        lon = np.asarray(lon, dtype=float).ravel()
+        lat = np.asarray(lat, dtype=float).ravel()
+        if not self.curvilinear:
+            x, _ = lon_frame(self.lon, lon)
+            return nearest_1d(self.lat, lat), nearest_1d(self.lon, x)
+        assert self.tree is not None
+        pos, _ = self.tree.query(to_xyz(lon, lat))
+        flat = self.ids[pos]
+        ncols = self.shape[1]
+        return flat // ncols, flat % ncols
+
+    def cell_lonlat(self, row: Any, col: Any) -> Tuple[Any, Any]:
+        if self.curvilinear:
+            return self.lon[row, col], self.lat[row, col]
+        return self.lon[col], self.lat[row]
+
+    def dist2(self, row: Any, col: Any, lon: float, lat: float) -> Any:
+        """
+        Distance measure between cells and one point for SHUD's GLDAS remap: squared degrees
+        (with the 0..360 seam) on regular grids, as SHUD; squared chord on curvilinear grids.
+        """
+        import numpy as np  # type: ignore
+
+        row, col = np.atleast_1d(row), np.atleast_1d(col)
+        if self.curvilinear:
+            d = to_xyz(self.lon[row, col], self.lat[row, col]) - to_xyz([lon], [lat])
+            return np.where(np.isfinite(d).all(axis=1), (d * d).sum(axis=1), np.inf)
+        x, lon_0360 = lon_frame(self.lon, np.asarray([lon], dtype=float))
+        dlon = np.abs(self.lon[col] - x[0])
+        if lon_0360:
+            dlon = np.minimum(dlon, 360.0 - dlon)
+        dlat = np.abs(self.lat[row] - float(lat))
+        return dlon * dlon + dlat * dlat
+
+    def inside(self, lon: Any, lat: Any) -> Any:
+        """
+        Whether points fall on the grid: within half a cell of the coordinate range (regular),
+        or within one cell spacing of the nearest valid centre (curvilinear).
+        """
+        import numpy as np  # type: ignore
+
+        lon = np.asarray(lon, dtype=float).ravel()
+        lat = np.asarray(lat, dtype=float).ravel()
+        if not self.curvilinear:
+            x, _ = lon_frame(self.lon, lon)
+            half_lat = 0.5 * float(np.median(np.abs(np.diff(self.lat)))) if self.lat.size > 1 else 0.0
+            half_lon = 0.5 * float(np.median(np.abs(np.diff(self.lon)))) if self.lon.size > 1 else 0.0
+            return (
+                (float(self.lat.min()) - half_lat <= lat)
+                & (lat <= float(self.lat.max()) + half_lat)
+                & (float(self.lon.min()) - half_lon <= x)
+                & (x <= float(self.lon.max()) + half_lon)
+            )
+        assert self.tree is not None
+        pos, d2 = self.tree.query(to_xyz(lon, lat))
+        rows, cols = self.shape
+        r, c = self.ids[pos] // cols, self.ids[pos] % cols
+        centre = self.tree.xyz[pos]
+        spacing2 = np.zeros(lon.size)
+        for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            rr, cc = np.clip(r + dr, 0, rows - 1), np.clip(c + dc, 0, cols - 1)
+            nb = to_xyz(self.lon[rr, cc], self.lat[rr, cc]) - centre
+            spacing2 = np.fmax(spacing2, (nb * nb).sum(axis=1))
+        return d2 <= spacing2
+
+
+def grid_index(lat_arr: Any, lon_arr: Any, *, cache: bool = True) -> GridIndex:
+    """Index of a grid given its lat/lon coordinates (both 1-D, or both 2-D of one shape)."""
+    import numpy as np  # type: ignore
+
+    lat = np.ascontiguousarray(np.ma.filled(np.ma.asarray(lat_arr, dtype=float), np.nan))
+    lon = np.ascontiguousarray(np.ma.filled(np.ma.asarray(lon_arr, dtype=float), np.nan))
+    if lat.ndim != lon.ndim or lat.ndim not in (1, 2) or (lat.ndim == 2 and lat.shape != lon.shape):
+        raise ValueError(
+            f"lat/lon coordinates must both be 1-D, or 2-D with one shape (got {lat.shape} and {lon.shape})"
+        )
+    if lat.ndim == 1:
+        return GridIndex(lat=lat, lon=lon)
+
+    h = hashlib.sha1()
+    h.update(f"{lat.shape}\0".encode("utf-8"))
+    h.update(lat.tobytes())
+    h.update(lon.tobytes())
+    key = h.hexdigest()
+    if key in _MEMO:
+        return _MEMO[key]
+
+    ok = np.isfinite(lat) & np.isfinite(lon)
+    if not bool(ok.any()):
+        raise ValueError("Curvilinear grid has no cell with finite lat/lon")
+    ids = np.flatnonzero(ok)
+    xyz = to_xyz(lon.ravel()[ids], lat.ravel()[ids])
+    path = os.path.join(cache_root(), "grid_index", f"{key}.npz")
+    tree: Optional[KDTree] = None
+    if cache and os.path.exists(path):
+        try:
+            with np.load(path) as z:
+                tree = KDTree(
+                    xyz=xyz,
+                    perm=z["perm"],
+                    start=z["start"],
+                    end=z["end"],
+                    lo=z["lo"],
+                    hi=z["hi"],
+                    depth=int(z["depth"]),
+                )
+        except Exception:
+            tree = None  # unreadable cache entry: rebuild and overwrite
+    if tree is None:
+        tree = KDTree.build(xyz)
+        if cache:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp.npz"
+                np.savez(
+                    tmp, perm=tree.perm, start=tree.start, end=tree.end, lo=tree.lo, hi=tree.hi, depth=np.int64(tree.depth)
+                )
+                os.replace(tmp, path)
+            except OSError:
+                pass  # read-only cache: the tree is rebuilt next time
+    gi = GridIndex(lat=lat, lon=lon, tree=tree, ids=ids)
+    _MEMO[key] = gi
+    return gi
+
+
+def read_grid(ds: Any, lat_var: str, lon_var: str) -> Tuple[GridIndex, str, str]:
+    """(index, row dimension, column dimension) of an open netCDF4 dataset's lat/lon coordinates."""
+    lat_v = ds.variables[lat_var]
+    lon_v = ds.variables[lon_var]
+    if lat_v.ndim == 2:
+        if tuple(lon_v.dimensions) != tuple(lat_v.dimensions):
+            raise ValueError(f"2-D {lat_var}/{lon_var} must share dimensions: {lat_v.dimensions} vs {lon_v.dimensions}")
+        row_dim, col_dim = lat_v.dimensions
+    else:
+        row_dim, col_dim = lat_v.dimensions[0], lon_v.dimensions[0]
+    return grid_index(lat_v[:], lon_v[:]), row_dim, col_dim
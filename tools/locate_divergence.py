@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Locate the first diverging output record between two SHUD runs.
+
+Inputs are either two legacy binary outputs (*.dat) or a legacy *.dat plus a
+NetCDF output variable. The tool bisects over the record (time) axis instead of
+scanning it, so it needs O(log N) record reads:
+
+- record i "matches" if its time and all values agree (exactly by default, or
+  within --tol)
+- once two runs diverge they are assumed to stay diverged (true for any
+  deterministic solver state), so the first diverging record is a bisection
+
+For *.dat vs *.dat the record payloads are compared as raw bytes first, so a
+matching record never needs to be decoded. Use --verify-prefix to additionally
+hash the whole matching prefix in blocks (O(N) sequential reads) and catch
+transient divergences that later re-converge.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from compare_output import LegacyBinReader, _require_netCDF4
+
+
+def _eprint(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
+class _NetcdfRecords:
+    """Expose a NetCDF output variable as legacy-ordered records (one per time index)."""
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        var_name: str,
+        time_dim: str,
+        obj_dim: str,
+        icol_1based: Sequence[int],
+    ) -> None:
+        netCDF4 = _require_netCDF4()
+        self.path = path
+        self._ds = netCDF4.Dataset(path, "r")
+        try:
+            if var_name not in self._ds.variables:
+                raise ValueError(f"var not found in NetCDF: {path}: {var_name}")
+            self._var = self._ds.variables[var_name]
+            self.is_float32 = str(self._var.dtype) == "float32"
+            dims = list(self._var.dimensions)
+            if not obj_dim:
+                cand = [d for d in dims if d != time_dim]
+                if len(cand) != 1:
+                    raise ValueError(f"Cannot infer obj_dim from dims={dims}; pass --obj-dim")
+                obj_dim = cand[0]
+            if time_dim not in dims or obj_dim not in dims:
+                raise ValueError(f"var dims do not include {time_dim}/{obj_dim}: {var_name} dims={dims}")
+            self._dims = dims
+            self._time_dim = time_dim
+            self._obj_dim = obj_dim
+            self._obj_idx0 = [int(i) - 1 for i in icol_1based]
+            nobj = len(self._ds.dimensions[obj_dim])
+            bad = [i + 1 for i in self._obj_idx0 if i < 0 or i >= nobj]
+            if bad:
+                raise ValueError(f"legacy icol out of range for NetCDF {obj_dim}={nobj}: {bad[:5]}")
+            self.num_records = len(self._ds.dimensions[time_dim])
+            self._time_var = self._ds.variables.get(time_dim)
+        except Exception:
+            self._ds.close()
+            raise
+
+    def close(self) -> None:
+        self._ds.close()
+
+    def time_at(self, i: int) -> Optional[float]:
+        if self._time_var is None:
+            return None
+        return float(self._time_var[int(i)])
+
+    def record(self, i: int) -> Tuple[Optional[float], List[float]]:
+        import numpy as np  # type: ignore
+
+        index: List[Any] = []
+        for d in self._dims:
+            if d == self._time_dim:
+                index.append(int(i))
+            elif d == self._obj_dim:
+                index.append(slice(None))
+            else:
+                index.append(0)
+        row = np.ma.filled(np.ma.asarray(self._var[tuple(index)], dtype=float), np.nan)
+        return self.time_at(i), [float(row[j]) for j in self._obj_idx0]
+
+
+def _values_equal(a: float, b: float, tol: float) -> bool:
+    if a == b:
+        return True
+    if math.isnan(a) and math.isnan(b):
+        return True
+    return abs(a - b) <= tol
+
+
+class _Comparator:
+    def __init__(self, a: LegacyBinReader, b: Any, *, tol: float, time_tol: float) -> None:
+        self.a = a
+        self.b = b
+        self.tol = float(tol)
+        self.time_tol = float(time_tol)
+        self.record_reads = 0
+        self._bytes_fast_path = isinstance(b, LegacyBinReader) and self.tol == 0.0
+
+    def diff(self, i: int) -> Dict[str, Any]:
+        """Return {} when record i matches, else a description of the mismatch."""
+        self.record_reads += 1
+        if self._bytes_fast_path and self.a.record_bytes(i) == self.b.record_bytes(i):
+            return {}
+        ta, va = self.a.record(i)
+        tb, vb = self.b.record(i)
+        out: Dict[str, Any] = {}
+        if tb is not None and abs(float(ta) - float(tb)) > self.time_tol:
+            out["time"] = {"a": float(ta), "b": float(tb)}
+        cols: List[Dict[str, Any]] = []
+        icol = self.a.icol_1based
+        if getattr(self.b, "is_float32", False):
+            import numpy as np  # type: ignore
+
+            # NetCDF output is float32: compare at the precision it was written with.
+            va = [float(v) for v in np.asarray(va, dtype=float).astype(np.float32)]
+        for j, (x, y) in enumerate(zip(va, vb)):
+            if not _values_equal(float(x), float(y), self.tol):
+                cols.append({"col": j, "index_1based": int(icol[j]), "a": float(x), "b": float(y), "diff": float(x) - float(y)})
+        if cols:
+            out["columns"] = cols
+        return out
+
+
+def _bisect_first_divergence(cmp: _Comparator, n: int) -> Tuple[Optional[int], Dict[str, Any]]:
+    if n <= 0:
+        return None, {}
+    last = cmp.diff(n - 1)
+    if not last:
+        return None, {}
+    lo, hi = 0, n - 1
+    hi_diff = last
+    while lo < hi:
+        mid = (lo + hi) // 2
+        d = cmp.diff(mid)
+        if d:
+            hi, hi_diff = mid, d
+        else:
+            lo = mid + 1
+    return hi, hi_diff
+
+
+def _verify_prefix(a: LegacyBinReader, b: LegacyBinReader, n: int, *, block: int) -> Optional[int]:
+    """Return the first block start whose hash differs within [0, n), or None."""
+    for start in range(0, n, block):
+        stop = min(n, start + block)
+        ha = hashlib.blake2b(digest_size=16)
+        hb = hashlib.blake2b(digest_size=16)
+        for i in range(start, stop):
+            ha.update(a.record_bytes(i))
+            hb.update(b.record_bytes(i))
+        if ha.digest() != hb.digest():
+            return start
+    return None
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description="Bisect two SHUD outputs for the first diverging record")
+    ap.add_argument("--a", required=True, help="Reference legacy binary output (*.dat)")
+    ap.add_argument("--b", required=True, help="Candidate output: legacy *.dat or NetCDF (*.nc)")
+    ap.add_argument("--var", default="", help="NetCDF variable name (required when --b is NetCDF)")
+    ap.add_argument("--time-dim", default="time", help="NetCDF time dimension name (default: time)")
+    ap.add_argument("--obj-dim", default="", help="NetCDF object dimension name (inferred if unambiguous)")
+    ap.add_argument("--tol", type=float, default=0.0, help="Absolute value tolerance (default: 0, exact)")
+    ap.add_argument("--time-tol", type=float, default=1e-6, help="Time match tolerance (minutes)")
+    ap.add_argument(
+        "--verify-prefix",
+        action="store_true",
+        help="(*.dat vs *.dat) also hash the matching prefix in blocks to catch transient divergences",
+    )
+    ap.add_argument("--block", type=int, default=4096, help="Records per hash block for --verify-prefix")
+    ap.add_argument("--out-json", default="", help="Write JSON report (optional)")
+
+    args = ap.parse_args(list(argv))
+    a_path = os.path.abspath(args.a)
+    b_path = os.path.abspath(args.b)
+    b_is_nc = b_path.endswith(".nc") or b_path.endswith(".nc4")
+    if b_is_nc and not args.var:
+        raise ValueError("--var is required when --b is a NetCDF file")
+    if args.verify_prefix and b_is_nc:
+        raise ValueError("--verify-prefix is only supported for *.dat vs *.dat")
+    if args.block <= 0:
+        raise ValueError(f"--block must be positive: {args.block}")
+
+    a = LegacyBinReader(a_path)
+    b: Any = None
+    try:
+        if b_is_nc:
+            b = _NetcdfRecords(
+                b_path,
+                var_name=args.var,
+                time_dim=args.time_dim,
+                obj_dim=args.obj_dim.strip(),
+                icol_1based=a.icol_1based,
+            )
+        else:
+            b = LegacyBinReader(b_path)
+            if b.icol_1based != a.icol_1based:
+                raise ValueError(f"Legacy column layout differs (icol[]): {a_path} vs {b_path}")
+
+        n = min(a.num_records, b.num_records)
+        cmp = _Comparator(a, b, tol=float(args.tol), time_tol=float(args.time_tol))
+        first, detail = _bisect_first_divergence(cmp, n)
+
+        prefix_block: Optional[int] = None
+        if args.verify_prefix and isinstance(b, LegacyBinReader) and float(args.tol) == 0.0:
+            prefix_block = _verify_prefix(a, b, first if first is not None else n, block=int(args.block))
+            if prefix_block is not None:
+                # Non-monotone divergence: scan the offending block linearly.
+                stop = min(n, prefix_block + int(args.block))
+                for i in range(prefix_block, stop):
+                    d = cmp.diff(i)
+                    if d:
+                        first, detail = i, d
+                        break
+
+        if first is None and a.num_records != b.num_records:
+            first = n
+            detail = {"length": {"a": a.num_records, "b": b.num_records}}
+
+        report: Dict[str, Any] = {
+            "a": a_path,
+            "b": b_path,
+            "var": args.var or None,
+            "tol": float(args.tol),
+            "num_records": {"a": a.num_records, "b": b.num_records},
+            "record_reads": cmp.record_reads,
+            "prefix_verified": bool(args.verify_prefix),
+            "first_divergence": None,
+        }
+        if first is not None:
+            t_min = a.time_at(first) if first < a.num_records else None
+            report["first_divergence"] = {"record": int(first), "t_min": t_min, **detail}
+    finally:
+        a.close()
+        if b is not None:
+            b.close()
+
+    print("== Divergence locate summary (a vs b) ==")
+    print(f"- records: a={report['num_records']['a']} b={report['num_records']['b']}")
+    print(f"- record reads: {report['record_reads']}")
+    fd = report["first_divergence"]
+    if fd is None:
+        print("- identical")
+    else:
+        print(f"- first diverging record: {fd['record']} (t_min={fd['t_min']})")
+        if "time" in fd:
+            print(f"  time: a={fd['time']['a']} b={fd['time']['b']}")
+        if "length" in fd:
+            print(f"  length: a={fd['length']['a']} b={fd['length']['b']}")
+        cols = fd.get("columns", [])
+        if cols:
+            shown = ",".join(str(c["index_1based"]) for c in cols[:20])
+            more = f" (+{len(cols) - 20} more)" if len(cols) > 20 else ""
+            max_abs = max(abs(float(c["diff"])) if math.isfinite(float(c["diff"])) else math.inf for c in cols)
+            print(f"  columns: {len(cols)} diverging, index_1based={shown}{more}, max_abs={max_abs:.6g}")
+
+    if args.out_json:
+        out_path = os.path.abspath(args.out_json)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Wrote: {out_path}")
+
+    return 2 if fd is not None else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+One-pass per-object statistics over SHUD legacy binary output (*.dat).
+
+For every legacy column (element / river segment / lake, keyed by icol[]) this
+computes count, min, max, mean, std and the time of the peak (first record at
+the maximum), over the whole run or per daily/monthly window. Non-finite values
+are skipped: count is the number of finite records per object, and objects
+without any are NaN.
+
+The reduction is a single streaming pass through the memory-mapped legacy
+reader: each input is split into contiguous record ranges, every range is
+reduced block by block in a worker process, and partial aggregates are merged
+with the pairwise (Chan et al.) mean/variance update. Nothing is ever loaded
+whole into RAM.
+
+Output: one NetCDF4 file with one group per input variable (e.g. /rivqdown):
+  index_1based(obj), window_start(window), count(window, obj),
+  min/max/mean/std/time_of_max(window, obj)
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import dataclasses
+import datetime as dt
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from compare_output import LegacyBinReader, _require_netCDF4
+
+
+WINDOWS = ("none", "daily", "monthly")
+
+
+def _eprint(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
+def _parse_yyyymmdd(v: int) -> dt.datetime:
+    return dt.datetime(v // 10000, (v // 100) % 100, v % 100, 0, 0, 0, tzinfo=dt.timezone.utc)
+
+
+@dataclasses.dataclass
+class _Agg:
+    """Partial aggregate of one window; every field is per object, NaN records are skipped."""
+
+    n: Any
+    mean: Any
+    m2: Any
+    vmin: Any
+    vmax: Any
+    tmax: Any
+
+    @classmethod
+    def of_block(cls, times: Any, vals: Any) -> "_Agg":
+        import numpy as np  # type: ignore
+
+        valid = np.isfinite(vals)
+        n = valid.sum(axis=0)
+        empty = n == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(valid, vals, 0.0).sum(axis=0) / n
+        masked_max = np.where(valid, vals, -np.inf)
+        imax = masked_max.argmax(axis=0)
+        return cls(
+            n=n,
+            mean=mean,
+            m2=np.where(valid, (vals - mean) ** 2, 0.0).sum(axis=0),
+            vmin=np.where(empty, np.nan, np.where(valid, vals, np.inf).min(axis=0)),
+            vmax=np.where(empty, np.nan, masked_max.max(axis=0)),
+            tmax=np.where(empty, np.nan, np.asarray(times, dtype=np.float64)[imax]),
+        )
+
+    def merge(self, other: "_Agg") -> None:
+        """Fold a later (in time) partial aggregate into this one."""
+        import numpy as np  # type: ignore
+
+        n = self.n + other.n
+        both = (self.n > 0) & (other.n > 0)
+        nz = np.maximum(n, 1)
+        delta = np.where(both, other.mean - self.mean, 0.0)
+        self.mean = np.where(self.n > 0, self.mean + delta * (other.n / nz), other.mean)
+        self.m2 = self.m2 + other.m2 + delta * delta * (self.n * other.n / nz)
+        self.vmin = np.fmin(self.vmin, other.vmin)
+        # Strictly greater keeps the earliest peak on ties.
+        later_peak = (other.vmax > self.vmax) | (np.isnan(self.vmax) & ~np.isnan(other.vmax))
+        self.tmax = np.where(later_peak, other.tmax, self.tmax)
+        self.vmax = np.where(later_peak, other.vmax, self.vmax)
+        self.n = n
+
+
+def _window_keys(times: Any, window: str, forc_start: Optional[int]) -> Any:
+    """Window start (minutes since ForcStartTime) of each record time."""
+    import numpy as np  # type: ignore
+
+    if window == "none":
+        return np.zeros(times.shape, dtype=np.float64)
+    if window == "daily":
+        return np.floor(times / 1440.0) * 1440.0
+    assert forc_start is not None
+    base = np.datetime64(_parse_yyyymmdd(forc_start).strftime("%Y-%m-%d"), "s")
+    stamps = base + np.round(times * 60.0).astype("timedelta64[s]")
+    month_start = stamps.astype("datetime64[M]").astype("datetime64[s]")
+    return (month_start - base).astype(np.float64) / 60.0
+
+
+def _reduce_range(task: Tuple[str, int, int, str, Optional[int], int]) -> Dict[float, _Agg]:
+    path, start, stop, window, forc_start, block_records = task
+    import numpy as np  # type: ignore
+
+    out: Dict[float, _Agg] = {}
+    with LegacyBinReader(path) as rd:
+        for b0 in range(start, stop, block_records):
+            b1 = min(stop, b0 + block_records)
+            times, vals = rd.read_block(b0, b1)
+            keys = _window_keys(times, window, forc_start)
+            # Records are time-ordered, so each window is one contiguous run within the block.
+            cuts = np.nonzero(np.diff(keys))[0] + 1
+            for r0, r1 in zip(np.r_[0, cuts], np.r_[cuts, len(keys)]):
+                key = float(keys[r0])
+                part = _Agg.of_block(times[r0:r1], vals[r0:r1])
+                if key in out:
+                    out[key].merge(part)
+                else:
+                    out[key] = part
+    return out
+
+
+def _var_name(path: str) -> str:
+    base = os.path.basename(path)
+    if base.endswith(".dat"):
+        base = base[: -len(".dat")]
+    return base.rsplit(".", 1)[-1]
+
+
+def _write_stats(
+    out_path: str,
+    results: List[Tuple[str, List[int], Dict[float, _Agg]]],
+    *,
+    window: str,
+    time_units: str,
+) -> None:
+    netCDF4 = _require_netCDF4()
+    import numpy as np  # type: ignore
+
+    tmp = out_path + ".tmp"
+    try:
+        with netCDF4.Dataset(tmp, "w", format="NETCDF4") as ds:
+            ds.title = "SHUD output per-object statistics"
+            ds.window = window
+            ds.history = (
+                f"{dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds')}: "
+                "computed by tools/output_stats.py"
+            )
+            for path, icol, aggs in results:
+                g = ds.createGroup(_var_name(path))
+                g.source_file = os.path.basename(path)
+                keys = sorted(aggs)
+                g.createDimension("obj", len(icol))
+                g.createDimension("window", len(keys))
+                iv = g.createVariable("index_1based", "i4", ("obj",))
+                iv.long_name = "legacy icol (1-based object index)"
+                iv[:] = np.asarray(icol, dtype=np.int32)
+                wv = g.createVariable("window_start", "f8", ("window",))
+                wv.units = time_units
+                wv[:] = np.asarray(keys, dtype=np.float64)
+
+                cv = g.createVariable("count", "i4", ("window", "obj"), zlib=True, complevel=4, shuffle=True)
+                cv.long_name = "number of finite records"
+                cv[:] = np.vstack([aggs[k].n for k in keys]).astype(np.int32)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    std = [np.where(aggs[k].n > 0, np.sqrt(aggs[k].m2 / aggs[k].n), np.nan) for k in keys]
+                fields = {
+                    "min": [aggs[k].vmin for k in keys],
+                    "max": [aggs[k].vmax for k in keys],
+                    "mean": [aggs[k].mean for k in keys],
+                    "std": std,
+                    "time_of_max": [aggs[k].tmax for k in keys],
+                }
+                for name, rows in fields.items():
+                    v = g.createVariable(name, "f8", ("window", "obj"), zlib=True, complevel=4, shuffle=True)
+                    if name == "time_of_max":
+                        v.units = time_units
+                    if name == "std":
+                        v.long_name = "population standard deviation"
+                    v[:] = np.vstack(rows)
+        os.replace(tmp, out_path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description="One-pass per-object statistics over SHUD legacy *.dat output")
+    ap.add_argument("inputs", nargs="+", help="Legacy binary output files (*.dat)")
+    ap.add_argument("--out", required=True, help="Output NetCDF path")
+    ap.add_argument("--window", choices=WINDOWS, default="none", help="Aggregation window (default: none)")
+    ap.add_argument("--forc-start", type=int, default=0, help="ForcStartTime YYYYMMDD (required for --window monthly)")
+    ap.add_argument("--tsd-forc", default="", help="Read ForcStartTime from this <prj>.tsd.forc instead of --forc-start")
+    ap.add_argument("--jobs", type=int, default=0, help="Worker processes (default: CPU count)")
+    ap.add_argument("--block-records", type=int, default=8192, help="Records per reduction block (default: 8192)")
+
+    args = ap.parse_args(list(argv))
+    if args.block_records <= 0:
+        raise ValueError(f"--block-records must be positive: {args.block_records}")
+
+    forc_start: Optional[int] = int(args.forc_start) if args.forc_start else None
+    if args.tsd_forc:
+        with open(args.tsd_forc, "r", encoding="utf-8") as f:
+            forc_start = int(f.readline().split()[1])
+    if args.window == "monthly" and forc_start is None:
+        raise ValueError("--window monthly needs --forc-start or --tsd-forc (calendar months)")
+    if forc_start is not None:
+        time_units = f"minutes since {_parse_yyyymmdd(forc_start).strftime('%Y-%m-%d')} 00:00:00 UTC"
+    else:
+        time_units = "minutes since ForcStartTime"
+
+    jobs = int(args.jobs) if int(args.jobs) > 0 else (os.cpu_count() or 1)
+    paths = [os.path.abspath(p) for p in args.inputs]
+
+    # Split each input into ~jobs contiguous ranges (block-aligned) so all cores stay busy.
+    tasks: List[Tuple[str, int, int, str, Optional[int], int]] = []
+    layout: List[Tuple[str, List[int], int]] = []
+    total_bytes = 0
+    for p in paths:
+        with LegacyBinReader(p) as rd:
+            n = rd.num_records
+            layout.append((p, list(rd.icol_1based), n))
+        if n == 0:
+            raise ValueError(f"No records in legacy bin: {p}")
+        total_bytes += os.path.getsize(p)
+        per = max(int(args.block_records), -(-n // jobs))
+        per = -(-per // int(args.block_records)) * int(args.block_records)
+        for s in range(0, n, per):
+            tasks.append((p, s, min(n, s + per), args.window, forc_start, int(args.block_records)))
+
+    t0 = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        partials = list(pool.map(_reduce_range, tasks))
+
+    merged: Dict[str, Dict[float, _Agg]] = {p: {} for p in paths}
+    for task, part in zip(tasks, partials):  # tasks are in time order per file
+        acc = merged[task[0]]
+        for key in sorted(part):
+            if key in acc:
+                acc[key].merge(part[key])
+            else:
+                acc[key] = part[key]
+    wall = time.perf_counter() - t0
+
+    out_path = os.path.abspath(args.out)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    _write_stats(
+        out_path,
+        [(p, icol, merged[p]) for (p, icol, _) in layout],
+        window=args.window,
+        time_units=time_units,
+    )
+
+    print("== Output statistics ==")
+    for p, icol, n in layout:
+        print(f"- {_var_name(p)}: objects={len(icol)} records={n} windows={len(merged[p])}")
+    print(f"- {total_bytes / 1e6:.1f} MB in {wall:.2f}s ({(total_bytes / 1e6) / wall if wall > 0 else 0.0:.1f} MB/s, jobs={jobs})")
+    print(f"Wrote: {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
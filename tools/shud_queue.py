@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Local SQLite-backed job queue for `tools/shudnc.py` across many projects.
+
+Jobs are (config, command, profile, extra args) tuples, e.g. one `run` per
+basin's `projects/<case>/shud.yaml`. `worker` pulls queued jobs while their
+CPU and memory slots fit the node budget, runs each as a `shudnc.py` child in
+its own session, retries transient failures with back-off and records per-job
+timing (wall/user/sys, peak RSS). Several workers (or `submit`/`status`/`cancel`
+from other shells) may share one database; claims are made in IMMEDIATE
+transactions so a job is started exactly once.
+
+Exit codes of the child decide retries: 0 is done, 2 (shudnc ConfigError) is a
+permanent failure, anything else (including death by signal, e.g. the OOM
+killer, of the child or of the SHUD it ran: shudnc then exits 128 + signum) is
+retried up to --retries times. A job whose CPU or memory slot exceeds the
+worker's whole budget can never start and is failed by the worker.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from shudnc import ConfigError, _as_int, _get, _load_yaml, _print_table, _ProcMonitor, _repo_root
+
+
+STATES = ("queued", "running", "done", "failed", "cancelled")
+
+# Child exit codes that retrying cannot fix (shudnc exits 2 on configuration errors).
+PERMANENT_RETURNCODES = (2,)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    config TEXT NOT NULL,
+    command TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    args TEXT NOT NULL DEFAULT '[]',
+    cpus INTEGER NOT NULL DEFAULT 1,
+    mem_mb INTEGER NOT NULL DEFAULT 0,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_retries INTEGER NOT NULL DEFAULT 2,
+    not_before REAL NOT NULL DEFAULT 0,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    worker TEXT,
+    pid INTEGER,
+    returncode INTEGER,
+    wall_sec REAL,
+    user_sec REAL,
+    sys_sec REAL,
+    max_rss_kb INTEGER,
+    log TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, priority, id);
+"""
+
+
+def _eprint(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    # Autocommit mode: transactions are explicit (BEGIN IMMEDIATE) where several processes race.
+    conn = sqlite3.connect(str(db_path), timeout=30.0, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _mem_total_mb() -> int:
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _default_slots(config_path: Path, profile: str) -> Tuple[int, int]:
+    """profiles.<name>.cpus / profiles.<name>.mem_mb from the job's shud.yaml (1 CPU, no memory limit)."""
+    cfg = _load_yaml(config_path)
+    profile_cfg = _get(cfg, f"profiles.{profile}", required=False)
+    if profile_cfg is None:
+        raise ConfigError(f"Profile not found in {config_path}: {profile}")
+    cpus = _as_int(profile_cfg.get("cpus", 1), key=f"profiles.{profile}.cpus")
+    mem_mb = _as_int(profile_cfg.get("mem_mb", 0), key=f"profiles.{profile}.mem_mb")
+    return cpus, mem_mb
+
+
+def _submit(conn: sqlite3.Connection, args: argparse.Namespace, repo_root: Path) -> int:
+    # Resolve every (config, profile) first so a bad entry queues nothing.
+    pending: List[Tuple[Path, str, int, int]] = []
+    for config in args.configs:
+        config_path = Path(config)
+        if not config_path.is_absolute():
+            config_path = (repo_root / config_path).resolve()
+        if not config_path.exists():
+            raise ConfigError(f"Config not found: {config_path}")
+        for profile in [p.strip() for p in args.profile.split(",") if p.strip()]:
+            cpus, mem_mb = _default_slots(config_path, profile)
+            pending.append(
+                (config_path, profile, args.cpus if args.cpus > 0 else cpus, args.mem_mb if args.mem_mb > 0 else mem_mb)
+            )
+    for config_path, profile, cpus, mem_mb in pending:
+        cur = conn.execute(
+            "INSERT INTO jobs (config, command, profile, args, cpus, mem_mb, priority, max_retries, submitted) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                str(config_path),
+                args.command,
+                profile,
+                json.dumps(args.extra),
+                max(1, cpus),
+                max(0, mem_mb),
+                args.priority,
+                max(0, args.retries),
+                time.time(),
+            ),
+        )
+        print(f"Submitted: job {cur.lastrowid} {args.command} {profile} ({config_path}) cpus={cpus} mem_mb={mem_mb}")
+    return 0 if pending else 1
+
+
+def _fmt_sec(v: Optional[float]) -> str:
+    return "-" if v is None else f"{v:.1f}"
+
+
+def _status(conn: sqlite3.Connection, args: argparse.Namespace, repo_root: Path) -> int:
+    where = ""
+    params: List[Any] = []
+    if args.state:
+        states = [s.strip() for s in args.state.split(",") if s.strip()]
+        unknown = [s for s in states if s not in STATES]
+        if unknown:
+            raise ConfigError(f"Unknown state(s): {unknown}; expected {list(STATES)}")
+        where = f"WHERE state IN ({','.join('?' * len(states))})"
+        params = states
+    rows = conn.execute(f"SELECT * FROM jobs {where} ORDER BY id", params).fetchall()
+    if args.json:
+        print(json.dumps([dict(r) for r in rows], indent=2, ensure_ascii=False))
+        return 0
+
+    now = time.time()
+    table: List[Tuple[str, ...]] = [
+        (
+            "id", "state", "config", "command", "profile", "cpus", "mem_mb",
+            "tries", "wait_s", "wall_s", "max_rss_MB", "rc",
+        )
+    ]
+    for r in rows:
+        try:
+            config = os.path.relpath(r["config"], repo_root)
+        except ValueError:
+            config = r["config"]
+        state = r["state"] + ("*" if r["cancel_requested"] and r["state"] == "running" else "")
+        wait = (r["started"] or r["finished"] or now) - r["submitted"] if r["state"] != "cancelled" else None
+        wall = r["wall_sec"] if r["wall_sec"] is not None else (now - r["started"] if r["state"] == "running" else None)
+        table.append(
+            (
+                str(r["id"]),
+                state,
+                config,
+                r["command"],
+                r["profile"],
+                str(r["cpus"]),
+                str(r["mem_mb"]),
+                f"{r['attempts']}/{r['max_retries'] + 1}",
+                _fmt_sec(wait),
+                _fmt_sec(wall),
+                "-" if r["max_rss_kb"] is None else f"{r['max_rss_kb'] / 1024:.0f}",
+                "-" if r["returncode"] is None else str(r["returncode"]),
+            )
+        )
+    _print_table(table)
+    if not rows:
+        return 0
+    counts = {s: 0 for s in STATES}
+    for r in rows:
+        counts[r["state"]] += 1
+    print("# " + " ".join(f"{s}={n}" for s, n in counts.items() if n))
+    return 0
+
+
+def _cancel(conn: sqlite3.Connection, args: argparse.Namespace, repo_root: Path) -> int:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if args.all:
+            rows = conn.execute("SELECT id, state FROM jobs WHERE state IN ('queued', 'running')").fetchall()
+        else:
+            ids = [_as_int(v, key="job id") for v in args.ids]
+            rows = conn.execute(
+                f"SELECT id, state FROM jobs WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall() if ids else []
+        for r in rows:
+            if r["state"] == "queued":
+                conn.execute("UPDATE jobs SET state = 'cancelled', finished = ? WHERE id = ?", (time.time(), r["id"]))
+                print(f"Cancelled: job {r['id']}")
+            elif r["state"] == "running":
+                # The owning worker kills the process group on its next poll.
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (r["id"],))
+                print(f"Cancel requested: job {r['id']} (running)")
+            else:
+                print(f"# job {r['id']} already {r['state']}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return 0
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _killpg(mon: _ProcMonitor) -> None:
+    """Terminate a job's whole process group (the shudnc child and whatever it started), then reap it."""
+    if mon.wait(timeout=0) is not None:
+        return
+    try:
+        os.killpg(mon.proc.pid, signal.SIGTERM)
+        if mon.wait(timeout=10) is None:
+            os.killpg(mon.proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    mon.wait()
+
+
+def _recover_orphans(conn: sqlite3.Connection, host: str) -> None:
+    """Requeue jobs left 'running' by a worker on this host that no longer exists."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for r in conn.execute("SELECT id, worker, pid FROM jobs WHERE state = 'running'").fetchall():
+            w_host, _, w_pid = str(r["worker"] or "").rpartition(":")
+            if w_host != host or not w_pid.isdigit() or _pid_alive(int(w_pid)):
+                continue
+            if r["pid"] and _pid_alive(int(r["pid"])):
+                try:
+                    os.killpg(int(r["pid"]), signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
+            conn.execute(
+                "UPDATE jobs SET state = 'queued', worker = NULL, pid = NULL, started = NULL WHERE id = ?", (r["id"],)
+            )
+            _eprint(f"WARNING: requeued job {r['id']} (worker {r['worker']} is gone)")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _fail_oversized(conn: sqlite3.Connection, *, cpus: int, mem_mb: int) -> None:
+    """Fail queued jobs that need more CPU (or memory) slots than the whole worker budget."""
+    rows = conn.execute(
+        "SELECT id, cpus, mem_mb FROM jobs WHERE state = 'queued' AND (cpus > ? OR (? > 0 AND mem_mb > ?))",
+        (cpus, mem_mb, mem_mb),
+    ).fetchall()
+    for r in rows:
+        cur = conn.execute(
+            "UPDATE jobs SET state = 'failed', finished = ? WHERE id = ? AND state = 'queued'", (time.time(), r["id"])
+        )
+        if cur.rowcount:
+            _eprint(
+                f"WARNING: job {r['id']} failed: needs cpus={r['cpus']} mem_mb={r['mem_mb']}, "
+                f"worker budget is cpus={cpus} mem_mb={mem_mb or 'unlimited'}"
+            )
+
+
+def _claim(conn: sqlite3.Connection, *, worker: str, free_cpus: int, free_mem_mb: int) -> List[sqlite3.Row]:
+    """Atomically mark as many queued jobs running as fit the free slots (priority, then FIFO)."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        claimed: List[sqlite3.Row] = []
+        rows = conn.execute(
+            "SELECT * FROM jobs WHERE state = 'queued' AND not_before <= ? ORDER BY priority DESC, id", (now,)
+        ).fetchall()
+        for r in rows:
+            if r["cpus"] > free_cpus or (free_mem_mb >= 0 and r["mem_mb"] > free_mem_mb):
+                continue
+            conn.execute(
+                "UPDATE jobs SET state = 'running', worker = ?, started = ?, attempts = attempts + 1, "
+                "returncode = NULL WHERE id = ?",
+                (worker, now, r["id"]),
+            )
+            free_cpus -= r["cpus"]
+            if free_mem_mb >= 0:
+                free_mem_mb -= r["mem_mb"]
+            claimed.append(r)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return claimed
+
+
+def _after_exit(
+    rc: int, *, attempts: int, max_retries: int, cancelled: bool, retry_delay_sec: float, now: float
+) -> Tuple[str, float]:
+    """(state, not_before) of a job whose child exited with `rc` on its `attempts`-th run (exponential back-off)."""
+    if cancelled:
+        return "cancelled", 0.0
+    if rc == 0:
+        return "done", 0.0
+    if rc not in PERMANENT_RETURNCODES and attempts <= max_retries:
+        return "queued", now + retry_delay_sec * 2 ** (attempts - 1)
+    return "failed", 0.0
+
+
+def _worker(conn: sqlite3.Connection, args: argparse.Namespace, repo_root: Path) -> int:
+    host = socket.gethostname()
+    worker = f"{host}:{os.getpid()}"
+    cpus = args.cpus if args.cpus > 0 else (os.cpu_count() or 1)
+    mem_mb = args.mem_mb if args.mem_mb > 0 else _mem_total_mb()
+    log_dir = Path(args.db).resolve().parent / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    shudnc = str(Path(__file__).resolve().parent / "shudnc.py")
+    print(f"# worker {worker}: cpus={cpus} mem_mb={mem_mb or 'unlimited'} db={args.db}")
+
+    _recover_orphans(conn, host)
+    running: Dict[int, Tuple[sqlite3.Row, _ProcMonitor]] = {}
+    idle_since = time.monotonic()
+    try:
+        while True:
+            _fail_oversized(conn, cpus=cpus, mem_mb=mem_mb)
+            used_cpus = sum(r["cpus"] for r, _ in running.values())
+            used_mem = sum(r["mem_mb"] for r, _ in running.values())
+            for r in _claim(
+                conn,
+                worker=worker,
+                free_cpus=cpus - used_cpus,
+                free_mem_mb=(mem_mb - used_mem) if mem_mb > 0 else -1,
+            ):
+                cmd = [sys.executable, shudnc, r["config"], r["command"], "--profile", r["profile"]]
+                cmd += json.loads(r["args"])
+                log_file = log_dir / f"job{r['id']}.log"
+                print(f"$ {' '.join(cmd)} > {log_file}  # job {r['id']} attempt {r['attempts'] + 1}")
+                sys.stdout.flush()
+                with log_file.open("ab") as f:
+                    f.write(f"# attempt {r['attempts'] + 1} on {worker}\n".encode("utf-8"))
+                    f.flush()
+                    proc = subprocess.Popen(
+                        cmd, cwd=str(repo_root), stdout=f, stderr=subprocess.STDOUT, start_new_session=True
+                    )
+                conn.execute("UPDATE jobs SET pid = ?, log = ? WHERE id = ?", (proc.pid, str(log_file), r["id"]))
+                running[int(r["id"])] = (r, _ProcMonitor(proc))
+
+            if not running:
+                queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+                if args.exit_when_empty and queued == 0:
+                    print("# queue empty; worker exiting")
+                    return 0
+                if args.idle_exit_sec > 0 and time.monotonic() - idle_since >= args.idle_exit_sec:
+                    print(f"# idle for {args.idle_exit_sec:.0f}s; worker exiting")
+                    return 0
+            else:
+                idle_since = time.monotonic()
+
+            time.sleep(args.poll_sec)
+            cancel = {
+                int(row[0])
+                for row in conn.execute(
+                    "SELECT id FROM jobs WHERE cancel_requested = 1 AND state = 'running' AND worker = ?", (worker,)
+                )
+            }
+            for job_id in list(running):
+                r, mon = running[job_id]
+                if job_id in cancel:
+                    _killpg(mon)
+                rc = mon.wait(timeout=0)
+                if rc is None:
+                    continue
+                del running[job_id]
+                usage = mon.usage()
+                state, not_before = _after_exit(
+                    rc,
+                    attempts=int(r["attempts"]) + 1,
+                    max_retries=int(r["max_retries"]),
+                    cancelled=job_id in cancel,
+                    retry_delay_sec=args.retry_delay_sec,
+                    now=time.time(),
+                )
+                conn.execute(
+                    "UPDATE jobs SET state = ?, not_before = ?, finished = ?, returncode = ?, wall_sec = ?, "
+                    "user_sec = ?, sys_sec = ?, max_rss_kb = ?, pid = NULL WHERE id = ?",
+                    (
+                        state,
+                        not_before,
+                        time.time() if state != "queued" else None,
+                        rc,
+                        usage["wall_sec"],
+                        usage["user_sec"],
+                        usage["sys_sec"],
+                        usage["max_rss_kb"],
+                        job_id,
+                    ),
+                )
+                retry = f", retry in {not_before - time.time():.0f}s" if state == "queued" else ""
+                print(f"# job {job_id}: {state} (rc={rc}, {usage['wall_sec']:.1f}s{retry})")
+    except BaseException:
+        # Children run in their own sessions: kill them and put their jobs back in the queue.
+        for job_id, (_, mon) in running.items():
+            _killpg(mon)
+            conn.execute(
+                "UPDATE jobs SET state = 'queued', attempts = attempts - 1, worker = NULL, pid = NULL WHERE id = ?",
+                (job_id,),
+            )
+        raise
+
+
+def main(argv: Sequence[str]) -> int:
+    repo_root = _repo_root()
+    ap = argparse.ArgumentParser(description="Local job queue for tools/shudnc.py (SQLite)")
+    ap.add_argument(
+        "--db",
+        default=str(repo_root / "runs" / ".queue" / "jobs.sqlite"),
+        help="Queue database (default: runs/.queue/jobs.sqlite; job logs go to logs/ next to it)",
+    )
+    sub = ap.add_subparsers(dest="action", required=True)
+
+    p = sub.add_parser("submit", help="Queue shudnc jobs (extra shudnc arguments after `--`)")
+    p.add_argument("configs", nargs="+", help="projects/<case>/shud.yaml files (one job per config and profile)")
+    p.add_argument("--command", default="run", help="shudnc command (default: run)")
+    p.add_argument("--profile", default="baseline", help="Comma-separated profiles (default: baseline)")
+    p.add_argument("--cpus", type=int, default=0, help="CPU slots per job (default: profiles.<name>.cpus or 1)")
+    p.add_argument(
+        "--mem-mb", type=int, default=0, help="Memory slot per job in MB (default: profiles.<name>.mem_mb or 0)"
+    )
+    p.add_argument("--priority", type=int, default=0, help="Higher runs first (default: 0)")
+    p.add_argument("--retries", type=int, default=2, help="Retries after transient failures (default: 2)")
+
+    p = sub.add_parser("status", help="List jobs")
+    p.add_argument("--state", default="", help=f"Comma-separated states to show ({', '.join(STATES)})")
+    p.add_argument("--json", action="store_true", help="Print rows as JSON")
+
+    p = sub.add_parser("cancel", help="Cancel queued or running jobs")
+    p.add_argument("ids", nargs="*", help="Job ids")
+    p.add_argument("--all", action="store_true", help="Cancel every queued and running job")
+
+    p = sub.add_parser("worker", help="Run queued jobs on this node")
+    p.add_argument("--cpus", type=int, default=0, help="CPU slots (default: CPU count)")
+    p.add_argument("--mem-mb", type=int, default=0, help="Memory slots in MB (default: MemTotal)")
+    p.add_argument("--poll-sec", type=float, default=2.0, help="Poll interval (default: 2)")
+    p.add_argument("--retry-delay-sec", type=float, default=30.0, help="First retry back-off, doubled per attempt")
+    p.add_argument("--exit-when-empty", action="store_true", help="Exit once nothing is queued or running")
+    p.add_argument("--idle-exit-sec", type=float, default=0.0, help="Exit after this long with nothing to run")
+
+    # Everything after `--` is passed through to shudnc (submit only).
+    argv = list(argv)
+    extra: List[str] = []
+    if "--" in argv:
+        cut = argv.index("--")
+        argv, extra = argv[:cut], argv[cut + 1 :]
+    args = ap.parse_args(argv)
+    if extra and args.action != "submit":
+        raise ConfigError("Extra `-- <shudnc args>` are only accepted by submit")
+    args.extra = extra
+    conn = _connect(Path(args.db))
+    try:
+        if args.action == "submit":
+            return _submit(conn, args, repo_root)
+        if args.action == "status":
+            return _status(conn, args, repo_root)
+        if args.action == "cancel":
+            return _cancel(conn, args, repo_root)
+        return _worker(conn, args, repo_root)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    try:
+        raise SystemExit(main(sys.argv[1:]))
+    except ConfigError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        raise SystemExit(2)
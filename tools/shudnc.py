@@ -2,20 +2,52 @@
 from __future__ import annotations
 
 import argparse
+import collections
+import copy
+import csv
+import gzip
+import datetime as dt
+import errno
+import hashlib
+import itertools
+import json
+import math
 import os
+import random
+import re
+import shutil
+import signal
 import subprocess
 import sys
-from dataclasses import dataclass
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import yaml
 
+from compare_forcing import _read_tsd_forc
+from forcing_catalog import PRODUCT_STEPS, from_epoch_min, preflight, time_ranges
+
 
 class ConfigError(RuntimeError):
     pass
 
 
+class ShudKilled(RuntimeError):
+    """SHUD died from a signal (e.g. the OOM killer): transient, so shudnc exits 128 + signum instead of 2."""
+
+    def __init__(self, signum: int, msg: str) -> None:
+        super().__init__(msg)
+        self.signum = int(signum)
+
+
+def _eprint(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
 def _repo_root() -> Path:
     return Path(__file__).resolve().parent.parent
 
@@ -284,12 +316,372 @@ def _autoshud_config_from_yaml(
     )
 
 
-def _run(cmd: List[str], *, cwd: Path, dry_run: bool) -> None:
+def _proc_io(pid: int) -> Optional[Dict[str, int]]:
+    """Cumulative I/O counters of a live process from /proc/<pid>/io (Linux only)."""
+    try:
+        text = Path(f"/proc/{pid}/io").read_text(encoding="ascii")
+    except OSError:
+        return None
+    out: Dict[str, int] = {}
+    for line in text.splitlines():
+        k, _, v = line.partition(":")
+        if v.strip().isdigit():
+            out[k.strip()] = int(v)
+    return out
+
+
+class _ProcMonitor:
+    """Wait for a child while sampling /proc/<pid>/io; reap it with wait4 to get its rusage."""
+
+    def __init__(self, proc: "subprocess.Popen[Any]", *, sample_sec: float = 1.0) -> None:
+        self.proc = proc
+        self.sample_sec = float(sample_sec)
+        self.started = time.monotonic()
+        self.wall_sec: Optional[float] = None
+        self.rusage: Any = None
+        self.io: Dict[str, int] = {}
+
+    def _sample(self) -> None:
+        io = _proc_io(self.proc.pid)
+        if io:
+            self.io = io
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+        """Return the exit code, or None if still running after `timeout` seconds."""
+        if self.proc.returncode is not None:
+            return self.proc.returncode
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Short back-off first so quick children are not charged a whole sampling period.
+        pause = 0.02
+        while True:
+            self._sample()
+            if hasattr(os, "wait4"):
+                pid, status, ru = os.wait4(self.proc.pid, os.WNOHANG)
+                if pid != 0:
+                    self.rusage = ru
+                    self.proc.returncode = os.waitstatus_to_exitcode(status)
+            else:
+                self.proc.poll()
+            if self.proc.returncode is not None:
+                self.wall_sec = time.monotonic() - self.started
+                return self.proc.returncode
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return None
+            pause = min(self.sample_sec, pause * 2)
+            time.sleep(min(pause, deadline - now) if deadline is not None else pause)
+
+    def usage(self) -> Dict[str, Any]:
+        ru = self.rusage
+        return {
+            "returncode": self.proc.returncode,
+            "wall_sec": self.wall_sec,
+            "user_sec": ru.ru_utime if ru is not None else None,
+            "sys_sec": ru.ru_stime if ru is not None else None,
+            # Linux reports ru_maxrss in KiB.
+            "max_rss_kb": ru.ru_maxrss if ru is not None else None,
+            # Last /proc sample before exit: storage-level bytes and all read()/write() bytes.
+            "read_bytes": self.io.get("read_bytes"),
+            "write_bytes": self.io.get("write_bytes"),
+            "rchar": self.io.get("rchar"),
+            "wchar": self.io.get("wchar"),
+        }
+
+
+def _physical_first(cpus: List[int]) -> List[int]:
+    """Order logical CPUs so one hyperthread of every physical core comes before any sibling."""
+    rank: Dict[int, int] = {}
+    for c in cpus:
+        try:
+            text = Path(f"/sys/devices/system/cpu/cpu{c}/topology/thread_siblings_list").read_text(encoding="ascii")
+        except OSError:
+            rank[c] = 0
+            continue
+        siblings: List[int] = []
+        for part in text.strip().split(","):
+            lo, _, hi = part.partition("-")
+            siblings.extend(range(int(lo), int(hi or lo) + 1))
+        rank[c] = sorted(siblings).index(c) if c in siblings else 0
+    return sorted(cpus, key=lambda c: (rank[c], c))
+
+
+def _node_cpus(cfg: Dict[str, Any]) -> List[int]:
+    """node.cpus: a CPU count or an explicit list of CPU ids (default: this process's affinity mask)."""
+    if hasattr(os, "sched_getaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+    else:
+        available = list(range(os.cpu_count() or 1))
+    value = _get(cfg, "node.cpus", required=False)
+    if value is None:
+        return available
+    if isinstance(value, list):
+        cpus = [_as_int(v, key="node.cpus[]") for v in value]
+        missing = [c for c in cpus if c not in available]
+        if missing:
+            raise ConfigError(f"node.cpus lists CPUs outside this process's affinity mask: {missing}")
+        return cpus
+    return available[: _as_int(value, key="node.cpus")]
+
+
+class _CoreLease:
+    """CPUs claimed from the node budget by holding one flock()ed file per CPU.
+
+    Every shudnc process on the node (profiles, sweep/calibrate members, queue
+    workers) claims from the same lock_dir, so concurrent SHUD instances never
+    share cores. The kernel drops the locks when the holder exits, even on a crash.
+    """
+
+    def __init__(self, cpus: List[int], files: List[Any]) -> None:
+        self.cpus = cpus
+        self._files = files
+
+    @classmethod
+    def claim(cls, n: int, *, node_cpus: List[int], lock_dir: Path, poll_sec: float = 1.0) -> "_CoreLease":
+        import fcntl
+
+        if n > len(node_cpus):
+            raise ConfigError(f"SHUD wants {n} threads but the node budget has {len(node_cpus)} CPUs")
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        order = _physical_first(node_cpus)
+        waited = False
+        while True:
+            held: List[Tuple[int, Any]] = []
+            for c in order:
+                f = (lock_dir / f"cpu{c}.lock").open("a")
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    f.close()
+                    continue
+                held.append((c, f))
+                if len(held) == n:
+                    return cls(sorted(c for c, _ in held), [f for _, f in held])
+            for _, f in held:
+                f.close()
+            if not waited:
+                print(f"# waiting for {n} free CPUs in {lock_dir} ({len(node_cpus)} in node budget)")
+                sys.stdout.flush()
+                waited = True
+            time.sleep(poll_sec)
+
+    def close(self) -> None:
+        for f in self._files:
+            f.close()
+        self._files = []
+
+
+@dataclass
+class _ShudThreads:
+    threads: Optional[int]
+    pin: bool
+    node_cpus: List[int]
+    lock_dir: Path
+
+
+def _shud_threads(cfg: Dict[str, Any], shud_cfg: Dict[str, Any], *, profile: str, no_pin: bool) -> _ShudThreads:
+    """OpenMP threads (shud.threads, else profiles.<name>.cpus) and whether to pin them to claimed cores.
+
+    Without either setting SHUD keeps its OpenMP defaults and is not pinned.
+    """
+    profile_cfg = _get(cfg, f"profiles.{profile}")
+    raw = shud_cfg.get("threads", profile_cfg.get("cpus"))
+    threads = _as_int(raw, key=f"profiles.{profile}.shud.threads") if raw is not None else None
+    if threads is not None and threads <= 0:
+        raise ConfigError(f"profiles.{profile}.shud.threads must be positive: {threads}")
+    pin = bool(shud_cfg.get("pin", _get(cfg, "node.pin", required=False) is not False))
+    lock_dir = _get(cfg, "node.lock_dir", required=False) or f"/tmp/shudnc-cpus-{os.getuid()}"
+    return _ShudThreads(
+        threads=threads,
+        pin=pin and threads is not None and not no_pin and hasattr(os, "sched_setaffinity"),
+        node_cpus=_node_cpus(cfg),
+        lock_dir=Path(os.path.expanduser(_as_str(lock_dir, key="node.lock_dir"))),
+    )
+
+
+def _run(
+    cmd: List[str],
+    *,
+    cwd: Path,
+    dry_run: bool,
+    usage_log: Optional[List[Dict[str, Any]]] = None,
+    label: str = "",
+) -> None:
     cmd_str = " ".join(cmd)
     print(f"$ (cd {cwd} && {cmd_str})")
     if dry_run:
         return
-    subprocess.run(cmd, cwd=str(cwd), check=True)
+    proc = subprocess.Popen(cmd, cwd=str(cwd))
+    mon = _ProcMonitor(proc)
+    try:
+        rc = mon.wait()
+    except KeyboardInterrupt:
+        proc.kill()
+        raise
+    finally:
+        if usage_log is not None and proc.returncode is not None:
+            usage_log.append({"step": label or cmd_str, "cmd": cmd, "cwd": str(cwd), **mon.usage()})
+    if rc != 0:
+        raise subprocess.CalledProcessError(int(rc or 0), cmd)
+
+
+# SHUD progress lines carry the simulated time; the first pattern that matches wins
+# (override per profile with shud.progress_regex, using a named group `day` or `min`).
+SHUD_PROGRESS_PATTERNS = (
+    r"(?P<day>\d+(?:\.\d+)?)\s*days?\b(?!\s*/)",
+    r"(?i)\bt(?:ime)?\s*=\s*(?P<min>\d+(?:\.\d+)?)\s*min",
+)
+
+
+def _read_kv_file(path: Path) -> Dict[str, str]:
+    kv: Dict[str, str] = {}
+    try:
+        lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+    except FileNotFoundError:
+        return kv
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and not parts[0].startswith("#"):
+            kv[parts[0].upper()] = parts[1]
+    return kv
+
+
+class _ShudLogPump:
+    """Copy SHUD output to the log (and stdout) in large chunks on a reader thread.
+
+    Progress lines are parsed into the simulated day; `tick()` (called from the
+    waiting thread) derives sim-days per wall-second, an ETA and a stall flag and
+    writes them to a metrics JSON.
+    """
+
+    def __init__(
+        self,
+        proc: "subprocess.Popen[bytes]",
+        *,
+        log_file: Path,
+        metrics_file: Path,
+        patterns: List[str],
+        sim_start_day: Optional[float],
+        sim_end_day: Optional[float],
+        stall_sec: float,
+        echo: bool = True,
+    ) -> None:
+        self.proc = proc
+        self.log_file = log_file
+        self.metrics_file = metrics_file
+        self.patterns = [re.compile(p) for p in patterns]
+        self.sim_start_day = sim_start_day
+        self.sim_end_day = sim_end_day
+        self.stall_sec = float(stall_sec)
+        self.echo = echo
+        self.started = time.monotonic()
+        self.sim_day: Optional[float] = None
+        self.last_output = self.started
+        self.last_progress = self.started
+        self.bytes = 0
+        self.stalled = False
+        self._samples: "collections.deque[Tuple[float, float]]" = collections.deque(maxlen=120)
+        self._thread = threading.Thread(target=self._pump, name="shud-log-pump", daemon=True)
+        self._thread.start()
+
+    def _parse(self, text: str) -> None:
+        for pat in self.patterns:
+            last = None
+            for last in pat.finditer(text):
+                pass
+            if last is None:
+                continue
+            groups = last.groupdict()
+            if groups.get("day") is not None:
+                day = float(groups["day"])
+            elif groups.get("min") is not None:
+                day = float(groups["min"]) / 1440.0
+            else:
+                continue
+            now = time.monotonic()
+            if self.sim_day is None or day != self.sim_day:
+                self.sim_day = day
+                self.last_progress = now
+                self._samples.append((now, day))
+            return
+
+    def _pump(self) -> None:
+        assert self.proc.stdout is not None
+        fd = self.proc.stdout.fileno()
+        tail = b""
+        out = sys.stdout.buffer if self.echo else None
+        with self.log_file.open("wb") as f:
+            while True:
+                chunk = os.read(fd, 1 << 16)
+                if not chunk:
+                    break
+                f.write(chunk)
+                if out is not None:
+                    out.write(chunk)
+                    out.flush()
+                self.bytes += len(chunk)
+                self.last_output = time.monotonic()
+                # Only complete lines are parsed; keep the unterminated tail for the next chunk.
+                data = tail + chunk
+                cut = max(data.rfind(b"\n"), data.rfind(b"\r"))
+                if cut < 0:
+                    tail = data[-4096:]
+                    continue
+                tail = data[cut + 1 :]
+                self._parse(data[: cut + 1].decode("utf-8", errors="replace"))
+            if tail:
+                self._parse(tail.decode("utf-8", errors="replace"))
+
+    def rates(self) -> Tuple[Optional[float], Optional[float]]:
+        """(overall, recent) simulated days per wall-second."""
+        if len(self._samples) < 2:
+            return None, None
+        t0, d0 = self._samples[0]
+        t1, d1 = self._samples[-1]
+        overall = (d1 - d0) / (t1 - t0) if t1 > t0 else None
+        # Recent: the last ~60 s of progress samples.
+        tr, dr = next(((t, d) for (t, d) in self._samples if t >= t1 - 60.0), (t0, d0))
+        if tr >= t1:
+            tr, dr = self._samples[-2]
+        recent = (d1 - dr) / (t1 - tr) if t1 > tr else None
+        return overall, recent
+
+    def tick(self, *, final: bool = False, returncode: Optional[int] = None) -> Dict[str, Any]:
+        now = time.monotonic()
+        overall, recent = self.rates()
+        rate = recent if recent else overall
+        eta = None
+        if rate and self.sim_day is not None and self.sim_end_day is not None:
+            eta = max(0.0, (self.sim_end_day - self.sim_day) / rate)
+        since_progress = now - self.last_progress
+        if not final and self.stall_sec > 0 and since_progress >= self.stall_sec and not self.stalled:
+            self.stalled = True
+            _eprint(
+                f"WARNING: SHUD made no progress for {since_progress:.0f}s "
+                f"(sim_day={self.sim_day}, last output {now - self.last_output:.0f}s ago); solver may be stuck"
+            )
+        elif since_progress < self.stall_sec:
+            self.stalled = False
+        metrics: Dict[str, Any] = {
+            "pid": self.proc.pid,
+            "running": not final,
+            "returncode": returncode,
+            "wall_sec": now - self.started,
+            "sim_day": self.sim_day,
+            "sim_start_day": self.sim_start_day,
+            "sim_end_day": self.sim_end_day,
+            "sim_days_per_sec": rate,
+            "sim_days_per_sec_overall": overall,
+            "eta_sec": eta,
+            "sec_since_progress": since_progress,
+            "sec_since_output": now - self.last_output,
+            "stalled": self.stalled,
+            "log_bytes": self.bytes,
+        }
+        _write_json(self.metrics_file, metrics)
+        return metrics
+
+    def join(self) -> None:
+        self._thread.join()
 
 
 def _run_shud(
@@ -298,39 +690,830 @@ def _run_shud(
     prjname: str,
     run_dir: Path,
     dry_run: bool,
-) -> None:
+    progress_regex: Optional[str] = None,
+    stall_sec: float = 600.0,
+    kill_on_stall: bool = False,
+    metrics_interval_sec: float = 5.0,
+    usage_log: Optional[List[Dict[str, Any]]] = None,
+    logs_dir: Optional[Path] = None,
+    threads: Optional[int] = None,
+    cores: Optional[List[int]] = None,
+) -> Optional[Dict[str, Any]]:
     if not shud_bin.exists():
         raise ConfigError(f"SHUD binary not found: {shud_bin}")
     if not os.access(shud_bin, os.X_OK):
         raise ConfigError(f"SHUD binary not executable: {shud_bin}")
 
-    logs_dir = run_dir / "logs"
+    # Staged runs execute in scratch but keep their logs in the real run_dir.
+    logs_dir = logs_dir or run_dir / "logs"
     log_file = logs_dir / f"shud_{prjname}.log"
+    metrics_file = logs_dir / f"shud_{prjname}.metrics.json"
 
-    print(f"$ (cd {run_dir} && {shud_bin} {prjname} | tee {log_file})")
+    env_s = f"OMP_NUM_THREADS={threads} " if threads else ""
+    pin_s = f" [cpus {','.join(str(c) for c in cores)}]" if cores else ""
+    print(f"$ (cd {run_dir} && {env_s}{shud_bin} {prjname} | tee {log_file}){pin_s}")
     if dry_run:
-        return
+        return None
+
+    para = _read_kv_file(run_dir / "input" / prjname / f"{prjname}.cfg.para")
+    start_day = float(para["START"]) if "START" in para else None
+    end_day = float(para["END"]) if "END" in para else None
+
+    env = dict(os.environ)
+    if threads:
+        env["OMP_NUM_THREADS"] = str(threads)
+    preexec: Optional[Callable[[], None]] = None
+    if cores:
+        # Affinity is set in the child before exec so every OpenMP thread inherits it.
+        env.setdefault("OMP_PROC_BIND", "close")
+        preexec = lambda: os.sched_setaffinity(0, cores)  # noqa: E731
 
     logs_dir.mkdir(parents=True, exist_ok=True)
-    with log_file.open("w", encoding="utf-8") as f:
-        proc = subprocess.Popen(
-            [str(shud_bin), prjname],
-            cwd=str(run_dir),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
+    sys.stdout.flush()
+    proc = subprocess.Popen(
+        [str(shud_bin), prjname],
+        cwd=str(run_dir),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        bufsize=0,
+        env=env,
+        preexec_fn=preexec,
+    )
+    pump = _ShudLogPump(
+        proc,
+        log_file=log_file,
+        metrics_file=metrics_file,
+        patterns=[progress_regex] if progress_regex else list(SHUD_PROGRESS_PATTERNS),
+        sim_start_day=start_day,
+        sim_end_day=end_day,
+        stall_sec=stall_sec,
+    )
+    mon = _ProcMonitor(proc)
+
+    def finish() -> Dict[str, Any]:
+        pump.join()
+        m = pump.tick(final=True, returncode=proc.returncode)
+        usage = {
+            "step": "shud",
+            "cmd": [str(shud_bin), prjname],
+            "cwd": str(run_dir),
+            **mon.usage(),
+            "sim_day": m["sim_day"],
+            "sim_days_per_sec": m["sim_days_per_sec_overall"],
+            "threads": threads,
+            "cpus": cores,
+        }
+        if usage_log is not None:
+            usage_log.append(usage)
+        return usage
+
+    try:
+        while True:
+            rc = mon.wait(timeout=metrics_interval_sec)
+            if rc is not None:
+                break
+            m = pump.tick()
+            if m["stalled"] and kill_on_stall:
+                proc.kill()
+                mon.wait()
+                finish()
+                raise ConfigError(
+                    f"SHUD stalled for {m['sec_since_progress']:.0f}s and was killed. See log: {log_file}"
+                )
+    except KeyboardInterrupt:
+        proc.kill()
+        raise
+    usage = finish()
+    rate = usage["sim_days_per_sec"]
+    rate_s = f", {rate:.3g} sim-days/s" if rate else ""
+    print(
+        f"# SHUD finished: rc={rc}, wall={usage['wall_sec']:.1f}s, sim_day={usage['sim_day']}{rate_s} ({metrics_file})"
+    )
+    if rc is not None and rc < 0:
+        try:
+            sig_name = signal.Signals(-rc).name
+        except ValueError:
+            sig_name = str(-rc)
+        raise ShudKilled(-rc, f"SHUD was killed by {sig_name}. See log: {log_file}")
+    if rc != 0:
+        raise ConfigError(f"SHUD exited with code {rc}. See log: {log_file}")
+    return usage
+
+
+STAGE_COMPRESS = ("none", "gzip")
+
+
+@dataclass
+class _StageConfig:
+    root: Path
+    compress: str = "none"
+    compress_level: int = 6
+    keep_on_failure: bool = False
+
+
+def _stage_config(shud_cfg: Dict[str, Any], *, profile: str, stage_dir: str) -> Optional[_StageConfig]:
+    """profiles.<name>.shud.stage (a mapping, or just the scratch dir); --stage-dir overrides the dir."""
+    raw = shud_cfg.get("stage")
+    if isinstance(raw, str):
+        raw = {"dir": raw}
+    if raw is not None and not isinstance(raw, dict):
+        raise ConfigError(f"profiles.{profile}.shud.stage must be a mapping or a directory path")
+    raw = dict(raw or {})
+    if stage_dir:
+        raw["dir"] = stage_dir
+    if not raw.get("dir"):
+        return None
+    compress = _normalize_enum(raw.get("compress", "none"), key=f"profiles.{profile}.shud.stage.compress")
+    if compress not in STAGE_COMPRESS:
+        raise ConfigError(f"profiles.{profile}.shud.stage.compress must be one of {list(STAGE_COMPRESS)}: {compress}")
+    level = _as_int(raw.get("compress_level", 6), key=f"profiles.{profile}.shud.stage.compress_level")
+    if not 1 <= level <= 9:
+        raise ConfigError(f"profiles.{profile}.shud.stage.compress_level must be 1-9: {level}")
+    return _StageConfig(
+        root=Path(os.path.expanduser(_as_str(raw["dir"], key=f"profiles.{profile}.shud.stage.dir"))).resolve(),
+        compress=compress,
+        compress_level=level,
+        keep_on_failure=bool(raw.get("keep_on_failure", False)),
+    )
+
+
+def _require_plain_member_output(base_cfg: Dict[str, Any], *, profile: str, what: str) -> None:
+    """Sweep/calibration members are read back as legacy *.dat (mmap); gzip stage-out would hide them."""
+    stage = _stage_config(base_cfg.get("shud") or {}, profile=profile, stage_dir="")
+    if stage is not None and stage.compress != "none":
+        raise ConfigError(
+            f"profiles.{profile}.shud.stage.compress={stage.compress} writes <prj>.out/*.dat.gz, which {what} "
+            "members cannot read back; use compress: none for this profile"
+        )
+
+
+def _copy_verified(src: Path, dst: Path, *, compress: str = "none", level: int = 6) -> Dict[str, Any]:
+    """Copy src to dst (gzip-compressed if asked), then re-read dst and check its content digest."""
+    h = hashlib.sha256()
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    with src.open("rb") as fin:
+        if compress == "gzip":
+            fout: Any = gzip.open(dst, "wb", compresslevel=level)
+        else:
+            fout = dst.open("wb")
+        with fout:
+            while True:
+                chunk = fin.read(1 << 20)
+                if not chunk:
+                    break
+                h.update(chunk)
+                fout.write(chunk)
+    digest = h.hexdigest()
+    check = hashlib.sha256()
+    with (gzip.open(dst, "rb") if compress == "gzip" else dst.open("rb")) as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            check.update(chunk)
+    if check.hexdigest() != digest:
+        raise ConfigError(f"Integrity check failed copying {src} -> {dst}")
+    shutil.copystat(src, dst)
+    return {"bytes": src.stat().st_size, "stored_bytes": dst.stat().st_size, "sha256": digest}
+
+
+def _stage_in(*, run_dir: Path, prjname: str, stage_dir: Path) -> Tuple[Dict[str, Any], List[Tuple[Path, Path]]]:
+    """Copy input/<prj> and the CSV forcing files into stage_dir and re-point run_dir-relative paths.
+
+    Returns a summary and the (staged output dir, run_dir output dir) pairs to copy back after the run.
+    """
+    t0 = time.monotonic()
+    src_input = run_dir / "input" / prjname
+    if not src_input.is_dir():
+        raise ConfigError(f"SHUD input dir not found for staging: {src_input}")
+    nbytes = 0
+    nfiles = 0
+    dst_input = stage_dir / "input" / prjname
+    for p in sorted(src_input.rglob("*")):
+        if p.is_file():
+            nbytes += _copy_verified(p, dst_input / p.relative_to(src_input))["bytes"]
+            nfiles += 1
+
+    # CSV forcing: line 2 of tsd.forc is a directory relative to the working dir; copy only the listed files.
+    tsd = dst_input / f"{prjname}.tsd.forc"
+    if tsd.exists():
+        lines = tsd.read_text(encoding="utf-8").splitlines()
+        forc_dir = (run_dir / lines[1].strip()).resolve() if len(lines) >= 2 else run_dir
+        try:
+            rel = forc_dir.relative_to(run_dir.resolve())
+        except ValueError:
+            rel = Path("forcing_staged")
+        for raw in lines[3:]:
+            parts = raw.split()
+            if len(parts) < 7 or parts[0].startswith("#"):
+                continue
+            src = forc_dir / parts[6]
+            dst = stage_dir / rel / parts[6]
+            if src.is_file() and not dst.exists():
+                nbytes += _copy_verified(src, dst)["bytes"]
+                nfiles += 1
+        if len(lines) >= 2:
+            lines[1] = _to_posix(str(rel)) + "/" if str(rel) != "." else "./"
+            tsd.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    # NetCDF forcing is read in place (archives are too large to stage); NetCDF output is staged.
+    legacy_out = f"{prjname}.out"
+    outputs: List[Tuple[Path, Path]] = [(stage_dir / "output" / legacy_out, run_dir / "output" / legacy_out)]
+    forcing_cfg = dst_input / f"{prjname}.cfg.forcing"
+    if forcing_cfg.exists():
+        kv = _read_kv_file(forcing_cfg)
+        if "DATA_ROOT" in kv:
+            data_root = (run_dir / kv["DATA_ROOT"]).resolve()
+            _patch_kv_cfg_file(forcing_cfg, updates={"DATA_ROOT": str(data_root)}, dry_run=False)
+    ncoutput_cfg = dst_input / f"{prjname}.cfg.ncoutput"
+    if ncoutput_cfg.exists():
+        kv = _read_kv_file(ncoutput_cfg)
+        updates: Dict[str, str] = {}
+        if "SCHEMA" in kv:
+            updates["SCHEMA"] = str((run_dir / kv["SCHEMA"]).resolve())
+        if "OUT_DIR" in kv:
+            outputs.append((stage_dir / "output_netcdf", (run_dir / kv["OUT_DIR"]).resolve()))
+            updates["OUT_DIR"] = "output_netcdf"
+        if updates:
+            _patch_kv_cfg_file(ncoutput_cfg, updates=updates, dry_run=False)
+    for staged, _ in outputs:
+        staged.mkdir(parents=True, exist_ok=True)
+
+    summary = {"files": nfiles, "bytes": nbytes, "wall_sec": time.monotonic() - t0}
+    return summary, outputs
+
+
+def _swap_dir(tmp: Path, target: Path) -> None:
+    """
+    Replace directory `target` by `tmp` (same filesystem) under a flock next to it.
+
+    Concurrent writers of one target take turns; the previous target is renamed aside into a
+    unique directory before it is deleted, so no writer ever removes a directory another one
+    is filling or has just installed.
+    """
+    import fcntl
+
+    with target.with_name(f".{target.name}.lock").open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        old: Optional[Path] = None
+        if target.exists():
+            old = Path(tempfile.mkdtemp(prefix=f".{target.name}.old.", dir=str(target.parent)))
+            os.rename(target, old / target.name)
+        os.rename(tmp, target)
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _install_dir(tmp: Path, entry: Path) -> bool:
+    """Rename a filled `tmp` to `entry` unless it exists already (then `tmp` is removed); True if installed."""
+    try:
+        if not entry.exists():
+            os.rename(tmp, entry)
+            return True
+    except OSError as exc:
+        # Lost the race: another writer installed a (complete) entry first.
+        if exc.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+            raise
+    shutil.rmtree(tmp, ignore_errors=True)
+    return False
+
+
+def _stage_out(outputs: List[Tuple[Path, Path]], *, stage: _StageConfig) -> Dict[str, Any]:
+    """Copy staged outputs back next to their targets, verify, then swap each target dir in by rename."""
+    t0 = time.monotonic()
+    files: Dict[str, Dict[str, Any]] = {}
+    swaps: List[Tuple[Path, Path]] = []
+    try:
+        for staged, target in outputs:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Unique name: another run of the same run_dir may be staging out at the same time.
+            tmp = Path(tempfile.mkdtemp(prefix=f".{target.name}.staging.", dir=str(target.parent)))
+            swaps.append((tmp, target))
+            shutil.copymode(staged, tmp)  # mkdtemp creates 0700
+            for p in sorted(staged.rglob("*")):
+                if not p.is_file():
+                    continue
+                rel = p.relative_to(staged)
+                # NetCDF output is already compressed internally.
+                compress = stage.compress if p.suffix != ".nc" else "none"
+                dst = tmp / rel
+                if compress == "gzip":
+                    dst = dst.with_name(dst.name + ".gz")
+                files[str(target / rel)] = _copy_verified(p, dst, compress=compress, level=stage.compress_level)
+    except BaseException:
+        for tmp, _ in swaps:
+            shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    for tmp, target in swaps:
+        _swap_dir(tmp, target)
+    return {
+        "files": len(files),
+        "bytes": sum(f["bytes"] for f in files.values()),
+        "stored_bytes": sum(f["stored_bytes"] for f in files.values()),
+        "wall_sec": time.monotonic() - t0,
+        "compress": stage.compress,
+        "outputs": files,
+    }
+
+
+def _run_shud_staged(
+    *,
+    stage: _StageConfig,
+    shud_bin: Path,
+    prjname: str,
+    run_dir: Path,
+    dry_run: bool,
+    usage_log: Optional[List[Dict[str, Any]]] = None,
+    **shud_kwargs: Any,
+) -> Optional[Dict[str, Any]]:
+    """Run SHUD in a scratch copy of its inputs; outputs replace run_dir's only after a successful run."""
+    if dry_run:
+        print(f"# would stage input/{prjname} + forcing into {stage.root}/shudnc-{prjname}-*")
+        _run_shud(shud_bin=shud_bin, prjname=prjname, run_dir=run_dir, dry_run=True, **shud_kwargs)
+        print(f"# would copy outputs back to {run_dir / 'output'} (compress={stage.compress})")
+        return None
+
+    stage.root.mkdir(parents=True, exist_ok=True)
+    need = sum(p.stat().st_size for p in (run_dir / "input" / prjname).rglob("*") if p.is_file())
+    free = shutil.disk_usage(stage.root).free
+    if free < need:
+        raise ConfigError(f"Not enough space in stage dir {stage.root}: {free} bytes free, inputs need {need}")
+
+    stage_dir = Path(tempfile.mkdtemp(prefix=f"shudnc-{prjname}-", dir=str(stage.root)))
+    ok = False
+    try:
+        stage_in, outputs = _stage_in(run_dir=run_dir, prjname=prjname, stage_dir=stage_dir)
+        print(
+            f"# staged {stage_in['files']} files ({stage_in['bytes'] / 1e6:.1f} MB) into {stage_dir} "
+            f"in {stage_in['wall_sec']:.1f}s"
+        )
+        if usage_log is not None:
+            usage_log.append({"step": "stage_in", "cwd": str(stage_dir), **stage_in})
+        usage = _run_shud(
+            shud_bin=shud_bin,
+            prjname=prjname,
+            run_dir=stage_dir,
+            dry_run=False,
+            usage_log=usage_log,
+            logs_dir=run_dir / "logs",
+            **shud_kwargs,
+        )
+        stage_out = _stage_out(outputs, stage=stage)
+        _write_json(run_dir / "logs" / f"stage_{prjname}.json", {"stage_dir": str(stage_dir), **stage_out})
+        print(
+            f"# copied back {stage_out['files']} files ({stage_out['bytes'] / 1e6:.1f} MB, "
+            f"{stage_out['stored_bytes'] / 1e6:.1f} MB stored) in {stage_out['wall_sec']:.1f}s"
+        )
+        if usage_log is not None:
+            usage_log.append(
+                {"step": "stage_out", "cwd": str(run_dir), **{k: v for k, v in stage_out.items() if k != "outputs"}}
+            )
+        ok = True
+        return usage
+    finally:
+        if ok or not stage.keep_on_failure:
+            shutil.rmtree(stage_dir, ignore_errors=True)
+        else:
+            _eprint(f"Kept stage dir for inspection: {stage_dir}")
+
+
+AUTOSHUD_STEP_SCRIPTS = {1: "Step1_RawDataProcessng.R", 2: "Step2_DataSubset.R", 3: "Step3_BuidModel.R"}
+
+# Run-dir subtrees that never hold AutoSHUD step outputs (logs, SHUD output, the step stamps).
+_STEP_SNAPSHOT_EXCLUDE = ("logs", "output", "output_netcdf", ".stepcache")
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _stat_fingerprint(paths: Iterable[Path]) -> List[Tuple[str, int, int]]:
+    """(path, size, mtime_ns) for files and every file below directories; missing paths count as (-1, -1)."""
+    out: List[Tuple[str, int, int]] = []
+    for p in paths:
+        if p.is_dir():
+            for root, dirs, files in os.walk(p, followlinks=True):
+                dirs.sort()
+                for name in sorted(files):
+                    fp = Path(root) / name
+                    st = fp.stat()
+                    out.append((_to_posix(str(fp)), st.st_size, st.st_mtime_ns))
+        elif p.exists():
+            st = p.stat()
+            out.append((_to_posix(str(p)), st.st_size, st.st_mtime_ns))
+        else:
+            out.append((_to_posix(str(p)), -1, -1))
+    return out
+
+
+def _shapefile_parts(path: Path) -> List[Path]:
+    if path.suffix.lower() != ".shp":
+        return [path]
+    return [path.with_suffix(ext) for ext in (".shp", ".shx", ".dbf", ".prj", ".cpg")]
+
+
+def _autoshud_step_inputs(auto: AutoShudConfig, step: int) -> List[Path]:
+    """Raw inputs a step reads (besides the generated config and the previous step's outputs)."""
+    if step == 1:
+        spatial = [auto.wbd, auto.stm, auto.dem] + [p for p in (auto.crs_ref, auto.lake) if p is not None]
+        parts: List[Path] = []
+        for p in spatial:
+            parts.extend(_shapefile_parts(p))
+        return parts + [auto.soil_dir, auto.landuse_file]
+    if step == 2:
+        return _forcing_window_files(auto.forcing_dir_ldas, auto.start_year, auto.end_year)
+    return []
+
+
+# Leading year of a date token in forcing file/dir names: 2000, 200001, 20000101 (GLDAS "A20000101", CMFD "_197901").
+_DATE_TOKEN_RE = re.compile(r"(?<!\d)((?:19|20)\d{2})(?:[01]\d(?:[0-3]\d)?)?(?!\d)")
+
+
+def _forcing_window_files(root: Path, start_year: int, end_year: int) -> List[Path]:
+    """
+    Files below a forcing archive that Step 2 reads for [start_year, end_year].
+
+    A file's year is the date token of its name, else of its nearest dated parent directory;
+    files without one (masks, grids) are always included.
+    """
+    if not root.is_dir():
+        return [root]
+    out: List[Path] = []
+    for dirpath, dirs, files in os.walk(root, followlinks=True):
+        rel_parts = Path(dirpath).relative_to(root).parts
+        dir_year: Optional[int] = None
+        for part in rel_parts:
+            m = _DATE_TOKEN_RE.search(part)
+            if m is not None:
+                dir_year = int(m.group(1))
+        if dir_year is not None and not start_year <= dir_year <= end_year:
+            dirs[:] = []
+            continue
+        dirs.sort()
+        for name in sorted(files):
+            m = _DATE_TOKEN_RE.search(name)
+            year = int(m.group(1)) if m is not None else dir_year
+            if year is None or start_year <= year <= end_year:
+                out.append(Path(dirpath) / name)
+    return out
+
+
+def _snapshot_roots(auto: AutoShudConfig) -> List[Path]:
+    roots = [auto.dir_out]
+    try:
+        auto.forcing_csv_dir.relative_to(auto.dir_out)
+    except ValueError:
+        roots.append(auto.forcing_csv_dir)
+    return roots
+
+
+def _snapshot_outputs(roots: List[Path]) -> Dict[str, Tuple[int, int]]:
+    snap: Dict[str, Tuple[int, int]] = {}
+    for i, root in enumerate(roots):
+        if not root.is_dir():
+            continue
+        for dirpath, dirs, files in os.walk(root):
+            if i == 0 and Path(dirpath) == root:
+                dirs[:] = [d for d in dirs if d not in _STEP_SNAPSHOT_EXCLUDE]
+            for name in files:
+                fp = Path(dirpath) / name
+                st = fp.stat()
+                snap[f"{i}/{_to_posix(os.path.relpath(fp, root))}"] = (st.st_size, st.st_mtime_ns)
+    return snap
+
+
+def _snapshot_path(roots: List[Path], rel: str) -> Path:
+    i, sub = rel.split("/", 1)
+    return roots[int(i)] / sub
+
+
+def _step_key_config(auto: AutoShudConfig, autoshud_text: str) -> str:
+    """Generated config without run-specific output locations (outputs are keyed relative to the roots)."""
+    try:
+        forc = _to_posix(str(auto.forcing_csv_dir.relative_to(auto.dir_out)))
+    except ValueError:
+        forc = "<external>"
+    lines: List[str] = []
+    for line in autoshud_text.splitlines():
+        key = line.split(" ", 1)[0]
+        if key == "dir.out":
+            continue
+        lines.append(f"dout.forc {forc}" if key == "dout.forc" else line)
+    return "\n".join(lines)
+
+
+def _step_key(auto: AutoShudConfig, *, step: int, autoshud_text: str, prev_digest: str) -> str:
+    h = hashlib.sha256()
+    h.update(f"step={step} script={AUTOSHUD_STEP_SCRIPTS[step]}\n".encode("utf-8"))
+    h.update(_step_key_config(auto, autoshud_text).encode("utf-8"))
+    h.update(f"\nprev={prev_digest}\n".encode("utf-8"))
+    for path, size, mtime_ns in _stat_fingerprint(_autoshud_step_inputs(auto, step)):
+        h.update(f"{path}\t{size}\t{mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _outputs_digest(files: Dict[str, Any]) -> str:
+    h = hashlib.sha256()
+    for rel in sorted(files):
+        h.update(f"{rel}\t{files[rel]['sha256']}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _file_identity(path: Path) -> Dict[str, Any]:
+    """Path, size, mtime and sha256 of a file (e.g. the SHUD binary) for run manifests."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return {"path": str(path), "exists": False}
+    return {"path": str(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": _sha256_file(path)}
+
+
+def _append_manifest(run_dir: Path, entry: Dict[str, Any]) -> None:
+    path = run_dir / "logs" / "manifest.json"
+    manifest = _read_json(path) or {}
+    runs = manifest.get("runs")
+    if not isinstance(runs, list):
+        runs = []
+    runs.append(entry)
+    _write_json(path, {"runs": runs})
+    print(f"Wrote: {path}")
+
+
+def _stamp_is_current(stamp: Optional[Dict[str, Any]], key: str, roots: List[Path]) -> bool:
+    if stamp is None or stamp.get("key") != key:
+        return False
+    for rel, meta in (stamp.get("files") or {}).items():
+        p = _snapshot_path(roots, rel)
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            return False
+        if st.st_size != meta["size"] or st.st_mtime_ns != meta["mtime_ns"]:
+            return False
+    return True
+
+
+def _run_autoshud_steps(
+    auto: AutoShudConfig,
+    *,
+    steps: List[int],
+    autoshud_text: str,
+    gen_file: Path,
+    autoshud_dir: Path,
+    cache_dir: Optional[Path],
+    force_steps: List[int],
+    dry_run: bool,
+    usage_log: Optional[List[Dict[str, Any]]] = None,
+) -> None:
+    """Run AutoSHUD steps, skipping or restoring those whose content key is unchanged.
+
+    key(step) = sha256(generated config minus dir.out/dout.forc locations, raw inputs of the
+    step (path/size/mtime; for Step 2 only the forcing files of startyear..endyear), content
+    digest of the previous step's outputs). A step's outputs are the files under run_dir
+    (and an external forcing csv_dir) that it created or modified, recorded relative to those roots.
+    `<run_dir>/.stepcache/step<N>.json` stamps the last run/restore in place;
+    `cache_dir/step<N>/<key>/` keeps copies that can be restored into any run_dir.
+    """
+    roots = _snapshot_roots(auto)
+    stamp_dir = auto.dir_out / ".stepcache"
+    prev_digest = ""
+    for step in steps:
+        script = AUTOSHUD_STEP_SCRIPTS[step]
+        cmd = ["Rscript", script, str(gen_file)]
+        if cache_dir is None:
+            _run(cmd, cwd=autoshud_dir, dry_run=dry_run, usage_log=usage_log, label=f"autoshud_step{step}")
+            continue
+
+        if not prev_digest and step > 1:
+            prev = _read_json(stamp_dir / f"step{step - 1}.json")
+            prev_digest = str(prev.get("digest", "")) if prev is not None else ""
+        key = _step_key(auto, step=step, autoshud_text=autoshud_text, prev_digest=prev_digest)
+        stamp_path = stamp_dir / f"step{step}.json"
+        entry = cache_dir / f"step{step}" / key
+        forced = step in force_steps
+
+        stamp = _read_json(stamp_path)
+        if not forced and _stamp_is_current(stamp, key, roots):
+            assert stamp is not None
+            print(f"# AutoSHUD step {step}: up to date (key {key[:12]})")
+            prev_digest = str(stamp["digest"])
+            continue
+
+        manifest = None if forced else _read_json(entry / "manifest.json")
+        if manifest is not None:
+            print(f"# AutoSHUD step {step}: restoring from cache {entry}")
+            if dry_run:
+                prev_digest = str(manifest["digest"])
+                continue
+            files: Dict[str, Any] = {}
+            for rel, meta in manifest["files"].items():
+                dst = _snapshot_path(roots, rel)
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(entry / "files" / rel, dst)
+                st = dst.stat()
+                files[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": meta["sha256"]}
+            prev_digest = str(manifest["digest"])
+            _write_json(stamp_path, {"step": step, "key": key, "digest": prev_digest, "files": files})
+            continue
+
+        if dry_run:
+            _run(cmd, cwd=autoshud_dir, dry_run=True)
+            prev_digest = f"dry-run:{key}"
+            continue
+
+        before = _snapshot_outputs(roots)
+        _run(cmd, cwd=autoshud_dir, dry_run=False, usage_log=usage_log, label=f"autoshud_step{step}")
+        after = _snapshot_outputs(roots)
+        files = {}
+        for rel, (size, mtime_ns) in sorted(after.items()):
+            if before.get(rel) == (size, mtime_ns):
+                continue
+            files[rel] = {"size": size, "mtime_ns": mtime_ns, "sha256": _sha256_file(_snapshot_path(roots, rel))}
+        prev_digest = _outputs_digest(files)
+        record = {"step": step, "key": key, "digest": prev_digest, "files": files}
+        _write_json(stamp_path, record)
+
+        # Entries are immutable once installed (other runs may be restoring from them): same key,
+        # same content, so an existing entry is kept and this run's copy dropped.
+        if entry.exists():
+            print(f"# AutoSHUD step {step}: cache entry already present: {entry}")
+            continue
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=f".{entry.name}.", dir=str(entry.parent)))
+        try:
+            shutil.copymode(entry.parent, tmp)  # mkdtemp creates 0700
+            # Copies, not hardlinks: later steps may rewrite these files in place.
+            for rel in files:
+                dst = tmp / "files" / rel
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(_snapshot_path(roots, rel), dst)
+            _write_json(tmp / "manifest.json", record)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        if _install_dir(tmp, entry):
+            print(f"# AutoSHUD step {step}: cached {len(files)} output files under {entry}")
+        else:
+            print(f"# AutoSHUD step {step}: cache entry already present: {entry}")
+
+
+def _forcing_preflight(
+    cfg: Dict[str, Any],
+    *,
+    repo_root: Path,
+    profile: str,
+    forcing_cfg: Dict[str, Any],
+    data_root: Path,
+    adapter: Dict[str, Any],
+    jobs: int,
+) -> None:
+    """
+    NetCDF forcing pre-flight: the product must cover every record of [ForcStartTime + START, END]
+    without gaps or duplicates, and every forcing station must sit on a valid grid cell.
+
+    Needs `<prj>.tsd.forc` and `<prj>.cfg.para` from this profile's run_dir or one it depends on.
+    Time axes are read through the forcing catalog (tools/forcing_catalog.py), so repeated checks
+    only rescan files that changed.
+    """
+    prjname = str(_get(cfg, "project.name"))
+    input_dir: Optional[Path] = None
+    for p in [profile] + _profile_dependencies(cfg, profile=profile):
+        d = _resolve_path(repo_root, _get(cfg, f"profiles.{p}.run_dir")) / "input" / prjname
+        if (d / f"{prjname}.tsd.forc").exists() and (d / f"{prjname}.cfg.para").exists():
+            input_dir = d
+            break
+    if input_dir is None:
+        print(f"# forcing pre-flight skipped: no {prjname}.tsd.forc/.cfg.para yet (run AutoSHUD Step1–3 first)")
+        return
+
+    product = str(forcing_cfg.get("product") or adapter.get("name") or "").strip().upper()
+    if product not in PRODUCT_STEPS:
+        print(f"# forcing pre-flight skipped: no record layout known for product {product!r}")
+        return
+    layout = adapter.get("layout") or {}
+    netcdf = adapter.get("netcdf") or {}
+    tsd = _read_tsd_forc(str(input_dir / f"{prjname}.tsd.forc"))
+    para = _read_kv_file(input_dir / f"{prjname}.cfg.para")
+    forc_start = dt.datetime(
+        tsd.forc_start_yyyymmdd // 10000,
+        (tsd.forc_start_yyyymmdd // 100) % 100,
+        tsd.forc_start_yyyymmdd % 100,
+        tzinfo=dt.timezone.utc,
+    )
+    start_day = _as_float(para.get("START", 0), key=f"START in {prjname}.cfg.para")
+    end_day = _as_float(para.get("END"), key=f"END in {prjname}.cfg.para")
+    t_start = forc_start + dt.timedelta(days=start_day)
+    t_end = forc_start + dt.timedelta(days=end_day)
+
+    t0 = time.perf_counter()
+    try:
+        report = preflight(
+            str(data_root),
+            product=product,
+            file_pattern=_as_str(layout.get("file_pattern"), key="adapter layout.file_pattern"),
+            t_start=t_start,
+            t_end=t_end,
+            var_names={str(k): str(v) for k, v in (netcdf.get("var_names") or {}).items()},
+            var_dirs={str(k): str(v) for k, v in (layout.get("variables_dir") or {}).items()} or None,
+            year_subdir=layout.get("year_subdir") is True,
+            stations=[(s.lon_deg, s.lat_deg) for s in tsd.stations],
+            jobs=jobs,
+        )
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"Forcing pre-flight failed for {data_root}: {e}") from e
+    wall = time.perf_counter() - t0
+
+    def fmt(tm: float) -> str:
+        return from_epoch_min(tm).strftime("%Y-%m-%d %H:%M")
+
+    step = float(report["step_min"])
+    errors: List[str] = []
+    rows: List[Tuple[str, ...]] = [("stream", "files", "missing", "unreadable", "gaps", "dup_records")]
+    for name, st in report["streams"].items():
+        gaps = time_ranges(st["missing_times"], step)
+        rows.append(
+            (
+                name,
+                str(st["files"]),
+                str(len(st["missing_files"])),
+                str(len(st["unreadable"])),
+                str(len(gaps)),
+                str(len(st["duplicate_times"])),
+            )
         )
-        assert proc.stdout is not None
-        for line in proc.stdout:
-            sys.stdout.write(line)
-            f.write(line)
-        rc = proc.wait()
-        if rc != 0:
-            raise ConfigError(f"SHUD exited with code {rc}. See log: {log_file}")
+        label = product if name == "*" else f"{product} {name}"
+        errors.extend(f"{label}: missing file {r}" for r in st["missing_files"][:10])
+        errors.extend(f"{label}: glob matches several files: {r}" for r in st["ambiguous"][:10])
+        errors.extend(f"{label}: unreadable {r}" for r in st["unreadable"][:10])
+        if st["missing_vars"]:
+            errors.append(f"{label}: {len(st['missing_vars'])} file(s) lack variables, e.g. {st['missing_vars'][0]}")
+        errors.extend(
+            f"{label}: no record for {fmt(a)}" + ("" if a == b else f" .. {fmt(b)}") for a, b in gaps[:20]
+        )
+        errors.extend(f"{label}: duplicate record at {fmt(tm)}" for tm in st["duplicate_times"][:10])
+
+    warnings: List[str] = []
+    for r in report["stations"]:
+        where = f"station[{r['station']}] lon={r['lon']:g} lat={r['lat']:g}"
+        if not r["inside"]:
+            errors.append(f"{where}: outside the {product} grid ({r['file']})")
+        elif r["invalid_vars"]:
+            msg = f"{where}: fill/NaN at cell (ilat={r['ilat']}, ilon={r['ilon']}) for {', '.join(r['invalid_vars'])}"
+            # SHUD's GLDAS reader moves such stations to the nearest valid cell (water mask).
+            (warnings if product == "GLDAS" else errors).append(msg)
+
+    print(
+        f"== Forcing pre-flight: {product} {fmt(report['window'][0])} .. {fmt(report['window'][1])} "
+        f"({report['records']} records x {len(report['streams'])} stream(s), "
+        f"{len(tsd.stations)} stations; scanned {report['scanned']} files, {wall:.1f}s) =="
+    )
+    _print_table(rows)
+    for w in warnings:
+        _eprint(f"WARNING: {w}")
+    if errors:
+        msg = "\n".join(f"- {e}" for e in errors)
+        raise ConfigError(f"Forcing pre-flight found problems in {data_root}:\n{msg}")
+
+
+def _netcdf_forcing_preflight(cfg: Dict[str, Any], *, repo_root: Path, profile: str, jobs: int = 0) -> None:
+    """Run the forcing pre-flight for a `forcing_mode: netcdf` profile (no-op for CSV forcing)."""
+    shud_cfg = _get(cfg, f"profiles.{profile}.shud", required=False) or {}
+    if str(shud_cfg.get("forcing_mode", "csv")).strip().lower() != "netcdf":
+        return
+    forcing_cfg = _get(shud_cfg, "forcing")
+    data_root = _resolve_path(repo_root, _get(forcing_cfg, "dir"))
+    adapter_path = _resolve_path(repo_root, _get(forcing_cfg, "adapter"))
+    missing = [p for p in (data_root, adapter_path) if not p.exists()]
+    if missing:
+        raise ConfigError("Missing required files/dirs:\n" + "\n".join(f"- {p}" for p in missing))
+    _forcing_preflight(
+        cfg,
+        repo_root=repo_root,
+        profile=profile,
+        forcing_cfg=forcing_cfg,
+        data_root=data_root,
+        adapter=_load_yaml(adapter_path),
+        jobs=jobs,
+    )
 
 
-def _validate(cfg: Dict[str, Any], *, repo_root: Path, profile: str) -> None:
+def _validate(cfg: Dict[str, Any], *, repo_root: Path, profile: str, jobs: int = 0) -> None:
     # Minimal validation: resolve paths and check key inputs exist.
     auto = _autoshud_config_from_yaml(cfg, repo_root=repo_root, profile=profile)
     profile_cfg = _get(cfg, f"profiles.{profile}")
@@ -367,6 +1550,7 @@ def _validate(cfg: Dict[str, Any], *, repo_root: Path, profile: str) -> None:
                 missing.append(p)
 
     # NetCDF forcing config checks (profile.shud.forcing)
+    adapter: Optional[Dict[str, Any]] = None
     if forcing_mode == "netcdf":
         forcing_cfg = _get(shud_cfg, "forcing")
         data_root = _resolve_path(repo_root, _get(forcing_cfg, "dir"))
@@ -392,6 +1576,17 @@ def _validate(cfg: Dict[str, Any], *, repo_root: Path, profile: str) -> None:
         msg = "\n".join([f"- {p}" for p in missing])
         raise ConfigError(f"Missing required files/dirs:\n{msg}")
 
+    if adapter is not None:
+        _forcing_preflight(
+            cfg,
+            repo_root=repo_root,
+            profile=profile,
+            forcing_cfg=forcing_cfg,
+            data_root=data_root,
+            adapter=adapter,
+            jobs=jobs,
+        )
+
 
 def _format_kv_cfg(*, header: List[str], kv: List[Tuple[str, str]]) -> str:
     lines: List[str] = []
@@ -452,6 +1647,27 @@ def _flatten_adapter_cfg(adapter: Dict[str, Any]) -> List[Tuple[str, str]]:
     return kv
 
 
+def _kv_overrides(value: Any, *, key: str) -> List[Tuple[str, str]]:
+    """Validate a YAML mapping of KEY VALUE overrides (keys upper-cased, values without whitespace)."""
+    if value is None:
+        return []
+    if not isinstance(value, dict):
+        raise ConfigError(f"Expected mapping for {key}, got: {value!r}")
+    out: List[Tuple[str, str]] = []
+    for k, v in value.items():
+        if not isinstance(k, str) or not k.strip():
+            raise ConfigError(f"Invalid {key} key: {k!r}")
+        if v is None:
+            raise ConfigError(f"Invalid {key} value for key {k!r} (must not be null)")
+        sv = str(v).strip()
+        if not sv:
+            raise ConfigError(f"Invalid {key} value for key {k!r} (empty string)")
+        if any(ch.isspace() for ch in sv):
+            raise ConfigError(f"Invalid {key} value for key {k!r}: contains whitespace: {sv!r}")
+        out.append((k.strip().upper(), sv))
+    return out
+
+
 def _render_shud_forcing_cfg(
     cfg: Dict[str, Any],
     *,
@@ -479,20 +1695,7 @@ def _render_shud_forcing_cfg(
     # Optional KEY VALUE overrides appended after adapter defaults.
     # This is useful for product-specific toggles like CMFD_PRECIP_UNITS.
     forcing_kv = forcing_cfg.get("kv") if isinstance(forcing_cfg, dict) else None
-    if forcing_kv is not None:
-        if not isinstance(forcing_kv, dict):
-            raise ConfigError(f"Expected mapping for profiles.{profile}.shud.forcing.kv, got: {forcing_kv!r}")
-        for k, v in forcing_kv.items():
-            if not isinstance(k, str) or not k.strip():
-                raise ConfigError(f"Invalid forcing.kv key for profile {profile}: {k!r}")
-            if v is None:
-                raise ConfigError(f"Invalid forcing.kv value for key {k!r} (must not be null)")
-            sv = str(v).strip()
-            if not sv:
-                raise ConfigError(f"Invalid forcing.kv value for key {k!r} (empty string)")
-            if any(ch.isspace() for ch in sv):
-                raise ConfigError(f"Invalid forcing.kv value for key {k!r}: contains whitespace: {sv!r}")
-            kv.append((k.strip().upper(), sv))
+    kv.extend(_kv_overrides(forcing_kv, key=f"profiles.{profile}.shud.forcing.kv"))
 
     prjname = str(_get(cfg, "project.name"))
     out_path = run_dir / "input" / prjname / f"{prjname}.cfg.forcing"
@@ -553,7 +1756,7 @@ def _patch_kv_cfg_file(path: Path, *, updates: Dict[str, str], dry_run: bool) ->
 
     if not path.exists():
         raise ConfigError(
-            f"SHUD cfg.para not found for patching: {path}\n"
+            f"SHUD cfg not found for patching: {path}\n"
             "Hint: run AutoSHUD Step3 to generate SHUD inputs first, or point run_dir to an existing run."
         )
 
@@ -590,7 +1793,25 @@ def _patch_kv_cfg_file(path: Path, *, updates: Dict[str, str], dry_run: bool) ->
         for k, v in sorted(remaining.items()):
             out_lines.append(f"{k} {v}")
 
-    path.write_text("\n".join(out_lines) + "\n", encoding="utf-8")
+    # Write-and-rename: never modify a (possibly hardlinked, see `sweep`) file in place.
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text("\n".join(out_lines) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _apply_shud_kv_overrides(
+    shud_cfg: Dict[str, Any], *, profile: str, prjname: str, run_dir: Path, dry_run: bool
+) -> None:
+    """Patch profiles.<name>.shud.para / shud.calib into <prj>.cfg.para / <prj>.cfg.calib."""
+    input_dir = run_dir / "input" / prjname
+    for section, suffix in (("para", "cfg.para"), ("calib", "cfg.calib")):
+        updates = dict(_kv_overrides(shud_cfg.get(section), key=f"profiles.{profile}.shud.{section}"))
+        if not updates:
+            continue
+        path = input_dir / f"{prjname}.{suffix}"
+        _patch_kv_cfg_file(path, updates=updates, dry_run=dry_run)
+        if not dry_run:
+            print(f"Patched: {path}")
 
 
 def _render_shud_cfg_overlays(cfg: Dict[str, Any], *, repo_root: Path, profile: str, run_dir: Path, dry_run: bool) -> None:
@@ -634,19 +1855,1203 @@ def _render_shud_cfg_overlays(cfg: Dict[str, Any], *, repo_root: Path, profile:
         print(f"Patched: {para_path}")
 
 
+@dataclass
+class _ProfileJob:
+    profile: str
+    run_dir: Path
+    depends_on: List[str]
+    cpus: int
+    cmd: List[str] = field(default_factory=list)
+    status: str = "pending"
+    returncode: Optional[int] = None
+    wall_sec: Optional[float] = None
+    log_file: Optional[Path] = None
+    started: float = 0.0
+    proc: Optional["subprocess.Popen[bytes]"] = None
+
+
+def _profile_dependencies(cfg: Dict[str, Any], *, profile: str) -> List[str]:
+    """Profiles whose run_dir outputs this profile consumes.
+
+    Explicit `profiles.<name>.depends_on` wins. Otherwise a profile that runs no
+    AutoSHUD steps (`autoshud.steps: []`) reuses the baseline Step1–Step3 static
+    inputs, so it depends on `baseline`.
+    """
+    profile_cfg = _get(cfg, f"profiles.{profile}")
+    deps = _get(profile_cfg, "depends_on", required=False)
+    if deps is not None:
+        if isinstance(deps, str):
+            deps = [deps]
+        if not isinstance(deps, list):
+            raise ConfigError(f"Expected list for profiles.{profile}.depends_on, got: {deps!r}")
+        out = [_as_str(d, key=f"profiles.{profile}.depends_on[]") for d in deps]
+    else:
+        steps = _get(profile_cfg, "autoshud.steps", required=False)
+        out = ["baseline"] if steps == [] and profile != "baseline" else []
+    for d in out:
+        if _get(cfg, f"profiles.{d}", required=False) is None:
+            raise ConfigError(f"profiles.{profile} depends on unknown profile: {d}")
+        if d == profile:
+            raise ConfigError(f"profiles.{profile} depends on itself")
+    return out
+
+
+def _kill_job(job: _ProfileJob) -> None:
+    """Terminate a job's whole process group (shudnc child and the SHUD it started)."""
+    assert job.proc is not None
+    if job.proc.poll() is not None:
+        return
+    killpg = getattr(os, "killpg", None)
+    try:
+        if killpg is not None:
+            killpg(job.proc.pid, signal.SIGTERM)
+        else:
+            job.proc.terminate()
+    except ProcessLookupError:
+        pass
+    try:
+        job.proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        try:
+            if killpg is not None:
+                killpg(job.proc.pid, signal.SIGKILL)
+            else:
+                job.proc.kill()
+        except ProcessLookupError:
+            pass
+        job.proc.wait()
+
+
+def _schedule_jobs(
+    selected: Dict[str, _ProfileJob],
+    *,
+    repo_root: Path,
+    jobs: int,
+    log_name: str,
+    dry_run: bool,
+    monitor: Optional[Callable[[_ProfileJob], bool]] = None,
+    on_finish: Optional[Callable[[_ProfileJob], None]] = None,
+) -> None:
+    """Run job commands as child processes: dependencies first, at most `jobs` CPUs busy.
+
+    `monitor(job)` is polled for running jobs; returning False kills the job
+    (status "pruned"). `on_finish(job)` runs once a job has ended.
+    """
+    used = 0
+    try:
+        while True:
+            for job in selected.values():
+                failed_deps = [d for d in job.depends_on if selected[d].status in ("failed", "skipped", "pruned")]
+                if job.status == "pending" and failed_deps:
+                    job.status = "skipped"
+
+            for job in selected.values():
+                if job.status != "pending" or any(selected[d].status != "ok" for d in job.depends_on):
+                    continue
+                if used + job.cpus > jobs:
+                    continue
+                if dry_run:
+                    # Dry-run writes nothing: children print their commands to our stdout.
+                    print(f"$ {' '.join(job.cmd)}")
+                    sys.stdout.flush()
+                    job.proc = subprocess.Popen(job.cmd, cwd=str(repo_root), start_new_session=True)
+                else:
+                    logs_dir = job.run_dir / "logs"
+                    logs_dir.mkdir(parents=True, exist_ok=True)
+                    job.log_file = logs_dir / log_name
+                    print(f"$ {' '.join(job.cmd)} > {job.log_file}")
+                    with job.log_file.open("wb") as f:
+                        job.proc = subprocess.Popen(
+                            job.cmd, cwd=str(repo_root), stdout=f, stderr=subprocess.STDOUT, start_new_session=True
+                        )
+                job.started = time.monotonic()
+                job.status = "running"
+                used += job.cpus
+
+            running = [j for j in selected.values() if j.status == "running"]
+            if not running:
+                break
+            time.sleep(0.5)
+            for job in running:
+                assert job.proc is not None
+                rc = job.proc.poll()
+                if rc is None:
+                    if monitor is None or monitor(job):
+                        continue
+                    _kill_job(job)
+                    job.status = "pruned"
+                    rc = job.proc.returncode
+                else:
+                    job.status = "ok" if rc == 0 else "failed"
+                job.returncode = rc
+                job.wall_sec = time.monotonic() - job.started
+                used -= job.cpus
+                print(f"# {job.profile}: {job.status} (rc={rc}, {job.wall_sec:.1f}s)")
+                if on_finish is not None:
+                    on_finish(job)
+    except BaseException:
+        # Children run in their own sessions; do not leave them behind on Ctrl-C or errors.
+        for job in selected.values():
+            if job.status == "running":
+                _kill_job(job)
+        raise
+
+
+def _print_table(rows: List[Tuple[str, ...]]) -> None:
+    widths = [max(len(r[i]) for r in rows) for i in range(len(rows[0]))]
+    for r in rows:
+        print("  ".join(c.ljust(w) for c, w in zip(r, widths)).rstrip())
+
+
+def _run_profiles(
+    cfg: Dict[str, Any],
+    *,
+    repo_root: Path,
+    config_path: Path,
+    command: str,
+    profiles: List[str],
+    jobs: int,
+    child_args: List[str],
+    dry_run: bool,
+) -> int:
+    """Run several profiles as child shudnc.py processes, honoring dependencies and a CPU budget."""
+    selected: Dict[str, _ProfileJob] = {}
+    for p in profiles:
+        if p in selected:
+            continue
+        profile_cfg = _get(cfg, f"profiles.{p}", required=False)
+        if profile_cfg is None:
+            raise ConfigError(f"Profile not found: {p}")
+        cpus = _as_int(_get(profile_cfg, "cpus", required=False) or 1, key=f"profiles.{p}.cpus")
+        selected[p] = _ProfileJob(
+            profile=p,
+            run_dir=_resolve_path(repo_root, _get(profile_cfg, "run_dir")),
+            depends_on=_profile_dependencies(cfg, profile=p),
+            # A profile wider than the whole budget still runs, alone.
+            cpus=max(1, min(cpus, jobs)),
+        )
+
+    # Dependencies outside the selection are assumed to have been run already.
+    for job in selected.values():
+        external = [d for d in job.depends_on if d not in selected]
+        if external:
+            print(f"# {job.profile}: assuming already run: {', '.join(external)}")
+        job.depends_on = [d for d in job.depends_on if d in selected]
+
+    # Reject cycles up front (Kahn's algorithm).
+    indeg = {p: len(j.depends_on) for p, j in selected.items()}
+    ready = [p for p, n in indeg.items() if n == 0]
+    seen = 0
+    while ready:
+        p = ready.pop()
+        seen += 1
+        for q, j in selected.items():
+            if p in j.depends_on:
+                indeg[q] -= 1
+                if indeg[q] == 0:
+                    ready.append(q)
+    if seen != len(selected):
+        cyc = sorted(p for p, n in indeg.items() if n > 0)
+        raise ConfigError(f"Profile dependency cycle among: {', '.join(cyc)}")
+
+    script = Path(__file__).resolve()
+    for job in selected.values():
+        job.cmd = [sys.executable, str(script), str(config_path), command, "--profile", job.profile] + child_args
+    _schedule_jobs(selected, repo_root=repo_root, jobs=jobs, log_name=f"shudnc_{command}.log", dry_run=dry_run)
+
+    print("")
+    print(f"== Profiles summary ({command}, jobs={jobs}) ==")
+    rows = [("profile", "status", "rc", "wall_s", "depends_on", "log")]
+    for job in selected.values():
+        rows.append(
+            (
+                job.profile,
+                job.status,
+                "" if job.returncode is None else str(job.returncode),
+                "" if job.wall_sec is None else f"{job.wall_sec:.1f}",
+                ",".join(job.depends_on) or "-",
+                _relpath(repo_root, job.log_file) if job.log_file is not None else "-",
+            )
+        )
+    _print_table(rows)
+
+    return 0 if all(j.status == "ok" for j in selected.values()) else 1
+
+
+SWEEP_SECTIONS = ("autoshud", "para", "calib")
+
+
+def _sweep_grid(sweep_cfg: Dict[str, Any], *, name: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Expand sweeps.<name>.parameters ({"<section>.<KEY>": [values...]}) into grid members."""
+    params = _get(sweep_cfg, "parameters")
+    if not isinstance(params, dict) or not params:
+        raise ConfigError(f"Expected non-empty mapping for sweeps.{name}.parameters")
+    keys: List[str] = []
+    axes: List[List[Any]] = []
+    for k, values in params.items():
+        section = str(k).split(".", 1)[0]
+        if section not in SWEEP_SECTIONS or "." not in str(k):
+            raise ConfigError(
+                f"Invalid sweeps.{name}.parameters key {k!r}: expected <section>.<KEY> with section in {SWEEP_SECTIONS}"
+            )
+        if not isinstance(values, list) or not values:
+            raise ConfigError(f"Expected non-empty list for sweeps.{name}.parameters.{k}")
+        keys.append(str(k))
+        axes.append(values)
+    return keys, [dict(zip(keys, combo)) for combo in itertools.product(*axes)]
+
+
+def _link_run_tree(src: Path, dst: Path) -> Tuple[int, int]:
+    """Mirror src into dst with hardlinks; return (linked, copied).
+
+    Files shudnc.py rewrites (`*.cfg.*`) are copied so patching a member never
+    touches the base run; run outputs and logs are not mirrored.
+    """
+    linked = copied = 0
+    for dirpath, dirs, files in os.walk(src):
+        if Path(dirpath) == src:
+            dirs[:] = [d for d in dirs if d not in _STEP_SNAPSHOT_EXCLUDE + ("config",)]
+        out_dir = dst / os.path.relpath(dirpath, src)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            s_path = Path(dirpath) / name
+            d_path = out_dir / name
+            if d_path.exists() or d_path.is_symlink():
+                d_path.unlink()
+            if ".cfg." in name:
+                shutil.copy2(s_path, d_path)
+                copied += 1
+                continue
+            try:
+                os.link(s_path, d_path)
+                linked += 1
+            except OSError:
+                # Different filesystem (or no hardlink support): fall back to a copy.
+                shutil.copy2(s_path, d_path)
+                copied += 1
+    return linked, copied
+
+
+def _write_member_config(
+    cfg: Dict[str, Any],
+    *,
+    base_cfg: Dict[str, Any],
+    base_run_dir: Path,
+    member: str,
+    member_dir: Path,
+    values: Dict[str, Any],
+    rebuild: bool,
+    origin: str,
+    dry_run: bool,
+    shud_overrides: Optional[Dict[str, Any]] = None,
+) -> Path:
+    """Create a member run dir derived from a base profile; return its generated shud.yaml.
+
+    `values` maps "<section>.<KEY>" to a value (see SWEEP_SECTIONS). Without
+    `rebuild` the member hardlinks the base run tree and only SHUD runs.
+    """
+    member_prof = copy.deepcopy(base_cfg)
+    member_prof["run_dir"] = str(member_dir)
+    member_prof.pop("depends_on", None)
+    shud = member_prof.setdefault("shud", {})
+    shud.update(copy.deepcopy(shud_overrides or {}))
+    shud["run"] = True
+    for section in ("para", "calib"):
+        upd = {k.split(".", 1)[1]: v for k, v in values.items() if k.startswith(f"{section}.")}
+        if upd:
+            shud[section] = {**(shud.get(section) or {}), **upd}
+
+    member_cfg = copy.deepcopy(cfg)
+    member_cfg.pop("sweeps", None)
+    member_cfg.pop("calibration", None)
+    if rebuild:
+        auto = copy.deepcopy(member_prof.get("autoshud") or _get(cfg, "profiles.baseline.autoshud"))
+        auto.setdefault("forcing", {})["csv_dir"] = str(member_dir / "forcing")
+        member_prof["autoshud"] = auto
+        params = member_cfg.setdefault("autoshud", {}).setdefault("parameters", {})
+        params.update({k.split(".", 1)[1]: v for k, v in values.items() if k.startswith("autoshud.")})
+    else:
+        member_prof.setdefault("autoshud", {})["steps"] = []
+    member_cfg["profiles"][member] = member_prof
+
+    member_yaml = member_dir / "config" / "member.shud.yaml"
+    if not dry_run:
+        if not rebuild:
+            linked, copied = _link_run_tree(base_run_dir, member_dir)
+            print(f"# {member}: hardlinked {linked} files, copied {copied} from {base_run_dir}")
+        member_yaml.parent.mkdir(parents=True, exist_ok=True)
+        member_yaml.write_text(
+            f"# Auto-generated by tools/shudnc.py ({origin}); do not edit manually.\n"
+            + yaml.safe_dump(member_cfg, sort_keys=False, allow_unicode=True),
+            encoding="utf-8",
+        )
+    return member_yaml
+
+
+def _sweep(
+    cfg: Dict[str, Any],
+    *,
+    repo_root: Path,
+    sweep_name: str,
+    jobs: int,
+    dry_run: bool,
+) -> int:
+    sweeps = _get(cfg, "sweeps", required=False) or {}
+    if not isinstance(sweeps, dict) or not sweeps:
+        raise ConfigError("No sweeps defined (expected a top-level `sweeps:` mapping)")
+    if not sweep_name:
+        if len(sweeps) != 1:
+            raise ConfigError(f"Several sweeps defined; pass --sweep one of: {', '.join(sorted(sweeps))}")
+        sweep_name = next(iter(sweeps))
+    sweep_cfg = _get(sweeps, sweep_name, required=False)
+    if not isinstance(sweep_cfg, dict):
+        raise ConfigError(f"Sweep not found: {sweep_name}")
+
+    base_profile = _as_str(sweep_cfg.get("base_profile", "baseline"), key=f"sweeps.{sweep_name}.base_profile")
+    base_cfg = _get(cfg, f"profiles.{base_profile}", required=False)
+    if not isinstance(base_cfg, dict):
+        raise ConfigError(f"sweeps.{sweep_name}.base_profile not found: {base_profile}")
+    base_run_dir = _resolve_path(repo_root, _get(base_cfg, "run_dir"))
+    run_root = _resolve_path(
+        repo_root, _as_str(_get(sweep_cfg, "run_root"), key=f"sweeps.{sweep_name}.run_root")
+    )
+    prjname = str(_get(cfg, "project.name"))
+    cpus = _as_int(sweep_cfg.get("cpus", base_cfg.get("cpus", 1)), key=f"sweeps.{sweep_name}.cpus")
+    if jobs <= 0:
+        jobs = _as_int(sweep_cfg.get("jobs", os.cpu_count() or 1), key=f"sweeps.{sweep_name}.jobs")
+
+    _require_plain_member_output(base_cfg, profile=base_profile, what=f"sweep {sweep_name}")
+    keys, members = _sweep_grid(sweep_cfg, name=sweep_name)
+    rebuild = any(k.startswith("autoshud.") for k in keys)
+    if rebuild:
+        base_steps = _get(base_cfg, "autoshud.steps", required=False)
+        if base_steps == []:
+            raise ConfigError(
+                f"sweeps.{sweep_name} varies autoshud.* but base profile {base_profile} does not run AutoSHUD steps"
+            )
+    elif not dry_run and not (base_run_dir / "input" / prjname).is_dir():
+        raise ConfigError(
+            f"Base run inputs not found: {base_run_dir / 'input' / prjname}\n"
+            f"Hint: run `shudnc.py ... run --profile {base_profile}` first; members hardlink its inputs."
+        )
+
+    # Members share the base profile's forcing: check it once here instead of in every member run.
+    _netcdf_forcing_preflight(cfg, repo_root=repo_root, profile=base_profile, jobs=jobs)
+    print(f"# sweep {sweep_name}: {len(members)} members from {base_profile} -> {run_root}")
+    script = Path(__file__).resolve()
+    selected: Dict[str, _ProfileJob] = {}
+    for i, values in enumerate(members):
+        member = f"{sweep_name}_{i:03d}"
+        member_dir = run_root / member
+
+        member_yaml = _write_member_config(
+            cfg,
+            base_cfg=base_cfg,
+            base_run_dir=base_run_dir,
+            member=member,
+            member_dir=member_dir,
+            values=values,
+            rebuild=rebuild,
+            origin=f"sweep {sweep_name}",
+            dry_run=dry_run,
+        )
+        selected[member] = _ProfileJob(
+            profile=member,
+            run_dir=member_dir,
+            depends_on=[],
+            cpus=max(1, min(cpus, jobs)),
+            cmd=[sys.executable, str(script), str(member_yaml), "run", "--profile", member, "--no-forcing-preflight"],
+        )
+
+    if dry_run:
+        for job in selected.values():
+            print(f"$ {' '.join(job.cmd)}")
+    else:
+        _schedule_jobs(selected, repo_root=repo_root, jobs=jobs, log_name="shudnc_sweep.log", dry_run=False)
+
+    rows: List[Tuple[str, ...]] = [tuple(["member"] + keys + ["status", "rc", "wall_s"])]
+    summary: List[Dict[str, Any]] = []
+    for (member, job), values in zip(selected.items(), members):
+        rows.append(
+            tuple(
+                [member]
+                + [str(values[k]) for k in keys]
+                + [
+                    job.status,
+                    "" if job.returncode is None else str(job.returncode),
+                    "" if job.wall_sec is None else f"{job.wall_sec:.1f}",
+                ]
+            )
+        )
+        summary.append(
+            {
+                "member": member,
+                "run_dir": str(job.run_dir),
+                "parameters": values,
+                "status": job.status,
+                "returncode": job.returncode,
+                "wall_sec": job.wall_sec,
+                "log": str(job.log_file) if job.log_file is not None else None,
+            }
+        )
+    print("")
+    print(f"== Sweep summary ({sweep_name}, jobs={jobs}) ==")
+    _print_table(rows)
+    if not dry_run:
+        out = run_root / "sweep_summary.json"
+        _write_json(out, {"sweep": sweep_name, "base_profile": base_profile, "members": summary})
+        print(f"Wrote: {out}")
+        return 0 if all(j.status == "ok" for j in selected.values()) else 1
+    return 0
+
+
+@dataclass(frozen=True)
+class _CalibParam:
+    key: str
+    lo: float
+    hi: float
+    log: bool
+    init: Optional[float]
+
+    def to_unit(self, v: float) -> float:
+        if self.log:
+            return (math.log(v) - math.log(self.lo)) / (math.log(self.hi) - math.log(self.lo))
+        return (v - self.lo) / (self.hi - self.lo)
+
+    def from_unit(self, u: float) -> float:
+        u = min(1.0, max(0.0, u))
+        if self.log:
+            return float(math.exp(math.log(self.lo) + u * (math.log(self.hi) - math.log(self.lo))))
+        return float(self.lo + u * (self.hi - self.lo))
+
+
+def _calib_params(calib_cfg: Dict[str, Any], *, name: str) -> List[_CalibParam]:
+    params = _get(calib_cfg, "parameters")
+    if not isinstance(params, dict) or not params:
+        raise ConfigError(f"Expected non-empty mapping for calibration.{name}.parameters")
+    out: List[_CalibParam] = []
+    for k, spec in params.items():
+        key = f"calibration.{name}.parameters.{k}"
+        if str(k).split(".", 1)[0] not in ("para", "calib") or "." not in str(k):
+            raise ConfigError(f"Invalid {key}: expected para.<KEY> or calib.<KEY> (SHUD-only parameters)")
+        if not isinstance(spec, dict):
+            raise ConfigError(f"Expected mapping with min/max for {key}")
+        lo = _as_float(spec.get("min"), key=f"{key}.min")
+        hi = _as_float(spec.get("max"), key=f"{key}.max")
+        log = bool(spec.get("log", False))
+        if not hi > lo or (log and lo <= 0):
+            raise ConfigError(f"Invalid range for {key}: min={lo} max={hi} log={log}")
+        init = _as_float(spec["init"], key=f"{key}.init") if spec.get("init") is not None else None
+        out.append(_CalibParam(key=str(k), lo=lo, hi=hi, log=log, init=init))
+    return out
+
+
+def _read_observed(path: Path, *, forc_start: dt.datetime) -> Dict[float, float]:
+    """Read `time,value` CSV; time is minutes since ForcStartTime or an ISO date/datetime (UTC)."""
+    obs: Dict[float, float] = {}
+    try:
+        f = path.open("r", encoding="utf-8", newline="")
+    except FileNotFoundError as exc:
+        raise ConfigError(f"Observed discharge file not found: {path}") from exc
+    with f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().startswith("#"):
+                continue
+            t_raw, v_raw = row[0].strip(), row[1].strip() if len(row) > 1 else ""
+            try:
+                value = float(v_raw)
+            except ValueError:
+                continue  # header or missing value
+            try:
+                t_min = float(t_raw)
+            except ValueError:
+                try:
+                    stamp = dt.datetime.fromisoformat(t_raw)
+                except ValueError:
+                    raise ConfigError(f"Invalid time in observed file {path}: {t_raw!r}") from None
+                if stamp.tzinfo is None:
+                    stamp = stamp.replace(tzinfo=dt.timezone.utc)
+                t_min = (stamp - forc_start).total_seconds() / 60.0
+            if math.isfinite(value):
+                obs[round(t_min, 6)] = value
+    if not obs:
+        raise ConfigError(f"No observations read from: {path}")
+    return obs
+
+
+class _OutletTracker:
+    """Incrementally accumulate the sum of squared errors of one legacy output column vs observations."""
+
+    def __init__(self, path: Path, *, outlet: int, obs: Dict[float, float]) -> None:
+        self.path = path
+        self.outlet = int(outlet)
+        self.obs = obs
+        self.sse = 0.0
+        self.n = 0
+        self.records = 0
+        self._reader: Any = None
+        self._col: Optional[int] = None
+
+    def poll(self) -> None:
+        from compare_output import LegacyBinReader
+
+        if self._reader is None:
+            try:
+                self._reader = LegacyBinReader(str(self.path), allow_partial=True)
+            except (OSError, ValueError):
+                return  # not created yet, or header still being written
+            icol = list(self._reader.icol_1based)
+            if self.outlet not in icol:
+                raise ConfigError(f"Outlet index {self.outlet} not in output columns of {self.path}")
+            self._col = icol.index(self.outlet)
+        n = self._reader.refresh()
+        assert self._col is not None
+        for i in range(self.records, n):
+            t, values = self._reader.record(i)
+            ob = self.obs.get(round(float(t), 6))
+            if ob is not None:
+                self.sse += (float(values[self._col]) - ob) ** 2
+                self.n += 1
+        self.records = n
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+def _calibrate(
+    cfg: Dict[str, Any],
+    *,
+    repo_root: Path,
+    name: str,
+    jobs: int,
+    dry_run: bool,
+) -> int:
+    """Evolution-strategy calibration of SHUD para/calib parameters against observed outlet discharge.
+
+    Each generation samples `population` members around the current center
+    (Gaussian in normalized, optionally log-scaled, parameter space), runs them as
+    SHUD members of the base profile, and moves the center to the mean of the best
+    `elite` members. The objective is the sum of squared errors at observed times
+    (reported also as NSE); because it only grows as a run proceeds, a member is
+    killed as soon as its partial SSE reaches the best complete SSE so far.
+    """
+    all_calib = _get(cfg, "calibration", required=False) or {}
+    if not isinstance(all_calib, dict) or not all_calib:
+        raise ConfigError("No calibration defined (expected a top-level `calibration:` mapping)")
+    if not name:
+        if len(all_calib) != 1:
+            choices = ", ".join(sorted(all_calib))
+            raise ConfigError(f"Several calibrations defined; pass --calibration one of: {choices}")
+        name = next(iter(all_calib))
+    ccfg = _get(all_calib, name, required=False)
+    if not isinstance(ccfg, dict):
+        raise ConfigError(f"Calibration not found: {name}")
+
+    key = f"calibration.{name}"
+    base_profile = _as_str(ccfg.get("base_profile", "baseline"), key=f"{key}.base_profile")
+    base_cfg = _get(cfg, f"profiles.{base_profile}", required=False)
+    if not isinstance(base_cfg, dict):
+        raise ConfigError(f"{key}.base_profile not found: {base_profile}")
+    _require_plain_member_output(base_cfg, profile=base_profile, what=f"calibration {name}")
+    base_run_dir = _resolve_path(repo_root, _get(base_cfg, "run_dir"))
+    run_root = _resolve_path(repo_root, _as_str(_get(ccfg, "run_root"), key=f"{key}.run_root"))
+    prjname = str(_get(cfg, "project.name"))
+    output_var = _as_str(ccfg.get("output", "rivqdown"), key=f"{key}.output")
+    outlet = _as_int(_get(ccfg, "outlet"), key=f"{key}.outlet")
+    population = _as_int(ccfg.get("population", 8), key=f"{key}.population")
+    generations = _as_int(ccfg.get("generations", 10), key=f"{key}.generations")
+    elite = _as_int(ccfg.get("elite", max(1, population // 4)), key=f"{key}.elite")
+    sigma = _as_float(ccfg.get("sigma", 0.3), key=f"{key}.sigma")
+    sigma_decay = _as_float(ccfg.get("sigma_decay", 0.85), key=f"{key}.sigma_decay")
+    warmup_min = _as_float(ccfg.get("warmup_days", 0), key=f"{key}.warmup_days") * 1440.0
+    cpus = _as_int(ccfg.get("cpus", base_cfg.get("cpus", 1)), key=f"{key}.cpus")
+    if jobs <= 0:
+        jobs = _as_int(ccfg.get("jobs", os.cpu_count() or 1), key=f"{key}.jobs")
+    if population < 2 or generations < 1 or not 1 <= elite <= population:
+        raise ConfigError(f"Invalid {key}: need population>=2, generations>=1, 1<=elite<=population")
+    params = _calib_params(ccfg, name=name)
+
+    input_dir = base_run_dir / "input" / prjname
+    tsd_forc = input_dir / f"{prjname}.tsd.forc"
+    if not tsd_forc.exists():
+        raise ConfigError(
+            f"Base run inputs not found: {tsd_forc}\n"
+            f"Hint: run `shudnc.py ... run --profile {base_profile}` first; members hardlink its inputs."
+        )
+    head = tsd_forc.read_text(encoding="utf-8").split("\n", 1)[0].split()
+    forc_start_i = _as_int(head[1] if len(head) > 1 else None, key=f"ForcStartTime in {tsd_forc}")
+    forc_start = dt.datetime(
+        forc_start_i // 10000, (forc_start_i // 100) % 100, forc_start_i % 100, tzinfo=dt.timezone.utc
+    )
+    obs_path = _resolve_path(repo_root, _as_str(_get(ccfg, "observed"), key=f"{key}.observed"))
+    # Only observations inside the simulated window can be matched: a member counts as complete
+    # (and can become best) only when it matched every one of them.
+    para = _read_kv_file(input_dir / f"{prjname}.cfg.para")
+    t_lo = max(warmup_min, _as_float(para.get("START", 0), key=f"START in {prjname}.cfg.para") * 1440.0)
+    t_hi = _as_float(para["END"], key=f"END in {prjname}.cfg.para") * 1440.0 if "END" in para else math.inf
+    obs = {t: v for t, v in _read_observed(obs_path, forc_start=forc_start).items() if t_lo <= t <= t_hi}
+    if not obs:
+        raise ConfigError(
+            f"No observations inside the simulated window after warmup ({warmup_min / 1440.0:g} days): {obs_path}"
+        )
+    obs_mean = sum(obs.values()) / len(obs)
+    sst = sum((v - obs_mean) ** 2 for v in obs.values())
+
+    _netcdf_forcing_preflight(cfg, repo_root=repo_root, profile=base_profile, jobs=jobs)
+    rng = random.Random(_as_int(ccfg.get("seed", 0), key=f"{key}.seed"))
+    center = [p.to_unit(p.init) if p.init is not None else 0.5 for p in params]
+    script = Path(__file__).resolve()
+    best: Optional[Dict[str, Any]] = None
+    history: List[Dict[str, Any]] = []
+    print(
+        f"# calibration {name}: {len(params)} parameters, population={population} generations={generations} "
+        f"jobs={jobs}, {len(obs)} observations of {output_var}[{outlet}]"
+    )
+
+    for gen in range(generations):
+        units: List[List[float]] = [list(center)] if gen == 0 else []
+        while len(units) < population:
+            units.append([min(1.0, max(0.0, c + rng.gauss(0.0, sigma))) for c in center])
+
+        selected: Dict[str, _ProfileJob] = {}
+        trackers: Dict[str, _OutletTracker] = {}
+        member_values: Dict[str, Dict[str, float]] = {}
+        for k, u in enumerate(units):
+            member = f"{name}_g{gen:02d}_m{k:02d}"
+            member_dir = run_root / member
+            values = {p.key: p.from_unit(x) for p, x in zip(params, u)}
+            member_yaml = _write_member_config(
+                cfg,
+                base_cfg=base_cfg,
+                base_run_dir=base_run_dir,
+                member=member,
+                member_dir=member_dir,
+                values=values,
+                rebuild=False,
+                origin=f"calibration {name}",
+                dry_run=dry_run,
+            )
+            selected[member] = _ProfileJob(
+                profile=member,
+                run_dir=member_dir,
+                depends_on=[],
+                cpus=max(1, min(cpus, jobs)),
+                cmd=[
+                    sys.executable, str(script), str(member_yaml), "run", "--profile", member, "--no-forcing-preflight"
+                ],
+            )
+            member_values[member] = values
+            trackers[member] = _OutletTracker(
+                member_dir / "output" / f"{prjname}.out" / f"{prjname}.{output_var}.dat", outlet=outlet, obs=obs
+            )
+
+        if dry_run:
+            for job in selected.values():
+                print(f"$ {' '.join(job.cmd)}")
+            print("# dry-run: later generations depend on results; stopping after generation 0")
+            return 0
+
+        def monitor(job: _ProfileJob) -> bool:
+            tr = trackers[job.profile]
+            tr.poll()
+            return best is None or tr.sse < best["sse"]
+
+        def on_finish(job: _ProfileJob) -> None:
+            nonlocal best
+            tr = trackers[job.profile]
+            if job.status == "ok":
+                tr.poll()
+            tr.close()
+            if job.status == "ok" and tr.n == len(obs) and (best is None or tr.sse < best["sse"]):
+                best = {"member": job.profile, "sse": tr.sse, "n_obs": tr.n, "parameters": member_values[job.profile]}
+                print(f"# new best: {job.profile} sse={tr.sse:.6g}")
+
+        _schedule_jobs(
+            selected,
+            repo_root=repo_root,
+            jobs=jobs,
+            log_name="shudnc_calibration.log",
+            dry_run=False,
+            monitor=monitor,
+            on_finish=on_finish,
+        )
+
+        results: List[Tuple[float, str, List[float]]] = []
+        rows: List[Tuple[str, ...]] = [
+            tuple(["member"] + [p.key for p in params] + ["status", "obs", "sse", "nse", "wall_s"])
+        ]
+        for (member, job), u in zip(selected.items(), units):
+            tr = trackers[member]
+            complete = job.status == "ok" and tr.n == len(obs)
+            if complete:
+                results.append((tr.sse, member, u))
+            history.append(
+                {
+                    "generation": gen,
+                    "member": member,
+                    "parameters": member_values[member],
+                    "status": job.status,
+                    "sse": tr.sse if tr.n > 0 else None,
+                    "nse": (1.0 - tr.sse / sst) if complete and sst > 0 else None,
+                    "n_obs": tr.n,
+                    "coverage": tr.n / len(obs),
+                    "records": tr.records,
+                    "wall_sec": job.wall_sec,
+                }
+            )
+            rows.append(
+                tuple(
+                    [member]
+                    + [f"{member_values[member][p.key]:.6g}" for p in params]
+                    + [
+                        job.status,
+                        f"{tr.n}/{len(obs)}",
+                        f"{tr.sse:.6g}" if tr.n > 0 else "",
+                        f"{1.0 - tr.sse / sst:.4f}" if complete and sst > 0 else "",
+                        "" if job.wall_sec is None else f"{job.wall_sec:.1f}",
+                    ]
+                )
+            )
+        print("")
+        print(f"== Calibration generation {gen} ({name}, sigma={sigma:.3g}) ==")
+        _print_table(rows)
+
+        if results:
+            results.sort(key=lambda r: r[0])
+            elites = [u for (_, _, u) in results[:elite]]
+            center = [sum(col) / len(elites) for col in zip(*elites)]
+        sigma *= sigma_decay
+
+    summary = {
+        "calibration": name,
+        "base_profile": base_profile,
+        "objective": "sse",
+        "observed": str(obs_path),
+        "n_obs": len(obs),
+        "best": None if best is None else {**best, "nse": (1.0 - best["sse"] / sst) if sst > 0 else None},
+        "members": history,
+    }
+    out = run_root / "calibration_summary.json"
+    _write_json(out, summary)
+    print("")
+    print(f"== Calibration best ({name}) ==")
+    if best is None:
+        print(f"- no member matched all {len(obs)} observations (check observed times vs the output interval)")
+    else:
+        print(f"- {best['member']}: sse={best['sse']:.6g} nse={summary['best']['nse']}")
+        for k, v in best["parameters"].items():
+            print(f"  {k}: {v:.6g}")
+    print(f"Wrote: {out}")
+    return 0 if best is not None else 1
+
+
+BENCH_FORCING_MODES = ("csv", "netcdf")
+BENCH_OUTPUT_MODES = ("legacy", "netcdf", "both")
+
+
+def _median(values: List[float]) -> Optional[float]:
+    vals = sorted(v for v in values if v is not None)
+    if not vals:
+        return None
+    mid = len(vals) // 2
+    return vals[mid] if len(vals) % 2 else 0.5 * (vals[mid - 1] + vals[mid])
+
+
+def _bench(
+    cfg: Dict[str, Any],
+    *,
+    repo_root: Path,
+    trials: int,
+    dry_run: bool,
+) -> int:
+    """Benchmark SHUD over forcing_mode x output_mode combinations on a short window.
+
+    Every combination is a member run dir hardlinked from the base profile
+    (NetCDF forcing/output settings come from `netcdf_profile`), with START/END
+    in <prj>.cfg.para narrowed to `days`. Trials run one at a time so runs do not
+    compete for cores or disk; figures come from each run's logs/manifest.json.
+    """
+    prjname = str(_get(cfg, "project.name"))
+    bcfg = _get(cfg, "bench", required=False) or {}
+    if not isinstance(bcfg, dict):
+        raise ConfigError("Expected mapping for bench")
+    base_profile = _as_str(bcfg.get("base_profile", "baseline"), key="bench.base_profile")
+    nc_profile = _as_str(bcfg.get("netcdf_profile", "nc"), key="bench.netcdf_profile")
+    run_root = _resolve_path(repo_root, _as_str(bcfg.get("run_root", f"runs/{prjname}/bench"), key="bench.run_root"))
+    days = _as_float(bcfg.get("days", 10), key="bench.days")
+    if trials <= 0:
+        trials = _as_int(bcfg.get("trials", 3), key="bench.trials")
+    forcing_modes = [
+        _normalize_enum(m, key="bench.forcing_modes[]") for m in bcfg.get("forcing_modes", BENCH_FORCING_MODES)
+    ]
+    output_modes = [
+        _normalize_enum(m, key="bench.output_modes[]") for m in bcfg.get("output_modes", BENCH_OUTPUT_MODES)
+    ]
+    bad = [m for m in forcing_modes if m not in BENCH_FORCING_MODES] + [
+        m for m in output_modes if m not in BENCH_OUTPUT_MODES
+    ]
+    if bad:
+        raise ConfigError(f"Unsupported bench mode(s): {bad}")
+
+    base_cfg = _get(cfg, f"profiles.{base_profile}", required=False)
+    nc_cfg = _get(cfg, f"profiles.{nc_profile}", required=False)
+    if not isinstance(base_cfg, dict) or not isinstance(nc_cfg, dict):
+        raise ConfigError(f"bench needs profiles {base_profile} and {nc_profile}")
+    nc_shud = _get(nc_cfg, "shud", required=False) or {}
+    base_run_dir = _resolve_path(repo_root, _get(base_cfg, "run_dir"))
+    para = _read_kv_file(base_run_dir / "input" / prjname / f"{prjname}.cfg.para")
+    if not dry_run and not para:
+        raise ConfigError(
+            f"Base run inputs not found: {base_run_dir / 'input' / prjname}\n"
+            f"Hint: run `shudnc.py ... run --profile {base_profile}` first; bench members hardlink its inputs."
+        )
+    start_day = float(para.get("START", 0))
+    window = {"START": f"{start_day:g}", "END": f"{start_day + days:g}"}
+
+    script = Path(__file__).resolve()
+    combos: List[Tuple[str, str, str, Path, Path]] = []
+    for fm in forcing_modes:
+        for om in output_modes:
+            member = f"bench_{fm}_{om}"
+            member_dir = run_root / member
+            overrides: Dict[str, Any] = {"forcing_mode": fm, "output_mode": om, "para": window}
+            if fm == "netcdf":
+                overrides["forcing"] = copy.deepcopy(_get(nc_shud, "forcing"))
+            if om in ("netcdf", "both"):
+                out_cfg = copy.deepcopy(_get(nc_shud, "output"))
+                out_cfg["dir"] = str(member_dir / "output_netcdf")
+                overrides["output"] = out_cfg
+            member_yaml = _write_member_config(
+                cfg,
+                base_cfg=base_cfg,
+                base_run_dir=base_run_dir,
+                member=member,
+                member_dir=member_dir,
+                values={},
+                rebuild=False,
+                origin="bench",
+                dry_run=dry_run,
+                shud_overrides=overrides,
+            )
+            combos.append((member, fm, om, member_dir, member_yaml))
+
+    print(
+        f"# bench: {len(combos)} combinations x {trials} trials, "
+        f"window START={window['START']} END={window['END']} (days)"
+    )
+    results: List[Dict[str, Any]] = []
+    for member, fm, om, member_dir, member_yaml in combos:
+        cmd = [sys.executable, str(script), str(member_yaml), "run", "--profile", member]
+        runs: List[Dict[str, Any]] = []
+        for trial in range(trials):
+            if dry_run:
+                print(f"$ {' '.join(cmd)}")
+                break
+            job = _ProfileJob(profile=f"{member}#{trial}", run_dir=member_dir, depends_on=[], cpus=1, cmd=cmd)
+            _schedule_jobs({job.profile: job}, repo_root=repo_root, jobs=1, log_name="shudnc_bench.log", dry_run=False)
+            manifest = _read_json(member_dir / "logs" / "manifest.json") or {}
+            last = (manifest.get("runs") or [{}])[-1]
+            shud = next((st for st in last.get("steps", []) if st.get("step") == "shud"), None)
+            runs.append({"trial": trial, "status": job.status, **(shud or {})})
+        ok = [r for r in runs if r.get("status") == "ok" and r.get("wall_sec") is not None]
+        results.append(
+            {
+                "member": member,
+                "forcing_mode": fm,
+                "output_mode": om,
+                "trials": runs,
+                "ok": len(ok),
+                "median_wall_sec": _median([r["wall_sec"] for r in ok]),
+                "median_sim_days_per_sec": _median([r.get("sim_days_per_sec") for r in ok]),
+                "max_rss_kb": max((r["max_rss_kb"] for r in ok if r.get("max_rss_kb") is not None), default=None),
+                "median_read_bytes": _median([r.get("rchar") for r in ok]),
+                "median_write_bytes": _median([r.get("wchar") for r in ok]),
+            }
+        )
+    if dry_run:
+        return 0
+
+    def fmt(v: Optional[float], scale: float = 1.0, spec: str = ".3g") -> str:
+        return "" if v is None else format(v / scale, spec)
+
+    rows: List[Tuple[str, ...]] = [
+        ("forcing", "output", "ok", "wall_s", "sim_days/s", "peak_rss_MB", "read_MB", "write_MB")
+    ]
+    for r in results:
+        rows.append(
+            (
+                r["forcing_mode"],
+                r["output_mode"],
+                f"{r['ok']}/{trials}",
+                fmt(r["median_wall_sec"], spec=".2f"),
+                fmt(r["median_sim_days_per_sec"]),
+                fmt(r["max_rss_kb"], 1024.0, ".1f"),
+                fmt(r["median_read_bytes"], 1e6, ".1f"),
+                fmt(r["median_write_bytes"], 1e6, ".1f"),
+            )
+        )
+    print("")
+    print(f"== Bench summary ({prjname}, {days:g} days, median of {trials} trials) ==")
+    _print_table(rows)
+    out = run_root / "bench_summary.json"
+    _write_json(out, {"project": prjname, "window": window, "trials": trials, "results": results})
+    print(f"Wrote: {out}")
+    return 0 if all(r["ok"] == trials for r in results) else 1
+
+
+PIN_BENCH_MODES = ("default", "threads", "pinned")
+
+
+def _bench_pinning(
+    cfg: Dict[str, Any],
+    *,
+    repo_root: Path,
+    trials: int,
+    dry_run: bool,
+) -> int:
+    """Aggregate throughput of a concurrent SHUD ensemble with and without CPU pinning.
+
+    `members` copies of the base run (hardlinked, window narrowed to bench.days)
+    run all at once in three modes: OpenMP defaults ("default"), OMP_NUM_THREADS
+    only ("threads") and threads pinned to cores claimed from the node budget
+    ("pinned"). Aggregate throughput is members * days / makespan.
+    """
+    prjname = str(_get(cfg, "project.name"))
+    bcfg = _get(cfg, "bench", required=False) or {}
+    if not isinstance(bcfg, dict):
+        raise ConfigError("Expected mapping for bench")
+    pcfg = bcfg.get("pinning") or {}
+    if not isinstance(pcfg, dict):
+        raise ConfigError("Expected mapping for bench.pinning")
+    base_profile = _as_str(bcfg.get("base_profile", "baseline"), key="bench.base_profile")
+    base_cfg = _get(cfg, f"profiles.{base_profile}", required=False)
+    if not isinstance(base_cfg, dict):
+        raise ConfigError(f"bench needs profile {base_profile}")
+    run_root = _resolve_path(repo_root, _as_str(bcfg.get("run_root", f"runs/{prjname}/bench"), key="bench.run_root"))
+    run_root = run_root / "pinning"
+    days = _as_float(bcfg.get("days", 10), key="bench.days")
+    if trials <= 0:
+        trials = _as_int(bcfg.get("trials", 3), key="bench.trials")
+    base_shud = base_cfg.get("shud") or {}
+    threads = _as_int(
+        pcfg.get("threads", base_shud.get("threads", base_cfg.get("cpus", 1))), key="bench.pinning.threads"
+    )
+    node_cpus = _node_cpus(cfg)
+    members = _as_int(pcfg.get("members", max(1, len(node_cpus) // max(1, threads))), key="bench.pinning.members")
+    if threads <= 0 or members <= 0:
+        raise ConfigError("bench.pinning.threads and bench.pinning.members must be positive")
+    if threads * members > len(node_cpus):
+        raise ConfigError(
+            f"bench.pinning: {members} members x {threads} threads exceeds the node budget of {len(node_cpus)} CPUs"
+        )
+
+    base_run_dir = _resolve_path(repo_root, _get(base_cfg, "run_dir"))
+    para = _read_kv_file(base_run_dir / "input" / prjname / f"{prjname}.cfg.para")
+    if not dry_run and not para:
+        raise ConfigError(
+            f"Base run inputs not found: {base_run_dir / 'input' / prjname}\n"
+            f"Hint: run `shudnc.py ... run --profile {base_profile}` first; bench members hardlink its inputs."
+        )
+    start_day = float(para.get("START", 0))
+    window = {"START": f"{start_day:g}", "END": f"{start_day + days:g}"}
+    mode_overrides: Dict[str, Dict[str, Any]] = {
+        "default": {"threads": None, "pin": False},
+        "threads": {"threads": threads, "pin": False},
+        "pinned": {"threads": threads, "pin": True},
+    }
+
+    script = Path(__file__).resolve()
+    ensembles: Dict[str, List[_ProfileJob]] = {}
+    for mode in PIN_BENCH_MODES:
+        ensembles[mode] = []
+        for i in range(members):
+            member = f"pin_{mode}_{i}"
+            member_dir = run_root / member
+            member_yaml = _write_member_config(
+                cfg,
+                base_cfg=base_cfg,
+                base_run_dir=base_run_dir,
+                member=member,
+                member_dir=member_dir,
+                values={},
+                rebuild=False,
+                origin="bench-pin",
+                dry_run=dry_run,
+                shud_overrides={"para": window, **mode_overrides[mode]},
+            )
+            cmd = [sys.executable, str(script), str(member_yaml), "run", "--profile", member]
+            ensembles[mode].append(
+                _ProfileJob(profile=member, run_dir=member_dir, depends_on=[], cpus=threads, cmd=cmd)
+            )
+
+    print(
+        f"# bench-pin: {members} members x {threads} threads, modes {', '.join(PIN_BENCH_MODES)}, "
+        f"{trials} trials, window START={window['START']} END={window['END']} (days)"
+    )
+    if dry_run:
+        for mode in PIN_BENCH_MODES:
+            for job in ensembles[mode]:
+                print(f"$ {' '.join(job.cmd)}")
+        return 0
+
+    results: List[Dict[str, Any]] = []
+    for trial in range(trials):
+        # Interleave modes per trial so slow drift of the node does not favour one mode.
+        for mode in PIN_BENCH_MODES:
+            jobs: Dict[str, _ProfileJob] = {}
+            for j in ensembles[mode]:
+                jobs[j.profile] = _ProfileJob(
+                    profile=j.profile, run_dir=j.run_dir, depends_on=[], cpus=threads, cmd=j.cmd
+                )
+            t0 = time.monotonic()
+            _schedule_jobs(
+                jobs, repo_root=repo_root, jobs=members * threads, log_name="shudnc_bench.log", dry_run=False
+            )
+            makespan = time.monotonic() - t0
+            rates: List[float] = []
+            for job in jobs.values():
+                manifest = _read_json(job.run_dir / "logs" / "manifest.json") or {}
+                last = (manifest.get("runs") or [{}])[-1]
+                shud = next((st for st in last.get("steps", []) if st.get("step") == "shud"), None) or {}
+                if shud.get("sim_days_per_sec"):
+                    rates.append(float(shud["sim_days_per_sec"]))
+            ok = sum(1 for j in jobs.values() if j.status == "ok")
+            results.append(
+                {
+                    "trial": trial,
+                    "mode": mode,
+                    "ok": ok,
+                    "makespan_sec": makespan,
+                    "aggregate_sim_days_per_sec": ok * days / makespan if makespan > 0 else None,
+                    "median_member_sim_days_per_sec": _median(rates),
+                }
+            )
+            print(f"# trial {trial} {mode}: {ok}/{members} ok, makespan {makespan:.1f}s")
+
+    rows: List[Tuple[str, ...]] = [("mode", "ok", "makespan_s", "agg_sim_days/s", "member_sim_days/s", "vs_default")]
+    summary: Dict[str, Dict[str, Any]] = {}
+    for mode in PIN_BENCH_MODES:
+        rs = [r for r in results if r["mode"] == mode]
+        summary[mode] = {
+            "ok": sum(r["ok"] for r in rs),
+            "median_makespan_sec": _median([r["makespan_sec"] for r in rs]),
+            "median_aggregate_sim_days_per_sec": _median([r["aggregate_sim_days_per_sec"] for r in rs]),
+            "median_member_sim_days_per_sec": _median([r["median_member_sim_days_per_sec"] for r in rs]),
+        }
+    base_rate = summary["default"]["median_aggregate_sim_days_per_sec"]
+    for mode in PIN_BENCH_MODES:
+        s = summary[mode]
+        agg = s["median_aggregate_sim_days_per_sec"]
+        member_rate = s["median_member_sim_days_per_sec"]
+        rows.append(
+            (
+                mode,
+                f"{s['ok']}/{members * trials}",
+                "" if s["median_makespan_sec"] is None else f"{s['median_makespan_sec']:.2f}",
+                "" if agg is None else f"{agg:.3g}",
+                "" if member_rate is None else f"{member_rate:.3g}",
+                f"{agg / base_rate:.2f}x" if agg and base_rate else "",
+            )
+        )
+    print("")
+    print(f"== Pinning bench ({prjname}, {members} x {threads} threads, {days:g} days, median of {trials} trials) ==")
+    _print_table(rows)
+    out = run_root / "pinning_summary.json"
+    _write_json(
+        out,
+        {
+            "project": prjname,
+            "window": window,
+            "members": members,
+            "threads": threads,
+            "node_cpus": node_cpus,
+            "trials": trials,
+            "summary": summary,
+            "results": results,
+        },
+    )
+    print(f"Wrote: {out}")
+    return 0 if all(s["ok"] == members * trials for s in summary.values()) else 1
+
+
 def main(argv: List[str]) -> int:
     parser = argparse.ArgumentParser(description="SHUD-NC meta runner (shud.yaml as single entry)")
     parser.add_argument("config", help="Path to projects/<case>/shud.yaml (relative to repo root or absolute)")
     parser.add_argument(
         "command",
-        choices=["validate", "render-autoshud", "render-shud-cfg", "autoshud", "run"],
+        choices=[
+            "validate",
+            "render-autoshud",
+            "render-shud-cfg",
+            "autoshud",
+            "run",
+            "sweep",
+            "calibrate",
+            "bench",
+            "bench-pin",
+        ],
         help="Action to perform",
     )
     parser.add_argument("--profile", default="baseline", help="Profile under profiles/<name> (default: baseline)")
+    parser.add_argument(
+        "--profiles",
+        default="",
+        help="Comma-separated profiles to run as a dependency graph (validate/autoshud/run only)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="CPU budget for --profiles/sweep (sum of per-run cpus running at once; default: CPU count)",
+    )
+    parser.add_argument("--sweep", default="", help="Sweep under sweeps/<name> (sweep command; optional if only one)")
+    parser.add_argument(
+        "--calibration",
+        default="",
+        help="Calibration under calibration/<name> (calibrate command; optional if only one)",
+    )
+    parser.add_argument(
+        "--trials", type=int, default=0, help="Trials per combination (bench/bench-pin; default: bench.trials or 3)"
+    )
+    parser.add_argument(
+        "--force-step",
+        default="",
+        help="Comma-separated AutoSHUD steps to rerun even if the step cache is current (or 'all')",
+    )
+    parser.add_argument(
+        "--no-step-cache",
+        action="store_true",
+        help="Always run AutoSHUD steps; do not read or write the step cache",
+    )
+    parser.add_argument(
+        "--stage-dir",
+        default="",
+        help="Run SHUD in a scratch copy under this dir (e.g. /dev/shm); overrides profiles.<name>.shud.stage.dir",
+    )
+    parser.add_argument(
+        "--no-pin",
+        action="store_true",
+        help="Do not pin SHUD to claimed CPUs (OMP_NUM_THREADS from shud.threads is still set)",
+    )
+    parser.add_argument(
+        "--no-forcing-preflight",
+        action="store_true",
+        help="run: skip the NetCDF forcing pre-flight before SHUD (sweep/calibrate check once for all members)",
+    )
     parser.add_argument("--dry-run", action="store_true", help="Print commands without executing")
 
     args = parser.parse_args(argv)
 
+    if args.force_step.strip().lower() == "all":
+        force_steps = sorted(AUTOSHUD_STEP_SCRIPTS)
+    else:
+        force_steps = [_as_int(v, key="--force-step") for v in args.force_step.split(",") if v.strip()]
+        unknown = [v for v in force_steps if v not in AUTOSHUD_STEP_SCRIPTS]
+        if unknown:
+            raise ConfigError(f"Unsupported AutoSHUD step in --force-step: {unknown}")
+
     repo_root = _repo_root()
     config_path = Path(args.config)
     if not config_path.is_absolute():
@@ -654,6 +3059,48 @@ def main(argv: List[str]) -> int:
 
     cfg = _load_yaml(config_path)
 
+    if args.command == "bench-pin":
+        return _bench_pinning(cfg, repo_root=repo_root, trials=args.trials, dry_run=args.dry_run)
+
+    if args.command == "bench":
+        return _bench(cfg, repo_root=repo_root, trials=args.trials, dry_run=args.dry_run)
+
+    if args.command == "calibrate":
+        return _calibrate(cfg, repo_root=repo_root, name=args.calibration, jobs=args.jobs, dry_run=args.dry_run)
+
+    if args.command == "sweep":
+        return _sweep(cfg, repo_root=repo_root, sweep_name=args.sweep, jobs=args.jobs, dry_run=args.dry_run)
+
+    if args.profiles:
+        if args.command not in ("validate", "autoshud", "run"):
+            raise ConfigError(f"--profiles is not supported for command: {args.command}")
+        profiles = [p.strip() for p in args.profiles.split(",") if p.strip()]
+        child_args: List[str] = []
+        if args.force_step:
+            child_args += ["--force-step", args.force_step]
+        if args.no_step_cache:
+            child_args.append("--no-step-cache")
+        if args.stage_dir:
+            child_args += ["--stage-dir", args.stage_dir]
+        if args.no_pin:
+            child_args.append("--no-pin")
+        if args.no_forcing_preflight:
+            child_args.append("--no-forcing-preflight")
+        if args.dry_run:
+            child_args.append("--dry-run")
+        if not profiles:
+            raise ConfigError("--profiles must list at least one profile")
+        return _run_profiles(
+            cfg,
+            repo_root=repo_root,
+            config_path=config_path,
+            command=args.command,
+            profiles=profiles,
+            jobs=args.jobs if args.jobs > 0 else (os.cpu_count() or 1),
+            child_args=child_args,
+            dry_run=args.dry_run,
+        )
+
     profile = args.profile
     if _get(cfg, f"profiles.{profile}", required=False) is None:
         raise ConfigError(f"Profile not found: {profile}")
@@ -666,7 +3113,7 @@ def main(argv: List[str]) -> int:
     run_dir = _resolve_path(repo_root, _get(profile_cfg, "run_dir"))
 
     if args.command == "validate":
-        _validate(cfg, repo_root=repo_root, profile=profile)
+        _validate(cfg, repo_root=repo_root, profile=profile, jobs=args.jobs)
         print("OK")
         return 0
 
@@ -690,38 +3137,122 @@ def main(argv: List[str]) -> int:
     else:
         print(f"# would write: {gen_file}")
 
-    if args.command in ("autoshud", "run"):
-        steps = _get(profile_cfg, "autoshud.steps", required=False)
-        if steps is None:
-            steps = [1, 2, 3]
-        step_map = {1: "Step1_RawDataProcessng.R", 2: "Step2_DataSubset.R", 3: "Step3_BuidModel.R"}
-        for step in steps:
-            step_i = _as_int(step, key=f"profiles.{profile}.autoshud.steps[]")
-            script = step_map.get(step_i)
-            if script is None:
-                raise ConfigError(f"Unsupported AutoSHUD step: {step_i}")
-            _run(["Rscript", script, str(gen_file)], cwd=autoshud_dir, dry_run=args.dry_run)
-
-    if args.command == "run":
-        # For NetCDF profile, render SHUD cfg overlays after AutoSHUD Step3 has
-        # generated the base SHUD inputs under run_dir/input/<prj>/.
-        shud_cfg = _get(profile_cfg, "shud", required=False) or {}
-        forcing_mode = str(shud_cfg.get("forcing_mode", "csv")).strip().lower()
-        output_mode = str(shud_cfg.get("output_mode", "legacy")).strip().lower()
-        if forcing_mode == "netcdf" or output_mode in ("netcdf", "both"):
-            _render_shud_cfg_overlays(
-                cfg,
-                repo_root=repo_root,
-                profile=profile,
-                run_dir=run_dir,
+    # Per-child resource usage of this invocation, appended to <run_dir>/logs/manifest.json.
+    usage_log: List[Dict[str, Any]] = []
+    started_utc = dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds")
+    status = "failed"
+    try:
+        if args.command in ("autoshud", "run"):
+            steps = _get(profile_cfg, "autoshud.steps", required=False)
+            if steps is None:
+                steps = [1, 2, 3]
+            step_ids: List[int] = []
+            for step in steps:
+                step_i = _as_int(step, key=f"profiles.{profile}.autoshud.steps[]")
+                if step_i not in AUTOSHUD_STEP_SCRIPTS:
+                    raise ConfigError(f"Unsupported AutoSHUD step: {step_i}")
+                step_ids.append(step_i)
+            cache_dir: Optional[Path] = None
+            if not args.no_step_cache:
+                cache_dir = _resolve_path(
+                    repo_root, _get(cfg, "paths.step_cache", required=False) or "runs/.cache/autoshud_steps"
+                )
+            _run_autoshud_steps(
+                auto,
+                steps=step_ids,
+                autoshud_text=autoshud_text,
+                gen_file=gen_file,
+                autoshud_dir=autoshud_dir,
+                cache_dir=cache_dir,
+                force_steps=force_steps,
                 dry_run=args.dry_run,
+                usage_log=usage_log,
             )
 
-        shud_cfg = _get(profile_cfg, "shud", required=False) or {}
-        if bool(shud_cfg.get("run", False)):
-            _run_shud(shud_bin=shud_bin, prjname=str(prjname), run_dir=run_dir, dry_run=args.dry_run)
-        else:
-            print("# SHUD run disabled for this profile (profiles.<name>.shud.run=false)")
+        if args.command == "run":
+            # For NetCDF profile, render SHUD cfg overlays after AutoSHUD Step3 has
+            # generated the base SHUD inputs under run_dir/input/<prj>/.
+            shud_cfg = _get(profile_cfg, "shud", required=False) or {}
+            forcing_mode = str(shud_cfg.get("forcing_mode", "csv")).strip().lower()
+            output_mode = str(shud_cfg.get("output_mode", "legacy")).strip().lower()
+            if forcing_mode == "netcdf" or output_mode in ("netcdf", "both"):
+                _render_shud_cfg_overlays(
+                    cfg,
+                    repo_root=repo_root,
+                    profile=profile,
+                    run_dir=run_dir,
+                    dry_run=args.dry_run,
+                )
+
+            shud_cfg = _get(profile_cfg, "shud", required=False) or {}
+            _apply_shud_kv_overrides(
+                shud_cfg, profile=profile, prjname=str(prjname), run_dir=run_dir, dry_run=args.dry_run
+            )
+            if bool(shud_cfg.get("run", False)):
+                if not args.no_forcing_preflight:
+                    _netcdf_forcing_preflight(cfg, repo_root=repo_root, profile=profile, jobs=args.jobs)
+                progress_regex = shud_cfg.get("progress_regex")
+                shud_kwargs: Dict[str, Any] = {
+                    "progress_regex": str(progress_regex) if progress_regex else None,
+                    "stall_sec": _as_float(shud_cfg.get("stall_sec", 600), key=f"profiles.{profile}.shud.stall_sec"),
+                    "kill_on_stall": bool(shud_cfg.get("kill_on_stall", False)),
+                }
+                affinity = _shud_threads(cfg, shud_cfg, profile=profile, no_pin=args.no_pin)
+                shud_kwargs["threads"] = affinity.threads
+                lease: Optional[_CoreLease] = None
+                if affinity.pin and not args.dry_run:
+                    lease = _CoreLease.claim(
+                        affinity.threads or 1, node_cpus=affinity.node_cpus, lock_dir=affinity.lock_dir
+                    )
+                    shud_kwargs["cores"] = lease.cpus
+                elif affinity.pin:
+                    print(f"# would pin SHUD to {affinity.threads} free CPUs from {affinity.lock_dir}")
+                stage = _stage_config(shud_cfg, profile=profile, stage_dir=args.stage_dir)
+                try:
+                    if stage is not None:
+                        _run_shud_staged(
+                            stage=stage,
+                            shud_bin=shud_bin,
+                            prjname=str(prjname),
+                            run_dir=run_dir,
+                            dry_run=args.dry_run,
+                            usage_log=usage_log,
+                            **shud_kwargs,
+                        )
+                    else:
+                        _run_shud(
+                            shud_bin=shud_bin,
+                            prjname=str(prjname),
+                            run_dir=run_dir,
+                            dry_run=args.dry_run,
+                            usage_log=usage_log,
+                            **shud_kwargs,
+                        )
+                finally:
+                    if lease is not None:
+                        lease.close()
+            else:
+                print("# SHUD run disabled for this profile (profiles.<name>.shud.run=false)")
+
+        status = "ok"
+    finally:
+        if not args.dry_run and args.command in ("autoshud", "run"):
+            shud_cfg = _get(profile_cfg, "shud", required=False) or {}
+            _append_manifest(
+                run_dir,
+                {
+                    "started_utc": started_utc,
+                    "command": args.command,
+                    "profile": profile,
+                    "config": str(config_path),
+                    "status": status,
+                    "forcing_mode": str(shud_cfg.get("forcing_mode", "csv")).strip().lower(),
+                    "output_mode": str(shud_cfg.get("output_mode", "legacy")).strip().lower(),
+                    "autoshud_config_sha256": hashlib.sha256(autoshud_text.encode("utf-8")).hexdigest(),
+                    "shud_bin": _file_identity(shud_bin),
+                    "steps": usage_log,
+                },
+            )
 
     return 0
 
@@ -732,3 +3263,6 @@ if __name__ == "__main__":
     except ConfigError as e:
         print(f"ERROR: {e}", file=sys.stderr)
         raise SystemExit(2)
+    except ShudKilled as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        raise SystemExit(128 + e.signum)
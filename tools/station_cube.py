@@ -0,0 +1,741 @@
+#!/usr/bin/env python3
+"""
+Station cube: raw forcing product variables at the forcing stations' grid cells,
+stored time-series-major as one `(station, time, var)` NetCDF per product.
+
+GLDAS, ERA5 and CMFD2 archives are time-major (one grid per record, thousands
+of files), while gen_forcing_baseline.py, compare_forcing.py and diagnostics
+read whole time series per station. The cube is extracted once and then read
+with one chunk per station instead of rescanning the archive:
+
+  - stations and ForcStartTime come from <run>/input/<prj>/<prj>.tsd.forc,
+    the period from <prj>.cfg.para (END), the product from
+    <nc_run>/input/<prj>/<prj>.cfg.forcing
+  - station cells use the same rules as SHUD's NetCDF forcing provider:
+    nearest cell, and for GLDAS a move off _FillValue cells at the simulation
+    start file (search radius 10 cells); `--interp bilinear|area` uses the
+    weights of tools/forcing_weights.py instead
+  - values are the raw product variables (units as in the source, masked -> NaN);
+    unit conversion stays with the consumers
+  - source files are read in parallel worker processes, one file per task
+
+A cube records a digest of its source files (path/size/mtime); `build` skips
+the extraction when cube, stations, window and sources are unchanged.
+
+Usage:
+  python3 tools/station_cube.py build --run runs/qhh/era5_baseline --nc-run runs/qhh/nc --prj qhh
+  python3 tools/station_cube.py info runs/qhh/era5_baseline/forcing_cube/qhh.ERA5.nc
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import dataclasses
+import datetime as dt
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from compare_forcing import _parse_units_since, _read_kv_cfg, _read_tsd_forc, _require_netCDF4
+from forcing_catalog import (
+    PRODUCT_STEPS,
+    catalog_for,
+    epoch_min,
+    from_epoch_min,
+    layout_streams,
+    required_records,
+    resolve_layout,
+)
+from forcing_weights import METHODS, REMAP_MAX_R, GridWeights, apply_local, concat, grid_weights
+from grid_index import read_grid
+
+
+# Raw variables (cfg.forcing NC_VAR_<KEY>) each product needs for SHUD's 5 forcing variables.
+PRODUCT_VARS: Dict[str, Tuple[str, ...]] = {
+    "CMFD2": ("PREC", "TEMP", "SHUM", "SRAD", "WIND", "PRES"),
+    "ERA5": ("TP", "T2M", "D2M", "U10", "V10", "SSR"),
+    "GLDAS": ("PREC", "TEMP", "SHUM", "PRES", "WIND", "SRAD"),
+}
+# Coordinate variable names when cfg.forcing has no LAT_VAR/LON_VAR/NC_DIM_* keys.
+PRODUCT_COORDS: Dict[str, Tuple[str, str]] = {
+    "CMFD2": ("lat", "lon"),
+    "ERA5": ("latitude", "longitude"),
+    "GLDAS": ("lat", "lon"),
+}
+CUBE_VERSION = 1
+
+
+def _eprint(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
+@dataclasses.dataclass
+class StationCube:
+    product: str
+    var_keys: List[str]
+    var_names: List[str]
+    var_units: List[str]
+    step_min: float
+    times: Any  # int64 (time,), minutes since 1970-01-01 UTC
+    raw: Any  # float64 (station, time, var)
+    station_lon: Any
+    station_lat: Any
+    cell_ilat: Any
+    cell_ilon: Any
+    attrs: Dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    def var(self, key: str) -> Any:
+        """(station, time) raw series of one NC_VAR_<KEY>."""
+        return self.raw[:, :, self.var_keys.index(key.upper())]
+
+    def units(self, key: str) -> str:
+        return self.var_units[self.var_keys.index(key.upper())]
+
+    def time_index(self, times_min: Sequence[float]) -> Any:
+        """Cube indices of exact record times (epoch minutes); raises if any is not in the cube."""
+        import numpy as np  # type: ignore
+
+        want = np.rint(np.asarray(times_min, dtype=float)).astype(np.int64)
+        idx = np.searchsorted(self.times, want)
+        ok = (idx < self.times.size) & (self.times[np.minimum(idx, self.times.size - 1)] == want)
+        if not bool(ok.all()):
+            bad = want[~ok]
+            raise ValueError(
+                f"Station cube has no record for {bad.size} time(s), first "
+                f"{from_epoch_min(float(bad[0])):%Y-%m-%d %H:%M} (cube covers "
+                f"{from_epoch_min(float(self.times[0])):%Y-%m-%d %H:%M} .. "
+                f"{from_epoch_min(float(self.times[-1])):%Y-%m-%d %H:%M})"
+            )
+        return idx
+
+    def select(self, rows: Sequence[int]) -> "StationCube":
+        """Cube of a subset of stations (e.g. one project's stations out of a merged extraction)."""
+        r = list(rows)
+        return dataclasses.replace(
+            self,
+            raw=self.raw[r],
+            station_lon=self.station_lon[r],
+            station_lat=self.station_lat[r],
+            cell_ilat=self.cell_ilat[r],
+            cell_ilon=self.cell_ilon[r],
+        )
+
+    def matches(self, stations: Sequence[Tuple[float, float]]) -> bool:
+        import numpy as np  # type: ignore
+
+        st = np.asarray(stations, dtype=float).reshape(-1, 2)
+        return (
+            st.shape[0] == self.station_lon.size
+            and bool(np.array_equal(st[:, 0], self.station_lon))
+            and bool(np.array_equal(st[:, 1], self.station_lat))
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class _ReadTask:
+    path: str
+    var_names: Tuple[str, ...]
+    var_cols: Tuple[int, ...]  # cube var index of each name
+    time_var: str
+    lat_dim: str
+    lon_dim: str
+    nst: int
+    boxes: Tuple["_Box", ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class _Box:
+    """One cropped read per variable; stations `rows` are weighted sums over the box's cells."""
+
+    lat_lo: int
+    lat_hi: int
+    lon_lo: int
+    lon_hi: int
+    rows: Any  # int (n,)
+    cols: Any  # int (n, K): flat index into the box's (lat, lon) slab
+    w: Any  # float (n, K)
+
+
+def _cfg_flag(forcing_cfg: Dict[str, str], key: str) -> bool:
+    return forcing_cfg.get(key, "0").strip() not in ("", "0", "FALSE", "false")
+
+
+def _coord_names(forcing_cfg: Dict[str, str], product: str) -> Tuple[str, str, str]:
+    lat_d, lon_d = PRODUCT_COORDS.get(product, ("lat", "lon"))
+    dim_time = forcing_cfg.get("NC_DIM_TIME", "time")
+    return (
+        forcing_cfg.get("TIME_VAR", dim_time),
+        forcing_cfg.get("LAT_VAR", forcing_cfg.get("NC_DIM_LAT", lat_d)),
+        forcing_cfg.get("LON_VAR", forcing_cfg.get("NC_DIM_LON", lon_d)),
+    )
+
+
+def check_files(paths: Sequence[str]) -> None:
+    """
+    Fail early, listing every missing/unreadable file, before any data is read.
+
+    Uses the archive catalog (tools/forcing_catalog.py) when one covers the files, which also
+    knows unreadable files; files absent from the catalog are checked on disk.
+    """
+    missing: List[str] = []
+    bad: List[str] = []
+    for fn in dict.fromkeys(paths):
+        cat = catalog_for(os.path.dirname(fn))
+        entry = cat.entry(fn) if cat is not None else None
+        if entry is None:
+            if not os.path.exists(fn):
+                missing.append(fn)
+        elif "error" in entry:
+            bad.append(f"{fn}: {entry['error']}")
+    if bad:
+        raise ValueError("Unusable forcing files:\n  " + "\n  ".join(bad[:20]))
+    if missing:
+        more = f"\n  ... {len(missing) - 20} more" if len(missing) > 20 else ""
+        raise FileNotFoundError(f"{len(missing)} forcing file(s) missing:\n  " + "\n  ".join(missing[:20]) + more)
+
+
+def _plan_files(
+    forcing_cfg: Dict[str, str], product: str, records: Sequence[int]
+) -> List[Tuple[str, List[str]]]:
+    """[(absolute file, var keys read from it)] covering the records, in layout order."""
+    keys = PRODUCT_VARS[product]
+    var_names = {k: forcing_cfg[f"NC_VAR_{k}"] for k in keys}
+    var_dirs = {k: forcing_cfg[f"LAYOUT_VAR_DIR_{k}"] for k in keys if f"LAYOUT_VAR_DIR_{k}" in forcing_cfg}
+    root = forcing_cfg["DATA_ROOT"]
+    streams = layout_streams(var_names, var_dirs or None)
+    resolved = resolve_layout(
+        root,
+        forcing_cfg["LAYOUT_FILE_PATTERN"],
+        records,
+        streams,
+        per_var=bool(var_dirs),
+        year_subdir=_cfg_flag(forcing_cfg, "LAYOUT_YEAR_SUBDIR"),
+    )
+    files: List[Tuple[str, List[str]]] = []
+    missing: List[str] = []
+    for name, res in resolved.items():
+        stream_keys = [name] if var_dirs else list(keys)
+        for pat, matches in res.items():
+            if len(matches) > 1:
+                raise ValueError(f"Glob must match exactly 1 file, got {len(matches)}: {os.path.join(root, pat)}")
+            if not matches:
+                missing.append(os.path.join(root, pat))
+                continue
+            files.append((os.path.join(root, matches[0]), stream_keys))
+    check_files(missing + [f for f, _ in files])
+    return files
+
+
+def _resolve_weights(
+    grid_file: str,
+    *,
+    lat_var: str,
+    lon_var: str,
+    stations: Sequence[Tuple[float, float]],
+    mask_var: str = "",
+    method: str = "nearest",
+) -> Tuple[GridWeights, str, str, int]:
+    """(weights, lat dim, lon dim, remapped) of the stations on `grid_file`'s grid."""
+    netCDF4 = _require_netCDF4()
+    import numpy as np  # type: ignore
+
+    with netCDF4.Dataset(grid_file, "r") as ds:
+        grid, lat_dim, lon_dim = read_grid(ds, lat_var, lon_var)
+        nlat, nlon = grid.shape
+        valid = None
+        if mask_var:
+            # Validity of the mask variable's first record over the stations' box plus the remap radius.
+            near, _ = grid_weights("nearest", grid.lat, grid.lon, stations)
+            var = ds.variables[mask_var]
+            r = REMAP_MAX_R + 1
+            k_lo, k_hi, j_lo, j_hi = near.box()
+            k_lo, k_hi = max(0, k_lo - r), min(nlat - 1, k_hi + r)
+            j_lo, j_hi = max(0, j_lo - r), min(nlon - 1, j_hi + r)
+            index = tuple(
+                slice(k_lo, k_hi + 1) if d == lat_dim else slice(j_lo, j_hi + 1) if d == lon_dim else 0
+                for d in var.dimensions
+            )
+            block = np.ma.asarray(var[index])
+            valid = np.zeros((nlat, nlon), dtype=bool)
+            valid[k_lo : k_hi + 1, j_lo : j_hi + 1] = ~np.ma.getmaskarray(block) & np.isfinite(
+                np.ma.getdata(block).astype(float)
+            )
+    gw, remapped = grid_weights(method, grid.lat, grid.lon, stations, valid=valid)
+    return gw, lat_dim, lon_dim, remapped
+
+
+def _station_weights(
+    forcing_cfg: Dict[str, str],
+    product: str,
+    files: Sequence[Tuple[str, List[str]]],
+    *,
+    stations: Sequence[Tuple[float, float]],
+    masks: Sequence[dt.datetime],
+    method: str,
+) -> Tuple[GridWeights, str, str, int]:
+    """
+    (weights, lat dim, lon dim, remapped) of the stations; GLDAS resolves each distinct t0
+    file's stations against that file's water mask.
+    """
+    import numpy as np  # type: ignore
+
+    _, lat_var, lon_var = _coord_names(forcing_cfg, product)
+    mask_keys = [_mask_key(product, m) for m in masks]
+    parts: List[GridWeights] = []
+    order: List[int] = []
+    remapped = 0
+    lat_dim = lon_dim = ""
+    for key in dict.fromkeys(mask_keys):
+        sel = [i for i in range(len(stations)) if mask_keys[i] == key]
+        grid_file = files[0][0]
+        mask_var = ""
+        if product == "GLDAS":
+            mask_var = forcing_cfg["NC_VAR_TEMP"]  # SHUD uses TEMP for the GLDAS water mask
+            _, mask_rec = required_records(product, masks[sel[0]], masks[sel[0]])
+            grid_file = _plan_files(forcing_cfg, product, mask_rec[:1])[0][0]
+        gw, lat_dim, lon_dim, n = _resolve_weights(
+            grid_file,
+            lat_var=lat_var,
+            lon_var=lon_var,
+            stations=[stations[i] for i in sel],
+            mask_var=mask_var,
+            method=method,
+        )
+        parts.append(gw)
+        order.extend(sel)
+        remapped += n
+    return concat(parts).select(np.argsort(order)), lat_dim, lon_dim, remapped
+
+
+def station_weights(
+    forcing_cfg: Dict[str, str],
+    *,
+    stations: Sequence[Tuple[float, float]],
+    t_start: dt.datetime,
+    mask_at: Optional[dt.datetime] = None,
+    method: str = "nearest",
+) -> Tuple[GridWeights, int]:
+    """(weights, remapped) extract_cube() would use for the stations, without reading any series."""
+    product = forcing_cfg.get("PRODUCT", "").strip().upper()
+    if product not in PRODUCT_VARS:
+        raise ValueError(f"Unsupported PRODUCT for a station cube: {product!r}")
+    _, records = required_records(product, t_start, t_start)
+    files = _plan_files(forcing_cfg, product, records[:1])
+    gw, _, _, remapped = _station_weights(
+        forcing_cfg, product, files, stations=stations, masks=[mask_at or t_start] * len(stations), method=method
+    )
+    return gw, remapped
+
+
+def _read_file(task: _ReadTask) -> Tuple[str, Any, Any, List[str]]:
+    """(path, record times (epoch minutes), values (time, station, var-of-task), units) of one file."""
+    netCDF4 = _require_netCDF4()
+    import numpy as np  # type: ignore
+
+    with netCDF4.Dataset(task.path, "r") as ds:
+        tv = ds.variables[task.time_var]
+        units = getattr(tv, "units", None)
+        if not isinstance(units, str) or not units.strip():
+            raise ValueError(f"time variable missing units: {task.path}:{task.time_var}")
+        factor_min, base_dt = _parse_units_since(units)
+        time_dim = tv.dimensions[0]
+        times = np.rint(epoch_min(base_dt) + np.asarray(tv[:], dtype=float).ravel() * factor_min).astype(np.int64)
+        out = np.full((times.size, task.nst, len(task.var_names)), np.nan, dtype=float)
+        var_units: List[str] = []
+        for c, name in enumerate(task.var_names):
+            var = ds.variables[name]
+            kept = [d for d in var.dimensions if d in (time_dim, task.lat_dim, task.lon_dim)]
+            order = [kept.index(d) for d in (time_dim, task.lat_dim, task.lon_dim) if d in kept]
+            for box in task.boxes:
+                index = tuple(
+                    slice(box.lat_lo, box.lat_hi + 1)
+                    if d == task.lat_dim
+                    else slice(box.lon_lo, box.lon_hi + 1)
+                    if d == task.lon_dim
+                    else slice(None)
+                    if d == time_dim
+                    else 0
+                    for d in var.dimensions
+                )
+                block = np.ma.transpose(np.ma.asarray(var[index]), order)
+                if block.ndim == 2:  # no time dimension: one record
+                    block = block[np.newaxis, :, :]
+                out[:, box.rows, c] = apply_local(np.ma.filled(block.astype(float), np.nan), box.cols, box.w)
+            u = getattr(var, "units", "")
+            var_units.append(u if isinstance(u, str) else "")
+    return task.path, times, out, var_units
+
+
+def _sources_digest(paths: Sequence[str]) -> str:
+    h = hashlib.sha1()
+    for p in sorted(paths):
+        st = os.stat(p)
+        h.update(f"{p}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def extract_cube(
+    forcing_cfg: Dict[str, str],
+    *,
+    stations: Sequence[Tuple[float, float]],
+    t_start: dt.datetime,
+    t_end: dt.datetime,
+    mask_at: Union[dt.datetime, Sequence[dt.datetime], None] = None,
+    groups: Optional[Sequence[Sequence[int]]] = None,
+    method: str = "nearest",
+    jobs: int = 0,
+) -> StationCube:
+    """
+    Read the product's raw variables at the stations for every record SHUD reads in
+    [t_start, t_end] (see forcing_catalog.required_records), interpolated with `method`
+    (tools/forcing_weights.py; "nearest" is SHUD's cell choice).
+
+    `mask_at` picks the GLDAS file used for the _FillValue remap (default: t_start), either one
+    time or one per station. `groups` splits the stations into separately cropped reads (e.g. one
+    per basin) so far-apart station sets do not read the grid between them; each source file is
+    still opened once.
+    """
+    import numpy as np  # type: ignore
+
+    product = forcing_cfg.get("PRODUCT", "").strip().upper()
+    if product not in PRODUCT_VARS:
+        raise ValueError(f"Unsupported PRODUCT for a station cube: {product!r}")
+    keys = list(PRODUCT_VARS[product])
+    step, records = required_records(product, t_start, t_end)
+    files = _plan_files(forcing_cfg, product, records)
+    time_var, _, _ = _coord_names(forcing_cfg, product)
+
+    nst = len(stations)
+    masks = list(mask_at) if isinstance(mask_at, (list, tuple)) else [mask_at or t_start] * nst
+    if len(masks) != nst:
+        raise ValueError(f"mask_at has {len(masks)} times for {nst} stations")
+    mask_keys = [_mask_key(product, m) for m in masks]
+
+    weights, lat_dim, lon_dim, remapped = _station_weights(
+        forcing_cfg, product, files, stations=stations, masks=masks, method=method
+    )
+    if remapped > 0:
+        _eprint(f"GLDAS remap: {remapped}/{nst} stations moved off _FillValue grid cells (using t0 file).")
+
+    boxes = []
+    for g in groups if groups else [range(nst)]:
+        rows = [int(i) for i in g]
+        if not rows:
+            continue
+        box = weights.box(rows)
+        cols, w = weights.local(box, rows)
+        boxes.append(
+            _Box(
+                lat_lo=box[0], lat_hi=box[1], lon_lo=box[2], lon_hi=box[3], rows=np.asarray(rows), cols=cols, w=w
+            )
+        )
+    tasks = [
+        _ReadTask(
+            path=path,
+            var_names=tuple(forcing_cfg[f"NC_VAR_{k}"] for k in fkeys),
+            var_cols=tuple(keys.index(k) for k in fkeys),
+            time_var=time_var,
+            lat_dim=lat_dim,
+            lon_dim=lon_dim,
+            nst=nst,
+            boxes=tuple(boxes),
+        )
+        for path, fkeys in files
+    ]
+
+    times = np.asarray(records, dtype=np.int64)
+    raw = np.full((nst, times.size, len(keys)), np.nan, dtype=float)
+    filled = np.zeros((times.size, len(keys)), dtype=bool)
+    units = [""] * len(keys)
+    t_first = int(times[0])
+
+    def merge(task: _ReadTask, ftimes: Any, vals: Any, vunits: List[str]) -> None:
+        pos = (ftimes - t_first) / step
+        k = np.rint(pos).astype(np.int64)
+        keep = (np.abs(pos - k) < 1e-6) & (k >= 0) & (k < times.size)
+        for c, col in enumerate(task.var_cols):
+            raw[:, k[keep], col] = vals[keep, :, c].T
+            filled[k[keep], col] = True
+            units[col] = units[col] or vunits[c]
+
+    workers = jobs if jobs > 0 else (os.cpu_count() or 1)
+    by_path = {t.path: t for t in tasks}
+    if workers == 1 or len(tasks) == 1:
+        for t in tasks:
+            _, ftimes, vals, vunits = _read_file(t)
+            merge(t, ftimes, vals, vunits)
+    else:
+        # HDF5 is not thread-safe: one process per file.
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, ftimes, vals, vunits in pool.map(_read_file, tasks, chunksize=max(1, len(tasks) // (workers * 8))):
+                merge(by_path[path], ftimes, vals, vunits)
+
+    if not bool(filled.all()):
+        k, c = np.argwhere(~filled)[0]
+        n = int((~filled).sum())
+        raise ValueError(
+            f"{product} files lack {n} (record, variable) value(s), first "
+            f"{keys[int(c)]} at {from_epoch_min(float(times[int(k)])):%Y-%m-%d %H:%M}"
+        )
+
+    return StationCube(
+        product=product,
+        var_keys=keys,
+        var_names=[forcing_cfg[f"NC_VAR_{k}"] for k in keys],
+        var_units=units,
+        step_min=float(step),
+        times=times,
+        raw=raw,
+        station_lon=np.array([float(x) for x, _ in stations], dtype=float),
+        station_lat=np.array([float(y) for _, y in stations], dtype=float),
+        cell_ilat=weights.dominant()[0],
+        cell_ilon=weights.dominant()[1],
+        attrs={
+            "data_root": forcing_cfg["DATA_ROOT"],
+            "sources_digest": _sources_digest([t.path for t in tasks]),
+            "files": len(tasks),
+            "window": f"{t_first} {int(times[-1])}",
+            "remapped": remapped,
+            "mask_at": ",".join(dict.fromkeys(mask_keys)),
+            "interp": method,
+        },
+    )
+
+
+def write_cube(path: str, cube: StationCube, *, complevel: int = 4) -> None:
+    netCDF4 = _require_netCDF4()
+
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+    os.close(fd)
+    try:
+        _write_cube_file(netCDF4, tmp, cube, complevel=complevel)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _write_cube_file(netCDF4: Any, tmp: str, cube: StationCube, *, complevel: int) -> None:
+    nst, nt, nv = cube.raw.shape
+    with netCDF4.Dataset(tmp, "w", format="NETCDF4") as ds:
+        ds.createDimension("station", nst)
+        ds.createDimension("time", nt)
+        ds.createDimension("var", nv)
+        tv = ds.createVariable("time", "i8", ("time",))
+        tv.units = "minutes since 1970-01-01 00:00:00 UTC"
+        tv[:] = cube.times
+        for name, arr, typ in (
+            ("station_lon", cube.station_lon, "f8"),
+            ("station_lat", cube.station_lat, "f8"),
+            ("cell_ilat", cube.cell_ilat, "i4"),
+            ("cell_ilon", cube.cell_ilon, "i4"),
+        ):
+            ds.createVariable(name, typ, ("station",))[:] = arr
+        names = ds.createVariable("var_key", str, ("var",))
+        vnames = ds.createVariable("var_name", str, ("var",))
+        vunits = ds.createVariable("var_units", str, ("var",))
+        for i in range(nv):
+            names[i] = cube.var_keys[i]
+            vnames[i] = cube.var_names[i]
+            vunits[i] = cube.var_units[i]
+        # Time-series-major: one chunk holds a station's whole series of every variable.
+        rv = ds.createVariable(
+            "raw",
+            "f8",
+            ("station", "time", "var"),
+            zlib=complevel > 0,
+            complevel=max(1, min(9, complevel)),
+            shuffle=True,
+            chunksizes=(1, nt, nv),
+            fill_value=float("nan"),
+        )
+        rv.long_name = "raw product variables at the station grid cells (source units)"
+        rv[:] = cube.raw
+        ds.version = CUBE_VERSION
+        ds.product = cube.product
+        ds.step_min = cube.step_min
+        ds.built_utc = dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds")
+        for k, v in cube.attrs.items():
+            ds.setncattr(k, v)
+
+
+def read_cube(path: str, *, t_range: Optional[Tuple[float, float]] = None) -> StationCube:
+    """Load a cube; `t_range` (epoch minutes, inclusive) reads only that slice of the time axis."""
+    netCDF4 = _require_netCDF4()
+    import numpy as np  # type: ignore
+
+    with netCDF4.Dataset(path, "r") as ds:
+        if int(getattr(ds, "version", 0)) != CUBE_VERSION:
+            raise ValueError(f"Unsupported station cube version in {path}")
+        times = np.asarray(ds.variables["time"][:], dtype=np.int64)
+        i0, i1 = 0, times.size
+        if t_range is not None:
+            i0 = int(np.searchsorted(times, int(round(t_range[0])), side="left"))
+            i1 = int(np.searchsorted(times, int(round(t_range[1])), side="right"))
+        attrs = {k: ds.getncattr(k) for k in ds.ncattrs()}
+        return StationCube(
+            product=str(attrs.pop("product")),
+            var_keys=[str(x) for x in ds.variables["var_key"][:]],
+            var_names=[str(x) for x in ds.variables["var_name"][:]],
+            var_units=[str(x) for x in ds.variables["var_units"][:]],
+            step_min=float(attrs.pop("step_min")),
+            times=times[i0:i1],
+            raw=np.asarray(np.ma.filled(ds.variables["raw"][:, i0:i1, :], np.nan), dtype=float),
+            station_lon=np.asarray(ds.variables["station_lon"][:], dtype=float),
+            station_lat=np.asarray(ds.variables["station_lat"][:], dtype=float),
+            cell_ilat=np.asarray(ds.variables["cell_ilat"][:], dtype=int),
+            cell_ilon=np.asarray(ds.variables["cell_ilon"][:], dtype=int),
+            attrs=attrs,
+        )
+
+
+def _mask_key(product: str, mask_at: dt.datetime) -> str:
+    """GLDAS remap record (floored to the product step) a cube was resolved at; '' for other products."""
+    if product != "GLDAS":
+        return ""
+    _, rec = required_records(product, mask_at, mask_at)
+    return f"{from_epoch_min(rec[0]):%Y-%m-%d %H:%M}"
+
+
+def _covers(cube: StationCube, records: Sequence[int]) -> bool:
+    try:
+        cube.time_index(records)
+    except ValueError:
+        return False
+    return True
+
+
+def default_cube_path(run_dir: str, prj: str, product: str) -> str:
+    return os.path.join(run_dir, "forcing_cube", f"{prj}.{product.upper()}.nc")
+
+
+def load_forcing_cfg(nc_run: str, prj: str) -> Dict[str, str]:
+    """<nc_run>/input/<prj>/<prj>.cfg.forcing with DATA_ROOT resolved against nc_run."""
+    path = os.path.join(nc_run, "input", prj, f"{prj}.cfg.forcing")
+    forcing_cfg = _read_kv_cfg(path)
+    if not forcing_cfg.get("PRODUCT"):
+        raise ValueError(f"Missing PRODUCT in cfg.forcing: {path}")
+    if "DATA_ROOT" in forcing_cfg and not os.path.isabs(forcing_cfg["DATA_ROOT"]):
+        forcing_cfg["DATA_ROOT"] = os.path.normpath(os.path.join(nc_run, forcing_cfg["DATA_ROOT"]))
+    return forcing_cfg
+
+
+def cube_for(
+    forcing_cfg: Dict[str, str],
+    *,
+    stations: Sequence[Tuple[float, float]],
+    t_start: dt.datetime,
+    t_end: dt.datetime,
+    mask_at: Optional[dt.datetime] = None,
+    path: str = "",
+    method: str = "nearest",
+    jobs: int = 0,
+    force: bool = False,
+) -> StationCube:
+    """
+    The station cube for this window: reuse `path` when it covers the window with the same
+    product, stations and source files; otherwise extract (and write to `path` when given).
+    """
+    product = forcing_cfg.get("PRODUCT", "").strip().upper()
+    if path and os.path.exists(path) and not force:
+        _, records = required_records(product, t_start, t_end)
+        cube = read_cube(path, t_range=(records[0], records[-1]))
+        same_mask = cube.attrs.get("mask_at") == _mask_key(product, mask_at or t_start)
+        same_interp = cube.attrs.get("interp", "nearest") == method
+        if cube.product == product and cube.matches(stations) and same_mask and same_interp and _covers(cube, records):
+            # Compare against the files the cube was extracted from (its own, possibly wider, window).
+            w0, w1 = (int(x) for x in str(cube.attrs.get("window", "0 0")).split())
+            built = list(range(w0, w1 + 1, int(cube.step_min)))
+            files = [f for f, _ in _plan_files(forcing_cfg, product, built)]
+            if cube.attrs.get("sources_digest") == _sources_digest(files):
+                return cube
+        _eprint(f"Station cube out of date, rebuilding: {path}")
+    cube = extract_cube(
+        forcing_cfg, stations=stations, t_start=t_start, t_end=t_end, mask_at=mask_at, method=method, jobs=jobs
+    )
+    if path:
+        write_cube(path, cube)
+    return cube
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description="Station cube: raw forcing at station cells, (station, time, var)")
+    sub = ap.add_subparsers(dest="action", required=True)
+    b = sub.add_parser("build", help="Extract (or refresh) the cube for a run's stations and period")
+    b.add_argument("--run", required=True, help="run_dir with input/<prj>/<prj>.tsd.forc and <prj>.cfg.para")
+    b.add_argument("--nc-run", required=True, help="NetCDF run_dir with input/<prj>/<prj>.cfg.forcing")
+    b.add_argument("--prj", required=True, help="Project name (e.g. qhh)")
+    b.add_argument("--out", default="", help="Cube path (default: <run>/forcing_cube/<prj>.<PRODUCT>.nc)")
+    b.add_argument("--end-day", type=float, default=None, help="Period end in days since ForcStartTime (default: END)")
+    b.add_argument(
+        "--interp", choices=METHODS, default="nearest", help="Station values from the grid (default: nearest, as SHUD)"
+    )
+    b.add_argument("--jobs", type=int, default=0, help="Worker processes (default: CPU count)")
+    b.add_argument("--force", action="store_true", help="Re-extract even if the cube is up to date")
+    i = sub.add_parser("info", help="Print a cube's product, stations, period and variables")
+    i.add_argument("cube", help="Cube path")
+    args = ap.parse_args(list(argv))
+
+    if args.action == "info":
+        cube = read_cube(args.cube)
+        print(f"== Station cube: {os.path.abspath(args.cube)} ==")
+        print(
+            f"- product={cube.product} stations={cube.station_lon.size} records={cube.times.size} "
+            f"step={cube.step_min:g} min interp={cube.attrs.get('interp', 'nearest')}"
+        )
+        print(
+            f"- period: {from_epoch_min(float(cube.times[0])):%Y-%m-%d %H:%M} .. "
+            f"{from_epoch_min(float(cube.times[-1])):%Y-%m-%d %H:%M}"
+        )
+        for k, n, u in zip(cube.var_keys, cube.var_names, cube.var_units):
+            print(f"- {k}: {n} [{u}]")
+        print(f"- built {cube.attrs.get('built_utc', '?')} from {cube.attrs.get('files', '?')} files in {cube.attrs.get('data_root', '?')}")
+        return 0
+
+    run_dir = os.path.abspath(args.run)
+    prj = str(args.prj)
+    tsd = _read_tsd_forc(os.path.join(run_dir, "input", prj, f"{prj}.tsd.forc"))
+    para = _read_kv_cfg(os.path.join(run_dir, "input", prj, f"{prj}.cfg.para"))
+    forcing_cfg = load_forcing_cfg(os.path.abspath(args.nc_run), prj)
+    product = forcing_cfg["PRODUCT"].strip().upper()
+    if product not in PRODUCT_STEPS:
+        raise ValueError(f"Unsupported PRODUCT for a station cube: {product!r}")
+
+    base = dt.datetime.strptime(str(tsd.forc_start_yyyymmdd), "%Y%m%d").replace(tzinfo=dt.timezone.utc)
+    end_day = float(args.end_day) if args.end_day is not None else float(para["END"])
+    mask_at = base + dt.timedelta(days=float(para.get("START", 0)))
+    out = os.path.abspath(args.out) if args.out else default_cube_path(run_dir, prj, product)
+
+    t0 = time.perf_counter()
+    cube = cube_for(
+        forcing_cfg,
+        stations=[(s.lon_deg, s.lat_deg) for s in tsd.stations],
+        t_start=base,
+        t_end=base + dt.timedelta(days=end_day),
+        mask_at=mask_at,
+        path=out,
+        method=str(args.interp),
+        jobs=int(args.jobs),
+        force=bool(args.force),
+    )
+    wall = time.perf_counter() - t0
+    print(f"== Station cube: {product} ==")
+    print(
+        f"- stations={cube.station_lon.size} records={cube.times.size} vars={','.join(cube.var_keys)} "
+        f"files={cube.attrs.get('files')} ({wall:.2f}s)"
+    )
+    print(f"Wrote: {out}" if os.path.exists(out) else f"(not written: {out})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
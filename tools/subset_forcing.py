@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Cut a basin subset out of a gridded forcing archive (GLDAS / ERA5 / CMFD2).
+
+The padded bounding box of the forcing stations (one or more <prj>.tsd.forc) is
+cut from every source file. Each file is written to the same relative path
+under --dst, with the same dimension, variable and attribute names. Only the
+lat/lon extent shrinks (the row/column box of curvilinear lat(y, x)/lon(y, x)
+grids), so `DATA_ROOT` (profiles.<name>.shud.forcing.dir) can point at the
+subset unchanged.
+
+Output variables are deflate-compressed and chunked along time with the whole
+(small) box in each chunk. Reading a station's time series then touches a few
+chunks instead of a global grid per record. Packed variables
+(scale_factor/add_offset) are copied raw. Stations keep the same nearest cell
+as long as they lie at least one cell inside the box, which the padding
+guarantees. For GLDAS the default padding is the water-mask remap radius
+(forcing_weights.REMAP_MAX_R), so SHUD's nearest-valid-cell search around
+masked stations sees the same cells in the subset as in the full grid.
+
+Files whose subset is up to date (same source size/mtime and box) are skipped,
+so re-running after new source files arrive only cuts those.
+
+Usage:
+  python3 tools/subset_forcing.py --adapter configs/forcing/gldas.yaml \
+    --src Data/Forcing/GLDAS --dst Data/Forcing/GLDAS_qhh \
+    --tsd-forc runs/qhh/baseline/input/qhh/qhh.tsd.forc --from 20170101 --to 20181231
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import dataclasses
+import datetime as dt
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+from compare_forcing import _read_tsd_forc, _require_netCDF4
+from forcing_catalog import _walk, layout_streams, required_records, resolve_layout
+from forcing_weights import REMAP_MAX_R
+from grid_index import GridIndex, read_grid
+
+
+SUBSET_ATTR = "shudnc_subset"
+
+
+def _eprint(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
+def _load_adapter(path: str) -> Dict[str, Any]:
+    import yaml  # type: ignore
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"Adapter YAML root must be a mapping: {path}")
+    return data
+
+
+def _parse_yyyymmdd(s: str) -> dt.datetime:
+    return dt.datetime.strptime(s, "%Y%m%d").replace(tzinfo=dt.timezone.utc)
+
+
+@dataclasses.dataclass(frozen=True)
+class SubsetJob:
+    src: str
+    dst: str
+    stations: Tuple[Tuple[float, float], ...]
+    pad_cells: int
+    keep_vars: Tuple[str, ...]  # data variables to copy; empty = all
+    lat_name: str
+    lon_name: str
+    chunk_time: int
+    complevel: int
+    shuffle: bool
+
+
+def _box(grid: GridIndex, stations: Sequence[Tuple[float, float]], pad: int) -> Tuple[int, int, int, int]:
+    """Inclusive (lat_lo, lat_hi, lon_lo, lon_hi) index box around the stations' nearest cells, padded."""
+    nlat, nlon = grid.shape
+    ilat, ilon = grid.nearest([float(x) for x, _ in stations], [float(y) for _, y in stations])
+    return (
+        max(0, int(ilat.min()) - pad),
+        min(nlat - 1, int(ilat.max()) + pad),
+        max(0, int(ilon.min()) - pad),
+        min(nlon - 1, int(ilon.max()) + pad),
+    )
+
+
+def _up_to_date(dst: str, stamp: str) -> bool:
+    if not os.path.exists(dst):
+        return False
+    netCDF4 = _require_netCDF4()
+    try:
+        with netCDF4.Dataset(dst, "r") as ds:
+            return str(getattr(ds, SUBSET_ATTR, "")) == stamp
+    except OSError:
+        return False
+
+
+def _subset_file(job: SubsetJob) -> Dict[str, Any]:
+    netCDF4 = _require_netCDF4()
+
+    st = os.stat(job.src)
+    t0 = time.perf_counter()
+    with netCDF4.Dataset(job.src, "r") as src:
+        src.set_auto_maskandscale(False)
+        grid, lat_dim, lon_dim = read_grid(src, job.lat_name, job.lon_name)
+        box = _box(grid, job.stations, job.pad_cells)
+        # Everything that changes the output file: source identity, box, variable set and storage layout.
+        stamp = json.dumps(
+            {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "box": box,
+                "vars": sorted(job.keep_vars),
+                "chunk_time": job.chunk_time,
+                "complevel": job.complevel,
+                "shuffle": job.shuffle,
+            },
+            separators=(",", ":"),
+        )
+        if _up_to_date(job.dst, stamp):
+            return {"src": job.src, "skipped": True, "bytes_in": st.st_size, "bytes_out": os.path.getsize(job.dst)}
+
+        cut = {lat_dim: slice(box[0], box[1] + 1), lon_dim: slice(box[2], box[3] + 1)}
+        size = {lat_dim: box[1] - box[0] + 1, lon_dim: box[3] - box[2] + 1}
+
+        coords = {n for n, v in src.variables.items() if v.dimensions == (n,)} | {job.lat_name, job.lon_name}
+        names = [
+            n
+            for n, v in src.variables.items()
+            if not job.keep_vars or n in job.keep_vars or n in coords or not ({lat_dim, lon_dim} & set(v.dimensions))
+        ]
+
+        os.makedirs(os.path.dirname(job.dst), exist_ok=True)
+        # Unique temp name next to dst: two runs over the same archive must not write one file.
+        fd, tmp = tempfile.mkstemp(
+            prefix=os.path.basename(job.dst) + ".", suffix=".tmp", dir=os.path.dirname(job.dst)
+        )
+        os.close(fd)
+        try:
+            _write_subset(src, tmp, job, names=names, cut=cut, size=size, stamp=stamp)
+            os.replace(tmp, job.dst)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    return {
+        "src": job.src,
+        "skipped": False,
+        "box": list(box),
+        "bytes_in": st.st_size,
+        "bytes_out": os.path.getsize(job.dst),
+        "wall_sec": time.perf_counter() - t0,
+    }
+
+
+def _write_subset(
+    src: Any,
+    tmp: str,
+    job: SubsetJob,
+    *,
+    names: Sequence[str],
+    cut: Dict[str, slice],
+    size: Dict[str, int],
+    stamp: str,
+) -> None:
+    netCDF4 = _require_netCDF4()
+    # Deflate needs HDF5: classic-format sources become NETCDF4_CLASSIC (same data model).
+    fmt = src.data_model if src.data_model.startswith("NETCDF4") else "NETCDF4_CLASSIC"
+    with netCDF4.Dataset(tmp, "w", format=fmt, clobber=True) as out:
+        out.setncatts({k: src.getncattr(k) for k in src.ncattrs()})
+        for name, d in src.dimensions.items():
+            out.createDimension(name, None if d.isunlimited() else size.get(name, len(d)))
+        for name in names:
+            var = src.variables[name]
+            attrs = {k: var.getncattr(k) for k in var.ncattrs() if k != "_FillValue"}
+            fill = var.getncattr("_FillValue") if "_FillValue" in var.ncattrs() else None
+            shape = tuple(size.get(d, len(src.dimensions[d])) for d in var.dimensions)
+            opts: Dict[str, Any] = {}
+            if var.ndim >= 2 and job.complevel > 0 and var.dtype != str:
+                chunks = [
+                    max(1, min(n, job.chunk_time if job.chunk_time > 0 else n)) if i == 0 else max(1, n)
+                    for i, n in enumerate(shape)
+                ]
+                opts = {
+                    "zlib": True,
+                    "complevel": max(1, min(9, job.complevel)),
+                    "shuffle": job.shuffle,
+                    "chunksizes": tuple(chunks),
+                }
+            ov = out.createVariable(name, var.datatype, var.dimensions, fill_value=fill, **opts)
+            ov.set_auto_maskandscale(False)  # copy packed values as stored
+            ov.setncatts(attrs)
+            index = tuple(cut.get(d, slice(None)) for d in var.dimensions)
+            if var.ndim == 0:
+                ov.assignValue(var.getValue())
+            else:
+                ov[...] = var[index]
+        out.setncattr(SUBSET_ATTR, stamp)
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description="Cut a padded station bounding box from every forcing file")
+    ap.add_argument("--adapter", required=True, help="Forcing adapter YAML (configs/forcing/<product>.yaml)")
+    ap.add_argument("--src", required=True, help="Source archive root (the product's DATA_ROOT)")
+    ap.add_argument("--dst", required=True, help="Destination root (same layout; point DATA_ROOT here)")
+    ap.add_argument(
+        "--tsd-forc", action="append", required=True, help="<prj>.tsd.forc with the stations (repeatable: union box)"
+    )
+    ap.add_argument(
+        "--pad-cells",
+        type=int,
+        default=0,
+        help=f"Grid cells of padding around the stations, at least 1 (default: {REMAP_MAX_R} for GLDAS, else 3)",
+    )
+    ap.add_argument("--from", dest="date_from", default="", help="First day YYYYMMDD (default: all files)")
+    ap.add_argument("--to", dest="date_to", default="", help="Last day YYYYMMDD, inclusive (needs --from)")
+    ap.add_argument("--all-vars", action="store_true", help="Copy every variable, not just the adapter's var_names")
+    ap.add_argument("--chunk-time", type=int, default=0, help="Chunk length along time (default: whole file)")
+    ap.add_argument("--complevel", type=int, default=4, help="Deflate level 0-9, 0 disables (default: 4)")
+    ap.add_argument("--no-shuffle", action="store_true", help="Disable the HDF5 shuffle filter")
+    ap.add_argument("--jobs", type=int, default=0, help="Worker processes (default: CPU count)")
+    ap.add_argument("--dry-run", action="store_true", help="List the files and box without writing")
+    args = ap.parse_args(list(argv))
+
+    adapter = _load_adapter(args.adapter)
+    product = str(adapter.get("name", "")).upper()
+    layout = adapter.get("layout") or {}
+    netcdf = adapter.get("netcdf") or {}
+    dims = netcdf.get("dims") or {}
+    var_names = {str(k): str(v) for k, v in (netcdf.get("var_names") or {}).items()}
+    src_root = os.path.abspath(args.src)
+    dst_root = os.path.abspath(args.dst)
+    if src_root == dst_root:
+        raise ValueError("--dst must differ from --src")
+    if not os.path.isdir(src_root):
+        raise FileNotFoundError(f"Source archive not found: {src_root}")
+
+    stations: List[Tuple[float, float]] = []
+    for p in args.tsd_forc:
+        stations.extend((s.lon_deg, s.lat_deg) for s in _read_tsd_forc(p).stations)
+    if not stations:
+        raise ValueError("No forcing stations in --tsd-forc")
+    if args.pad_cells <= 0:
+        args.pad_cells = REMAP_MAX_R if product == "GLDAS" else 3
+    elif product == "GLDAS" and args.pad_cells < REMAP_MAX_R:
+        _eprint(
+            f"WARNING: --pad-cells {args.pad_cells} < {REMAP_MAX_R} (GLDAS water-mask remap radius): "
+            "masked stations may remap to a different cell on the subset"
+        )
+
+    if args.date_from:
+        t_start = _parse_yyyymmdd(args.date_from)
+        t_end = _parse_yyyymmdd(args.date_to) + dt.timedelta(days=1) if args.date_to else t_start + dt.timedelta(days=1)
+        _, records = required_records(product, t_start, t_end)
+        var_dirs = {str(k): str(v) for k, v in (layout.get("variables_dir") or {}).items()} or None
+        resolved = resolve_layout(
+            src_root,
+            str(layout.get("file_pattern", "")),
+            records,
+            layout_streams(var_names, var_dirs),
+            per_var=bool(var_dirs),
+            year_subdir=layout.get("year_subdir") is True,
+        )
+        rels = sorted({r for res in resolved.values() for m in res.values() for r in m})
+        missing = [pat for res in resolved.values() for pat, m in res.items() if not m]
+        for pat in missing[:10]:
+            _eprint(f"WARNING: no source file for {pat}")
+    else:
+        rels = _walk(src_root)
+    if not rels:
+        raise FileNotFoundError(f"No NetCDF files to subset under {src_root}")
+
+    lat_name = str(dims.get("lat", "lat"))
+    lon_name = str(dims.get("lon", "lon"))
+    jobs = [
+        SubsetJob(
+            src=os.path.join(src_root, r),
+            dst=os.path.join(dst_root, r),
+            stations=tuple(stations),
+            pad_cells=max(1, int(args.pad_cells)),
+            keep_vars=() if args.all_vars else tuple(sorted(set(var_names.values()))),
+            lat_name=lat_name,
+            lon_name=lon_name,
+            chunk_time=int(args.chunk_time),
+            complevel=int(args.complevel),
+            shuffle=not bool(args.no_shuffle),
+        )
+        for r in rels
+    ]
+
+    print(f"== Forcing subset: {product or '?'} {len(jobs)} files, {len(stations)} stations, pad {args.pad_cells} cells ==")
+    if args.dry_run:
+        for j in jobs[:20]:
+            print(f"$ {j.src} -> {j.dst}")
+        if len(jobs) > 20:
+            print(f"... {len(jobs) - 20} more")
+        return 0
+
+    t0 = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+    workers = int(args.jobs) if int(args.jobs) > 0 else (os.cpu_count() or 1)
+    # HDF5 is not thread-safe: one process per file.
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for res in pool.map(_subset_file, jobs, chunksize=max(1, len(jobs) // (workers * 8))):
+            results.append(res)
+    wall = time.perf_counter() - t0
+
+    done = [r for r in results if not r["skipped"]]
+    bytes_in = sum(int(r["bytes_in"]) for r in results)
+    bytes_out = sum(int(r["bytes_out"]) for r in results)
+    boxes = sorted({tuple(r["box"]) for r in done})
+    manifest = {
+        "product": product,
+        "src": src_root,
+        "adapter": os.path.abspath(args.adapter),
+        "tsd_forc": [os.path.abspath(p) for p in args.tsd_forc],
+        "pad_cells": int(args.pad_cells),
+        "stations": len(stations),
+        "boxes": [list(b) for b in boxes],
+        "files": len(results),
+        "written": len(done),
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "wall_sec": wall,
+    }
+    print(f"- written={len(done)} up-to-date={len(results) - len(done)} ({wall:.2f}s)")
+    for b in boxes:
+        print(f"- box lat[{b[0]}:{b[1]}] lon[{b[2]}:{b[3]}] ({(b[1] - b[0] + 1) * (b[3] - b[2] + 1)} cells)")
+    ratio = bytes_in / bytes_out if bytes_out else 0.0
+    print(f"- size: {bytes_in / 1e6:.1f} MB -> {bytes_out / 1e6:.1f} MB ({ratio:.1f}x)")
+    os.makedirs(dst_root, exist_ok=True)
+    out_path = os.path.join(dst_root, "subset_manifest.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    print(f"Wrote: {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))